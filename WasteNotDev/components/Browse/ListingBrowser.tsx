@@ -19,7 +19,7 @@ import type { Listing } from '../../services/types';
 const USER_BRANCH_ID = '546c6ef4-ef5d-4582-b1c6-6977a42d1ce1';
 
 export const ListingBrowser = () => {
-  const { listings, loading, refetch } = useListings();
+  const { listings, loading, refetch, loadMore, hasMore, loadingMore } = useListings();
   const [selectedListing, setSelectedListing] = useState<string | null>(null);
   const [claimQuantities, setClaimQuantities] = useState<Record<string, number>>({});
   const [claiming, setClaiming] = useState(false);
@@ -135,6 +135,14 @@ export const ListingBrowser = () => {
             )}
           </View>
         ))}
+
+        {hasMore && (
+          <TouchableOpacity style={styles.loadMoreButton} onPress={loadMore} disabled={loadingMore}>
+            <ThemedText style={styles.loadMoreText}>
+              {loadingMore ? 'Loading...' : 'Load more listings'}
+            </ThemedText>
+          </TouchableOpacity>
+        )}
       </ScrollView>
     </ThemedView>
   );
@@ -193,6 +201,17 @@ const styles = StyleSheet.create({
     borderRadius: 8,
     overflow: 'hidden',
   },
+  loadMoreButton: {
+    margin: 16,
+    padding: 12,
+    borderRadius: 8,
+    alignItems: 'center',
+    backgroundColor: '#f5f5f5',
+  },
+  loadMoreText: {
+    fontSize: 16,
+    color: '#007AFF',
+  },
   claimButton: {
     backgroundColor: '#28a745',
     margin: 16,
@@ -5,7 +5,7 @@
 
 
 import React from 'react';
-import { View, Text, StyleSheet, RefreshControl, ActivityIndicator, Alert, ScrollView } from 'react-native';
+import { View, Text, StyleSheet, RefreshControl, ActivityIndicator, Alert, ScrollView, TouchableOpacity } from 'react-native';
 import { usePendingClaims } from '@/hooks/usePendingClaims';
 import { PendingClaimCard } from './PendingClaimCard';
 import { ApprovedClaimCard } from './ApprovedClaimCard';
@@ -15,7 +15,7 @@ export const PendingClaimsList: React.FC = () => {
   const branchId = '03a897a0-e271-4174-aed2-d283a888dbae';
   const userBranchId = '0ca58dd2-df98-42ee-b0a4-f6b43c00a3d8';
 
-  const { claims, approvedClaims, loading, error, refresh, approveClaim, approving } =
+  const { claims, approvedClaims, loading, error, refresh, approveClaim, approving, approveAllClaims, approvingAll } =
     usePendingClaims(branchId, userBranchId);
 
   const handleApproveClaim = (claimId: string) => {
@@ -29,6 +29,17 @@ export const PendingClaimsList: React.FC = () => {
     );
   };
 
+  const handleApproveAll = () => {
+    Alert.alert(
+      'Approve All Claims',
+      `Are you sure you want to approve all ${claims.length} pending claims?`,
+      [
+        { text: 'Cancel', style: 'cancel' },
+        { text: 'Approve All', onPress: () => approveAllClaims() },
+      ]
+    );
+  };
+
   if (loading && claims.length === 0 && approvedClaims.length === 0) {
     return (
       <View style={styles.container}>
@@ -78,7 +89,22 @@ export const PendingClaimsList: React.FC = () => {
 
       {/* Pending Claims Section */}
       <View style={styles.section}>
-        <Text style={styles.sectionTitle}>Pending Claims</Text>
+        <View style={styles.sectionHeader}>
+          <Text style={styles.sectionTitle}>Pending Claims</Text>
+          {claims.length > 1 && (
+            <TouchableOpacity
+              style={[styles.approveAllButton, approvingAll && styles.approveAllButtonDisabled]}
+              onPress={handleApproveAll}
+              disabled={approvingAll}
+            >
+              {approvingAll ? (
+                <ActivityIndicator size="small" color="#fff" />
+              ) : (
+                <Text style={styles.approveAllText}>Approve All ({claims.length})</Text>
+              )}
+            </TouchableOpacity>
+          )}
+        </View>
         {claims.length === 0 ? (
           <View style={styles.emptySection}>
             <Text style={styles.emptyText}>✓ No pending claims</Text>
@@ -158,6 +184,27 @@ const styles = StyleSheet.create({
     paddingHorizontal: 16,
     marginBottom: 12,
   },
+  sectionHeader: {
+    flexDirection: 'row',
+    justifyContent: 'space-between',
+    alignItems: 'center',
+    paddingRight: 16,
+  },
+  approveAllButton: {
+    backgroundColor: '#4CAF50',
+    borderRadius: 8,
+    paddingVertical: 6,
+    paddingHorizontal: 12,
+    marginBottom: 12,
+  },
+  approveAllButtonDisabled: {
+    opacity: 0.6,
+  },
+  approveAllText: {
+    color: '#fff',
+    fontWeight: 'bold',
+    fontSize: 14,
+  },
   listContainer: {
     paddingHorizontal: 16,
   },
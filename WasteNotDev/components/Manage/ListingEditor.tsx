@@ -2,6 +2,7 @@
 // Fetches listings created by the current branch
 // Allows editing individual item quantities via EditableLineItem components
 // Provides cancel listing functionality that sets all quantities to zero
+// Cancel All cancels every listing at once (e.g. at close of day) with a single request
 // Manages listing state and communicates with backend via listingService
 // This is adapted for React Native from my own code in frontend/src/components/ManageListings.jsx
 
@@ -18,7 +19,7 @@ const BRANCH_ID = '03a897a0-e271-4174-aed2-d283a888dbae';
 const USER_BRANCH_ID = '0ca58dd2-df98-42ee-b0a4-f6b43c00a3d8';
 
 export const ListingEditor = () => {
-  const { listings, loading, updateItem, cancelListing } = useListingManagement(BRANCH_ID, USER_BRANCH_ID);
+  const { listings, loading, updateItem, cancelListing, cancelAll } = useListingManagement(BRANCH_ID, USER_BRANCH_ID);
 
   const handleCancel = (listing: any) => {
     Alert.alert(
@@ -47,6 +48,33 @@ export const ListingEditor = () => {
     );
   };
 
+  const handleCancelAll = () => {
+    Alert.alert(
+      'Cancel All Listings',
+      `Are you sure you want to cancel all ${listings.length} listings?`,
+      [
+        { text: 'No', style: 'cancel' },
+        {
+          text: 'Yes, Cancel All',
+          style: 'destructive',
+          onPress: async () => {
+            try {
+              const results = await cancelAll();
+              const failed = results.filter((r) => !r.success).length;
+              if (failed > 0) {
+                Alert.alert('Partly done', `${failed} listing(s) could not be cancelled.`);
+              } else {
+                Alert.alert('Success', 'All listings cancelled successfully!');
+              }
+            } catch (error) {
+              Alert.alert('Error', 'Failed to cancel listings.');
+            }
+          },
+        },
+      ]
+    );
+  };
+
   if (loading) {
     return (
       <ThemedView style={styles.centerContainer}>
@@ -69,6 +97,10 @@ export const ListingEditor = () => {
         Manage Your Listings
       </ThemedText>
 
+      <TouchableOpacity style={styles.cancelAllButton} onPress={handleCancelAll}>
+        <ThemedText style={styles.cancelButtonText}>Cancel All Listings</ThemedText>
+      </TouchableOpacity>
+
       <ScrollView style={styles.content}>
         {listings.map((listing) => (
           <View key={listing.listing_id} style={styles.listingContainer}>
@@ -157,6 +189,14 @@ const styles = StyleSheet.create({
     paddingVertical: 8,
     borderRadius: 8,
   },
+  cancelAllButton: {
+    backgroundColor: '#dc3545',
+    marginHorizontal: 16,
+    marginBottom: 8,
+    paddingVertical: 10,
+    borderRadius: 8,
+    alignItems: 'center',
+  },
   cancelButtonText: {
     color: '#fff',
     fontSize: 14,
@@ -1,7 +1,7 @@
 
 
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   View,
   Text,
@@ -11,7 +11,7 @@ import {
   ActivityIndicator,
 } from 'react-native';
 import { useRouter } from 'expo-router';
-import { pickupService} from "@/services/pickupService";
+import { pickupService, MyPickupChanges } from "@/services/pickupService";
 
 interface MyPickup {
   claim_id: string;
@@ -20,12 +20,23 @@ interface MyPickup {
   org_name: string;
   branch_name: string;
   total_items: number;
+  approved_at: string | null;
 }
 
+// Replacing the changed pickups, most recently approved first like the API
+const applyPickupChanges = (prev: MyPickup[], changes: MyPickupChanges): MyPickup[] => {
+  const changed = new Set(changes.pickups.map((p) => p.claim_id));
+  return [...changes.pickups, ...prev.filter((p) => !changed.has(p.claim_id))]
+    .sort((a, b) => Date.parse(b.approved_at ?? '') - Date.parse(a.approved_at ?? '') || 0);
+};
+
 export const MyPickupsList: React.FC = () => {
   const router = useRouter();
   const [pickups, setPickups] = useState<MyPickup[]>([]);
   const [loading, setLoading] = useState(true);
+  const [refreshing, setRefreshing] = useState(false);
+  // Cursor from the last response, so a refresh only downloads the pickups that changed
+  const changeCursor = useRef<string | null>(null);
 
   // Charity user id
   // TODO: will need to eventually change this to reflect the logged in credentials
@@ -40,9 +51,10 @@ export const MyPickupsList: React.FC = () => {
   const loadPickups = async () => {
     try{
       setLoading(true);
-      // the branch id
-      const data = await pickupService.getMyPickups(BranchId);
-      setPickups(data);
+      // the branch id, without a cursor every pickup comes back
+      const changes = await pickupService.getMyPickupChanges(BranchId);
+      setPickups(changes.pickups);
+      changeCursor.current = changes.cursor;
     }
     catch (error) {
       console.error('Error loading pickups:', error);
@@ -52,6 +64,26 @@ export const MyPickupsList: React.FC = () => {
     }
   };
 
+  // Pull to refresh, only the pickups approved or collected since the last load are downloaded
+  const refreshPickups = async () => {
+    if (!changeCursor.current) {
+      await loadPickups();
+      return;
+    }
+    try {
+      setRefreshing(true);
+      const changes = await pickupService.getMyPickupChanges(BranchId, changeCursor.current);
+      setPickups((prev) => applyPickupChanges(prev, changes));
+      changeCursor.current = changes.cursor;
+    }
+    catch (error) {
+      console.error('Error refreshing pickups:', error);
+    }
+    finally {
+      setRefreshing(false);
+    }
+  };
+
   const handleViewQR = (claimId: string) => {
     router.push({
       pathname: '/pickup-qr',
@@ -129,6 +161,8 @@ export const MyPickupsList: React.FC = () => {
           </TouchableOpacity>
         )}
         contentContainerStyle={styles.listContainer}
+        refreshing={refreshing}
+        onRefresh={refreshPickups}
       />
     </View>
   );
@@ -10,6 +10,7 @@ import {
   TouchableOpacity,
 } from 'react-native';
 import { usePickupQR } from '@/hooks/usePickupQR';
+import { pickupService } from '@/services/pickupService';
 import { ClaimStatusBadge } from './ClaimStatusBadge';
 
 interface QRCodeDisplayProps {
@@ -88,7 +89,7 @@ export const QRCodeDisplay: React.FC<QRCodeDisplayProps> = ({
       {/* QR Code */}
       <View style={styles.qrContainer}>
         <Image
-          source={{ uri: qrData.qr_code_image }}
+          source={{ uri: pickupService.qrImageUri(qrData), cache: 'default' }}
           style={styles.qrImage}
           resizeMode="contain"
         />
@@ -2,7 +2,9 @@
 import React, { useState, useEffect } from 'react';
 import { View, StyleSheet, Alert, ActivityIndicator } from 'react-native';
 import { CameraView, useCameraPermissions } from 'expo-camera';
-import { pickupService, VerifyPickupResponse } from '@/services/pickupService';
+import { pickupService, VerifyPickupResponse, VerifiedPickupResult } from '@/services/pickupService';
+import { precheckPickupCode } from '@/services/pickupToken';
+import { pickupQueue } from '@/services/pickupQueue';
 
 
 interface QRCodeScannerProps {
@@ -26,10 +28,52 @@ export const QRCodeScanner: React.FC<QRCodeScannerProps> = ({
     }
   }, []);
 
+  // Confirming codes queued while the API was busy, and telling the worker about any that failed
+  useEffect(() => {
+    return pickupQueue.start(userBranchId, (results: VerifiedPickupResult[]) => {
+      const failed = results.filter((r) => !r.success);
+      if (failed.length) {
+        Alert.alert(
+          'Queued Pickups Not Confirmed',
+          failed.map((r) => `${r.charity_name || 'Unknown'}: ${r.message}`).join('\n')
+        );
+      }
+    });
+  }, [userBranchId]);
+
+  const showFailure = (errorMessage: string) => {
+    Alert.alert(
+      'Verification Failed',
+      errorMessage,
+      [
+        {
+          text: 'Try Again',
+          onPress: () => {
+            setScanned(false);
+            setVerifying(false);
+          }
+        },
+        {
+          text: 'Cancel',
+          onPress: onCancel,
+          style: 'cancel'
+        }
+      ]
+    );
+  };
+
   const handleBarCodeScanned = async ({ data }: { data: string }) => {
     if (scanned || verifying) return;
 
     setScanned(true);
+
+    // Signed codes for another store or past their expiry are turned away without the API
+    const precheckError = precheckPickupCode(data, userBranchId);
+    if (precheckError) {
+      showFailure(precheckError);
+      return;
+    }
+
     setVerifying(true);
 
     try {
@@ -38,26 +82,21 @@ export const QRCodeScanner: React.FC<QRCodeScannerProps> = ({
       onVerified(result);
 
     } catch (error: any) {
-      const errorMessage = error.response?.data?.detail || 'Failed to verify pickup';
-
-      Alert.alert(
-        'Verification Failed',
-        errorMessage,
-        [
-          {
-            text: 'Try Again',
-            onPress: () => {
-              setScanned(false);
-              setVerifying(false);
-            }
-          },
-          {
-            text: 'Cancel',
-            onPress: onCancel,
-            style: 'cancel'
-          }
-        ]
-      );
+      // No answer or the API was too busy: a code that passed the pre-check is queued and
+      // confirmed later, so the queue at the door keeps moving
+      const busy = !error.response || error.response.status === 503;
+      if (busy && data.startsWith('WN1.')) {
+        pickupQueue.add(data);
+        Alert.alert(
+          'Pickup Queued',
+          'This code is for your store and has not expired, but the server could not confirm it yet. ' +
+          'It will be confirmed automatically when the server responds.',
+          [{ text: 'Next Scan', onPress: () => { setScanned(false); setVerifying(false); } }]
+        );
+        return;
+      }
+
+      showFailure(error.response?.data?.detail || 'Failed to verify pickup');
     }
   };
 
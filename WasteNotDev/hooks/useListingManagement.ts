@@ -1,6 +1,7 @@
 // Custom hook for managing listings (edit/cancel operations)
 // Fetches listings for a specific branch from the backend
 // Provides functions to update individual items and cancel entire listings
+// cancelAll cancels every listing for the branch in one request instead of one request per listing
 // Manages loading state and error handling
 // Automatically refetches data after mutations
 
@@ -61,7 +62,21 @@ export const useListingManagement = (branchId: string, userBranchId: string) =>
     }
   };
 
-  return { listings, loading, error, refetch: fetchListings, updateItem, cancelListing };
+  const cancelAll = async () => {
+    try {
+      const results = await listingService.bulkUpdate({
+        user_branch_id: userBranchId,
+        cancel: listings.map((listing) => listing.listing_id),
+      });
+      await fetchListings(); // Refresh the list
+      return results;
+    } catch (err) {
+      console.error('Error canceling listings:', err);
+      throw err;
+    }
+  };
+
+  return { listings, loading, error, refetch: fetchListings, updateItem, cancelListing, cancelAll };
 };
 
 // REFERENCES
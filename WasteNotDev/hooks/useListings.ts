@@ -1,23 +1,51 @@
 // Custom hook for fetching available listings
-// Retrieves all available listings from the backend API
+// Retrieves available listings from the backend API one page at a time
 // Manages loading state and error handling
 // Provides refetch function to manually reload data
 // Used by the browse/claim functionality
-import { useState, useEffect } from 'react';
-import { listingService } from '../services/listingService';
+// Listings shown are kept up to date from the backend's event stream, so claimed items disappear without a refresh
+// Refreshing (e.g. after a claim) only downloads the listings that changed since the last load (GET /listings/changes)
+import { useState, useEffect, useRef } from 'react';
+import { listingService, ListingChanges } from '../services/listingService';
+import { eventService } from '../services/eventService';
 import type { Listing } from '../services/types';
 
+// Replacing changed listings and dropping removed ones, in listing_id order like the pages
+// New listings after the last loaded one are left for loadMore while there are more pages
+const applyListingChanges = (prev: Listing[], changes: ListingChanges, hasMore: boolean): Listing[] => {
+  const removed = new Set(changes.removed);
+  const changed = new Map(changes.listings.map((l) => [l.listing_id, l]));
+  const loaded = new Set(prev.map((l) => l.listing_id));
+  const last = prev.length ? prev[prev.length - 1].listing_id : null;
+  const added = changes.listings.filter(
+    (l) => !loaded.has(l.listing_id) && (!hasMore || (last !== null && l.listing_id < last))
+  );
+  return [
+    ...prev.filter((l) => !removed.has(l.listing_id)).map((l) => changed.get(l.listing_id) ?? l),
+    ...added,
+  ].sort((a, b) => (a.listing_id < b.listing_id ? -1 : 1));
+};
+
 export const useListings = () => {
   const [listings, setListings] = useState<Listing[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<Error | null>(null);
+  // Cursor for GET /listings/changes, taken before the first page was loaded
+  const changeCursor = useRef<string | null>(null);
 
+  // Loads the first page again
   const fetchListings = async () => {
     try {
       setLoading(true);
       setError(null);
-      const data = await listingService.getAvailable();
-      setListings(data);
+      // Getting the cursor first, so anything that changes while the page loads is picked up by the next sync
+      const { cursor } = await listingService.getChanges();
+      const page = await listingService.getAvailable();
+      setListings(page.listings);
+      setNextCursor(page.nextCursor);
+      changeCursor.current = cursor;
     } catch (err) {
       setError(err as Error);
       console.error('Error fetching listings:', err);
@@ -26,11 +54,70 @@ export const useListings = () => {
     }
   };
 
+  // Adds the next page to the end of the list
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const page = await listingService.getAvailable(nextCursor);
+      setListings((prev) => [...prev, ...page.listings]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      setError(err as Error);
+      console.error('Error fetching more listings:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Applying what changed since the last load instead of loading the first page again
+  const syncListings = async () => {
+    if (!changeCursor.current) {
+      await fetchListings();
+      return;
+    }
+    try {
+      setError(null);
+      const changes = await listingService.getChanges(changeCursor.current);
+      setListings((prev) => applyListingChanges(prev, changes, nextCursor !== null));
+      changeCursor.current = changes.cursor;
+    } catch (err: any) {
+      // 410 when too much has changed, it is quicker to load the listings again
+      if (err.response?.status === 410) {
+        await fetchListings();
+        return;
+      }
+      setError(err as Error);
+      console.error('Error syncing listings:', err);
+    }
+  };
+
   useEffect(() => {
     fetchListings();
   }, []);
 
-  return { listings, loading, error, refetch: fetchListings };
+  // Updating the items of listings already on screen, listings with nothing left are removed
+  // New listings are not added here, they appear the next time the list is fetched
+  useEffect(() => {
+    return eventService.subscribe(['listings'], (event) => {
+      if (event.type === 'resync') {
+        fetchListings();
+        return;
+      }
+      if (event.type !== 'listing') return;
+      const changed = new Map(event.listings.map((l) => [l.listing_id, l.items]));
+      setListings((prev) =>
+        prev
+          .map((listing) => {
+            const items = changed.get(listing.listing_id);
+            return items ? { ...listing, items } : listing;
+          })
+          .filter((listing) => listing.items.length > 0)
+      );
+    });
+  }, []);
+
+  return { listings, loading, error, refetch: syncListings, loadMore, hasMore: nextCursor !== null, loadingMore };
 };
 
 // REFERENCES
@@ -1,12 +1,22 @@
 // Custom hook for managing pending claims and approved claims awaiting pickup
 // Fetches pending claims for approval and approved claims waiting for pickup
-// Provides functions to approve claims and refresh data
+// Provides functions to approve claims (one at a time or all at once) and refresh data
 // Manages loading states and error handling
+// Reloads when the backend's event stream says a claim for this branch changed, instead of waiting for a pull to refresh
+// After the first load only the pending claims that changed are downloaded (GET /claims/pending/changes)
 
 
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { Alert } from 'react-native';
-import { claimApprovalService, PendingClaimDetail, ApprovedClaimGroup } from '@/services/claimApprovalService';
+import { claimApprovalService, PendingClaimDetail, PendingClaimChanges, ApprovedClaimGroup } from '@/services/claimApprovalService';
+import { eventService } from '@/services/eventService';
+
+// Replacing the changed claims and dropping the ones no longer pending, newest first like the API
+const applyClaimChanges = (prev: PendingClaimDetail[], changes: PendingClaimChanges): PendingClaimDetail[] => {
+  const replaced = new Set([...changes.removed, ...changes.claims.map((c) => c.claim_id)]);
+  return [...changes.claims, ...prev.filter((c) => !replaced.has(c.claim_id))]
+    .sort((a, b) => Date.parse(b.created_at) - Date.parse(a.created_at));
+};
 
 export const usePendingClaims = (branchId: string, userBranchId: string) => {
   const [claims, setClaims] = useState<PendingClaimDetail[]>([]);
@@ -14,6 +24,9 @@ export const usePendingClaims = (branchId: string, userBranchId: string) => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [approving, setApproving] = useState<string | null>(null);
+  const [approvingAll, setApprovingAll] = useState(false);
+  // Cursor from the last pending claims response, for the branch it was for
+  const cursorRef = useRef<{ branchId: string; cursor: string } | null>(null);
 
   const loadClaims = useCallback(async (): Promise<void> => {
     if (!branchId) {
@@ -27,10 +40,13 @@ export const usePendingClaims = (branchId: string, userBranchId: string) => {
 
       // Loading both pending claims and approved claims awaiting pickup
       // sequential wait, as promise all would not work
-      const pendingData = await claimApprovalService.getPendingClaims(branchId);
+      // Without a cursor (first load or another branch) every pending claim comes back
+      const cursor = cursorRef.current?.branchId === branchId ? cursorRef.current.cursor : null;
+      const pendingChanges = await claimApprovalService.getPendingClaimChanges(branchId, cursor);
       const approvedData = await claimApprovalService.getApprovedAwaitingPickup(branchId);
 
-      setClaims(pendingData);
+      setClaims((prevClaims) => (cursor ? applyClaimChanges(prevClaims, pendingChanges) : pendingChanges.claims));
+      cursorRef.current = { branchId, cursor: pendingChanges.cursor };
       setApprovedClaims(approvedData);
     } catch (err) {
       console.error('Error loading claims:', err);
@@ -44,6 +60,14 @@ export const usePendingClaims = (branchId: string, userBranchId: string) => {
     void loadClaims();
   }, [loadClaims]);
 
+  // Claims created, approved or collected for this branch, and resyncs after the stream drops
+  useEffect(() => {
+    if (!branchId) return;
+    return eventService.subscribe(['claims'], () => {
+      void loadClaims();
+    }, branchId);
+  }, [branchId, loadClaims]);
+
   const approveClaim = useCallback(async (claimId: string): Promise<boolean> => {
     if (!userBranchId) {
       Alert.alert('Error', 'User branch not found');
@@ -82,6 +106,52 @@ export const usePendingClaims = (branchId: string, userBranchId: string) => {
     }
   }, [userBranchId, branchId]);
 
+  // Approving every pending claim in one request, for clearing the list just before pickup time
+  const approveAllClaims = useCallback(async (): Promise<boolean> => {
+    if (!userBranchId) {
+      Alert.alert('Error', 'User branch not found');
+      return false;
+    }
+
+    try {
+      setApprovingAll(true);
+
+      const { results, approved_amt } = await claimApprovalService.approveClaims({
+        claim_ids: claims.map((c) => c.claim_id),
+        user_branch_id: userBranchId
+      });
+
+      // Removing the approved claims and any that were already approved, keeping the ones that failed
+      const done = new Set(
+        results
+          .filter((r) => r.approved || r.message === 'Claim has already been approved')
+          .map((r) => r.claim_id)
+      );
+      setClaims((prevClaims) => prevClaims.filter((c) => !done.has(c.claim_id)));
+
+      const approvedData = await claimApprovalService.getApprovedAwaitingPickup(branchId);
+      setApprovedClaims(approvedData);
+
+      const failed = results.filter((r) => !r.approved && !done.has(r.claim_id));
+      Alert.alert(
+        failed.length ? 'Some claims were not approved' : 'Success',
+        failed.length
+          ? `${approved_amt} approved. ${failed.length} could not be approved: ${failed[0].message}`
+          : `${approved_amt} claims approved! The charities can now pick up their items.`,
+        [{ text: 'OK' }]
+      );
+
+      return failed.length === 0;
+    } catch (err: any) {
+      console.error('Error approving claims:', err);
+      const errorMessage = err.response?.data?.detail || 'Failed to approve claims';
+      Alert.alert('Error', errorMessage);
+      return false;
+    } finally {
+      setApprovingAll(false);
+    }
+  }, [userBranchId, branchId, claims]);
+
   const refresh = useCallback(() => {
     void loadClaims();
   }, [loadClaims]);
@@ -93,7 +163,9 @@ export const usePendingClaims = (branchId: string, userBranchId: string) => {
     error,
     refresh,
     approveClaim,
-    approving
+    approving,
+    approveAllClaims,
+    approvingAll
   };
 };
 
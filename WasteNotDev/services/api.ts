@@ -19,6 +19,74 @@ const config: AxiosRequestConfig = {
 
 export const api = axios.create(config);
 
+// Read-your-writes with a read replica on the API (backend/db/replica.py)
+// Every write response carries the database position it reached in X-WasteNot-LSN, and sending the latest
+// one back with each request makes the API read from a copy of the database that already has our changes
+const LSN_HEADER = 'x-wastenot-lsn';
+let writeToken: string | null = null;
+
+api.interceptors.response.use((response) => {
+  const token = response.headers[LSN_HEADER];
+  if (token) {
+    writeToken = token;
+  }
+  return response;
+});
+
+api.interceptors.request.use((request) => {
+  if (writeToken) {
+    request.headers.set(LSN_HEADER, writeToken);
+  }
+  return request;
+});
+
+// For URLs loaded outside axios (e.g. by an Image component), which cannot send the header
+export const withWriteToken = (url: string): string =>
+  writeToken ? `${url}${url.includes('?') ? '&' : '?'}lsn=${encodeURIComponent(writeToken)}` : url;
+
+// Conditional GETs for the branch screens (backend/db/versions.py)
+// The pending claims, pickups, listings and awaiting pickup endpoints send an ETag, and sending it back in
+// If-None-Match gets an empty 304 when nothing on the branch has changed, so we keep the last body for each
+// URL and hand it back to the caller as if it was a normal 200
+const MAX_CACHED = 50;
+const etagCache = new Map<string, { etag: string; data: unknown }>();
+
+const cacheKey = (request: AxiosRequestConfig): string => api.getUri({ ...request, method: 'get' });
+
+api.interceptors.request.use((request) => {
+  if ((request.method ?? 'get').toLowerCase() === 'get') {
+    const cached = etagCache.get(cacheKey(request));
+    if (cached) {
+      request.headers.set('If-None-Match', cached.etag);
+      // axios rejects anything outside 2xx by default
+      request.validateStatus = (status) => (status >= 200 && status < 300) || status === 304;
+    }
+  }
+  return request;
+});
+
+api.interceptors.response.use((response) => {
+  if ((response.config.method ?? 'get').toLowerCase() !== 'get') return response;
+  const key = cacheKey(response.config);
+  if (response.status === 304) {
+    const cached = etagCache.get(key);
+    if (cached) {
+      return { ...response, status: 200, data: cached.data };
+    }
+    return response;
+  }
+  const etag = response.headers['etag'];
+  if (etag) {
+    // Oldest URL out first once the cache is full (a Map keeps insertion order)
+    etagCache.delete(key);
+    etagCache.set(key, { etag, data: response.data });
+    if (etagCache.size > MAX_CACHED) {
+      etagCache.delete(etagCache.keys().next().value as string);
+    }
+  }
+  return response;
+});
+
 // REFERENCES
 // ChatGPT. (2025, November 7). Retrieved from chatgpt.com: https://chatgpt.com/c/69176485-1458-8331-b053-4df0abe35697
 // ChatGPT. (2025, November 11). Retrieved from chatgpt.com: https://chatgpt.com/c/69203ef4-2430-8326-be09-e8e39fed78c5
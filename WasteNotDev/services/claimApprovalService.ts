@@ -31,6 +31,18 @@ export interface ApproveClaimResponse {
   approved: boolean;
   message: string;
 }
+
+// Approving every pending claim at once, one result per claim
+export interface ApproveClaimsRequest {
+  claim_ids: string[];
+  user_branch_id: string;
+}
+
+export interface ApproveClaimsResponse {
+  results: ApproveClaimResponse[];
+  approved_amt: number;
+}
+
 export interface ApprovedClaimItem {
   product_name: string;
   quantity_claimed: number;
@@ -52,6 +64,14 @@ export interface ApprovedClaimGroup {
   claims: ApprovedClaim[];
 }
 
+// Pending claims changed since the cursor from the last response (GET /claims/pending/changes)
+// removed are claims that are no longer pending, e.g. approved on another device
+export interface PendingClaimChanges {
+  claims: PendingClaimDetail[];
+  removed: string[];
+  cursor: string;
+}
+
 export const claimApprovalService = {
     getPendingClaims: async (branchId: string): Promise<PendingClaimDetail[]> => {
         const response = await api.get('/claims/pending', {
@@ -59,10 +79,21 @@ export const claimApprovalService = {
         });
         return response.data;
     },
+    // Without a cursor every pending claim is returned
+    getPendingClaimChanges: async (branchId: string, cursor?: string | null): Promise<PendingClaimChanges> => {
+        const response = await api.get('/claims/pending/changes', {
+            params: cursor ? { branch_id: branchId, cursor } : { branch_id: branchId }
+        });
+        return response.data;
+    },
     approveClaim: async (request: ApproveClaimRequest): Promise<ApproveClaimResponse> => {
         const response = await api.post('/claims/approve', request);
         return response.data;
     },
+    approveClaims: async (request: ApproveClaimsRequest): Promise<ApproveClaimsResponse> => {
+        const response = await api.post('/claims/approve/bulk', request);
+        return response.data;
+    },
     getApprovedAwaitingPickup: async (branchId: string): Promise<ApprovedClaimGroup[]> => {
         const response = await api.get('/claims/approved-awaiting-pickup', {
             params: { branch_id: branchId }
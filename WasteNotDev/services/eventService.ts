@@ -0,0 +1,109 @@
+// Service for the server-sent events stream (GET /events on the backend)
+// Lets screens update when claims or listings change instead of reloading on a timer
+// React Native has no EventSource, so the stream is read with XMLHttpRequest,
+// whose responseText grows as each event arrives (MDN, 2025)
+// Reconnects after the retry time the server sends if the stream drops
+
+import { api } from './api';
+import type { ListingLineItem } from './types';
+
+export type EventTopic = 'claims' | 'listings';
+
+export interface ClaimEvent {
+  type: 'claim';
+  event: 'created' | 'approved' | 'collected';
+  claim_id: string;
+  branch_id: string;
+}
+
+// items is empty when the listing has nothing left to claim
+export interface ListingEvent {
+  type: 'listing';
+  branch_id: string;
+  listings: Array<{ listing_id: string; items: ListingLineItem[] }>;
+}
+
+// Changes may have been missed, so everything should be fetched again
+export interface ResyncEvent {
+  type: 'resync';
+}
+
+export type StreamEvent = ClaimEvent | ListingEvent | ResyncEvent;
+
+const DEFAULT_RETRY_MS = 5000;
+
+export const eventService = {
+  // Returns a function that closes the stream
+  subscribe: (
+    topics: EventTopic[],
+    onEvent: (event: StreamEvent) => void,
+    branchId?: string,
+  ): (() => void) => {
+    let xhr: XMLHttpRequest | null = null;
+    let timer: ReturnType<typeof setTimeout> | null = null;
+    let closed = false;
+    let retryMs = DEFAULT_RETRY_MS;
+
+    const connect = () => {
+      let seen = 0; // how much of responseText has been read
+      let buffer = '';
+      const params = new URLSearchParams({ topics: topics.join(',') });
+      if (branchId) params.append('branch_id', branchId);
+
+      const request = new XMLHttpRequest();
+      xhr = request;
+      request.open('GET', `${api.defaults.baseURL}/events?${params.toString()}`);
+      request.setRequestHeader('Accept', 'text/event-stream');
+
+      request.onprogress = () => {
+        buffer += request.responseText.slice(seen);
+        seen = request.responseText.length;
+
+        // Events are separated by a blank line, the last part may not have fully arrived yet
+        const parts = buffer.split('\n\n');
+        buffer = parts.pop() ?? '';
+        for (const part of parts) {
+          let data = '';
+          for (const line of part.split('\n')) {
+            if (line.startsWith('data: ')) data += line.slice(6);
+            else if (line.startsWith('retry: ')) retryMs = Number(line.slice(7)) || DEFAULT_RETRY_MS;
+            // lines starting with ':' are heartbeats
+          }
+          if (!data) continue;
+          try {
+            onEvent(JSON.parse(data) as StreamEvent);
+          } catch (err) {
+            console.error('Error reading event:', err);
+          }
+        }
+      };
+
+      // The stream only ends if it drops, so it is opened again
+      // and the screen refetches in case something changed in between
+      const reconnect = () => {
+        if (closed) return;
+        timer = setTimeout(() => {
+          onEvent({ type: 'resync' });
+          connect();
+        }, retryMs);
+      };
+      request.onerror = reconnect;
+      request.onload = reconnect;
+
+      request.send();
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      if (timer) clearTimeout(timer);
+      xhr?.abort();
+      xhr = null;
+    };
+  },
+};
+
+// REFERENCES
+// MDN. (2025). Using server-sent events. Retrieved from developer.mozilla.org: https://developer.mozilla.org/en-US/docs/Web/API/Server-sent_events/Using_server-sent_events
+// MDN. (2025). XMLHttpRequest: progress event. Retrieved from developer.mozilla.org: https://developer.mozilla.org/en-US/docs/Web/API/XMLHttpRequest/progress_event
@@ -2,13 +2,41 @@
 // Provides service functions for all listing operations
 
 import { api } from './api';
-import type { Listing, CreateListingRequest, UpdateListingItemRequest } from './types';
+import type { Listing, CreateListingRequest, UpdateListingItemRequest, BulkListingRequest, BulkListingResult } from './types';
+
+// One page of listings, nextCursor is null on the last page
+export interface ListingPage {
+  listings: Listing[];
+  nextCursor: string | null;
+}
+
+// Listings changed since the cursor from the last response (GET /listings/changes)
+// listings have all their available items, removed are listings with nothing left to claim
+export interface ListingChanges {
+  listings: Listing[];
+  removed: string[];
+  cursor: string;
+}
 
 export const listingService = {
-  // Get all available listings (for browsing)
+  // Get a page of available listings (for browsing)
+  // Pass the nextCursor from the previous page to get the next one
+  getAvailable: async (cursor?: string | null): Promise<ListingPage> => {
+    const response = await api.get('/listings', {
+      params: cursor ? { cursor } : {},
+    });
+    return {
+      listings: response.data,
+      nextCursor: response.headers['x-next-cursor'] ?? null,
+    };
+  },
 
-  getAvailable: async (): Promise<Listing[]> => {
-    const response = await api.get('/listings');
+  // Without a cursor only a new cursor is returned, to get before loading the first page
+  // A 410 means the cursor is too far behind and the listings should be loaded again
+  getChanges: async (cursor?: string | null): Promise<ListingChanges> => {
+    const response = await api.get('/listings/changes', {
+      params: cursor ? { cursor } : {},
+    });
     return response.data;
   },
 
@@ -37,6 +65,12 @@ export const listingService = {
   cancel: async (data: { user_branch_id: string; listing_id: string; items: UpdateListingItemRequest[] }): Promise<void> => {
     await api.post('/listing/cancel', data);
   },
+
+  //Edit and cancel many listings in one request, returns one result per listing
+  bulkUpdate: async (data: BulkListingRequest): Promise<BulkListingResult[]> => {
+    const response = await api.post('/listing/bulk', data);
+    return response.data.results;
+  },
 };
 
 // REFERENCES
@@ -0,0 +1,49 @@
+// Queue of scanned pickup codes the API could not confirm at the time (e.g. the database was slow)
+// The scanner keeps going, and the queued codes are confirmed together with POST /pickup/verify/bulk
+// Only codes that passed precheckPickupCode are queued, so they are for this store and not expired
+// A code stays queued until the API gives an answer for it
+
+import { pickupService, VerifiedPickupResult } from './pickupService';
+
+const FLUSH_INTERVAL_MS = 15000;
+
+let queued: string[] = [];
+let flushing = false;
+
+export const pickupQueue = {
+  add: (code: string): void => {
+    if (!queued.includes(code)) {
+      queued.push(code);
+    }
+  },
+
+  size: (): number => queued.length,
+
+  // Sends every queued code, returns the results or null if the API could not be reached again
+  flush: async (userBranchId: string): Promise<VerifiedPickupResult[] | null> => {
+    if (flushing || queued.length === 0) return [];
+    flushing = true;
+    const sending = [...queued];
+    try {
+      const { results } = await pickupService.verifyPickups(sending, userBranchId);
+      queued = queued.filter((code) => !sending.includes(code));
+      return results;
+    } catch (err) {
+      console.error('Error confirming queued pickups:', err);
+      return null;
+    } finally {
+      flushing = false;
+    }
+  },
+
+  // Flushes every FLUSH_INTERVAL_MS while codes are queued, returns a function that stops it
+  start: (userBranchId: string, onResults: (results: VerifiedPickupResult[]) => void): (() => void) => {
+    const timer = setInterval(async () => {
+      const results = await pickupQueue.flush(userBranchId);
+      if (results && results.length) {
+        onResults(results);
+      }
+    }, FLUSH_INTERVAL_MS);
+    return () => clearInterval(timer);
+  },
+};
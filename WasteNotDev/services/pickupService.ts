@@ -1,13 +1,13 @@
 
 
-import {api} from './api';
+import {api, withWriteToken} from './api';
 
 // QR data for pickup
 export interface PickupQRData {
   pickup_id: string;
   claim_id: string;
   qr_code: string;
-  qr_code_image: string; // base64 data URL
+  qr_code_image_url: string; // path of the PNG on the API, use pickupService.qrImageUri
   complete: boolean;
   created_at: string;
   items: Array<{
@@ -50,6 +50,27 @@ export interface VerifyPickupResponse{
   }>;
 }
 
+// Completing many scanned codes at once (POST /pickup/verify/bulk), one result per code
+export interface VerifiedPickupResult {
+  qr_code: string;
+  pickup_id: string | null;
+  claim_id: string | null;
+  success: boolean;
+  message: string;
+  charity_name: string | null;
+}
+
+export interface VerifyPickupsResponse {
+  results: VerifiedPickupResult[];
+  completed_amt: number;
+}
+
+// Pickups changed since the cursor from the last response (GET /pickups/my-pickups/changes)
+export interface MyPickupChanges {
+  pickups: MyPickup[];
+  cursor: string;
+}
+
 export const pickupService = {
   getPickupQR: async (claimId: string, UserBranchId: string): Promise<PickupQRData> => {
     const response = await api.get(`/pickup/qr/${claimId}`, {
@@ -58,17 +79,34 @@ export const pickupService = {
     return response.data;
   },
 
+  // Full URL of the QR image, the Image component caches it and the API sends an ETag
+  // so refreshing the QR screen does not download the image again
+  qrImageUri: (data: PickupQRData): string => withWriteToken(`${api.defaults.baseURL}${data.qr_code_image_url}`),
+
   getMyPickups: async (branchId: string): Promise<MyPickup[]> => {
     const response = await api.get('/pickups/my-pickups', {
       params: { branch_id: branchId }
     });
     return response.data;
   },
+  // Without a cursor every pickup is returned
+  getMyPickupChanges: async (branchId: string, cursor?: string | null): Promise<MyPickupChanges> => {
+    const response = await api.get('/pickups/my-pickups/changes', {
+      params: cursor ? { branch_id: branchId, cursor } : { branch_id: branchId }
+    });
+    return response.data;
+  },
   verifyPickup: async (qr_code: string, user_branch_id: string):Promise<VerifyPickupResponse> => {
     const response= await api.post('/pickup/verify', {
       qr_code,user_branch_id,
     });
     return response.data;
+  },
+  verifyPickups: async (qr_codes: string[], user_branch_id: string): Promise<VerifyPickupsResponse> => {
+    const response = await api.post('/pickup/verify/bulk', {
+      qr_codes, user_branch_id,
+    });
+    return response.data;
   }
 };
 
@@ -0,0 +1,55 @@
+// Reading the signed pickup QR codes on the scanner (backend/utils/pickup_token.py)
+// A signed code is WN1.<payload>.<signature>, and the payload holds the claim, the store branch that
+// approved it and when it expires, so the scanner can turn away a code for another store or an expired
+// code straight away without waiting on the API
+// The signature is only checked by the backend, as the scanner does not have the key
+// Older codes are random strings and are always sent to the API
+
+const VERSION = 'WN1.';
+
+export interface PickupToken {
+  claimId: string;
+  userBranchId: string;
+  expiresAt: number; // Unix time in seconds
+}
+
+// base64url without padding to bytes
+const decode = (text: string): number[] => {
+  const base64 = text.replace(/-/g, '+').replace(/_/g, '/') + '='.repeat((4 - (text.length % 4)) % 4);
+  return Array.from(atob(base64), (char) => char.charCodeAt(0));
+};
+
+const toUuid = (bytes: number[]): string => {
+  const hex = bytes.map((b) => b.toString(16).padStart(2, '0')).join('');
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+};
+
+// null for codes that are not signed or cannot be read
+export const readPickupToken = (code: string): PickupToken | null => {
+  if (!code.startsWith(VERSION)) return null;
+  const parts = code.slice(VERSION.length).split('.');
+  if (parts.length !== 2) return null;
+  try {
+    const bytes = decode(parts[0]);
+    if (bytes.length !== 36) return null;
+    return {
+      claimId: toUuid(bytes.slice(0, 16)),
+      userBranchId: toUuid(bytes.slice(16, 32)),
+      // 4 byte big endian expiry
+      expiresAt: ((bytes[32] << 24) >>> 0) + (bytes[33] << 16) + (bytes[34] << 8) + bytes[35],
+    };
+  } catch {
+    return null;
+  }
+};
+
+// The reason to turn a scanned code away without asking the API, or null if it should be sent
+// Uses the same messages as POST /pickup/verify
+export const precheckPickupCode = (code: string, userBranchId: string): string | null => {
+  if (!code.startsWith(VERSION)) return null;
+  const token = readPickupToken(code);
+  if (!token) return 'Invalid QR code';
+  if (token.userBranchId !== userBranchId.toLowerCase()) return 'This pickup is for a different branch';
+  if (token.expiresAt < Date.now() / 1000) return 'This QR code has expired';
+  return null;
+};
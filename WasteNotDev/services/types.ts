@@ -38,6 +38,21 @@ export interface UpdateListingItemRequest {
   quantity: number;
 }
 
+// Many listing edits and cancels in one request (POST /listing/bulk)
+export interface BulkListingRequest {
+  user_branch_id: string;
+  edits?: Array<{ listing_id: string; items: UpdateListingItemRequest[] }>;
+  cancel?: string[];
+}
+
+export interface BulkListingResult {
+  listing_id: string;
+  action: 'edit' | 'cancel';
+  success: boolean;
+  updated_amt: number;
+  message?: string | null;
+}
+
 export interface ClaimRequest {
   user_branch_id: string;
   items: Array<{
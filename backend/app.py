@@ -0,0 +1,139 @@
+# App factory for the WasteNot API
+# This code is adapted from video "how to create a Fast APi & React Project" (Tech With Tim, 2024)
+# main.py used to create the pool, the app and every endpoint when it was imported. create_app builds the app
+# for the chosen database mode (see db/config.py) from the routers in endpoints/ (sync) or async_endpoints/
+# (async), one per part of the app: listings, claims, approvals and pickups
+#
+# A new worker has to import all of this before it can take a request, so anything only some settings or
+# endpoints need is imported when it is needed instead:
+#   - only the chosen mode's endpoints and pool are imported, so the sync mode never loads psycopg 3
+#   - the event stream, metrics, replica and compression code are only imported when switched on
+#   - qrcode and PIL are only imported when the first QR code is drawn (utils/qr_render.py)
+#   - the pools are created and opened by lifespan, not on import
+# python -m benchmarks.cold_start measures how long a worker takes from starting to answering a request
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from db.config import DB_MODE, LISTING_CACHE, EVENTS, METRICS, REPLICA_CONFIG, COMPRESS_MIN_BYTES
+from db.notify import pg_listener
+from db.replica import LSN_HEADER
+from utils.qr_render import close_pool
+
+# port the frontend is running on
+origins = [
+     "http://localhost:5173", "http://127.0.0.1:5173" # so the vite dev server can call teh api from either origin
+ ]
+
+
+# Starting up and shutting down (FastAPI, 2025), replacing the startup and shutdown events, which are deprecated
+# Startup: opens POOL_MIN connections before the first request is taken, then starts the listener
+# Shutdown: runs after uvicorn has finished the requests in progress (see serve.py), stops the listener,
+# then waits up to POOL_DRAIN_TIMEOUT seconds for any connection still in use before closing the pools
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_MODE == "async":
+        from db.async_pool import open_async_pool
+        await open_async_pool()
+    else:
+        from db.sync_pool import open_sync_pools
+        await run_in_threadpool(open_sync_pools)
+    pg_listener.start()
+    yield
+    await run_in_threadpool(pg_listener.stop)
+    if DB_MODE == "async":
+        from db.async_pool import close_async_pool
+        await close_async_pool()
+    else:
+        from db.sync_pool import close_sync_pools
+        await run_in_threadpool(close_sync_pools)
+    # Stopping the QR rendering processes
+    close_pool()
+
+
+# No free connection within POOL_TIMEOUT, or a statement that ran past its statement_timeout:
+# answered with a 503 so the client knows to try again shortly, instead of a 500
+def database_busy(request: Request, exc: Exception):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The database is busy, please try again"},
+        headers={"Retry-After": "1"},
+    )
+
+
+def create_app() -> FastAPI:
+    # Setting up FastAPI
+    app = FastAPI(lifespan=lifespan)
+
+    # Serving the endpoints for the chosen database mode
+    if DB_MODE == "async":
+        from async_endpoints import ROUTERS
+        from db.async_pool import ASYNC_BUSY_ERRORS as mode_busy_errors
+    else:
+        from endpoints import ROUTERS
+        mode_busy_errors = ()
+    for router in ROUTERS:
+        app.include_router(router)
+
+    # Adding CORS middleware to block unauthorised websites, endpoints, or servers from accessing the API
+    # This is needed for the Vite frontend (5173) to call the FastAPI backend (8000)
+    app.add_middleware(
+     CORSMiddleware,
+     allow_origins=origins,  # specifying the origins outlined in the above list
+     allow_credentials=True,  # for allowing tokens, etc
+     allow_methods=["*"],  # allowing all methods
+     allow_headers=["*"],  # allowing all headers
+     expose_headers=["X-Next-Cursor", "ETag", LSN_HEADER],  # so the browser lets the frontend read the pagination cursor, ETags and write token
+    )
+
+    # With a read replica, write responses carry the primary's WAL position so the client's next read
+    # sees its own changes (db/replica.py)
+    if REPLICA_CONFIG:
+        from db.replica import LsnTokenMiddleware
+        app.add_middleware(LsnTokenMiddleware)
+
+    # Compressing big responses with gzip or brotli (utils/responses.py)
+    if COMPRESS_MIN_BYTES:
+        from utils.responses import CompressionMiddleware
+        app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
+    # psycopg2 errors in both modes, as the listing cache and event stream use psycopg2 in the async mode too
+    from db.pool import BUSY_ERRORS
+    for busy_error in BUSY_ERRORS + mode_busy_errors:
+        app.add_exception_handler(busy_error, database_busy)
+
+    # The listing cache and the event stream share one Postgres listener, which runs in both modes
+    # on its own connection (see db/notify.py), started and stopped by lifespan above
+    if LISTING_CACHE:
+        from db.listing_cache import attach_listing_cache
+        attach_listing_cache(pg_listener)
+    if EVENTS:
+        from db.events import event_hub
+        from event_stream import router as events_router
+        event_hub.attach(pg_listener)
+        app.include_router(events_router)
+
+    # Request, SQL and pool metrics for Prometheus (utils/metrics.py)
+    if METRICS:
+        from utils import metrics
+        app.add_middleware(metrics.MetricsMiddleware)
+
+        @app.get("/metrics", tags=["meta"])
+        def get_metrics():
+            return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    # Testing suggested by ChatGPT (ChatGPT, 2025)
+    # for web frontend
+    @app.get("/", tags=["meta"])
+    def root():
+        return {"status": "ok", "docs": "/docs", "db_mode": DB_MODE}
+
+    return app
+
+# REFERENCES
+# ChatGPT. (2025, November 7). Retrieved from chatgpt.com: https://chatgpt.com/c/69176485-1458-8331-b053-4df0abe35697
+# ChatGPT. (2025, November 11). Retrieved from chatgpt.com: https://chatgpt.com/c/69203ef4-2430-8326-be09-e8e39fed78c5
+# FastAPI. (2025). Lifespan Events. Retrieved from fastapi.tiangolo.com: https://fastapi.tiangolo.com/advanced/events/
+# Tim, T. W. (2024, November 19). How to Create a FastAPI & React Project-Python Backend + React Frontend. Retrieved from youtube.com: https://www.youtube.com/watch?v=aSdVU9-SxH4
@@ -0,0 +1,10 @@
+# this file is for the initialisation of the async_endpoints folder
+# Async versions of the endpoints in endpoints/, served when WASTENOT_DB_MODE=async
+# Each endpoint is an async def on the psycopg 3 pool in db/async_pool.py,
+# so a request waiting on Postgres gives the event loop back instead of holding a threadpool thread
+# The SQL (db/queries.py) and the response building (db/rows.py) are shared with endpoints/,
+# so both modes return the same responses and can be compared like for like
+
+from async_endpoints import listings, claims, approvals, pickups
+
+ROUTERS = [listings.router, claims.router, approvals.router, pickups.router]
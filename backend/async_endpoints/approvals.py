@@ -0,0 +1,136 @@
+# Async versions of the approval endpoints in endpoints/approvals.py, served when WASTENOT_DB_MODE=async
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional
+from utils.pickup_token import new_pickup_code
+from utils.responses import read_response
+from db import queries, rows
+from db.claims import approval_request, approvable_claims, approve_claims_params, approval_results
+from db.versions import CLAIMS, branch_etag, etag_headers, with_etag
+from db.changes import change_cursor, pending_claim_changes
+from db.async_pool import branch_unchanged, etag_versions, get_async_conn, get_async_write_conn
+from db.config import JSON_AGG_READS
+from models import (
+    PendingClaimDetail, ApproveClaimRequest, ApproveClaimResponse, ApproveClaimsRequest,
+    ApproveClaimsResponse, PendingClaimChanges,
+)
+
+router = APIRouter()
+
+
+@router.get("/claims/pending", response_model=List[PendingClaimDetail],
+            dependencies=[Depends(branch_unchanged([CLAIMS]))])
+async def get_pending_claims(
+        request: Request,
+        response: Response,
+        branch_id: str = Query(..., description="Branch ID to get pending claims for"),
+        conn=Depends(get_async_conn)
+):
+    async with conn.cursor() as cur:
+        etag = branch_etag(request, await etag_versions(request, cur, branch_id), [CLAIMS])
+        response.headers.update(etag_headers(etag))
+
+        if JSON_AGG_READS:
+            await cur.execute(queries.JSON_PENDING_CLAIMS, (branch_id,))
+            return with_etag(rows.json_response((await cur.fetchone())[0]), etag)
+
+        await cur.execute(queries.PENDING_CLAIMS, (branch_id,))
+        claims = await cur.fetchall()
+        if not claims:
+            return []
+
+        claim_ids = [row[0] for row in claims]
+
+        await cur.execute(queries.CLAIM_ITEMS, (claim_ids,))
+        items_rows = await cur.fetchall()
+
+    return read_response(request, response, rows.pending_claims_from_rows(claims, items_rows))
+
+
+@router.get("/claims/pending/changes", response_model=PendingClaimChanges)
+async def get_pending_claim_changes(
+        branch_id: str = Query(..., description="Branch ID to get pending claims for"),
+        cursor: Optional[str] = Query(None, description="cursor from the previous response"),
+        conn=Depends(get_async_conn)
+):
+    since = change_cursor(cursor)
+    async with conn.cursor() as cur:
+        await cur.execute(queries.CHANGE_CURSOR)
+        next_cursor = (await cur.fetchone())[0]
+
+        if since is None:
+            await cur.execute(queries.PENDING_CLAIMS, (branch_id,))
+        else:
+            await cur.execute(queries.PENDING_CLAIM_CHANGES, {"branch_id": branch_id, "since": since})
+        claims = await cur.fetchall()
+
+        items_rows = []
+        claim_ids = [row[0] for row in claims if not row[3]]
+        if claim_ids:
+            await cur.execute(queries.CLAIM_ITEMS, (claim_ids,))
+            items_rows = await cur.fetchall()
+
+    return pending_claim_changes(claims, items_rows, next_cursor)
+
+
+@router.post("/claims/approve", response_model=ApproveClaimResponse)
+async def approve_claim(payload: ApproveClaimRequest, conn=Depends(get_async_write_conn, scope="function")):
+    async with conn.transaction():
+        async with conn.cursor() as cur:
+            await cur.execute(queries.LOCK_CLAIM, (payload.claim_id,))
+            claim_row = await cur.fetchone()
+            if not claim_row:
+                raise HTTPException(404, "Claim not found")
+
+            claim_id, already_approved, charity_user_id = claim_row
+            if already_approved:
+                raise HTTPException(400, "Claim has already been approved")
+
+            await cur.execute(queries.USER_BRANCH_USER, (payload.user_branch_id,))
+            store_user_row = await cur.fetchone()
+            if not store_user_row:
+                raise HTTPException(404, "Store worker branch not found")
+
+            store_user_id = store_user_row[0]
+
+            await cur.execute(queries.COUNT_CLAIM_ITEMS_FOR_BRANCH, (payload.claim_id, payload.user_branch_id))
+            count = (await cur.fetchone())[0]
+            if count == 0:
+                raise HTTPException(403, "This claim is not for items from your branch")
+
+            await cur.execute(queries.APPROVE_CLAIM, (store_user_id, payload.claim_id))
+            qr_code = new_pickup_code(payload.claim_id, payload.user_branch_id)
+            await cur.execute(queries.INSERT_PICKUP, (payload.claim_id, qr_code))
+
+    return ApproveClaimResponse(
+        claim_id=str(payload.claim_id),
+        approved=True,
+        message="Claim approved successfully"
+    )
+
+
+@router.post("/claims/approve/bulk", response_model=ApproveClaimsResponse)
+async def approve_claims(payload: ApproveClaimsRequest, conn=Depends(get_async_write_conn, scope="function")):
+    claim_ids = approval_request(payload)
+
+    locked_rows, approved_rows = [], []
+    async with conn.transaction():
+        async with conn.cursor() as cur:
+            await cur.execute(queries.USER_BRANCH_USER, (payload.user_branch_id,))
+            store_user_row = await cur.fetchone()
+            if not store_user_row:
+                raise HTTPException(404, "Store worker branch not found")
+
+            valid_ids = [claim_id for claim_id in claim_ids if claim_id]
+            if valid_ids:
+                await cur.execute(queries.LOCK_CLAIMS_FOR_BRANCH,
+                                  {"claim_ids": valid_ids, "user_branch_id": payload.user_branch_id})
+                locked_rows = await cur.fetchall()
+
+            to_approve = approvable_claims(locked_rows)
+            if to_approve:
+                await cur.execute(queries.APPROVE_CLAIMS, approve_claims_params(store_user_row[0], payload.user_branch_id, to_approve))
+                approved_rows = await cur.fetchall()
+
+    results = approval_results(payload, claim_ids, locked_rows, approved_rows)
+    return ApproveClaimsResponse(results=results, approved_amt=len(approved_rows))
@@ -0,0 +1,62 @@
+# Async version of the claim endpoint in endpoints/claims.py, served when WASTENOT_DB_MODE=async
+
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from db import queries
+from db.claims import (
+    merge_claim_items, check_availability, claim_line_item_params, claim_if_available_params, Shortfall,
+    CLAIM_ATTEMPTS, retry_delay,
+)
+from db.async_pool import get_async_write_conn, ASYNC_RETRY_ERRORS
+from db.config import CLAIM_ENGINE
+from models import Claim, ClaimOutput
+
+router = APIRouter()
+
+
+@router.post("/claims", response_model=ClaimOutput)
+async def create_claim(payload: Claim, conn=Depends(get_async_write_conn, scope="function")):
+    if not payload.items:
+        raise HTTPException(400, "No items provided")
+
+    requested = merge_claim_items(payload.items)
+
+    if CLAIM_ENGINE == "optimistic":
+        return ClaimOutput(claim_id=str(await claim_optimistically(conn, payload.user_branch_id, requested)))
+
+    async with conn.transaction():
+        async with conn.cursor() as cur:
+            # Locking all the requested rows in a fixed order while we check availability (Yamamoto, 2025)
+            await cur.execute(queries.LOCK_LINE_ITEMS, (list(requested),))
+            check_availability(requested, await cur.fetchall())
+
+            await cur.execute(queries.INSERT_CLAIM, (payload.user_branch_id,))
+            claim_id = (await cur.fetchone())[0]
+
+            await cur.execute(queries.CLAIM_LINE_ITEMS, claim_line_item_params(claim_id, requested))
+    return ClaimOutput(claim_id=str(claim_id))
+
+
+# Optimistic version of the claim above (see db/claims.py)
+# Each attempt runs in a savepoint inside the request's transaction, rolled back if anything was short or it deadlocked
+async def claim_optimistically(conn, user_branch_id, requested):
+    for attempt in range(CLAIM_ATTEMPTS):
+        try:
+            async with conn.transaction():
+                cur = await conn.execute(
+                    queries.CLAIM_IF_AVAILABLE, claim_if_available_params(user_branch_id, requested))
+                row = await cur.fetchone()
+                if row is None:
+                    raise Shortfall()
+                return row[0]
+        except Shortfall:
+            cur = await conn.execute(queries.LINE_ITEM_QUANTITIES, (list(requested),))
+            check_availability(requested, await cur.fetchall())
+        except ASYNC_RETRY_ERRORS:
+            if attempt == CLAIM_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(retry_delay(attempt))
+    raise HTTPException(409, "The items changed while claiming, please try again")
+
+# REFERENCES
+# Yamamoto, T. (2025, August 22). Preventing Race Conditions with SELECT FOR UPDATE in Web Applications. Retrieved from leapcell.io: https://leapcell.io/blog/preventing-race-conditions-with-select-for-update-in-web-applications
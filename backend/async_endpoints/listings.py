@@ -0,0 +1,286 @@
+# Async versions of the listing endpoints in endpoints/listings.py, served when WASTENOT_DB_MODE=async
+
+from tempfile import SpooledTemporaryFile
+import psycopg
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from typing import List, Optional
+from uuid import UUID
+from utils.responses import read_response
+from db import queries, rows
+from db.versions import LISTINGS, branch_etag, check_not_modified, etag_headers, with_etag
+from db.changes import change_cursor, listing_changes_params, check_listing_changes, listing_changes
+from db.listings import check_quantities, edit_arrays, bulk_request, bulk_listing_ids, bulk_results
+from db.uploads import (
+    upload_format, spool_upload, copy_sql, copy_error, check_row_count, check_upload_errors,
+    upload_error_params, upload_output, UPLOAD_SPOOL_SIZE, COPY_CHUNK_SIZE,
+)
+from db.async_pool import (
+    async_pool, branch_versions, commit_write, etag_versions, get_async_conn, get_async_write_conn, get_async_bulk_conn,
+    set_async_statement_timeout, read_connection,
+)
+from db.config import JSON_AGG_READS, LISTING_CACHE
+from db.listing_cache import listing_cache
+from models import (
+    BranchProducts, Listing, ListingOutput, ListingAvailable, UpdateListingInput, UpdateListingOutput,
+    CancelListing, CancelListingOutput, BulkListingInput, BulkListingOutput, ListingUploadOutput,
+    ListingChanges,
+)
+
+router = APIRouter()
+
+
+@router.get("/get_products", response_model=List[BranchProducts])
+async def get_products(
+        branch_id: str = Query(..., description="Branch ID to get products for"),
+        conn=Depends(get_async_conn),
+):
+    async with conn.cursor() as cur:
+        await cur.execute(queries.GET_PRODUCTS, (branch_id,))
+        product_rows = await cur.fetchall()
+    return rows.products_from_rows(product_rows)
+
+
+@router.post("/listing", response_model=ListingOutput)
+async def make_listing(payload: Listing, conn=Depends(get_async_write_conn, scope="function")):
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="No items provided")
+
+    async with conn.transaction():
+        async with conn.cursor() as cur:
+            # creating the listing
+            await cur.execute(queries.INSERT_LISTING, (payload.user_branch_id,))
+            listing_id = (await cur.fetchone())[0]
+
+            await cur.executemany(
+                queries.INSERT_LISTING_LINE_ITEM,
+                [(listing_id, it.product_id, it.quantity) for it in payload.items],
+            )
+
+    return ListingOutput(listing_id=str(listing_id))
+
+
+# Async version of refresh_listing_cache in endpoints/listings.py
+async def refresh_listing_cache():
+    plan = listing_cache.refresh_plan()
+    if plan is None:
+        return
+    async with async_pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(queries.CACHE_CLAIMABLE_LISTINGS, {"branch_ids": plan[1]})
+            listing_rows = await cur.fetchall()
+            await cur.execute(queries.AVAILABLE_LINE_ITEMS, ([row[0] for row in listing_rows],))
+            item_rows = await cur.fetchall()
+    listing_cache.load(plan, listing_rows, item_rows)
+
+
+async def cached_listing_page(request, response, cursor, limit, org_id=None, branch_id=None, product_id=None):
+    await refresh_listing_cache()
+    listings, next_cursor = listing_cache.page(cursor, limit, org_id, branch_id, product_id)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return read_response(request, response, listings)
+
+
+@router.get("/listings", response_model=List[ListingAvailable])
+async def list_claimable_listings(
+        request: Request,
+        response: Response,
+        cursor: Optional[UUID] = Query(None, description="listing_id of the last listing on the previous page"),
+        limit: int = Query(rows.LISTING_PAGE_SIZE, ge=1, le=rows.LISTING_PAGE_MAX, description="Listings per page"),
+        org_id: Optional[UUID] = Query(None, description="Only listings from this organisation"),
+        branch_id: Optional[UUID] = Query(None, description="Only listings from this branch"),
+        product_id: Optional[UUID] = Query(None, description="Only listings with this product available"),
+):
+    if LISTING_CACHE and listing_cache.ready():
+        return await cached_listing_page(request, response, cursor, limit, org_id, branch_id, product_id)
+
+    params = rows.listing_page_params(cursor, limit, org_id, branch_id, product_id)
+    async with read_connection(request) as conn, conn.cursor() as cur:
+        if JSON_AGG_READS:
+            await cur.execute(queries.JSON_CLAIMABLE_LISTINGS_PAGE, {**params, "page_size": limit})
+            body, json_cursor = await cur.fetchone()
+            return rows.json_response(body, json_cursor)
+
+        await cur.execute(queries.CLAIMABLE_LISTINGS_PAGE, params)
+        listings, next_cursor = rows.split_listing_page(await cur.fetchall(), limit)
+        if not listings:
+            return []
+
+        listing_ids = [row[0] for row in listings]
+
+        await cur.execute(queries.AVAILABLE_LINE_ITEMS, (listing_ids,))
+        item_rows = await cur.fetchall()
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return read_response(request, response, rows.listings_from_rows(listings, item_rows))
+
+
+@router.get("/get_listings", response_model=List[ListingAvailable])
+async def get_listings_by_branch(
+        request: Request,
+        response: Response,
+        branch_id: UUID = Query(..., description="Branch ID to get listings for"),
+        cursor: Optional[UUID] = Query(None, description="listing_id of the last listing on the previous page"),
+        limit: int = Query(rows.LISTING_PAGE_SIZE, ge=1, le=rows.LISTING_PAGE_MAX, description="Listings per page"),
+        product_id: Optional[UUID] = Query(None, description="Only listings with this product available"),
+        if_none_match: Optional[str] = Header(None),
+):
+    if LISTING_CACHE and listing_cache.ready():
+        return await cached_listing_page(request, response, cursor, limit, branch_id=branch_id, product_id=product_id)
+
+    if if_none_match:
+        check_not_modified(request, if_none_match, await branch_versions(branch_id), [LISTINGS])
+
+    params = rows.listing_page_params(cursor, limit, branch_id=branch_id, product_id=product_id)
+    async with read_connection(request) as conn, conn.cursor() as cur:
+        etag = branch_etag(request, await etag_versions(request, cur, branch_id), [LISTINGS])
+        response.headers.update(etag_headers(etag))
+
+        if JSON_AGG_READS:
+            await cur.execute(queries.JSON_CLAIMABLE_LISTINGS_PAGE, {**params, "page_size": limit})
+            body, json_cursor = await cur.fetchone()
+            return with_etag(rows.json_response(body, json_cursor), etag)
+
+        await cur.execute(queries.CLAIMABLE_LISTINGS_PAGE, params)
+        listing_rows, next_cursor = rows.split_listing_page(await cur.fetchall(), limit)
+        if not listing_rows:
+            return []
+
+        listing_ids = [row[0] for row in listing_rows]
+
+        await cur.execute(queries.AVAILABLE_LINE_ITEMS, (listing_ids,))
+        item_rows = await cur.fetchall()
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return read_response(request, response, rows.listings_from_rows(listing_rows, item_rows))
+
+
+@router.get("/listings/changes", response_model=ListingChanges)
+async def get_listing_changes(
+        cursor: Optional[str] = Query(None, description="cursor from the previous response"),
+        org_id: Optional[UUID] = Query(None, description="Only listings from this organisation"),
+        branch_id: Optional[UUID] = Query(None, description="Only listings from this branch"),
+        product_id: Optional[UUID] = Query(None, description="Only listings with this product available"),
+        conn=Depends(get_async_conn),
+):
+    since = change_cursor(cursor)
+    async with conn.cursor() as cur:
+        await cur.execute(queries.CHANGE_CURSOR)
+        next_cursor = (await cur.fetchone())[0]
+        if since is None:
+            return ListingChanges(listings=[], removed=[], cursor=next_cursor)
+
+        await cur.execute(queries.LISTING_CHANGES, listing_changes_params(since, org_id, branch_id, product_id))
+        listing_rows = await cur.fetchall()
+        check_listing_changes(listing_rows)
+
+        item_rows = []
+        listing_ids = [row[0] for row in listing_rows if row[3]]
+        if listing_ids:
+            await cur.execute(queries.AVAILABLE_LINE_ITEMS, (listing_ids,))
+            item_rows = await cur.fetchall()
+
+    return listing_changes(listing_rows, item_rows, next_cursor)
+
+
+@router.patch("/listing/items", response_model=UpdateListingOutput)
+async def update_listing_items(payload: UpdateListingInput, conn=Depends(get_async_write_conn, scope="function")):
+    async with conn.transaction():
+        async with conn.cursor() as cur:
+            # Lock the listing row while we are updating to prevent race conditions (Yamamoto, 2025)
+            await cur.execute(queries.LOCK_BRANCH_LISTING, (payload.listing_id, payload.user_branch_id))
+            if await cur.fetchone() is None:
+                raise HTTPException(404, "Listing not found for this branch")
+
+            check_quantities(payload.items)
+
+            updated = 0
+            if payload.items:
+                await cur.execute(queries.UPDATE_LINE_ITEM_QUANTITIES, edit_arrays([(payload.listing_id, payload.items)]))
+                updated = cur.rowcount
+    return UpdateListingOutput(updated_amt=updated)
+
+
+@router.post("/listing/cancel", response_model=CancelListingOutput)
+async def cancel_listing(payload: CancelListing, conn=Depends(get_async_write_conn, scope="function")):
+    async with conn.transaction():
+        async with conn.cursor() as cur:
+            await cur.execute(queries.LOCK_BRANCH_LISTING, (payload.listing_id, payload.user_branch_id))
+            if await cur.fetchone() is None:
+                raise HTTPException(404, "Listing not found for this branch")
+
+            await cur.execute(queries.ZERO_LISTING_QUANTITIES, (payload.listing_id,))
+            zeroed = cur.rowcount
+    return CancelListingOutput(listing_id=str(payload.listing_id), zeroed_amt=zeroed)
+
+
+@router.post("/listing/bulk", response_model=BulkListingOutput)
+async def bulk_manage_listings(payload: BulkListingInput, conn=Depends(get_async_bulk_conn, scope="function")):
+    edits, cancels = bulk_request(payload)
+    listing_ids = bulk_listing_ids(edits, cancels)
+
+    owned, updated_rows, zeroed_rows = set(), [], []
+    if listing_ids:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute(queries.LOCK_BRANCH_LISTINGS, (listing_ids, payload.user_branch_id))
+                owned = {str(row[0]) for row in await cur.fetchall()}
+
+                owned_edits = [(lid, items) for lid, items in edits if lid in owned and items]
+                if owned_edits:
+                    await cur.execute(queries.UPDATE_LINE_ITEM_QUANTITIES, edit_arrays(owned_edits))
+                    updated_rows = await cur.fetchall()
+
+                owned_cancels = [lid for lid in cancels if lid in owned]
+                if owned_cancels:
+                    await cur.execute(queries.ZERO_LISTINGS_QUANTITIES, (owned_cancels,))
+                    zeroed_rows = await cur.fetchall()
+
+    return BulkListingOutput(results=bulk_results(payload, edits, cancels, owned, updated_rows, zeroed_rows))
+
+
+# The body is read into a spooled file (only written to disk if it is large) before a connection is taken,
+# so a slow client does not hold one from the pool while it sends the file, then COPY reads it from the file
+@router.post("/listings/upload", response_model=ListingUploadOutput)
+async def upload_listings(
+        request: Request,
+        fmt: Optional[str] = Query(None, alias="format", description="csv or ndjson, otherwise taken from the Content-Type"),
+):
+    fmt = upload_format(fmt, request.headers.get("content-type"))
+    with SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE) as body:
+        columns = await spool_upload(request.stream(), fmt, body)
+        return await load_listing_upload(request, body, fmt, columns)
+
+
+async def load_listing_upload(request, body, fmt, columns):
+    async with async_pool.connection() as conn:
+        await set_async_statement_timeout(conn, "bulk")
+        async with conn.cursor() as cur:
+            await cur.execute(queries.CREATE_LISTING_UPLOAD)
+            try:
+                if fmt == "ndjson":
+                    await cur.execute(queries.CREATE_LISTING_UPLOAD_JSON)
+                async with cur.copy(copy_sql(fmt, columns)) as copy:
+                    while chunk := body.read(COPY_CHUNK_SIZE):
+                        await copy.write(chunk)
+                if fmt == "ndjson":
+                    await cur.execute(queries.NDJSON_TO_UPLOAD)
+            except psycopg.DataError as e:
+                copy_error(e.diag)
+
+            await cur.execute(queries.COUNT_LISTING_UPLOAD)
+            check_row_count((await cur.fetchone())[0])
+
+            await cur.execute(queries.UPLOAD_ERRORS, upload_error_params())
+            check_upload_errors(await cur.fetchall())
+
+            await cur.execute(queries.CREATE_UPLOADED_LISTINGS)
+            listing_rows = await cur.fetchall()
+        await commit_write(request, conn)
+
+    return upload_output(listing_rows)
+
+# REFERENCES
+# Yamamoto, T. (2025, August 22). Preventing Race Conditions with SELECT FOR UPDATE in Web Applications. Retrieved from leapcell.io: https://leapcell.io/blog/preventing-race-conditions-with-select-for-update-in-web-applications
@@ -0,0 +1,199 @@
+# Async versions of the pickup endpoints in endpoints/pickups.py, served when WASTENOT_DB_MODE=async
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from typing import List, Optional
+from utils.qr_render import FORMATS, qr_etag, render_qr_async
+from utils.responses import read_response
+from db import queries, rows
+from db.pickups import check_pickup_code, verify_request, completable_pickups, verify_results
+from db.versions import LISTINGS, CLAIMS, branch_etag, etag_headers, with_etag
+from db.changes import change_cursor
+from db.async_pool import branch_unchanged, etag_versions, get_async_conn, get_async_write_conn
+from db.config import JSON_AGG_READS
+from models import (
+    PickupDetail, VerifyPickupRequest, VerifyPickupResponse, VerifyPickupsRequest, VerifyPickupsResponse,
+    PickupChanges,
+)
+
+router = APIRouter()
+
+
+@router.get("/pickup/qr/{claim_id}")
+async def get_pickup_qr(
+        claim_id: str,
+        user_branch_id: str = Query(..., description="User branch ID of charity that made the claim"),
+        conn=Depends(get_async_conn)
+):
+    async with conn.cursor() as cur:
+        await cur.execute(queries.CHARITY_CLAIM, (claim_id, user_branch_id))
+        claim = await cur.fetchone()
+        if not claim:
+            raise HTTPException(404, "Claim not found")
+        if not claim[1]:
+            raise HTTPException(400, "Claim not approved yet")
+
+        await cur.execute(queries.CLAIM_PICKUP, (claim_id,))
+        pickup = await cur.fetchone()
+        if not pickup:
+            raise HTTPException(404, "QR code not generated yet")
+
+        await cur.execute(queries.PICKUP_ITEMS_WITH_STORE, (claim_id,))
+        items_rows = await cur.fetchall()
+
+    return rows.pickup_qr_from_rows(claim_id, pickup, rows.qr_image_url(claim_id, user_branch_id), items_rows)
+
+
+@router.get("/pickup/qr/{claim_id}/image")
+async def get_pickup_qr_image(
+        claim_id: str,
+        user_branch_id: str = Query(..., description="User branch ID of charity that made the claim"),
+        fmt: str = Query("png", alias="format", description="png, svg or matrix"),
+        if_none_match: Optional[str] = Header(None),
+        conn=Depends(get_async_conn)
+):
+    if fmt not in FORMATS:
+        raise HTTPException(400, f"format must be one of: {', '.join(FORMATS)}")
+
+    async with conn.cursor() as cur:
+        await cur.execute(queries.CHARITY_CLAIM, (claim_id, user_branch_id))
+        claim = await cur.fetchone()
+        if not claim:
+            raise HTTPException(404, "Claim not found")
+        if not claim[1]:
+            raise HTTPException(400, "Claim not approved yet")
+
+        await cur.execute(queries.CLAIM_PICKUP, (claim_id,))
+        pickup = await cur.fetchone()
+        if not pickup:
+            raise HTTPException(404, "QR code not generated yet")
+
+    qr_code = pickup[1]
+    etag = qr_etag(qr_code, fmt)
+    if rows.etag_matches(if_none_match, etag):
+        return rows.qr_image_response(None, FORMATS[fmt], etag, not_modified=True)
+    # Drawing the QR code is CPU work, so it is done in a worker process off the event loop
+    image = await render_qr_async(qr_code, fmt)
+    return rows.qr_image_response(image, FORMATS[fmt], etag, not_modified=False)
+
+
+@router.get("/pickups/my-pickups", response_model=List[PickupDetail],
+            dependencies=[Depends(branch_unchanged([CLAIMS]))])
+async def get_my_pickups(
+        request: Request,
+        response: Response,
+        branch_id: str = Query(..., description="Branch ID of charity to get pickups for"),
+        conn=Depends(get_async_conn)
+):
+    async with conn.cursor() as cur:
+        etag = branch_etag(request, await etag_versions(request, cur, branch_id), [CLAIMS])
+        response.headers.update(etag_headers(etag))
+
+        if JSON_AGG_READS:
+            await cur.execute(queries.JSON_MY_PICKUPS, (branch_id,))
+            return with_etag(rows.json_response((await cur.fetchone())[0]), etag)
+
+        await cur.execute(queries.MY_PICKUPS, (branch_id,))
+        claims = await cur.fetchall()
+
+    return read_response(request, response, rows.pickups_from_rows(claims))
+
+
+@router.get("/pickups/my-pickups/changes", response_model=PickupChanges)
+async def get_my_pickup_changes(
+        branch_id: str = Query(..., description="Branch ID of charity to get pickups for"),
+        cursor: Optional[str] = Query(None, description="cursor from the previous response"),
+        conn=Depends(get_async_conn)
+):
+    since = change_cursor(cursor)
+    async with conn.cursor() as cur:
+        await cur.execute(queries.CHANGE_CURSOR)
+        next_cursor = (await cur.fetchone())[0]
+
+        if since is None:
+            await cur.execute(queries.MY_PICKUPS, (branch_id,))
+        else:
+            await cur.execute(queries.PICKUP_CHANGES, {"branch_id": branch_id, "since": since})
+        claims = await cur.fetchall()
+
+    return PickupChanges(pickups=rows.pickups_from_rows(claims), cursor=next_cursor)
+
+
+@router.post("/pickup/verify", response_model=VerifyPickupResponse, dependencies=[Depends(check_pickup_code)])
+async def verify_pickup(payload: VerifyPickupRequest, conn=Depends(get_async_write_conn, scope="function")):
+    async with conn.transaction():
+        async with conn.cursor() as cur:
+            await cur.execute(queries.LOCK_PICKUP_BY_QR, (payload.qr_code,))
+            pickup_row = await cur.fetchone()
+            if not pickup_row:
+                raise HTTPException(404, "Invalid QR code")
+
+            pickup_id, claim_id, complete, charity_user_branch_id = pickup_row
+            if complete:
+                raise HTTPException(400, "This pickup has already been completed")
+
+            await cur.execute(queries.PICKUP_ITEMS_WITH_BRANCH, (claim_id,))
+            items_rows = await cur.fetchall()
+            if not items_rows:
+                raise HTTPException(404, "No items found for this claim")
+
+            # Verifying store worker's branch matches (l.user_branch_id)
+            if str(items_rows[0][5]) != payload.user_branch_id:
+                raise HTTPException(403, "This pickup is for a different branch")
+
+            await cur.execute(queries.CHARITY_NAME, (charity_user_branch_id,))
+            charity_row = await cur.fetchone()
+            charity_name = f"{charity_row[0]} - {charity_row[1]}" if charity_row else "Unknown"
+
+            await cur.execute(queries.COMPLETE_PICKUP, (pickup_id,))
+
+    return VerifyPickupResponse(
+        pickup_id=str(pickup_id),
+        claim_id=str(claim_id),
+        success=True,
+        message=f"Pickup verified! Please give {charity_name} their items.",
+        charity_name=charity_name,
+        items=rows.verified_items_from_rows(items_rows)
+    )
+
+
+@router.post("/pickup/verify/bulk", response_model=VerifyPickupsResponse)
+async def verify_pickups(payload: VerifyPickupsRequest, conn=Depends(get_async_write_conn, scope="function")):
+    rejected = verify_request(payload)
+    qr_codes = [qr_code for qr_code in payload.qr_codes if qr_code not in rejected]
+
+    locked_rows, completed_rows = [], []
+    if qr_codes:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                await cur.execute(queries.LOCK_PICKUPS_BY_QR,
+                                  {"qr_codes": qr_codes, "user_branch_id": payload.user_branch_id})
+                locked_rows = await cur.fetchall()
+
+                to_complete = completable_pickups(locked_rows)
+                if to_complete:
+                    await cur.execute(queries.COMPLETE_PICKUPS, (to_complete,))
+                    completed_rows = await cur.fetchall()
+
+    results = verify_results(payload, rejected, locked_rows, completed_rows)
+    return VerifyPickupsResponse(results=results, completed_amt=len(completed_rows))
+
+
+@router.get("/claims/approved-awaiting-pickup",
+            dependencies=[Depends(branch_unchanged([LISTINGS, CLAIMS], today=True))])
+async def get_approved_awaiting_pickup(
+        request: Request,
+        response: Response,
+        branch_id: str = Query(..., description="Branch ID to get approved claims for"),
+        conn=Depends(get_async_conn)
+):
+    async with conn.cursor() as cur:
+        etag = branch_etag(request, await etag_versions(request, cur, branch_id), [LISTINGS, CLAIMS], today=True)
+        response.headers.update(etag_headers(etag))
+
+        await cur.execute(queries.APPROVED_AWAITING_PICKUP, (branch_id,))
+        approved_rows = await cur.fetchall()
+
+    if not approved_rows:
+        return []
+
+    return read_response(request, response, rows.approved_groups_from_rows(approved_rows))
@@ -0,0 +1 @@
+# Benchmark scripts, run from the backend folder with python -m benchmarks.<name>
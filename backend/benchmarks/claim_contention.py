@@ -0,0 +1,161 @@
+# Stress test for POST /claims on a few hot line items (WASTENOT_CLAIM_ENGINE, see db/claims.py)
+# Run from the backend folder, after seeding (python -m benchmarks.seed), against a running server:
+#   WASTENOT_CLAIM_ENGINE=locking uvicorn main:app --port 8000 --workers 4
+#   python -m benchmarks.claim_contention --threads 64 --quantity 2000
+#   ... restart the server with WASTENOT_CLAIM_ENGINE=optimistic and run it again
+# A new listing is made with --items line items of --quantity each, then --threads threads claim from it
+# as fast as they can (1-3 of one or two items per claim, like charities rushing a popular listing) until
+# it is all gone. It then checks nothing was oversold:
+#   - no quantity went below zero
+#   - each item's starting quantity = what is left + every listing_claim_item for it
+#   - the quantities the server said yes to = the listing_claim_items
+# and reports successful claims per second and the claim latency
+
+import argparse
+import random
+import threading
+import time
+from statistics import quantiles
+import httpx
+import psycopg2
+from db.config import DB_CONFIG
+
+STORE = """
+    SELECT ub.user_branch_id, p.product_id
+    FROM user_branch ub
+    JOIN organisation o ON o.org_id = ub.org_id
+    JOIN product p ON p.branch_id = ub.branch_id
+    WHERE o.org_name LIKE 'Bench Store %%'
+    LIMIT %s
+"""
+CHARITIES = """
+    SELECT ub.user_branch_id::text
+    FROM user_branch ub JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE 'Bench Charity %'
+"""
+INSERT_LISTING = "INSERT INTO listing (user_branch_id) VALUES (%s) RETURNING listing_id"
+INSERT_ITEM = """
+    INSERT INTO listing_line_item (listing_id, product_id, quantity)
+    VALUES (%s, %s, %s) RETURNING listing_line_item_id::text
+"""
+REMAINING = "SELECT listing_line_item_id::text, quantity FROM listing_line_item WHERE listing_id = %s"
+CLAIMED = """
+    SELECT lli.listing_line_item_id::text, COALESCE(SUM(lci.quantity), 0)
+    FROM listing_line_item lli
+    LEFT JOIN listing_claim_item lci ON lci.listing_line_item_id = lli.listing_line_item_id
+    WHERE lli.listing_id = %s
+    GROUP BY lli.listing_line_item_id
+"""
+
+
+def make_hot_listing(cur, items, quantity):
+    cur.execute(STORE, (items,))
+    rows = cur.fetchall()
+    if not rows:
+        raise SystemExit("No Bench world found, run python -m benchmarks.seed first")
+    cur.execute(INSERT_LISTING, (rows[0][0],))
+    listing_id = cur.fetchone()[0]
+    item_ids = []
+    for _, product_id in rows:
+        cur.execute(INSERT_ITEM, (listing_id, product_id, quantity))
+        item_ids.append(cur.fetchone()[0])
+    return listing_id, item_ids
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []  # ms, successful claims
+        self.statuses = {}
+        self.claimed = {}  # listing_line_item_id -> quantity the server said yes to
+
+
+def charity_thread(url, item_ids, charities, stop, results, seed):
+    rng = random.Random(seed)
+    with httpx.Client(base_url=url, timeout=60) as client:
+        while not stop.is_set():
+            items = rng.sample(item_ids, min(len(item_ids), rng.choice((1, 2))))
+            payload = {
+                "user_branch_id": rng.choice(charities),
+                "items": [{"listing_line_item_id": item, "quantity": rng.randint(1, 3)} for item in items],
+            }
+            start = time.perf_counter()
+            response = client.post("/claims", json=payload)
+            elapsed = (time.perf_counter() - start) * 1000
+            with results.lock:
+                results.statuses[response.status_code] = results.statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    results.latencies.append(elapsed)
+                    for item in payload["items"]:
+                        lli_id = item["listing_line_item_id"]
+                        results.claimed[lli_id] = results.claimed.get(lli_id, 0) + item["quantity"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--items", type=int, default=2, help="hot line items on the listing")
+    parser.add_argument("--quantity", type=int, default=2000, help="starting quantity of each item")
+    parser.add_argument("--seconds", type=float, default=120, help="stop after this long even if stock is left")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    cur = conn.cursor()
+    listing_id, item_ids = make_hot_listing(cur, args.items, args.quantity)
+    cur.execute(CHARITIES)
+    charities = [row[0] for row in cur.fetchall()]
+    print(f"listing {listing_id}: {len(item_ids)} items x {args.quantity}, {args.threads} threads")
+
+    stop = threading.Event()
+    results = Results()
+    threads = [
+        threading.Thread(target=charity_thread, args=(args.url, item_ids, charities, stop, results, i))
+        for i in range(args.threads)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    # Stopping once fewer than 3 of every item are left, after which most claims can only fall short
+    while time.perf_counter() - start < args.seconds:
+        time.sleep(0.2)
+        cur.execute(REMAINING, (listing_id,))
+        if all(quantity < 3 for _, quantity in cur.fetchall()):
+            break
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    cur.execute(REMAINING, (listing_id,))
+    remaining = dict(cur.fetchall())
+    cur.execute(CLAIMED, (listing_id,))
+    claimed = dict(cur.fetchall())
+    problems = []
+    for lli_id in item_ids:
+        if remaining[lli_id] < 0:
+            problems.append(f"{lli_id} went below zero ({remaining[lli_id]})")
+        if remaining[lli_id] + claimed[lli_id] != args.quantity:
+            problems.append(f"{lli_id}: {remaining[lli_id]} left + {claimed[lli_id]} claimed != {args.quantity}")
+        if results.claimed.get(lli_id, 0) != claimed[lli_id]:
+            problems.append(f"{lli_id}: server accepted {results.claimed.get(lli_id, 0)}, database has {claimed[lli_id]}")
+
+    ok = len(results.latencies)
+    print(f"{sum(results.statuses.values())} requests in {elapsed:.1f}s, statuses {dict(sorted(results.statuses.items()))}")
+    print(f"{ok / elapsed:.1f} successful claims/s")
+    if ok >= 2:
+        cuts = quantiles(results.latencies, n=100)
+        print(f"claim latency ms: p50 {cuts[49]:.1f}  p95 {cuts[94]:.1f}  p99 {cuts[98]:.1f}  max {max(results.latencies):.1f}")
+    print(f"left: {remaining}")
+    if problems:
+        print("OVERSOLD OR LOST CLAIMS:")
+        for problem in problems:
+            print("  " + problem)
+        raise SystemExit(1)
+    print("No item oversold, every accepted claim is in the database")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Cold start benchmark: how long a new API process takes before it can serve traffic
+# Run from the backend folder, after seeding (python -m benchmarks.seed):
+#   python -m benchmarks.cold_start [runs]
+# For each database mode, runs a fresh Python process each time and reports the median and best of:
+#   import         - importing main, which builds the app (measured inside the process)
+#   first request  - from starting uvicorn main:app to the first 200 from GET /claims/pending for a Bench
+#                    store, which includes starting Python, the imports, opening the pool and the request
+# Workers added during the pickup peaks wait this long before they can take any requests
+
+import os
+import subprocess
+import sys
+import time
+from statistics import median
+import httpx
+import psycopg2
+from db.config import DB_CONFIG
+
+PORT = 8799
+# Most seconds to wait for a server to answer before giving up on the run
+START_TIMEOUT = 30
+
+BENCH_STORE = """
+    SELECT b.branch_id::text FROM branch b JOIN organisation o ON o.org_id = b.org_id
+    WHERE o.org_name LIKE 'Bench Store %' LIMIT 1
+"""
+
+IMPORT_SCRIPT = (
+    "import time; start = time.perf_counter(); import main; "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+
+def import_ms(env) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], env=env, capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def first_request_ms(env, branch_id) -> float:
+    url = f"http://127.0.0.1:{PORT}/claims/pending"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=5) as client:
+            while time.perf_counter() - start < START_TIMEOUT:
+                try:
+                    if client.get(url, params={"branch_id": branch_id}).status_code == 200:
+                        return (time.perf_counter() - start) * 1000
+                except httpx.TransportError:
+                    pass  # not listening yet
+                time.sleep(0.005)
+        raise RuntimeError(f"The server did not answer within {START_TIMEOUT}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(BENCH_STORE)
+            branch_id = cur.fetchone()[0]
+    finally:
+        conn.close()
+
+    print(f"{'mode':6} {'import ms':>20} {'first request ms':>20}")
+    print(f"{'':6} {'median':>10}{'best':>10} {'median':>10}{'best':>10}")
+    for mode in ("sync", "async"):
+        env = dict(os.environ, WASTENOT_DB_MODE=mode)
+        imports = [import_ms(env) for _ in range(runs)]
+        firsts = [first_request_ms(env, branch_id) for _ in range(runs)]
+        print(f"{mode:6} {median(imports):10.0f}{min(imports):10.0f} {median(firsts):10.0f}{min(firsts):10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# Endpoint latency benchmark
+# Drives every endpoint (endpoints/ and async_endpoints/) against a running server, at each concurrency level,
+# and reports p50/p95/p99 latency and throughput
+# Run from the backend folder, after seeding (python -m benchmarks.seed) and starting the server:
+#   uvicorn main:app --port 8000
+#   python -m benchmarks.endpoints --concurrency 1,8,32 --requests 200 --out before.json
+#   ... make a change and restart the server ...
+#   python -m benchmarks.endpoints --concurrency 1,8,32 --requests 200 --compare before.json
+# Requests use the seeded Bench world, read straight from the database before each run:
+#   - reads pick a random store or charity branch for every request
+#   - writes each get their own target (an available item to claim, a pending claim to approve,
+#     a pickup to verify ...), so every request does the full amount of work and none fail as duplicates
+# Requests are sent from one event loop, so the benchmark itself adds very little time to each request
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from statistics import quantiles
+import httpx
+import psycopg2
+from db.config import DB_CONFIG
+
+# Requests sent before timing each run, so connections are open and caches are warm
+WARMUP = 10
+
+BENCH_UB = """
+    SELECT ub.branch_id, ub.user_branch_id
+    FROM user_branch ub JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE %s
+"""
+
+STORE_PRODUCTS = """
+    SELECT ub.user_branch_id, array_agg(p.product_id::text)
+    FROM user_branch ub
+    JOIN organisation o ON o.org_id = ub.org_id
+    JOIN product p ON p.branch_id = ub.branch_id
+    WHERE o.org_name LIKE 'Bench Store %%'
+    GROUP BY ub.user_branch_id
+"""
+
+AVAILABLE_ITEMS = """
+    SELECT lli.listing_line_item_id
+    FROM listing_line_item lli
+    JOIN listing l ON l.listing_id = lli.listing_id
+    JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE 'Bench Store %%' AND lli.quantity >= 1
+    ORDER BY random() LIMIT %s
+"""
+
+OPEN_LISTINGS = """
+    SELECT l.listing_id, l.user_branch_id, array_agg(lli.listing_line_item_id::text)
+    FROM listing l
+    JOIN listing_line_item lli ON lli.listing_id = l.listing_id
+    JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE 'Bench Store %%' AND lli.quantity >= 1
+    GROUP BY l.listing_id, l.user_branch_id
+    ORDER BY random() LIMIT %s
+"""
+
+# A pending claim and a user of the store it was made on, who can approve it
+PENDING_CLAIMS = """
+    SELECT DISTINCT ON (c.claim_id) c.claim_id, l.user_branch_id
+    FROM claim c
+    JOIN listing_claim_item lci ON lci.claim_id = c.claim_id
+    JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+    JOIN listing l ON l.listing_id = lli.listing_id
+    JOIN user_branch ub ON ub.user_branch_id = c.user_branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE 'Bench Charity %%' AND NOT c.approved
+    LIMIT %s
+"""
+
+APPROVED_CLAIMS = """
+    SELECT c.claim_id, c.user_branch_id
+    FROM claim c
+    JOIN pickup p ON p.claim_id = c.claim_id
+    JOIN user_branch ub ON ub.user_branch_id = c.user_branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE 'Bench Charity %%' AND c.approved
+    ORDER BY random() LIMIT %s
+"""
+
+AWAITING_PICKUPS = """
+    SELECT DISTINCT ON (p.pickup_id) p.qr_code, l.user_branch_id
+    FROM pickup p
+    JOIN listing_claim_item lci ON lci.claim_id = p.claim_id
+    JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+    JOIN listing l ON l.listing_id = lli.listing_id
+    JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE 'Bench Store %%' AND NOT p.complete
+    LIMIT %s
+"""
+
+
+# ---------------------------------------------
+# Requests for each endpoint
+# Each function returns n (method, path, keyword arguments for httpx) for the endpoint,
+# fewer if the world has run out of targets for a write
+
+class World:
+    def __init__(self, cur, rng):
+        self.cur = cur
+        self.rng = rng
+        cur.execute(BENCH_UB, ("Bench Store %",))
+        self.stores = cur.fetchall()
+        cur.execute(BENCH_UB, ("Bench Charity %",))
+        self.charities = cur.fetchall()
+        cur.execute(STORE_PRODUCTS)
+        self.products = {str(ub): products for ub, products in cur.fetchall()}
+        if not self.stores or not self.charities:
+            raise SystemExit("No Bench world found, run python -m benchmarks.seed first")
+
+    def store(self):
+        return [str(v) for v in self.rng.choice(self.stores)]
+
+    def charity(self):
+        return [str(v) for v in self.rng.choice(self.charities)]
+
+    def fetch(self, sql, n):
+        self.cur.execute(sql, (n,))
+        # UUIDs come back as strings already, arrays are cast to text[] in the SQL
+        return self.cur.fetchall()
+
+
+def get_products(world, n):
+    return [("GET", "/get_products", {"params": {"branch_id": world.store()[0]}}) for _ in range(n)]
+
+
+def listings(world, n):
+    return [("GET", "/listings", {}) for _ in range(n)]
+
+
+def listings_by_branch(world, n):
+    return [("GET", "/listings", {"params": {"branch_id": world.store()[0]}}) for _ in range(n)]
+
+
+def get_listings(world, n):
+    return [("GET", "/get_listings", {"params": {"branch_id": world.store()[0]}}) for _ in range(n)]
+
+
+def claims_pending(world, n):
+    return [("GET", "/claims/pending", {"params": {"branch_id": world.store()[0]}}) for _ in range(n)]
+
+
+def approved_awaiting_pickup(world, n):
+    return [("GET", "/claims/approved-awaiting-pickup", {"params": {"branch_id": world.store()[0]}}) for _ in range(n)]
+
+
+def my_pickups(world, n):
+    return [("GET", "/pickups/my-pickups", {"params": {"branch_id": world.charity()[0]}}) for _ in range(n)]
+
+
+def pickup_qr(world, n):
+    return [("GET", f"/pickup/qr/{claim_id}", {"params": {"user_branch_id": ub}})
+            for claim_id, ub in world.fetch(APPROVED_CLAIMS, n)]
+
+
+def pickup_qr_image(world, n):
+    return [("GET", f"/pickup/qr/{claim_id}/image", {"params": {"user_branch_id": ub}})
+            for claim_id, ub in world.fetch(APPROVED_CLAIMS, n)]
+
+
+def create_listing(world, n):
+    requests = []
+    for _ in range(n):
+        ub = world.store()[1]
+        products = world.rng.sample(world.products[ub], min(3, len(world.products[ub])))
+        items = [{"product_id": p, "quantity": world.rng.randint(1, 10)} for p in products]
+        requests.append(("POST", "/listing", {"json": {"user_branch_id": ub, "items": items}}))
+    return requests
+
+
+def edit_listing(world, n):
+    return [("PATCH", "/listing/items", {"json": {
+        "user_branch_id": ub, "listing_id": listing_id,
+        "items": [{"listing_line_item_id": item, "quantity": world.rng.randint(1, 10)} for item in items],
+    }}) for listing_id, ub, items in world.fetch(OPEN_LISTINGS, n)]
+
+
+# Edits up to 5 listings of one store per request
+def bulk_listing(world, n):
+    by_store = {}
+    for listing_id, ub, items in world.fetch(OPEN_LISTINGS, n * 20):
+        by_store.setdefault(ub, []).append({
+            "listing_id": listing_id,
+            "items": [{"listing_line_item_id": item, "quantity": world.rng.randint(1, 10)} for item in items],
+        })
+    requests = []
+    for ub, edits in by_store.items():
+        for i in range(0, len(edits), 5):
+            requests.append(("POST", "/listing/bulk", {"json": {"user_branch_id": ub, "edits": edits[i:i + 5]}}))
+    world.rng.shuffle(requests)
+    return requests[:n]
+
+
+def cancel_listing(world, n):
+    return [("POST", "/listing/cancel", {"json": {"user_branch_id": ub, "listing_id": listing_id}})
+            for listing_id, ub, _ in world.fetch(OPEN_LISTINGS, n)]
+
+
+def create_claim(world, n):
+    return [("POST", "/claims", {"json": {
+        "user_branch_id": world.charity()[1],
+        "items": [{"listing_line_item_id": item, "quantity": 1}],
+    }}) for (item,) in world.fetch(AVAILABLE_ITEMS, n)]
+
+
+def approve_claim(world, n):
+    return [("POST", "/claims/approve", {"json": {"claim_id": claim_id, "user_branch_id": ub}})
+            for claim_id, ub in world.fetch(PENDING_CLAIMS, n)]
+
+
+def verify_pickup(world, n):
+    return [("POST", "/pickup/verify", {"json": {"qr_code": qr_code, "user_branch_id": ub}})
+            for qr_code, ub in world.fetch(AWAITING_PICKUPS, n)]
+
+
+# Reads first, then writes in the order the app makes them, so each write has targets from the one before
+# (new claims are approved, approved claims are collected)
+ENDPOINTS = {
+    "get_products": get_products,
+    "listings": listings,
+    "listings_by_branch": listings_by_branch,
+    "get_listings": get_listings,
+    "claims_pending": claims_pending,
+    "approved_awaiting_pickup": approved_awaiting_pickup,
+    "my_pickups": my_pickups,
+    "pickup_qr": pickup_qr,
+    "pickup_qr_image": pickup_qr_image,
+    "create_listing": create_listing,
+    "edit_listing": edit_listing,
+    "bulk_listing": bulk_listing,
+    "cancel_listing": cancel_listing,
+    "create_claim": create_claim,
+    "approve_claim": approve_claim,
+    "verify_pickup": verify_pickup,
+}
+
+
+# ---------------------------------------------
+# Running
+
+async def run(client, requests, concurrency):
+    latencies = []
+    errors = 0
+    pending = iter(requests)
+
+    # Each worker sends its next request as soon as the last one is answered,
+    # so there are always `concurrency` requests in flight
+    async def worker():
+        nonlocal errors
+        for method, path, kwargs in pending:
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentiles(latencies):
+    if len(latencies) < 2:
+        return (latencies[0],) * 3 if latencies else (0.0,) * 3
+    cuts = quantiles(latencies, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+async def benchmark(args, world):
+    results = []
+    for level in args.concurrency:
+        limits = httpx.Limits(max_connections=level, max_keepalive_connections=level)
+        async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+            for name in args.only:
+                # Targets are read again for every run, as the runs before may have used them up
+                requests = ENDPOINTS[name](world, args.requests + WARMUP)
+                if len(requests) <= WARMUP:
+                    print(f"{name:26} {level:>4}  skipped, not enough targets in the Bench world")
+                    continue
+                await run(client, requests[:WARMUP], level)
+                latencies, errors, elapsed = await run(client, requests[WARMUP:], level)
+                p50, p95, p99 = percentiles(latencies)
+                result = {
+                    "endpoint": name, "concurrency": level, "requests": len(latencies), "errors": errors,
+                    "throughput": len(latencies) / elapsed, "p50": p50, "p95": p95, "p99": p99,
+                }
+                results.append(result)
+                print_result(result, args.baseline)
+    return results
+
+
+def print_result(result, baseline):
+    line = (f"{result['endpoint']:26} {result['concurrency']:>4} {result['requests']:>6} {result['errors']:>6}"
+            f" {result['throughput']:>9.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f}")
+    before = baseline.get((result["endpoint"], result["concurrency"]))
+    if before:
+        change = (result["p95"] - before["p95"]) / before["p95"] * 100 if before["p95"] else 0.0
+        line += f" {before['p95']:>8.1f} {change:>+7.1f}%"
+    print(line)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Latency and throughput of every endpoint")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint and level")
+    parser.add_argument("--only", default=",".join(ENDPOINTS), help="comma separated endpoints to run")
+    parser.add_argument("--seed", type=int, default=42, help="seed for picking branches and targets")
+    parser.add_argument("--out", help="save the results as JSON")
+    parser.add_argument("--compare", help="results JSON from an earlier run to show the p95 change against")
+    args = parser.parse_args()
+
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+    args.only = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = [name for name in args.only if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints {unknown}, choose from {list(ENDPOINTS)}")
+
+    args.baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            args.baseline = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+    return args
+
+
+def main():
+    args = parse_args()
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            world = World(cur, random.Random(args.seed))
+            header = (f"{'endpoint':26} {'conc':>4} {'n':>6} {'errors':>6} {'req/s':>9}"
+                      f" {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+            if args.baseline:
+                header += f" {'was p95':>8} {'change':>8}"
+            print(f"{args.url}\n{header}")
+            results = asyncio.run(benchmark(args, world))
+    finally:
+        conn.close()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"url": args.url, "results": results}, f, indent=2)
+        print(f"Saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Prepared statement benchmark for db/prepared.py
+# Run from the backend folder, after seeding (python -m benchmarks.seed):
+#   python -m benchmarks.prepared [runs]
+# For each read statement, on one connection, with a random Bench branch or claim for every run:
+#   1. EXPLAIN ANALYZE of the plain SQL and of EXECUTE on the prepared statement, reporting the planning
+#      and execution time Postgres measured
+#   2. the time for the whole call from Python (send, plan, run, fetch), plain and prepared
+# The prepared statement is run WARMUP times first, as Postgres only switches to the cached generic plan
+# after five runs
+
+import json
+import random
+import sys
+import time
+from statistics import mean
+import psycopg2
+from db import queries
+from db.config import DB_CONFIG
+from db.prepared import PreparedStatement
+
+WARMUP = 10
+
+STORE_BRANCHES = """
+    SELECT b.branch_id::text FROM branch b JOIN organisation o ON o.org_id = b.org_id
+    WHERE o.org_name LIKE 'Bench Store %'
+"""
+CHARITY_BRANCHES = """
+    SELECT b.branch_id::text FROM branch b JOIN organisation o ON o.org_id = b.org_id
+    WHERE o.org_name LIKE 'Bench Charity %'
+"""
+CLAIMS = """
+    SELECT c.claim_id::text FROM claim c
+    JOIN user_branch ub ON ub.user_branch_id = c.user_branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE 'Bench Charity %'
+    LIMIT 500
+"""
+
+# Statement name -> which sample its one parameter comes from
+STATEMENTS = (
+    ("GET_PRODUCTS", "store"),
+    ("PENDING_CLAIMS", "store"),
+    ("JSON_PENDING_CLAIMS", "store"),
+    ("APPROVED_AWAITING_PICKUP", "store"),
+    ("MY_PICKUPS", "charity"),
+    ("JSON_MY_PICKUPS", "charity"),
+    ("PICKUP_ITEMS_WITH_STORE", "claim"),
+    ("PICKUP_ITEMS_WITH_BRANCH", "claim"),
+)
+
+
+def prepare(cur, name):
+    statement = PreparedStatement(name, getattr(queries, name))
+    cur.execute(statement.prepare_sql)
+    cur.execute(queries.PREPARED_PARAMETER_TYPES, (statement.name,))
+    statement.set_parameter_types(cur.fetchone()[0])
+    return statement
+
+
+# (planning ms, execution ms) as measured by Postgres
+def explain(cur, sql, params):
+    cur.execute(f"EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) {sql}", params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Planning Time"], plan[0]["Execution Time"]
+
+
+# ms for each call from Python
+def call(cur, sql, params):
+    start = time.perf_counter()
+    cur.execute(sql, params)
+    cur.fetchall()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(1)
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    samples = {}
+    for key, sql in (("store", STORE_BRANCHES), ("charity", CHARITY_BRANCHES), ("claim", CLAIMS)):
+        cur.execute(sql)
+        samples[key] = [row[0] for row in cur.fetchall()]
+        if not samples[key]:
+            raise SystemExit("No Bench world found, run python -m benchmarks.seed first")
+
+    print(f"{runs} runs per statement, times in ms (mean)")
+    print(f"{'statement':26} {'plan':>7} {'plan (prep)':>11} {'exec':>7} {'exec (prep)':>11} "
+          f"{'call':>7} {'call (prep)':>11} {'saved':>6}")
+    for name, sample in STATEMENTS:
+        sql = getattr(queries, name)
+        statement = prepare(cur, name)
+        params = lambda: (rng.choice(samples[sample]),)
+        for _ in range(WARMUP):
+            call(cur, statement.execute_sql, params())
+
+        plain = [explain(cur, sql, params()) for _ in range(runs)]
+        prepared = [explain(cur, statement.execute_sql, params()) for _ in range(runs)]
+        # The plain and prepared calls take turns so both see the same cache and load
+        plain_calls, prepared_calls = [], []
+        for _ in range(runs):
+            plain_calls.append(call(cur, sql, params()))
+            prepared_calls.append(call(cur, statement.execute_sql, params()))
+
+        saved = 1 - mean(prepared_calls) / mean(plain_calls)
+        print(
+            f"{name:26} {mean(p for p, _ in plain):7.3f} {mean(p for p, _ in prepared):11.3f} "
+            f"{mean(e for _, e in plain):7.3f} {mean(e for _, e in prepared):11.3f} "
+            f"{mean(plain_calls):7.3f} {mean(prepared_calls):11.3f} {saved:6.0%}"
+        )
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
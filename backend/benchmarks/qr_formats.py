@@ -0,0 +1,77 @@
+# Micro-benchmark for the QR formats in utils/qr_render.py
+# Run from the backend folder:
+#   python -m benchmarks.qr_formats [tokens]
+# 1. Renders every token in each format in this process and reports the time per image and the size
+# 2. Renders the PNGs from 8 threads, first in the threads themselves and then in the process pool,
+#    while another thread does a small piece of Python work in a loop (standing in for claim requests)
+#    and reports how long that work took each time, which shows how much the rendering held the GIL
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import mean, quantiles
+from utils.qr_code import generate_secure_token
+from utils.qr_render import FORMATS, render_qr, get_pool, close_pool, QR_WORKERS
+
+THREADS = 8
+
+
+def format_table(tokens):
+    print(f"{'format':8} {'ms/image':>9} {'bytes':>7}")
+    for fmt in FORMATS:
+        start = time.perf_counter()
+        sizes = [len(render_qr(token, fmt)) for token in tokens]
+        per_image = (time.perf_counter() - start) * 1000 / len(tokens)
+        print(f"{fmt:8} {per_image:9.3f} {mean(sizes):7.0f}")
+    # The base64 data URI the JSON used to carry
+    print(f"{'base64':8} {'':>9} {mean(len(render_qr(t, 'png')) * 4 / 3 for t in tokens[:50]):7.0f}")
+
+
+# Waits 1ms (like a request waiting on Postgres) then does a small bit of Python work, over and over
+# until stop is set, recording each time in ms
+# After the wait the thread has to get the GIL back, so this goes up when other threads hold it
+def other_requests(stop, timings):
+    while not stop.is_set():
+        start = time.perf_counter()
+        time.sleep(0.001)
+        sum(i * i for i in range(2000))
+        timings.append((time.perf_counter() - start) * 1000)
+
+
+def burst(tokens, render):
+    stop = threading.Event()
+    timings = []
+    other = threading.Thread(target=other_requests, args=(stop, timings))
+    other.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as threads:
+        list(threads.map(render, tokens))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    other.join()
+    p50, p95 = quantiles(timings, n=100)[49], quantiles(timings, n=100)[94]
+    return elapsed, p50, p95
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    tokens = [generate_secure_token() for _ in range(count)]
+
+    format_table(tokens)
+
+    if QR_WORKERS <= 0:
+        print("\nWASTENOT_QR_WORKERS=0, skipping the process pool comparison")
+        sys.exit(0)
+
+    # Starting the workers before timing so the start up cost is not counted
+    pool = get_pool()
+    list(pool.map(render_qr, tokens[:QR_WORKERS], ["png"] * QR_WORKERS))
+
+    print(f"\nPNG burst, {count} images from {THREADS} threads")
+    print(f"{'where':14} {'images/s':>9} {'other p50 ms':>13} {'other p95 ms':>13}")
+    in_thread = burst(tokens, lambda token: render_qr(token, "png"))
+    in_pool = burst(tokens, lambda token: pool.submit(render_qr, token, "png").result())
+    for name, (elapsed, p50, p95) in (("threads", in_thread), (f"{QR_WORKERS} processes", in_pool)):
+        print(f"{name:14} {count / elapsed:9.0f} {p50:13.2f} {p95:13.2f}")
+    close_pool()
@@ -0,0 +1,207 @@
+# Seeds a migrated local database with a synthetic world for the endpoint benchmark (benchmarks/endpoints.py)
+# Run from the backend folder:
+#   python -m benchmarks.seed --orgs 20 --branches 5 --charities 10 --days 30
+# Builds, all in one transaction:
+#   - N store organisations with B branches each, and M charities with one branch each, one user per branch
+#   - P products per store branch
+#   - K days of history: L listings per store branch per day, each with I line items
+#   - a claim by a random charity on a share of the listings (--claim-rate), taking half of each item.
+#     Claims older than --open-days are approved and collected, newer ones are either still pending
+#     or approved and waiting for pickup, so every screen has something to show
+# Everything is generated in Postgres with generate_series, so large worlds take seconds rather than minutes
+# Every seeded organisation is named "Bench ...", and --reset removes them and everything under them first
+# random() is seeded with --seed so the same options give the same shape of data each time
+
+import argparse
+import time
+import psycopg2
+from db.config import DB_CONFIG
+
+BENCH_STORE = "Bench Store %%"
+BENCH_CHARITY = "Bench Charity %%"
+
+# Removing a previous world, children first (also removes rows the benchmark added to it)
+RESET = """
+    CREATE TEMP TABLE bench_ub ON COMMIT DROP AS
+    SELECT ub.user_branch_id, ub.user_id, ub.branch_id
+    FROM user_branch ub
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE 'Bench %';
+
+    CREATE TEMP TABLE bench_claim ON COMMIT DROP AS
+    SELECT claim_id FROM claim WHERE user_branch_id IN (SELECT user_branch_id FROM bench_ub);
+
+    CREATE TEMP TABLE bench_listing ON COMMIT DROP AS
+    SELECT listing_id FROM listing WHERE user_branch_id IN (SELECT user_branch_id FROM bench_ub);
+
+    DELETE FROM pickup WHERE claim_id IN (SELECT claim_id FROM bench_claim);
+    DELETE FROM listing_claim_item WHERE claim_id IN (SELECT claim_id FROM bench_claim);
+    DELETE FROM claim WHERE claim_id IN (SELECT claim_id FROM bench_claim);
+    DELETE FROM listing_line_item WHERE listing_id IN (SELECT listing_id FROM bench_listing);
+    DELETE FROM listing WHERE listing_id IN (SELECT listing_id FROM bench_listing);
+    DELETE FROM product WHERE branch_id IN (SELECT branch_id FROM bench_ub);
+    DELETE FROM user_branch WHERE user_branch_id IN (SELECT user_branch_id FROM bench_ub);
+    DELETE FROM app_user WHERE user_id IN (SELECT user_id FROM bench_ub);
+    DELETE FROM branch WHERE org_id IN (SELECT org_id FROM organisation WHERE org_name LIKE 'Bench %');
+    DELETE FROM organisation WHERE org_name LIKE 'Bench %';
+"""
+
+WORLD = f"""
+    SELECT setseed(%(seed)s);
+
+    INSERT INTO organisation (org_name)
+    SELECT 'Bench Store ' || g FROM generate_series(1, %(orgs)s) g;
+    INSERT INTO organisation (org_name)
+    SELECT 'Bench Charity ' || g FROM generate_series(1, %(charities)s) g;
+
+    INSERT INTO branch (org_id, branch_name, branch_location)
+    SELECT org_id, org_name || ' Branch ' || g, 'Cork'
+    FROM organisation, generate_series(1, %(branches)s) g
+    WHERE org_name LIKE '{BENCH_STORE}';
+    INSERT INTO branch (org_id, branch_name, branch_location)
+    SELECT org_id, org_name || ' Branch', 'Cork'
+    FROM organisation
+    WHERE org_name LIKE '{BENCH_CHARITY}';
+
+    -- One user per branch, the email is how the user is matched back to its branch
+    INSERT INTO app_user (user_email)
+    SELECT 'bench-' || b.branch_id || '@example.com'
+    FROM branch b JOIN organisation o ON o.org_id = b.org_id
+    WHERE o.org_name LIKE 'Bench %%';
+    INSERT INTO user_branch (user_id, branch_id, org_id)
+    SELECT u.user_id, b.branch_id, b.org_id
+    FROM branch b JOIN app_user u ON u.user_email = 'bench-' || b.branch_id || '@example.com';
+
+    CREATE TEMP TABLE store_ub ON COMMIT DROP AS
+    SELECT ub.user_branch_id, ub.user_id, ub.branch_id
+    FROM user_branch ub JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE '{BENCH_STORE}';
+
+    INSERT INTO product (branch_id, product_name)
+    SELECT branch_id, 'Product ' || g FROM store_ub, generate_series(1, %(products)s) g;
+
+    -- Day 0 is today, the time within the day is random but never in the future
+    INSERT INTO listing (user_branch_id, created_at)
+    SELECT user_branch_id,
+           date_trunc('day', now()) - d * interval '1 day'
+             + random() * LEAST(interval '1 day', now() - date_trunc('day', now()))
+    FROM store_ub, generate_series(0, %(days)s - 1) d, generate_series(1, %(listings)s) n;
+
+    INSERT INTO listing_line_item (listing_id, product_id, quantity)
+    SELECT l.listing_id, p.product_id, 2 + (random() * 8)::int
+    FROM listing l
+    JOIN store_ub ub ON ub.user_branch_id = l.user_branch_id
+    CROSS JOIN LATERAL (
+        SELECT product_id FROM product
+        -- l.listing_id makes Postgres pick new products for every listing instead of reusing them per branch
+        WHERE branch_id = ub.branch_id AND l.listing_id IS NOT NULL
+        ORDER BY random() LIMIT %(items)s
+    ) p;
+
+    -- Claims on a share of the listings, by a random charity
+    CREATE TEMP TABLE bench_claims ON COMMIT DROP AS
+    WITH charities AS (
+        SELECT array_agg(ub.user_branch_id) AS ids
+        FROM user_branch ub JOIN organisation o ON o.org_id = ub.org_id
+        WHERE o.org_name LIKE '{BENCH_CHARITY}'
+    )
+    SELECT gen_random_uuid() AS claim_id,
+           l.listing_id,
+           ub.user_id AS store_user_id,
+           ids[1 + floor(random() * cardinality(ids))::int] AS charity_user_branch_id,
+           LEAST(l.created_at + random() * interval '4 hours', now()) AS created_at,
+           CASE
+               WHEN l.created_at < now() - %(open_days)s * interval '1 day' THEN 'collected'
+               WHEN random() < 0.5 THEN 'pending'
+               ELSE 'approved'
+           END AS state
+    FROM listing l
+    JOIN store_ub ub ON ub.user_branch_id = l.user_branch_id
+    CROSS JOIN charities
+    WHERE random() < %(claim_rate)s;
+
+    INSERT INTO claim (claim_id, user_branch_id, created_at, approved, approved_by, approved_at)
+    SELECT claim_id, charity_user_branch_id, created_at, state <> 'pending',
+           CASE WHEN state <> 'pending' THEN store_user_id END,
+           CASE WHEN state <> 'pending' THEN LEAST(created_at + interval '1 hour', now()) END
+    FROM bench_claims;
+
+    INSERT INTO listing_claim_item (claim_id, listing_line_item_id, quantity)
+    SELECT bc.claim_id, lli.listing_line_item_id, lli.quantity / 2
+    FROM bench_claims bc
+    JOIN listing_line_item lli ON lli.listing_id = bc.listing_id;
+
+    UPDATE listing_line_item lli
+    SET quantity = lli.quantity - lli.quantity / 2
+    FROM bench_claims bc
+    WHERE lli.listing_id = bc.listing_id;
+
+    INSERT INTO pickup (claim_id, qr_code, complete, created_at)
+    SELECT claim_id, gen_random_uuid()::text, state = 'collected', LEAST(created_at + interval '1 hour', now())
+    FROM bench_claims
+    WHERE state <> 'pending';
+"""
+
+COUNTS = """
+    SELECT 'store branches', count(*) FROM branch b JOIN organisation o ON o.org_id = b.org_id WHERE o.org_name LIKE 'Bench Store %'
+    UNION ALL SELECT 'charity branches', count(*) FROM branch b JOIN organisation o ON o.org_id = b.org_id WHERE o.org_name LIKE 'Bench Charity %'
+    UNION ALL SELECT 'listings', count(*) FROM listing
+    UNION ALL SELECT 'listing line items', count(*) FROM listing_line_item
+    UNION ALL SELECT 'claims', count(*) FROM claim
+    UNION ALL SELECT 'pending claims', count(*) FROM claim WHERE NOT approved
+    UNION ALL SELECT 'pickups', count(*) FROM pickup
+    UNION ALL SELECT 'pickups awaiting collection', count(*) FROM pickup WHERE NOT complete
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a synthetic world for the endpoint benchmark")
+    parser.add_argument("--orgs", type=int, default=20, help="store organisations")
+    parser.add_argument("--branches", type=int, default=5, help="branches per store organisation")
+    parser.add_argument("--charities", type=int, default=10, help="charity organisations, one branch each")
+    parser.add_argument("--products", type=int, default=20, help="products per store branch")
+    parser.add_argument("--days", type=int, default=30, help="days of listing history")
+    parser.add_argument("--listings", type=int, default=2, help="listings per store branch per day")
+    parser.add_argument("--items", type=int, default=3, help="line items per listing")
+    parser.add_argument("--claim-rate", type=float, default=0.6, help="share of listings that get a claim")
+    parser.add_argument("--open-days", type=int, default=2, help="days of claims still pending or awaiting pickup")
+    parser.add_argument("--seed", type=float, default=0.42, help="seed for random(), between -1 and 1")
+    parser.add_argument("--reset", action="store_true", help="remove the previous Bench world first")
+    return parser.parse_args(argv)
+
+
+# The parameters for WORLD, also used by tests/test_query_plans.py to seed the default world
+def world_params(args) -> dict:
+    return {
+        "orgs": args.orgs, "branches": args.branches, "charities": args.charities,
+        "products": args.products, "days": args.days, "listings": args.listings,
+        "items": min(args.items, args.products), "claim_rate": args.claim_rate,
+        "open_days": args.open_days, "seed": args.seed,
+    }
+
+
+def main():
+    args = parse_args()
+    params = world_params(args)
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        start = time.perf_counter()
+        with conn, conn.cursor() as cur:
+            if args.reset:
+                cur.execute(RESET)
+            cur.execute(WORLD, params)
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+        # The planner needs up to date statistics for the new table sizes
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE")
+            cur.execute(COUNTS)
+            for name, count in cur.fetchall():
+                print(f"  {name:28} {count:>9}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# Serialization benchmark for utils/responses.py
+# Run from the backend folder, after seeding (python -m benchmarks.seed):
+#   python -m benchmarks.serialization [requests]
+# Reads the rows for the biggest Bench branch of each read endpoint once, then sends them through a small
+# FastAPI app in this process in each of these ways, and reports the CPU time per request and the bytes sent:
+#   models  - Pydantic models built in the endpoint and checked against response_model (how it used to be)
+#   dicts   - the db/rows.py dicts checked against response_model (WASTENOT_FAST_RESPONSES off)
+#   orjson  - fast_response, JSON (WASTENOT_FAST_RESPONSES=1)
+#   msgpack - fast_response for a client that sends Accept: application/msgpack (if msgpack is installed)
+# and orjson compressed with gzip and brotli (if brotli is installed) by CompressionMiddleware
+# The app is called directly as ASGI with no server or HTTP client, so the times are the endpoint's Python
+# work after the rows have been grouped into dicts: checking the response, encoding and compressing it
+
+import asyncio
+import sys
+import time
+from typing import List
+import psycopg2
+from fastapi import FastAPI, Request, Response
+from pydantic import TypeAdapter
+from db import queries, rows
+from db.config import DB_CONFIG
+from models import ListingAvailable, PendingClaimDetail, PickupDetail
+from utils.responses import fast_response, CompressionMiddleware, load_brotli, load_msgpack
+
+COMPRESS_MIN_BYTES = 1024
+WARMUP = 5
+
+# The Bench branch with the most of each
+BIGGEST_LISTING_BRANCH = """
+    SELECT ub.branch_id FROM listing l
+    JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE o.org_name LIKE 'Bench Store %'
+    GROUP BY ub.branch_id ORDER BY count(*) DESC LIMIT 1
+"""
+BIGGEST_PENDING_BRANCH = """
+    SELECT store_branch_id FROM claim_summary WHERE status = 'pending'
+    GROUP BY store_branch_id ORDER BY count(*) DESC LIMIT 1
+"""
+BIGGEST_PICKUP_BRANCH = """
+    SELECT charity_branch_id FROM claim_summary WHERE status <> 'pending'
+    GROUP BY charity_branch_id ORDER BY count(*) DESC LIMIT 1
+"""
+BIGGEST_AWAITING_BRANCH = """
+    SELECT s.store_branch_id FROM claim_summary s
+    JOIN pickup p ON p.claim_id = s.claim_id
+    WHERE s.status = 'approved' AND p.created_at >= CURRENT_DATE
+    GROUP BY s.store_branch_id ORDER BY count(*) DESC LIMIT 1
+"""
+
+
+# Each endpoint's response as the db/rows.py dicts, and the model FastAPI checks it against (None for none)
+def load_samples(cur):
+    samples = {}
+
+    cur.execute(BIGGEST_LISTING_BRANCH)
+    branch_id = cur.fetchone()[0]
+    cur.execute(queries.CLAIMABLE_LISTINGS_PAGE, rows.listing_page_params(None, rows.LISTING_PAGE_MAX, branch_id=branch_id))
+    listing_rows, _ = rows.split_listing_page(cur.fetchall(), rows.LISTING_PAGE_MAX)
+    cur.execute(queries.AVAILABLE_LINE_ITEMS, ([row[0] for row in listing_rows],))
+    samples["get_listings"] = (rows.listings_from_rows(listing_rows, cur.fetchall()), ListingAvailable)
+
+    cur.execute(BIGGEST_PENDING_BRANCH)
+    branch_id = cur.fetchone()[0]
+    cur.execute(queries.PENDING_CLAIMS, (branch_id,))
+    claims = cur.fetchall()
+    cur.execute(queries.CLAIM_ITEMS, ([row[0] for row in claims],))
+    samples["claims/pending"] = (rows.pending_claims_from_rows(claims, cur.fetchall()), PendingClaimDetail)
+
+    cur.execute(BIGGEST_PICKUP_BRANCH)
+    cur.execute(queries.MY_PICKUPS, (cur.fetchone()[0],))
+    samples["my-pickups"] = (rows.pickups_from_rows(cur.fetchall()), PickupDetail)
+
+    cur.execute(BIGGEST_AWAITING_BRANCH)
+    row = cur.fetchone()
+    if row:
+        cur.execute(queries.APPROVED_AWAITING_PICKUP, (row[0],))
+        samples["awaiting-pickup"] = (rows.approved_groups_from_rows(cur.fetchall()), None)
+    return samples
+
+
+# The routes for one endpoint, made in a function so each one keeps its own content
+# (not as default arguments, which FastAPI would take as query parameters and copy on every request)
+def add_routes(app, name, content, model):
+    response_model = List[model] if model else None
+
+    if model:
+        adapter = TypeAdapter(List[model])
+
+        @app.get(f"/models/{name}", response_model=response_model)
+        async def models():
+            return adapter.validate_python(content)
+
+    @app.get(f"/dicts/{name}", response_model=response_model)
+    async def dicts():
+        return content
+
+    @app.get(f"/fast/{name}")
+    async def fast(request: Request, response: Response):
+        return fast_response(request, response, content)
+
+
+# One route per endpoint and way of sending it
+# The routes are async def so they run on the event loop like the async endpoints, instead of being
+# timed with the threadpool hand off of the sync ones
+def bench_app(samples):
+    app = FastAPI()
+    for name, (content, model) in samples.items():
+        add_routes(app, name, content, model)
+    return CompressionMiddleware(app, minimum_size=COMPRESS_MIN_BYTES)
+
+
+# Calls the app without a server, returning the status and the number of body bytes it sent
+async def call(app, path, headers):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    sent = {"status": None, "bytes": 0}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            sent["bytes"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return sent
+
+
+# (label, path prefix, request headers)
+def variants():
+    found = [
+        ("models", "models", {}),
+        ("dicts", "dicts", {}),
+        ("orjson", "fast", {}),
+    ]
+    if load_msgpack() is not None:
+        found.append(("msgpack", "fast", {"Accept": "application/msgpack"}))
+    found.append(("orjson+gzip", "fast", {"Accept-Encoding": "gzip"}))
+    if load_brotli() is not None:
+        found.append(("orjson+br", "fast", {"Accept-Encoding": "br"}))
+    return found
+
+
+async def run(app, samples, requests):
+    print(f"{'endpoint':16} {'items':>6} {'variant':12} {'CPU ms/req':>10} {'bytes':>8}")
+    for name, (content, model) in samples.items():
+        for label, prefix, headers in variants():
+            if prefix == "models" and model is None:
+                continue
+            path = f"/{prefix}/{name}"
+            for _ in range(WARMUP):
+                await call(app, path, headers)
+            start = time.process_time()
+            for _ in range(requests):
+                sent = await call(app, path, headers)
+            per_request = (time.process_time() - start) * 1000 / requests
+            assert sent["status"] == 200, (path, sent)
+            print(f"{name:16} {len(content):6} {label:12} {per_request:10.3f} {sent['bytes']:8}")
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn, conn.cursor() as cur:
+            samples = load_samples(cur)
+    finally:
+        conn.close()
+    if load_msgpack() is None:
+        print("msgpack is not installed, skipping MessagePack")
+    if load_brotli() is None:
+        print("brotli is not installed, skipping brotli")
+    asyncio.run(run(bench_app(samples), samples, requests))
+
+
+if __name__ == "__main__":
+    main()
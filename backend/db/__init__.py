@@ -0,0 +1,4 @@
+# this file is for the initialisation of the db folder
+# the db folder holds everything that talks to Postgres:
+# the connection settings, the SQL used by the endpoints and the helpers that turn rows into responses
+# the SQL is kept in one place so the sync (psycopg2) and async (psycopg 3) endpoints run exactly the same statements
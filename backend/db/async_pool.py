@@ -0,0 +1,354 @@
+# Async connection pool, only used when WASTENOT_DB_MODE=async
+# psycopg 3 is used because it keeps the same %s placeholders as psycopg2, so db/queries.py works unchanged
+# The pool is created closed and opened on startup, as opening needs a running event loop
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from weakref import WeakKeyDictionary
+import psycopg
+from fastapi import Header, Query, Request
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool, PoolTimeout, TooManyRequests
+from db import queries
+from db.config import (
+    DB_CONFIG, POOL_MIN, POOL_MAX, POOL_TIMEOUT, POOL_MAX_WAITING, POOL_CHECK_IDLE, POOL_DRAIN_TIMEOUT,
+    STATEMENT_TIMEOUTS, METRICS, PREPARED, REPLICA_CONFIG, REPLICA_WAIT_MS,
+)
+from db.pool import statement_timeout_options
+from db.prepared import REGISTRY
+from db.replica import (
+    keep_write_token, read_position, replica_breaker, write_token_failed, REPLICA_READS, POLL_SECONDS, NO_TOKEN,
+)
+from db.versions import check_not_modified, checked_versions
+
+logger = logging.getLogger(__name__)
+
+# The psycopg 3 errors for BUSY_ERRORS in db/pool.py, answered with a 503 in async mode (see app.py)
+ASYNC_BUSY_ERRORS = (
+    PoolTimeout,
+    TooManyRequests,
+    psycopg.errors.QueryCanceled,
+    psycopg.errors.DeadlockDetected,
+    psycopg.errors.SerializationFailure,
+)
+
+# The psycopg 3 errors for RETRY_ERRORS in db/claims.py, retried by the optimistic claim engine
+ASYNC_RETRY_ERRORS = (
+    psycopg.errors.DeadlockDetected,
+    psycopg.errors.SerializationFailure,
+)
+
+
+
+# ---------------------------------------------
+# Prepared statements and metrics
+# The psycopg 3 versions of the cursor and pool classes in db/prepared.py and db/metrics.py, kept here so
+# the sync mode never imports psycopg 3
+
+# Asks psycopg 3 to prepare the statements in db/prepared.py (prepare=True), which uses the protocol level
+# prepare instead of SQL
+class AsyncPreparedCursor(psycopg.AsyncCursor):
+    async def execute(self, query, params=None, *, prepare=None, binary=None):
+        if prepare is None and query in REGISTRY:
+            prepare = True
+        return await super().execute(query, params, prepare=prepare, binary=binary)
+
+
+# The same as MetricsCursor and MetricsConnectionPool in db/metrics.py
+# COPY is not timed here, as in async mode it includes waiting for the client to send the upload
+if METRICS:
+    from db.metrics import (
+        POOL_EXHAUSTED, POOL_IN_USE, POOL_MAX as POOL_MAX_GAUGE, POOL_WAIT_SECONDS, POOL_WAITING, SQL_ERRORS,
+        record, statement_name,
+    )
+
+    class AsyncMetricsCursor(AsyncPreparedCursor):
+        async def _timed(self, sql, run):
+            name = statement_name(sql)
+            start = time.perf_counter()
+            try:
+                return await run()
+            except Exception:
+                SQL_ERRORS.inc(statement=name)
+                raise
+            finally:
+                record(name, time.perf_counter() - start, self.rowcount)
+
+        async def execute(self, query, params=None, **kwargs):
+            return await self._timed(query, lambda: super(AsyncMetricsCursor, self).execute(query, params, **kwargs))
+
+        async def executemany(self, query, params_seq, **kwargs):
+            return await self._timed(query, lambda: super(AsyncMetricsCursor, self).executemany(query, params_seq, **kwargs))
+
+    # psycopg_pool queues requests when every connection is in use, and raises PoolTimeout if the wait is too long
+    # or TooManyRequests if the queue is full
+    class AsyncMetricsConnectionPool(AsyncConnectionPool):
+        def __init__(self, conninfo, **kwargs):
+            kwargs.setdefault("kwargs", {})["cursor_factory"] = AsyncMetricsCursor
+            super().__init__(conninfo, **kwargs)
+            POOL_MAX_GAUGE.set(self.max_size)
+            POOL_WAITING.read = lambda: {(): self.get_stats().get("requests_waiting", 0)}
+
+        async def getconn(self, timeout=None):
+            start = time.perf_counter()
+            try:
+                conn = await super().getconn(timeout)
+            except (PoolTimeout, TooManyRequests):
+                POOL_EXHAUSTED.inc()
+                raise
+            finally:
+                POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+            POOL_IN_USE.inc()
+            return conn
+
+        async def putconn(self, conn):
+            await super().putconn(conn)
+            POOL_IN_USE.dec()
+
+
+# With metrics on, the pool counts connections in use and every statement is timed
+pool_class = AsyncConnectionPool
+if METRICS:
+    pool_class = AsyncMetricsConnectionPool
+
+# Time each connection was returned to the pool, so only connections that have been idle are checked
+returned_at = WeakKeyDictionary()
+
+
+async def mark_returned(conn):
+    returned_at[conn] = time.monotonic()
+
+
+# The same check as the sync pool (db/pool.py): SELECT 1 on a connection idle for more than POOL_CHECK_IDLE,
+# if it fails psycopg_pool throws the connection away and hands out another
+async def check_idle_connection(conn):
+    if time.monotonic() - returned_at.get(conn, 0) > POOL_CHECK_IDLE:
+        await AsyncConnectionPool.check_connection(conn)
+
+
+# With prepared statements on, the endpoint SQL is prepared the first time each connection runs it (db/prepared.py)
+connection_kwargs = {"options": statement_timeout_options()}
+if PREPARED:
+    connection_kwargs["cursor_factory"] = AsyncPreparedCursor
+
+# Same size, wait and timeouts as the psycopg2 pool in db/sync_pool.py so the two modes can be compared
+async_pool = pool_class(
+    make_conninfo(**DB_CONFIG),
+    min_size=POOL_MIN,
+    max_size=POOL_MAX,
+    timeout=POOL_TIMEOUT,
+    max_waiting=POOL_MAX_WAITING,
+    check=check_idle_connection,
+    reset=mark_returned,
+    kwargs=connection_kwargs,
+    open=False,
+)
+
+
+# Second pool on the read replica, when one is set up (db/replica.py)
+# Its connections use the same cursor class as the primary's, but the pool metrics only cover the primary
+async_replica_pool = None
+if REPLICA_CONFIG:
+    replica_kwargs = dict(connection_kwargs)
+    if METRICS:
+        replica_kwargs["cursor_factory"] = AsyncMetricsCursor
+    async_replica_pool = AsyncConnectionPool(
+        make_conninfo(**REPLICA_CONFIG),
+        min_size=POOL_MIN,
+        max_size=POOL_MAX,
+        timeout=POOL_TIMEOUT,
+        max_waiting=POOL_MAX_WAITING,
+        check=check_idle_connection,
+        reset=mark_returned,
+        kwargs=replica_kwargs,
+        open=False,
+    )
+
+
+# Waiting for POOL_MIN connections so the first requests do not have to open them
+# If Postgres is not up yet the app still starts, and the pool keeps trying in the background
+async def open_async_pool():
+    try:
+        await async_pool.open(wait=True, timeout=POOL_TIMEOUT)
+    except PoolTimeout as e:
+        logger.warning("Could not open pooled connections at startup: %s", e)
+    # Not waited for, reads go to the primary until the replica connections are open
+    if async_replica_pool is not None:
+        await async_replica_pool.open()
+
+
+# psycopg_pool waits up to the timeout for connections still in use to be given back, then closes them
+async def close_async_pool():
+    await async_pool.close(timeout=POOL_DRAIN_TIMEOUT)
+    if async_replica_pool is not None:
+        await async_replica_pool.close(timeout=POOL_DRAIN_TIMEOUT)
+
+
+# A connection for a GET endpoint: from the read replica when there is one and it has caught up with the
+# client's last write, otherwise from the primary
+@asynccontextmanager
+async def read_connection(request: Request):
+    conn = None
+    if async_replica_pool is not None:
+        conn = await async_replica_conn(async_replica_pool, read_position(request))
+    if conn is None:
+        async with async_pool.connection() as conn:
+            yield conn
+        return
+    try:
+        yield conn
+    except Exception as e:
+        if async_lost_replica(e):
+            # The replica went away during the endpoint's queries, which is too late to move the read
+            replica_breaker.mark_down()
+            await discard_async_replica_conn(async_replica_pool, conn)
+        else:
+            await release_async_replica_conn(async_replica_pool, conn)
+        raise
+    await release_async_replica_conn(async_replica_pool, conn)
+
+
+# Async versions of branch_versions, etag_versions and branch_unchanged in db/sync_pool.py
+async def branch_versions(branch_id):
+    async with async_pool.connection() as conn:
+        await conn.set_autocommit(True)
+        try:
+            cur = await conn.execute(queries.PRIMARY_BRANCH_VERSIONS, {"branch_id": str(branch_id)})
+            return await cur.fetchone()
+        finally:
+            await conn.set_autocommit(False)
+
+
+async def etag_versions(request: Request, cur, branch_id):
+    versions = checked_versions(request)
+    if versions is None:
+        await cur.execute(queries.BRANCH_VERSIONS, {"branch_id": str(branch_id)})
+        versions = await cur.fetchone()
+    return versions
+
+
+def branch_unchanged(scopes, today=False):
+    async def check(request: Request, branch_id: str = Query(...), if_none_match: Optional[str] = Header(None)):
+        if if_none_match:
+            check_not_modified(request, if_none_match, await branch_versions(branch_id), scopes, today)
+    return check
+
+
+# Async version of get_conn in db/sync_pool.py, for the GET endpoints
+# The pool commits when the endpoint returns and rolls back if it raises (e.g. an HTTPException)
+async def get_async_conn(request: Request):
+    async with read_connection(request) as conn:
+        yield conn
+
+
+# Raising statement_timeout for the rest of the transaction, as set_statement_timeout in db/pool.py
+async def set_async_statement_timeout(conn, route_class: str):
+    if route_class != "read":
+        await conn.execute(queries.SET_STATEMENT_TIMEOUT, (str(STATEMENT_TIMEOUTS[route_class]),))
+
+
+# Commits the write and, with a read replica, reads the primary's WAL position for LsnTokenMiddleware
+# (db/replica.py) on the same connection, in autocommit so no transaction is opened. Async version of
+# read_write_token in db/sync_pool.py
+async def commit_write(request: Request, conn):
+    await conn.commit()
+    if not REPLICA_CONFIG:
+        return
+    await conn.set_autocommit(True)
+    try:
+        cur = await conn.execute(queries.CURRENT_LSN)
+        keep_write_token(request, (await cur.fetchone())[0])
+    except psycopg.Error as e:
+        write_token_failed(e)
+    finally:
+        if not conn.closed:
+            await conn.set_autocommit(False)
+
+
+# The write endpoints use these with Depends(..., scope="function"), so the write is committed before the
+# response is sent rather than after it. Otherwise a client could read straight after a write and not see it,
+# and there would be no write token for LsnTokenMiddleware yet. Nothing after the yield runs if the endpoint
+# raised, and the pool rolls back
+async def get_async_write_conn(request: Request):
+    async with async_pool.connection() as conn:
+        await set_async_statement_timeout(conn, "write")
+        yield conn
+        await commit_write(request, conn)
+
+
+async def get_async_bulk_conn(request: Request):
+    async with async_pool.connection() as conn:
+        await set_async_statement_timeout(conn, "bulk")
+        yield conn
+        await commit_write(request, conn)
+
+
+# ---------------------------------------------
+# Read replica (db/replica.py)
+
+# psycopg_pool connects in the background, so an unreachable replica shows up as a PoolTimeout, the same as
+# every connection being in use. It is taken as down if the pool has failed to connect since a statement last
+# ran on the replica (connections_errors only ever goes up)
+replica_connect_errors = 0
+
+
+# A replica connection that has replayed up to token, or None if the read should go to the primary
+# Checked with REPLICA_CAUGHT_UP even without a token, as replica_conn in db/replica.py
+async def async_replica_conn(replica_pool, token):
+    global replica_connect_errors
+    if not replica_breaker.available():
+        REPLICA_READS.inc(database="primary", reason="replica down")
+        return None
+    deadline = time.monotonic() + REPLICA_WAIT_MS / 1000
+    try:
+        conn = await replica_pool.getconn(timeout=REPLICA_WAIT_MS / 1000)
+    except (PoolTimeout, psycopg.OperationalError):
+        if replica_pool.get_stats().get("connections_errors", 0) > replica_connect_errors:
+            replica_breaker.mark_down()
+        REPLICA_READS.inc(database="primary", reason="replica unavailable")
+        return None
+    try:
+        while True:
+            cur = await conn.execute(queries.REPLICA_CAUGHT_UP, (token or NO_TOKEN,))
+            caught_up = (await cur.fetchone())[0]
+            replica_breaker.mark_up()
+            replica_connect_errors = replica_pool.get_stats().get("connections_errors", 0)
+            if caught_up:
+                REPLICA_READS.inc(database="replica", reason="caught up" if token else "no token")
+                return conn
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(POLL_SECONDS)
+    except (psycopg.OperationalError, psycopg.InterfaceError):
+        replica_breaker.mark_down()
+        await discard_async_replica_conn(replica_pool, conn)
+        REPLICA_READS.inc(database="primary", reason="replica unavailable")
+        return None
+    await release_async_replica_conn(replica_pool, conn)
+    REPLICA_READS.inc(database="primary", reason="replica behind")
+    return None
+
+
+# Whether an error from an endpoint's query on a replica connection means the replica went away, as
+# lost_replica in db/replica.py
+def async_lost_replica(e) -> bool:
+    return (isinstance(e, (psycopg.OperationalError, psycopg.InterfaceError))
+            and not isinstance(e, psycopg.errors.QueryCanceled))
+
+
+# A connection the replica dropped is closed, so psycopg_pool replaces it instead of handing it out again
+async def discard_async_replica_conn(replica_pool, conn):
+    await conn.close()
+    await replica_pool.putconn(conn)
+
+
+# Nothing to commit on a replica, and psycopg_pool expects connections back outside a transaction
+async def release_async_replica_conn(replica_pool, conn):
+    try:
+        await conn.rollback()
+    except psycopg.OperationalError:
+        pass
+    await replica_pool.putconn(conn)
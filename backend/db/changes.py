@@ -0,0 +1,69 @@
+# Delta sync helpers shared by the sync and async endpoints
+# The app used to download every pending claim, pickup and listing again on each refresh. The /changes
+# endpoints return only what changed since a cursor the client got with its last response:
+#   GET /claims/pending/changes     - new or changed pending claims, and the ones approved since
+#   GET /pickups/my-pickups/changes - new or changed pickups
+#   GET /listings/changes           - listings with changed items, and the ones with nothing left
+# The cursor is a Postgres snapshot (pg_current_snapshot) and each row records the transaction that last
+# wrote it (migration 0006), so a write that was still running when the cursor was taken is sent next time
+# The cursor is taken before the changes are read, so a write that commits in between can be sent twice but
+# is never missed. The client replaces what it has with each change, so a repeat does no harm
+
+import re
+from fastapi import HTTPException
+from db import rows
+from models import PendingClaimChanges, PickupChanges, ListingChanges
+
+# xmin:xmax:xip,xip,... as Postgres prints a pg_snapshot
+CURSOR_FORMAT = re.compile(r"\d{1,20}:\d{1,20}:(\d{1,20}(,\d{1,20})*)?")
+CURSOR_MAX_LENGTH = 8192
+
+# Most changed listings sent in one response. A client further behind than this gets a 410 and reloads
+# the listings, which is cheaper than sending every listing as a change
+LISTING_CHANGES_MAX = 500
+
+
+# Checks a cursor sent by the client before it is used in the SQL, None means no cursor
+def change_cursor(cursor):
+    if cursor is None:
+        return None
+    if len(cursor) > CURSOR_MAX_LENGTH or not CURSOR_FORMAT.fullmatch(cursor):
+        raise HTTPException(400, "Invalid change cursor")
+    return cursor
+
+
+# claims are PENDING_CLAIMS or PENDING_CLAIM_CHANGES rows, items_rows are CLAIM_ITEMS for the pending ones
+def pending_claim_changes(claims, items_rows, cursor) -> PendingClaimChanges:
+    pending = [row for row in claims if not row[3]]
+    removed = [str(row[0]) for row in claims if row[3]]
+    return PendingClaimChanges(
+        claims=rows.pending_claims_from_rows(pending, items_rows),
+        removed=removed,
+        cursor=cursor,
+    )
+
+
+# Parameters for LISTING_CHANGES, with the same filters as the listing pages
+def listing_changes_params(since, org_id=None, branch_id=None, product_id=None) -> dict:
+    params = rows.listing_page_params(None, LISTING_CHANGES_MAX, org_id, branch_id, product_id)
+    del params["cursor"]
+    params["since"] = since
+    return params
+
+
+# Raises 410 when more listings changed than are sent in one response
+def check_listing_changes(listing_rows):
+    if len(listing_rows) > LISTING_CHANGES_MAX:
+        raise HTTPException(410, "Too many listings have changed since this cursor, reload the listings")
+
+
+# listing_rows are (listing_id, org_name, branch_name, claimable) from LISTING_CHANGES
+# item_rows come from AVAILABLE_LINE_ITEMS for the claimable ones
+def listing_changes(listing_rows, item_rows, cursor) -> ListingChanges:
+    listings = rows.listings_from_rows([row for row in listing_rows if row[3]], item_rows)
+    kept = {listing["listing_id"] for listing in listings}
+    return ListingChanges(
+        listings=listings,
+        removed=[str(row[0]) for row in listing_rows if str(row[0]) not in kept],
+        cursor=cursor,
+    )
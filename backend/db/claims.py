@@ -0,0 +1,161 @@
+# Claim helpers shared by the sync and async claim endpoints
+# A claim is made with a fixed number of statements however many items it has:
+#   1. LOCK_LINE_ITEMS locks every requested row, always in the same order
+#   2. check_availability checks every quantity here in Python
+#   3. INSERT_CLAIM creates the claim
+#   4. CLAIM_LINE_ITEMS takes the quantities off and adds the listing claim items
+# Before this the endpoint made three round trips per item while holding the row locks
+#
+# With WASTENOT_CLAIM_ENGINE=optimistic a claim is one statement instead (CLAIM_IF_AVAILABLE), which takes each
+# quantity off only if enough is left, so rows are locked for one statement and the commit rather than three
+# round trips. It first locks the rows in listing_line_item_id order, the same as LOCK_LINE_ITEMS, so claims for
+# the same items queue instead of deadlocking. A hot row is still locked until commit, so in
+# benchmarks/claim_contention.py it is not reliably faster than the locking engine
+#   - if anything was short, the items that were taken are rolled back and LINE_ITEM_QUANTITIES explains why,
+#     with the same errors as the locking engine
+#   - deadlocks and serialization failures are retried with backoff (retry_delay), and a claim that keeps
+#     failing gets a 503 (db/pool.py)
+
+import random
+from collections import Counter
+import psycopg2
+from fastapi import HTTPException
+from uuid import UUID
+from db.listings import normalise_id
+from models import ApproveClaimResponse
+from utils.pickup_token import new_pickup_code
+
+# Errors where running the same claim again can succeed
+# The psycopg 3 versions for the async endpoint are ASYNC_RETRY_ERRORS in db/async_pool.py
+RETRY_ERRORS = (
+    psycopg2.errors.DeadlockDetected,
+    psycopg2.errors.SerializationFailure,
+)
+CLAIM_ATTEMPTS = 5
+# Seconds, doubled for each attempt
+RETRY_BASE_DELAY = 0.01
+
+
+# Raised inside the claim's transaction (or savepoint) so the quantities already taken are put back
+class Shortfall(Exception):
+    pass
+
+
+# Exponential backoff with full jitter, so claims that collided do not all retry at the same moment (Brooker, 2015)
+def retry_delay(attempt: int) -> float:
+    return random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt)
+
+
+# Validating the requested items before touching the database
+# The same line item asked for twice is merged into one request for the total quantity
+# Returns {listing_line_item_id: quantity} in the order the items were sent
+def merge_claim_items(items) -> dict:
+    requested = {}
+    for it in items:
+        if it.quantity < 0:
+            raise HTTPException(400, "Quantity must be >=0")
+        # IDs are normalised so they match the IDs Postgres sends back
+        try:
+            lli_id = str(UUID(it.listing_line_item_id))
+        except ValueError:
+            raise HTTPException(404, f"listing line item not found: {it.listing_line_item_id}")
+        requested[lli_id] = requested.get(lli_id, 0) + it.quantity
+    return requested
+
+
+# locked_rows are the (listing_line_item_id, quantity) rows returned by LOCK_LINE_ITEMS
+# Raises the same errors the per-item version did, for the first item that fails
+def check_availability(requested: dict, locked_rows) -> None:
+    remaining_by_item = {str(lli_id): int(qty) for lli_id, qty in locked_rows}
+
+    for lli_id, quantity in requested.items():
+        # The row is missing if the listing_line_item_id does not reference an existing listing line item
+        if lli_id not in remaining_by_item:
+            raise HTTPException(404, f"listing line item not found: {lli_id}")
+
+        remaining = remaining_by_item[lli_id]
+        if quantity > remaining:
+            raise HTTPException(
+                400,
+                f"Not enough available for item {lli_id}"
+                f"(Requested {quantity}, but only {remaining} available of this item)."
+            )
+
+
+# Parameters for CLAIM_LINE_ITEMS
+def claim_line_item_params(claim_id, requested: dict) -> dict:
+    return {
+        "claim_id": claim_id,
+        "item_ids": list(requested.keys()),
+        "quantities": list(requested.values()),
+    }
+
+
+# Parameters for CLAIM_IF_AVAILABLE, the lock order comes from the locked CTE in the query, not from these
+def claim_if_available_params(user_branch_id, requested: dict) -> dict:
+    items = sorted(requested.items())
+    return {
+        "user_branch_id": user_branch_id,
+        "item_ids": [lli_id for lli_id, _ in items],
+        "quantities": [quantity for _, quantity in items],
+    }
+
+
+# Bulk approval (POST /claims/approve/bulk), for clearing a store's pending claims before pickup time
+# Every claim is approved in one transaction with a fixed number of statements however many there are:
+#   1. USER_BRANCH_USER finds the store worker approving them
+#   2. LOCK_CLAIMS_FOR_BRANCH locks every claim and checks it has items from the worker's branch
+#   3. APPROVE_CLAIMS approves the claims that passed and creates their pickups with new QR codes
+# Claims that are not found, already approved or for another branch are reported in the results instead of
+# failing the request, with the same messages as POST /claims/approve
+
+# Validates the request and returns the claim IDs normalised, None for any that is not a UUID
+def approval_request(payload) -> list:
+    if not payload.claim_ids:
+        raise HTTPException(400, "No claims provided")
+    claim_ids = [normalise_id(claim_id) for claim_id in payload.claim_ids]
+
+    # Each claim can only be sent once, as it would be approved with two QR codes otherwise
+    repeated = [claim_id for claim_id, n in Counter(c for c in claim_ids if c).items() if n > 1]
+    if repeated:
+        raise HTTPException(400, f"Claim appears more than once in the request: {repeated[0]}")
+    return claim_ids
+
+
+# locked_rows are the (claim_id, approved, for_branch) rows returned by LOCK_CLAIMS_FOR_BRANCH
+# Returns the claim IDs that can be approved, in the order they were locked
+def approvable_claims(locked_rows) -> list:
+    return [str(claim_id) for claim_id, approved, for_branch in locked_rows if for_branch and not approved]
+
+
+# Parameters for APPROVE_CLAIMS, with a new QR code for every claim (signed for the approving branch
+# when WASTENOT_QR_SECRET is set, see utils/pickup_token.py)
+def approve_claims_params(store_user_id, user_branch_id, claim_ids: list) -> dict:
+    return {
+        "approved_by": store_user_id,
+        "claim_ids": claim_ids,
+        "qr_codes": [new_pickup_code(claim_id, user_branch_id) for claim_id in claim_ids],
+    }
+
+
+# Building one result per claim in the order they were sent
+# approved_rows are the claim_ids returned by APPROVE_CLAIMS
+def approval_results(payload, claim_ids, locked_rows, approved_rows) -> list:
+    locked = {str(row[0]): row for row in locked_rows}
+    approved = {str(row[0]) for row in approved_rows}
+    results = []
+
+    for sent_id, claim_id in zip(payload.claim_ids, claim_ids):
+        if claim_id in approved:
+            results.append(ApproveClaimResponse(claim_id=claim_id, approved=True, message="Claim approved successfully"))
+        elif claim_id not in locked:
+            results.append(ApproveClaimResponse(claim_id=sent_id, approved=False, message="Claim not found"))
+        elif locked[claim_id][1]:
+            results.append(ApproveClaimResponse(claim_id=claim_id, approved=False, message="Claim has already been approved"))
+        else:
+            results.append(ApproveClaimResponse(claim_id=claim_id, approved=False,
+                                                message="This claim is not for items from your branch"))
+    return results
+
+# REFERENCES
+# Brooker, M. (2015, March 4). Exponential Backoff And Jitter. Retrieved from aws.amazon.com: https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
@@ -0,0 +1,110 @@
+# Database settings shared by both database modes
+# WASTENOT_DB_MODE picks which endpoints are served when the app starts:
+#   sync  - the original def endpoints on a psycopg2 connection pool (db/pool.py, default)
+#   async - async def endpoints on a psycopg 3 AsyncConnectionPool, so requests wait on the event loop instead of the threadpool
+
+import os
+
+DB_MODE = os.getenv("WASTENOT_DB_MODE", "sync").lower()
+
+if DB_MODE not in ("sync", "async"):
+    raise ValueError(f"WASTENOT_DB_MODE must be 'sync' or 'async', not '{DB_MODE}'")
+
+# WASTENOT_JSON_AGG=1 makes /listings, /get_listings, /claims/pending and /pickups/my-pickups
+# build their JSON inside Postgres (see the JSON_ queries in db/queries.py) instead of in Python
+JSON_AGG_READS = os.getenv("WASTENOT_JSON_AGG", "0") == "1"
+
+# WASTENOT_LISTING_CACHE=1 serves /listings and /get_listings from an in-process cache (db/listing_cache.py)
+# The cache is kept up to date by Postgres NOTIFY, so migration 0003 has to be applied first
+LISTING_CACHE = os.getenv("WASTENOT_LISTING_CACHE", "0") == "1"
+
+# WASTENOT_EVENTS=1 adds GET /events, a Server-Sent Events stream of claim and listing changes (event_stream.py)
+# Claim changes come from the triggers in migration 0004
+EVENTS = os.getenv("WASTENOT_EVENTS", "0") == "1"
+
+# WASTENOT_METRICS=1 adds GET /metrics in the Prometheus text format, with request, SQL and pool metrics
+# (utils/metrics.py and db/metrics.py)
+METRICS = os.getenv("WASTENOT_METRICS", "0") == "1"
+
+# WASTENOT_FAST_RESPONSES=1 sends the big read endpoints through orjson, or MessagePack for clients that ask
+# for it, without checking them against their response_model again (utils/responses.py)
+FAST_RESPONSES = os.getenv("WASTENOT_FAST_RESPONSES", "0") == "1"
+
+# WASTENOT_COMPRESS_MIN_BYTES compresses responses of at least this many bytes with gzip, or brotli when the
+# client accepts it and the brotli package is installed (utils/responses.py). 0 leaves them uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("WASTENOT_COMPRESS_MIN_BYTES", "0"))
+
+# WASTENOT_CLAIM_ENGINE picks how POST /claims takes the claimed quantities off the listings (db/claims.py):
+#   locking    - locks the requested rows, checks them in Python, then updates them (default)
+#   optimistic - one statement that only takes quantities off rows with enough left, retried on deadlocks
+CLAIM_ENGINE = os.getenv("WASTENOT_CLAIM_ENGINE", "locking").lower()
+
+if CLAIM_ENGINE not in ("locking", "optimistic"):
+    raise ValueError(f"WASTENOT_CLAIM_ENGINE must be 'locking' or 'optimistic', not '{CLAIM_ENGINE}'")
+
+# WASTENOT_PREPARED=1 runs the endpoint SQL as prepared statements, parsed once per pooled connection
+# (db/prepared.py)
+PREPARED = os.getenv("WASTENOT_PREPARED", "0") == "1"
+
+# WASTENOT_QR_SECRET signs the pickup QR codes given out when a claim is approved (utils/pickup_token.py),
+# so POST /pickup/verify can reject a forged, expired or wrong branch code without a database lookup
+# Without it pickups get the original random codes. Changing it invalidates every signed code not yet collected
+QR_SECRET = os.getenv("WASTENOT_QR_SECRET", "")
+# Hours a signed pickup code is valid for after approval
+QR_TOKEN_HOURS = float(os.getenv("WASTENOT_QR_TOKEN_HOURS", "48"))
+
+# Connection details (Chowdhury, 2025), each can be set from the environment for a deployment,
+# the defaults are the local development database
+# dbname is used instead of database so the same settings work for psycopg2 and psycopg 3
+DB_CONFIG = {
+    "host": os.getenv("WASTENOT_DB_HOST", "localhost"),
+    "dbname": os.getenv("WASTENOT_DB_NAME", "master"),
+    "user": os.getenv("WASTENOT_DB_USER", "postgres"),
+    "password": os.getenv("WASTENOT_DB_PASSWORD", "newpword3"),
+    "port": int(os.getenv("WASTENOT_DB_PORT", "5432")),
+}
+
+# Pool sizes, the same for both modes so they can be compared fairly
+POOL_MIN = int(os.getenv("WASTENOT_POOL_MIN", "2"))
+POOL_MAX = int(os.getenv("WASTENOT_POOL_MAX", "20"))
+# Seconds a request waits for a free connection before getting a 503
+POOL_TIMEOUT = float(os.getenv("WASTENOT_POOL_TIMEOUT", "5"))
+# Requests allowed to wait at once, any more get a 503 straight away instead of queueing
+POOL_MAX_WAITING = int(os.getenv("WASTENOT_POOL_MAX_WAITING", "100"))
+# Connections idle for longer than this many seconds are checked with SELECT 1 before being handed out,
+# so a Postgres restart does not fail the next request on every pooled connection
+POOL_CHECK_IDLE = float(os.getenv("WASTENOT_POOL_CHECK_IDLE", "2"))
+
+# WASTENOT_REPLICA_HOST adds a second pool on a read replica of the database, which the GET endpoints read
+# from (db/replica.py). The other connection details are the same as the primary unless set
+REPLICA_CONFIG = None
+if os.getenv("WASTENOT_REPLICA_HOST"):
+    REPLICA_CONFIG = {
+        **DB_CONFIG,
+        "host": os.getenv("WASTENOT_REPLICA_HOST"),
+        "port": int(os.getenv("WASTENOT_REPLICA_PORT", str(DB_CONFIG["port"]))),
+        # so a replica that cannot be reached does not hold up reads for long before they go to the primary
+        "connect_timeout": 2,
+    }
+# Milliseconds a read waits for a replica connection, and for the replica to catch up with the client's
+# last write, before it is sent to the primary instead
+REPLICA_WAIT_MS = int(os.getenv("WASTENOT_REPLICA_WAIT_MS", "100"))
+# Seconds reads go straight to the primary after the replica could not be reached, instead of every read
+# waiting to find that out again
+REPLICA_COOLDOWN = float(os.getenv("WASTENOT_REPLICA_COOLDOWN", "30"))
+
+# Seconds the pools wait on shutdown for connections still in use to be given back before closing anyway
+POOL_DRAIN_TIMEOUT = float(os.getenv("WASTENOT_POOL_DRAIN_TIMEOUT", "10"))
+
+# statement_timeout in milliseconds for each kind of endpoint, so one slow query cannot hold a connection
+# for long (PostgreSQL, 2025). Reads are the default for every pooled connection, writes and the bulk
+# endpoints (bulk listing edits and uploads) raise it for their own transaction (db/pool.py)
+STATEMENT_TIMEOUTS = {
+    "read": int(os.getenv("WASTENOT_READ_TIMEOUT_MS", "5000")),
+    "write": int(os.getenv("WASTENOT_WRITE_TIMEOUT_MS", "10000")),
+    "bulk": int(os.getenv("WASTENOT_BULK_TIMEOUT_MS", "60000")),
+}
+
+# REFERENCES
+# Chowdhury, P. (2025, July 23). Python PostgreSQL Connection Pooling Using Psycopg2. Retrieved from geeksforgeeks.org: https://www.geeksforgeeks.org/python/python-postgresql-connection-pooling-using-psycopg2/
+# PostgreSQL. (2025). Client Connection Defaults. Retrieved from postgresql.org: https://www.postgresql.org/docs/current/runtime-config-client.html
@@ -0,0 +1,142 @@
+# Fan out of Postgres notifications to the clients connected to GET /events (event_stream.py)
+# The process's one Postgres listener (db/notify.py) calls this hub for every notification,
+# and the hub puts an event on the queue of every client that wants it:
+#   claim_changes   -> a "claim" event for the clients of that branch (store or charity)
+#   listing_changes -> a "listing" event with the new availability for every client following listings
+# The availability is read once per notification, not once per client, so the database work grows
+# with the rate of change instead of with the number of open phones
+# Each client has a bounded queue, a client that falls behind gets a "resync" event and should refetch
+# If the availability cannot be read, the clients following listings get a "resync" event instead, so a change
+# is never silently dropped
+
+import asyncio
+import json
+import logging
+import threading
+import psycopg2
+from db import queries
+from db.config import DB_CONFIG
+
+CLAIM_CHANNEL = "claim_changes"
+LISTING_CHANNEL = "listing_changes"
+
+# Events a client can be behind by before it is told to refetch instead
+QUEUE_SIZE = 100
+
+RESYNC = {"type": "resync"}
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    def __init__(self, loop, branch_id, topics):
+        self.loop = loop
+        self.branch_id = branch_id
+        self.topics = set(topics)
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+
+class EventHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        # Connection for reading availability, only used on the listener thread
+        self._conn = None
+
+    def attach(self, listener):
+        listener.listen(CLAIM_CHANNEL, self.on_claim_change)
+        listener.listen(LISTING_CHANNEL, self.on_listing_change)
+        # Notifications sent while the listener was reconnecting are lost, so every client refetches
+        listener.on_connection(on_connect=lambda: self.publish(RESYNC, lambda sub: True))
+
+    # ---------------------------------------------
+    # Clients, called from the event loop
+
+    def subscribe(self, branch_id, topics) -> Subscriber:
+        sub = Subscriber(asyncio.get_running_loop(), branch_id, topics)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    # ---------------------------------------------
+    # Publishing, called from the listener thread
+
+    def publish(self, event: dict, wanted):
+        with self._lock:
+            subscribers = [sub for sub in self._subscribers if wanted(sub)]
+        for sub in subscribers:
+            # asyncio queues are not thread safe, so the put is run on the client's event loop
+            sub.loop.call_soon_threadsafe(self._put, sub, event)
+
+    @staticmethod
+    def _put(sub: Subscriber, event: dict):
+        try:
+            sub.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client is too far behind, so its queue is replaced by one resync
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(RESYNC)
+
+    def on_claim_change(self, channel: str, payload: str):
+        change = json.loads(payload)
+        event = {"type": "claim", **change}
+        self.publish(event, lambda sub: "claims" in sub.topics and sub.branch_id == change["branch_id"])
+
+    def on_listing_change(self, channel: str, payload: str):
+        def wanted(sub):
+            return "listings" in sub.topics
+
+        with self._lock:
+            if not any(wanted(sub) for sub in self._subscribers):
+                return
+
+        change = json.loads(payload)
+        listing_ids = change.get("listing_ids")
+        if not listing_ids:
+            # Too many listings changed to list them, so the clients refetch
+            self.publish({**RESYNC, "branch_id": change["branch_id"]}, wanted)
+            return
+
+        try:
+            listings = self.availability(listing_ids)
+        except psycopg2.Error as e:
+            logger.warning("Could not read the availability of %d changed listings: %s", len(listing_ids), e)
+            self.publish({**RESYNC, "branch_id": change["branch_id"]}, wanted)
+            return
+
+        self.publish({"type": "listing", "branch_id": change["branch_id"], "listings": listings}, wanted)
+
+    # The items still available on each listing, a listing with no items is no longer claimable
+    def availability(self, listing_ids) -> list:
+        items = {listing_id: [] for listing_id in listing_ids}
+        for lid, lli_id, pid, pname, qty in self._fetch(queries.AVAILABLE_LINE_ITEMS, (listing_ids,)):
+            items[str(lid)].append({
+                "listing_line_item_id": str(lli_id),
+                "product_id": str(pid),
+                "product_name": pname,
+                "quantity": int(qty),
+            })
+        return [{"listing_id": listing_id, "items": listing_items} for listing_id, listing_items in items.items()]
+
+    def _fetch(self, sql, params):
+        try:
+            if self._conn is None or self._conn.closed:
+                self._conn = psycopg2.connect(**DB_CONFIG)
+                self._conn.autocommit = True
+            with self._conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.fetchall()
+        except psycopg2.Error:
+            # Dropping the connection so the next notification makes a new one
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            raise
+
+
+event_hub = EventHub()
@@ -0,0 +1,146 @@
+# In-process cache of claimable listings, used when WASTENOT_LISTING_CACHE=1
+# The Browse tab reads /listings far more often than listings change, so instead of running
+# CLAIMABLE_LISTINGS_PAGE for every page the listings are kept in memory, grouped by branch,
+# and pages are cut from memory with the same filters and keyset pagination as the SQL
+#
+# Keeping it up to date across worker processes:
+#   - the listing_line_item triggers (migration 0003) NOTIFY listing_changes with the branch_id on every write
+#   - the Postgres listener in each process (db/notify.py) marks that branch as out of date
+#   - the next read reloads only the out of date branches (CACHE_CLAIMABLE_LISTINGS) and serves from memory again
+# While the listener is not connected the cache is not used, as changes could be missed,
+# and every branch is reloaded once it reconnects
+#
+# Loading needs a connection, which the sync and async endpoints get from their own pools,
+# so this class never talks to Postgres itself: refresh_plan() says what to load and load() stores it
+
+import json
+import threading
+from bisect import bisect_right
+from db import rows
+
+LISTING_CHANNEL = "listing_changes"
+
+
+class ListingCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+        # branch_id -> [(listing_id, org_id, product_ids, listing)] in listing_id order, listing being a ListingAvailable dict
+        self._branches = {}
+        # every branch's listings merged in listing_id order, rebuilt after each load
+        self._sorted = []
+        self._loaded_all = False
+        # Every invalidation gets a number, so a load that started before a change does not mark it as done
+        self._version = 0
+        self._stale = {}  # branch_id -> version it was marked out of date at
+        self._all_stale = 0  # version everything was last marked out of date at
+
+    # ---------------------------------------------
+    # Invalidation, called from the listener thread
+
+    def set_ready(self, ready: bool):
+        if ready:
+            # Anything could have changed while we were not listening
+            self.invalidate_all()
+        self._ready = ready
+
+    def invalidate_all(self):
+        with self._lock:
+            self._version += 1
+            self._all_stale = self._version
+            self._loaded_all = False
+
+    def invalidate(self, branch_id: str):
+        with self._lock:
+            self._version += 1
+            self._stale[branch_id] = self._version
+
+    def on_notify(self, channel: str, payload: str):
+        try:
+            branch_id = json.loads(payload)["branch_id"]
+        except (ValueError, KeyError, TypeError):
+            # Not a message we understand, so everything is reloaded to be safe
+            self.invalidate_all()
+            return
+        self.invalidate(str(branch_id))
+
+    # ---------------------------------------------
+    # Loading
+
+    def ready(self) -> bool:
+        return self._ready
+
+    # Returns None when the cache is up to date,
+    # otherwise (version, branch_ids) where branch_ids is None to load every branch
+    def refresh_plan(self):
+        with self._lock:
+            if not self._loaded_all:
+                return self._version, None
+            if self._stale:
+                return self._version, list(self._stale)
+            return None
+
+    # listing_rows are (listing_id, org_name, branch_name, branch_id, org_id) from CACHE_CLAIMABLE_LISTINGS
+    # item_rows come from AVAILABLE_LINE_ITEMS
+    def load(self, plan, listing_rows, item_rows):
+        version, branch_ids = plan
+        listings = rows.listings_from_rows(listing_rows, item_rows)
+        meta = {str(row[0]): (str(row[3]), str(row[4])) for row in listing_rows}
+
+        loaded = {} if branch_ids is None else {branch_id: [] for branch_id in branch_ids}
+        for listing in listings:
+            branch_id, org_id = meta[listing["listing_id"]]
+            product_ids = frozenset(item["product_id"] for item in listing["items"])
+            loaded.setdefault(branch_id, []).append((listing["listing_id"], org_id, product_ids, listing))
+
+        with self._lock:
+            if branch_ids is None:
+                self._branches = loaded
+                # Branches changed while loading are left in _stale, so this only has to be
+                # done again if everything was invalidated while loading
+                self._loaded_all = version >= self._all_stale
+            else:
+                self._branches.update(loaded)
+            # Branches changed after the plan was made stay out of date
+            self._stale = {b: v for b, v in self._stale.items() if v > version}
+            self._sorted = sorted(
+                (entry for entries in self._branches.values() for entry in entries),
+                key=lambda entry: entry[0],
+            )
+
+    # ---------------------------------------------
+    # Reading
+
+    # Returns (listings, next cursor or None), the same page CLAIMABLE_LISTINGS_PAGE would return
+    def page(self, cursor, limit, org_id=None, branch_id=None, product_id=None):
+        with self._lock:
+            entries = self._branches.get(str(branch_id), []) if branch_id else self._sorted
+
+        # Listing IDs are lowercase UUID strings, which sort in the same order as Postgres sorts uuids
+        start = bisect_right(entries, str(cursor), key=lambda entry: entry[0]) if cursor else 0
+        org_id = str(org_id) if org_id else None
+        product_id = str(product_id) if product_id else None
+
+        page = []
+        for listing_id, entry_org_id, product_ids, listing in entries[start:]:
+            if org_id and entry_org_id != org_id:
+                continue
+            if product_id and product_id not in product_ids:
+                continue
+            page.append(listing)
+            # one extra listing tells us whether there is another page
+            if len(page) > limit:
+                return page[:limit], page[limit - 1]["listing_id"]
+        return page, None
+
+
+listing_cache = ListingCache()
+
+
+# Registering the cache with the process's Postgres listener, called by create_app in app.py when the cache is switched on
+def attach_listing_cache(listener):
+    listener.listen(LISTING_CHANNEL, listing_cache.on_notify)
+    listener.on_connection(
+        on_connect=lambda: listing_cache.set_ready(True),
+        on_disconnect=lambda: listing_cache.set_ready(False),
+    )
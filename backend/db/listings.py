@@ -0,0 +1,86 @@
+# Listing management helpers shared by the sync and async endpoints
+# The bulk endpoint (POST /listing/bulk) edits and cancels many listings for one user_branch_id
+# in a single transaction with a fixed number of statements:
+#   1. LOCK_BRANCH_LISTINGS locks every listing in the request that belongs to the branch
+#   2. UPDATE_LINE_ITEM_QUANTITIES applies all the item edits
+#   3. ZERO_LISTINGS_QUANTITIES cancels all the listings
+# Listings that are not found for the branch are reported in the results instead of failing the request
+
+from collections import Counter
+from fastapi import HTTPException
+from uuid import UUID
+from models import BulkListingResult
+
+
+# Normalising an ID so it matches the IDs Postgres sends back, None if it is not a UUID
+def normalise_id(value):
+    try:
+        return str(UUID(value))
+    except ValueError:
+        return None
+
+
+# Validating the edited quantities before touching the database (same rule as PATCH /listing/items)
+def check_quantities(items) -> None:
+    for it in items:
+        if it.quantity < 0:
+            raise HTTPException(400, "Quantity must be >= 0")
+        if normalise_id(it.listing_line_item_id) is None:
+            raise HTTPException(400, f"Invalid listing_line_item_id: {it.listing_line_item_id}")
+
+
+# Matching arrays for UPDATE_LINE_ITEM_QUANTITIES
+def edit_arrays(edits):
+    listing_ids, item_ids, quantities = [], [], []
+    for listing_id, items in edits:
+        for it in items:
+            listing_ids.append(listing_id)
+            item_ids.append(normalise_id(it.listing_line_item_id))
+            quantities.append(it.quantity)
+    return listing_ids, item_ids, quantities
+
+
+# Validates the bulk request and returns (edits, cancels) with normalised listing IDs
+# edits is a list of (listing_id, items), cancels a list of listing_ids
+def bulk_request(payload):
+    edits = []
+    for edit in payload.edits:
+        check_quantities(edit.items)
+        edits.append((normalise_id(edit.listing_id), edit.items))
+    cancels = [normalise_id(listing_id) for listing_id in payload.cancel]
+
+    # A listing can only be edited or cancelled once in the same request
+    counts = Counter(lid for lid, _ in edits if lid) + Counter(lid for lid in cancels if lid)
+    repeated = [lid for lid, n in counts.items() if n > 1]
+    if repeated:
+        raise HTTPException(400, f"Listing appears more than once in the request: {repeated[0]}")
+    return edits, cancels
+
+
+# Every valid listing_id in the request, for LOCK_BRANCH_LISTINGS
+def bulk_listing_ids(edits, cancels) -> list:
+    return [lid for lid, _ in edits if lid] + [lid for lid in cancels if lid]
+
+
+# Building one result per listing in the order they were sent
+# owned is the set of listing_ids locked for this branch
+# updated_rows and zeroed_rows are the listing_ids returned by the UPDATE statements
+def bulk_results(payload, edits, cancels, owned, updated_rows, zeroed_rows):
+    updated = Counter(str(row[0]) for row in updated_rows)
+    zeroed = Counter(str(row[0]) for row in zeroed_rows)
+    results = []
+
+    for edit, (lid, _) in zip(payload.edits, edits):
+        if lid not in owned:
+            results.append(BulkListingResult(listing_id=edit.listing_id, action="edit", success=False,
+                                              message="Listing not found for this branch"))
+        else:
+            results.append(BulkListingResult(listing_id=lid, action="edit", success=True, updated_amt=updated[lid]))
+
+    for listing_id, lid in zip(payload.cancel, cancels):
+        if lid not in owned:
+            results.append(BulkListingResult(listing_id=listing_id, action="cancel", success=False,
+                                              message="Listing not found for this branch"))
+        else:
+            results.append(BulkListingResult(listing_id=lid, action="cancel", success=True, updated_amt=zeroed[lid]))
+    return results
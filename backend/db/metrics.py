@@ -0,0 +1,101 @@
+# SQL and connection pool metrics, used when WASTENOT_METRICS=1 (see utils/metrics.py)
+# Statements are timed by a cursor class given to every pooled connection (cursor_factory), so the endpoints
+# do not change: MetricsCursor for psycopg2 (sync mode) and AsyncMetricsCursor for psycopg 3 (async mode, in
+# db/async_pool.py so the sync mode never imports psycopg 3)
+# (both based on the prepared statement cursors, which do nothing unless WASTENOT_PREPARED=1)
+# Each statement is labelled with its name in db/queries.py, so the metrics line up with the code,
+# and its time is also added to the current request's Postgres time
+# The pools are subclassed to count connections in use and requests waiting, time how long getconn waits,
+# and count requests turned away
+
+import time
+from psycopg2.pool import PoolError
+from db import queries
+from db.pool import ConnectionPool
+from db.prepared import PreparedCursor
+from utils.metrics import Counter, Gauge, Histogram, add_db_time
+
+SQL_SECONDS = Histogram("wastenot_sql_seconds", "Time to run each SQL statement", ("statement",))
+SQL_ROWS = Counter("wastenot_sql_rows_total", "Rows returned or changed by each SQL statement", ("statement",))
+SQL_ERRORS = Counter("wastenot_sql_errors_total", "SQL statements that raised an error", ("statement",))
+
+POOL_IN_USE = Gauge("wastenot_pool_connections_in_use", "Pooled connections handed out right now")
+POOL_MAX = Gauge("wastenot_pool_connections_max", "Most connections the pool will open")
+POOL_WAIT_SECONDS = Histogram("wastenot_pool_getconn_seconds", "Time spent getting a connection from the pool")
+POOL_EXHAUSTED = Counter("wastenot_pool_exhausted_total", "Requests that could not get a connection from the pool")
+# Read from the pool when scraped, set up by the pool classes below
+POOL_WAITING = Gauge("wastenot_pool_requests_waiting", "Requests waiting for a free connection right now")
+
+# SQL text -> name of the constant in db/queries.py
+STATEMENT_NAMES = {
+    sql: name for name, sql in vars(queries).items()
+    if name.isupper() and isinstance(sql, str)
+}
+
+
+# Statements built at runtime (e.g. COPY for an upload) are labelled by their first word
+def statement_name(sql) -> str:
+    if not isinstance(sql, str):
+        return "OTHER"
+    name = STATEMENT_NAMES.get(sql)
+    if name:
+        return name
+    words = sql.split(None, 1)
+    return words[0].upper() if words else "OTHER"
+
+
+def record(name: str, seconds: float, rowcount: int):
+    SQL_SECONDS.observe(seconds, statement=name)
+    if rowcount and rowcount > 0:
+        SQL_ROWS.inc(rowcount, statement=name)
+    add_db_time(seconds)
+
+
+# ---------------------------------------------
+# Sync mode (psycopg2)
+
+class MetricsCursor(PreparedCursor):
+    def _timed(self, sql, run):
+        name = statement_name(sql)
+        start = time.perf_counter()
+        try:
+            return run()
+        except Exception:
+            SQL_ERRORS.inc(statement=name)
+            raise
+        finally:
+            record(name, time.perf_counter() - start, self.rowcount)
+
+    def execute(self, query, vars=None):
+        return self._timed(query, lambda: super(MetricsCursor, self).execute(query, vars))
+
+    def executemany(self, query, vars_list):
+        return self._timed(query, lambda: super(MetricsCursor, self).executemany(query, vars_list))
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed(sql, lambda: super(MetricsCursor, self).copy_expert(sql, file, size))
+
+
+# getconn waits up to POOL_TIMEOUT for a connection, then raises PoolTimeout (a PoolError) which is counted here
+class MetricsConnectionPool(ConnectionPool):
+    def __init__(self, minconn, maxconn, **kwargs):
+        kwargs["cursor_factory"] = MetricsCursor
+        super().__init__(minconn, maxconn, **kwargs)
+        POOL_MAX.set(maxconn)
+        POOL_WAITING.read = lambda: {(): self.waiting}
+
+    def getconn(self, timeout=None):
+        start = time.perf_counter()
+        try:
+            conn = super().getconn(timeout)
+        except PoolError:
+            POOL_EXHAUSTED.inc()
+            raise
+        finally:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+        POOL_IN_USE.inc()
+        return conn
+
+    def putconn(self, conn, close=False):
+        super().putconn(conn, close)
+        POOL_IN_USE.dec()
@@ -0,0 +1,77 @@
+# Migration runner for the SQL files in db/migrations
+# Run from the backend folder:
+#   python -m db.migrate          applies every migration that has not been applied yet
+#   python -m db.migrate status   lists the migrations and whether they have been applied
+# Files are applied in name order (0001_, 0002_, ...) and each one runs in its own transaction,
+# so a migration that fails leaves nothing behind and can be fixed and run again
+# Applied versions are recorded in the schema_migrations table
+
+import sys
+from pathlib import Path
+import psycopg2
+from db.config import DB_CONFIG
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+CREATE_SCHEMA_MIGRATIONS = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version text PRIMARY KEY,
+        applied_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+
+# Only one runner at a time, a second one waits here and then skips what the first applied
+MIGRATION_LOCK = "SELECT pg_advisory_xact_lock(hashtext('wastenot_migrations'))"
+
+
+# Returns [(version, path)] in the order they should be applied, e.g. ("0002", .../0002_hot_path_indexes.sql)
+def migration_files():
+    return [(path.name.split("_", 1)[0], path) for path in sorted(MIGRATIONS_DIR.glob("*.sql"))]
+
+
+def applied_versions(cur) -> set:
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate(conn) -> list:
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(CREATE_SCHEMA_MIGRATIONS)
+
+    applied = []
+    for version, path in migration_files():
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(MIGRATION_LOCK)
+                if version in applied_versions(cur):
+                    continue
+                # No parameters are passed, so the whole file is sent as it is
+                cur.execute(path.read_text())
+                cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+        applied.append(path.name)
+    return applied
+
+
+def status(conn):
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(CREATE_SCHEMA_MIGRATIONS)
+            done = applied_versions(cur)
+    return [(path.name, version in done) for version, path in migration_files()]
+
+
+if __name__ == "__main__":
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if sys.argv[1:] == ["status"]:
+            for name, done in status(conn):
+                print(f"{'applied' if done else 'pending':8} {name}")
+        else:
+            applied = migrate(conn)
+            for name in applied:
+                print(f"applied  {name}")
+            if not applied:
+                print("Database is up to date")
+    finally:
+        conn.close()
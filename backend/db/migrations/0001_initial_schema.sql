@@ -0,0 +1,77 @@
+-- WasteNot schema, as used by the queries in backend/db/queries.py
+-- Every statement uses IF NOT EXISTS so this can also be run against a database that was set up by hand,
+-- in which case it only records the schema as version 0001
+-- gen_random_uuid() is built into PostgreSQL 13+ so no extension is needed
+
+-- Organisations (stores and charities) and their branches
+CREATE TABLE IF NOT EXISTS organisation (
+    org_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_name text NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS branch (
+    branch_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    org_id uuid NOT NULL REFERENCES organisation (org_id),
+    branch_name text NOT NULL,
+    branch_location text NOT NULL DEFAULT ''
+);
+
+-- Users and the branches they work for
+CREATE TABLE IF NOT EXISTS app_user (
+    user_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_email text
+);
+
+CREATE TABLE IF NOT EXISTS user_branch (
+    user_branch_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id uuid NOT NULL REFERENCES app_user (user_id),
+    branch_id uuid NOT NULL REFERENCES branch (branch_id),
+    org_id uuid NOT NULL REFERENCES organisation (org_id)
+);
+
+-- User Story 1: products and listings
+CREATE TABLE IF NOT EXISTS product (
+    product_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    branch_id uuid NOT NULL REFERENCES branch (branch_id),
+    product_name text NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS listing (
+    listing_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_branch_id uuid NOT NULL REFERENCES user_branch (user_branch_id),
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- quantity is what is still available to claim
+CREATE TABLE IF NOT EXISTS listing_line_item (
+    listing_line_item_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    listing_id uuid NOT NULL REFERENCES listing (listing_id),
+    product_id uuid NOT NULL REFERENCES product (product_id),
+    quantity integer NOT NULL CHECK (quantity >= 0)
+);
+
+-- User Story 2 and 5: claims and approvals
+CREATE TABLE IF NOT EXISTS claim (
+    claim_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_branch_id uuid NOT NULL REFERENCES user_branch (user_branch_id),
+    created_at timestamptz NOT NULL DEFAULT now(),
+    approved boolean NOT NULL DEFAULT FALSE,
+    approved_by uuid REFERENCES app_user (user_id),
+    approved_at timestamptz
+);
+
+CREATE TABLE IF NOT EXISTS listing_claim_item (
+    listing_claim_item_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    claim_id uuid NOT NULL REFERENCES claim (claim_id),
+    listing_line_item_id uuid NOT NULL REFERENCES listing_line_item (listing_line_item_id),
+    quantity integer NOT NULL CHECK (quantity >= 0)
+);
+
+-- Pickups, one per approved claim
+CREATE TABLE IF NOT EXISTS pickup (
+    pickup_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    claim_id uuid NOT NULL REFERENCES claim (claim_id),
+    qr_code text NOT NULL,
+    complete boolean NOT NULL DEFAULT FALSE,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
@@ -0,0 +1,52 @@
+-- Indexes for the joins and filters in backend/db/queries.py
+-- Postgres only indexes primary keys and unique constraints by itself, so every foreign key
+-- the endpoints join on was being read with a sequential scan
+-- tests/test_query_plans.py checks that each endpoint query uses these
+
+-- GET_PRODUCTS: products for a branch, already in product_name order
+CREATE INDEX IF NOT EXISTS product_branch_name_idx
+    ON product (branch_id, product_name);
+
+-- Every store/charity query goes from a branch to its user_branch rows
+CREATE INDEX IF NOT EXISTS user_branch_branch_idx
+    ON user_branch (branch_id);
+
+-- Listings made by a user_branch (CLAIMABLE_LISTINGS_PAGE, CACHE_CLAIMABLE_LISTINGS, LISTING_CHANGES)
+CREATE INDEX IF NOT EXISTS listing_user_branch_idx
+    ON listing (user_branch_id);
+
+-- Line items of a listing (edits, cancels, claim joins)
+CREATE INDEX IF NOT EXISTS listing_line_item_listing_idx
+    ON listing_line_item (listing_id);
+
+-- Partial index for the claimable side of CLAIMABLE_LISTINGS_PAGE and AVAILABLE_LINE_ITEMS
+-- Only rows with quantity >= 1 are in it, so it stays small as listings are claimed or cancelled
+-- product_id is included so the ?product_id= filter is answered from the index
+CREATE INDEX IF NOT EXISTS listing_line_item_available_idx
+    ON listing_line_item (listing_id, product_id)
+    WHERE quantity >= 1;
+
+-- Items of a claim (CLAIM_ITEMS, PICKUP_ITEMS_*, COUNT_CLAIM_ITEMS_FOR_BRANCH, LOCK_CLAIMS_FOR_BRANCH,
+-- LOCK_PICKUPS_BY_QR, APPROVED_AWAITING_PICKUP)
+-- quantity is included so refresh_claim_summary (0005) can total a claim's items with an index only scan
+CREATE INDEX IF NOT EXISTS listing_claim_item_claim_idx
+    ON listing_claim_item (claim_id) INCLUDE (quantity);
+
+-- Claims made by a charity user_branch (CHARITY_CLAIM)
+CREATE INDEX IF NOT EXISTS claim_user_branch_idx
+    ON claim (user_branch_id, approved);
+
+-- verify_pickup looks a pickup up by the scanned QR code
+-- qr_code is a random token so it is also made unique here
+CREATE UNIQUE INDEX IF NOT EXISTS pickup_qr_code_idx
+    ON pickup (qr_code);
+
+-- CLAIM_PICKUP and refresh_claim_summary (0005) look a claim's pickup up by claim_id
+CREATE INDEX IF NOT EXISTS pickup_claim_idx
+    ON pickup (claim_id);
+
+-- APPROVED_AWAITING_PICKUP: today's pickups that have not been collected yet
+-- Completed pickups are left out of the index as they are never read by that query
+CREATE INDEX IF NOT EXISTS pickup_awaiting_created_idx
+    ON pickup (created_at)
+    WHERE complete = FALSE;
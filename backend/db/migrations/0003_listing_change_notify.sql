@@ -0,0 +1,38 @@
+-- Sends a NOTIFY on the listing_changes channel whenever listing line items are added or their quantities change
+-- This covers making listings, claims, edits and cancels, and anything added later that writes line items
+-- The payload is {"branch_id": ..., "listing_ids": [...]}, one notification per branch in the statement
+-- Notifications are only delivered when the transaction commits, so a rolled back claim sends nothing
+-- NOTIFY payloads must be under 8000 bytes, so for more than 100 listings listing_ids is left out
+-- and the whole branch is treated as changed
+-- Used by db/listing_cache.py
+
+CREATE OR REPLACE FUNCTION notify_listing_changes() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(
+        'listing_changes',
+        json_build_object(
+            'branch_id', ub.branch_id,
+            'listing_ids', CASE WHEN COUNT(DISTINCT l.listing_id) <= 100 THEN json_agg(DISTINCT l.listing_id) END
+        )::text
+    )
+    FROM changed_items ci
+    JOIN listing l ON l.listing_id = ci.listing_id
+    JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+    GROUP BY ub.branch_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One trigger per event, as a trigger with a transition table can only be for one event
+-- FOR EACH STATEMENT means a bulk update sends one notification per branch, not one per row
+DROP TRIGGER IF EXISTS listing_line_item_inserted ON listing_line_item;
+CREATE TRIGGER listing_line_item_inserted
+    AFTER INSERT ON listing_line_item
+    REFERENCING NEW TABLE AS changed_items
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_listing_changes();
+
+DROP TRIGGER IF EXISTS listing_line_item_updated ON listing_line_item;
+CREATE TRIGGER listing_line_item_updated
+    AFTER UPDATE ON listing_line_item
+    REFERENCING NEW TABLE AS changed_items
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_listing_changes();
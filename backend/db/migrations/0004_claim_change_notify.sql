@@ -0,0 +1,80 @@
+-- Sends a NOTIFY on the claim_changes channel when a claim is made, approved or collected
+-- The payload is {"claim_id": ..., "branch_id": ..., "event": "created" | "approved" | "collected"},
+-- sent once for each store branch the claim has items from and once for the charity's branch,
+-- so the event stream (db/events.py) only has to pass each message to the clients of that branch
+-- Like listing_changes (0003) it is only delivered when the transaction commits
+
+CREATE OR REPLACE FUNCTION notify_claim_changes(claim_ids uuid[], claim_event text) RETURNS void AS $$
+BEGIN
+    PERFORM pg_notify(
+        'claim_changes',
+        json_build_object('claim_id', branches.claim_id, 'branch_id', branches.branch_id, 'event', claim_event)::text
+    )
+    FROM (
+        -- The stores the items were claimed from
+        SELECT lci.claim_id, ub.branch_id
+        FROM listing_claim_item lci
+        JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+        JOIN listing l ON l.listing_id = lli.listing_id
+        JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+        WHERE lci.claim_id = ANY(claim_ids)
+        UNION
+        -- The charity that made the claim
+        SELECT c.claim_id, ub.branch_id
+        FROM claim c
+        JOIN user_branch ub ON ub.user_branch_id = c.user_branch_id
+        WHERE c.claim_id = ANY(claim_ids)
+    ) branches;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A claim is only complete once its items are added, so "created" is sent when the listing claim items are inserted
+CREATE OR REPLACE FUNCTION notify_claim_created() RETURNS trigger AS $$
+BEGIN
+    PERFORM notify_claim_changes(ARRAY(SELECT DISTINCT claim_id FROM new_items), 'created');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement level with old and new rows, so approving many claims at once sends one batch
+CREATE OR REPLACE FUNCTION notify_claim_approved() RETURNS trigger AS $$
+BEGIN
+    PERFORM notify_claim_changes(ARRAY(
+        SELECT n.claim_id
+        FROM new_claims n
+        JOIN old_claims o ON o.claim_id = n.claim_id
+        WHERE n.approved AND NOT o.approved
+    ), 'approved');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_pickup_collected() RETURNS trigger AS $$
+BEGIN
+    PERFORM notify_claim_changes(ARRAY(
+        SELECT n.claim_id
+        FROM new_pickups n
+        JOIN old_pickups o ON o.pickup_id = n.pickup_id
+        WHERE n.complete AND NOT o.complete
+    ), 'collected');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS listing_claim_item_inserted ON listing_claim_item;
+CREATE TRIGGER listing_claim_item_inserted
+    AFTER INSERT ON listing_claim_item
+    REFERENCING NEW TABLE AS new_items
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_claim_created();
+
+DROP TRIGGER IF EXISTS claim_approved ON claim;
+CREATE TRIGGER claim_approved
+    AFTER UPDATE ON claim
+    REFERENCING OLD TABLE AS old_claims NEW TABLE AS new_claims
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_claim_approved();
+
+DROP TRIGGER IF EXISTS pickup_collected ON pickup;
+CREATE TRIGGER pickup_collected
+    AFTER UPDATE ON pickup
+    REFERENCING OLD TABLE AS old_pickups NEW TABLE AS new_pickups
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_pickup_collected();
@@ -0,0 +1,144 @@
+-- One row per claim and store branch it has items from, so the pending claims and my pickups screens
+-- can find a branch's claims with one index lookup instead of joining every claim through its items,
+-- listings and user branches and collapsing the fan-out with SELECT DISTINCT
+-- The totals are for the whole claim, as the screens show every item of a claim to each store it is from
+-- Kept up to date by the triggers below, which fire on the writes made by create_claim (listing claim items
+-- inserted), approve_claim (claim approved) and verify_pickup (pickup completed), including the bulk
+-- endpoints and the benchmark seed, and filled in for existing claims at the end
+
+CREATE TABLE IF NOT EXISTS claim_summary (
+    claim_id uuid NOT NULL REFERENCES claim (claim_id) ON DELETE CASCADE,
+    store_branch_id uuid NOT NULL REFERENCES branch (branch_id),
+    charity_branch_id uuid NOT NULL REFERENCES branch (branch_id),
+    charity_user_branch_id uuid NOT NULL REFERENCES user_branch (user_branch_id),
+    item_count integer NOT NULL,  -- listing claim items
+    total_quantity integer NOT NULL,
+    status text NOT NULL CHECK (status IN ('pending', 'approved', 'collected')),
+    created_at timestamptz NOT NULL,
+    approved_at timestamptz,
+    PRIMARY KEY (claim_id, store_branch_id)
+);
+
+-- Pending claims for a store branch, newest first (PENDING_CLAIMS)
+CREATE INDEX IF NOT EXISTS claim_summary_store_pending_idx
+    ON claim_summary (store_branch_id, created_at DESC)
+    WHERE status = 'pending';
+
+-- Approved and collected claims for a charity branch, most recently approved first (MY_PICKUPS)
+CREATE INDEX IF NOT EXISTS claim_summary_charity_approved_idx
+    ON claim_summary (charity_branch_id, approved_at DESC)
+    WHERE status <> 'pending';
+
+-- Rebuilds the summary rows of the given claims from claim, listing_claim_item and pickup
+CREATE OR REPLACE FUNCTION refresh_claim_summary(claim_ids uuid[]) RETURNS void AS $$
+BEGIN
+    INSERT INTO claim_summary (
+        claim_id, store_branch_id, charity_branch_id, charity_user_branch_id,
+        item_count, total_quantity, status, created_at, approved_at
+    )
+    SELECT
+        c.claim_id, stores.branch_id, ub_charity.branch_id, c.user_branch_id,
+        totals.item_count, totals.total_quantity,
+        CASE WHEN p.complete THEN 'collected' WHEN c.approved THEN 'approved' ELSE 'pending' END,
+        c.created_at, c.approved_at
+    FROM claim c
+    JOIN user_branch ub_charity ON ub_charity.user_branch_id = c.user_branch_id
+    JOIN (
+        SELECT lci.claim_id, count(*) AS item_count, SUM(lci.quantity) AS total_quantity
+        FROM listing_claim_item lci
+        WHERE lci.claim_id = ANY(claim_ids)
+        GROUP BY lci.claim_id
+    ) totals ON totals.claim_id = c.claim_id
+    JOIN (
+        SELECT DISTINCT lci.claim_id, ub.branch_id
+        FROM listing_claim_item lci
+        JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+        JOIN listing l ON l.listing_id = lli.listing_id
+        JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+        WHERE lci.claim_id = ANY(claim_ids)
+    ) stores ON stores.claim_id = c.claim_id
+    -- pickup.claim_id is not unique, so a claim counts as collected if any of its pickups is complete
+    LEFT JOIN LATERAL (
+        SELECT bool_or(pk.complete) AS complete
+        FROM pickup pk
+        WHERE pk.claim_id = c.claim_id
+    ) p ON TRUE
+    WHERE c.claim_id = ANY(claim_ids)
+    ON CONFLICT (claim_id, store_branch_id) DO UPDATE SET
+        item_count = EXCLUDED.item_count,
+        total_quantity = EXCLUDED.total_quantity,
+        status = EXCLUDED.status,
+        approved_at = EXCLUDED.approved_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement level with transition tables like the notifications in 0004, so a bulk approval or
+-- verification refreshes every claim it changed in one go
+CREATE OR REPLACE FUNCTION claim_summary_items_inserted() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_claim_summary(ARRAY(SELECT DISTINCT claim_id FROM new_items));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION claim_summary_claims_updated() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_claim_summary(ARRAY(
+        SELECT n.claim_id
+        FROM new_claims n
+        JOIN old_claims o ON o.claim_id = n.claim_id
+        WHERE n.approved IS DISTINCT FROM o.approved OR n.approved_at IS DISTINCT FROM o.approved_at
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Pickups are made incomplete by approve_claim, so only inserts that are already complete (e.g. seeded
+-- history) and updates that change complete need a refresh
+CREATE OR REPLACE FUNCTION claim_summary_pickups_inserted() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_claim_summary(ARRAY(SELECT claim_id FROM new_pickups WHERE complete));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION claim_summary_pickups_updated() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_claim_summary(ARRAY(
+        SELECT n.claim_id
+        FROM new_pickups n
+        JOIN old_pickups o ON o.pickup_id = n.pickup_id
+        WHERE n.complete IS DISTINCT FROM o.complete
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS claim_summary_items_inserted ON listing_claim_item;
+CREATE TRIGGER claim_summary_items_inserted
+    AFTER INSERT ON listing_claim_item
+    REFERENCING NEW TABLE AS new_items
+    FOR EACH STATEMENT EXECUTE FUNCTION claim_summary_items_inserted();
+
+DROP TRIGGER IF EXISTS claim_summary_claims_updated ON claim;
+CREATE TRIGGER claim_summary_claims_updated
+    AFTER UPDATE ON claim
+    REFERENCING OLD TABLE AS old_claims NEW TABLE AS new_claims
+    FOR EACH STATEMENT EXECUTE FUNCTION claim_summary_claims_updated();
+
+DROP TRIGGER IF EXISTS claim_summary_pickups_inserted ON pickup;
+CREATE TRIGGER claim_summary_pickups_inserted
+    AFTER INSERT ON pickup
+    REFERENCING NEW TABLE AS new_pickups
+    FOR EACH STATEMENT EXECUTE FUNCTION claim_summary_pickups_inserted();
+
+DROP TRIGGER IF EXISTS claim_summary_pickups_updated ON pickup;
+CREATE TRIGGER claim_summary_pickups_updated
+    AFTER UPDATE ON pickup
+    REFERENCING OLD TABLE AS old_pickups NEW TABLE AS new_pickups
+    FOR EACH STATEMENT EXECUTE FUNCTION claim_summary_pickups_updated();
+
+-- Backfilling every existing claim once
+SELECT refresh_claim_summary(ARRAY(SELECT claim_id FROM claim));
+
+ANALYZE claim_summary;
@@ -0,0 +1,87 @@
+-- Change tracking for the delta sync endpoints (db/changes.py)
+-- changed_xid is the transaction that last wrote the row. A client keeps the pg_snapshot it was sent with
+-- its last response as a cursor, and a row has changed since then if that transaction was not visible in
+-- the snapshot. Unlike an updated_at time or a sequence number, this cannot miss a row written by a
+-- transaction that was still running when the cursor was taken and committed afterwards
+-- Inserts get changed_xid from the column default. Quantity updates set it in a row trigger, and the claim
+-- summary sets it when refresh_claim_summary rewrites a row
+-- Existing rows are marked with the migration's transaction, which a client that has a cursor already saw
+
+ALTER TABLE listing_line_item ADD COLUMN IF NOT EXISTS changed_xid xid8 NOT NULL DEFAULT pg_current_xact_id();
+ALTER TABLE claim_summary ADD COLUMN IF NOT EXISTS changed_xid xid8 NOT NULL DEFAULT pg_current_xact_id();
+
+-- Line items written since a cursor, newest transactions last (LISTING_CHANGES)
+CREATE INDEX IF NOT EXISTS listing_line_item_changed_idx
+    ON listing_line_item (changed_xid);
+
+-- A store branch's claims changed since a cursor, pending or not so approved claims can be removed
+-- (PENDING_CLAIM_CHANGES)
+CREATE INDEX IF NOT EXISTS claim_summary_store_changed_idx
+    ON claim_summary (store_branch_id, changed_xid);
+
+-- A charity branch's approved and collected claims changed since a cursor (PICKUP_CHANGES)
+CREATE INDEX IF NOT EXISTS claim_summary_charity_changed_idx
+    ON claim_summary (charity_branch_id, changed_xid)
+    WHERE status <> 'pending';
+
+-- Row level, as a statement trigger cannot change the rows being written
+CREATE OR REPLACE FUNCTION listing_line_item_changed() RETURNS trigger AS $$
+BEGIN
+    NEW.changed_xid := pg_current_xact_id();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS listing_line_item_changed ON listing_line_item;
+CREATE TRIGGER listing_line_item_changed
+    BEFORE UPDATE OF quantity ON listing_line_item
+    FOR EACH ROW
+    WHEN (OLD.quantity IS DISTINCT FROM NEW.quantity)
+    EXECUTE FUNCTION listing_line_item_changed();
+
+-- refresh_claim_summary from 0005, now also recording the transaction that changed each row
+CREATE OR REPLACE FUNCTION refresh_claim_summary(claim_ids uuid[]) RETURNS void AS $$
+BEGIN
+    INSERT INTO claim_summary (
+        claim_id, store_branch_id, charity_branch_id, charity_user_branch_id,
+        item_count, total_quantity, status, created_at, approved_at
+    )
+    SELECT
+        c.claim_id, stores.branch_id, ub_charity.branch_id, c.user_branch_id,
+        totals.item_count, totals.total_quantity,
+        CASE WHEN p.complete THEN 'collected' WHEN c.approved THEN 'approved' ELSE 'pending' END,
+        c.created_at, c.approved_at
+    FROM claim c
+    JOIN user_branch ub_charity ON ub_charity.user_branch_id = c.user_branch_id
+    JOIN (
+        SELECT lci.claim_id, count(*) AS item_count, SUM(lci.quantity) AS total_quantity
+        FROM listing_claim_item lci
+        WHERE lci.claim_id = ANY(claim_ids)
+        GROUP BY lci.claim_id
+    ) totals ON totals.claim_id = c.claim_id
+    JOIN (
+        SELECT DISTINCT lci.claim_id, ub.branch_id
+        FROM listing_claim_item lci
+        JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+        JOIN listing l ON l.listing_id = lli.listing_id
+        JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+        WHERE lci.claim_id = ANY(claim_ids)
+    ) stores ON stores.claim_id = c.claim_id
+    -- pickup.claim_id is not unique, so a claim counts as collected if any of its pickups is complete
+    LEFT JOIN LATERAL (
+        SELECT bool_or(pk.complete) AS complete
+        FROM pickup pk
+        WHERE pk.claim_id = c.claim_id
+    ) p ON TRUE
+    WHERE c.claim_id = ANY(claim_ids)
+    ON CONFLICT (claim_id, store_branch_id) DO UPDATE SET
+        item_count = EXCLUDED.item_count,
+        total_quantity = EXCLUDED.total_quantity,
+        status = EXCLUDED.status,
+        approved_at = EXCLUDED.approved_at,
+        changed_xid = pg_current_xact_id();
+END;
+$$ LANGUAGE plpgsql;
+
+ANALYZE listing_line_item;
+ANALYZE claim_summary;
@@ -0,0 +1,96 @@
+-- Versions for the branch-scoped GET endpoints (db/versions.py)
+-- Each branch has a version for its listings and one for its claims, so a GET can tell the client's copy is
+-- still current from a short index read and answer 304 without running its queries
+--   listings - line items added to or changed on the branch's listings (making, editing, cancelling and
+--              uploading listings, and the quantities taken by claims)
+--   claims   - claim_summary rows written for the branch as the store or the charity (claims made,
+--              approved and collected, see migration 0005)
+--
+-- A counter row per branch would be bumped by every write to the branch and stay locked until that write
+-- committed, so every claim on a store branch would queue behind the one before it. Instead each write
+-- transaction adds its own row for each branch and scope it changed, keyed by its transaction id
+-- (pg_current_xact_id, as the change cursors in 0006), so two writers never touch the same row and never wait
+-- on each other. A branch's version is the newest transaction id for the scope (BRANCH_VERSIONS)
+-- Transaction ids are handed out in start order, not commit order, so db/versions.py only sends an ETag once
+-- every transaction older than the branch's newest change has finished
+--
+-- A transaction also deletes the older rows of the branches it writes to, so each branch only keeps a few.
+-- Rows another transaction is already deleting are skipped (SKIP LOCKED) rather than waited for. Only rows
+-- older than the transaction's own are deleted, so the newest transaction id for a branch never goes down
+
+-- The primary key also serves BRANCH_VERSIONS, reading the newest changed_xid from the end of the index
+CREATE TABLE IF NOT EXISTS branch_change (
+    branch_id uuid NOT NULL REFERENCES branch (branch_id) ON DELETE CASCADE,
+    scope text NOT NULL CHECK (scope IN ('listings', 'claims')),
+    changed_xid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    PRIMARY KEY (branch_id, scope, changed_xid)
+);
+
+CREATE OR REPLACE FUNCTION record_branch_changes(branch_ids uuid[], change_scope text) RETURNS void AS $$
+BEGIN
+    -- A second statement in the same transaction finds its own row already there
+    INSERT INTO branch_change (branch_id, scope)
+    SELECT DISTINCT b.branch_id, change_scope
+    FROM unnest(branch_ids) AS b(branch_id)
+    WHERE b.branch_id IS NOT NULL
+    ON CONFLICT DO NOTHING;
+
+    DELETE FROM branch_change
+    WHERE ctid = ANY(ARRAY(
+        SELECT ctid
+        FROM branch_change
+        WHERE branch_id = ANY(branch_ids)
+        AND scope = change_scope
+        AND changed_xid < pg_current_xact_id()
+        FOR UPDATE SKIP LOCKED
+    ));
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement level like the notifications in 0003, so a bulk edit records each branch once
+CREATE OR REPLACE FUNCTION record_listing_changes() RETURNS trigger AS $$
+BEGIN
+    PERFORM record_branch_changes(ARRAY(
+        SELECT ub.branch_id
+        FROM changed_items ci
+        JOIN listing l ON l.listing_id = ci.listing_id
+        JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+    ), 'listings');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION record_claim_changes() RETURNS trigger AS $$
+BEGIN
+    PERFORM record_branch_changes(ARRAY(
+        SELECT store_branch_id FROM changed_claims
+        UNION
+        SELECT charity_branch_id FROM changed_claims
+    ), 'claims');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS branch_change_items_inserted ON listing_line_item;
+CREATE TRIGGER branch_change_items_inserted
+    AFTER INSERT ON listing_line_item
+    REFERENCING NEW TABLE AS changed_items
+    FOR EACH STATEMENT EXECUTE FUNCTION record_listing_changes();
+
+DROP TRIGGER IF EXISTS branch_change_items_updated ON listing_line_item;
+CREATE TRIGGER branch_change_items_updated
+    AFTER UPDATE ON listing_line_item
+    REFERENCING NEW TABLE AS changed_items
+    FOR EACH STATEMENT EXECUTE FUNCTION record_listing_changes();
+
+DROP TRIGGER IF EXISTS branch_change_claims_inserted ON claim_summary;
+CREATE TRIGGER branch_change_claims_inserted
+    AFTER INSERT ON claim_summary
+    REFERENCING NEW TABLE AS changed_claims
+    FOR EACH STATEMENT EXECUTE FUNCTION record_claim_changes();
+
+DROP TRIGGER IF EXISTS branch_change_claims_updated ON claim_summary;
+CREATE TRIGGER branch_change_claims_updated
+    AFTER UPDATE ON claim_summary
+    REFERENCING NEW TABLE AS changed_claims
+    FOR EACH STATEMENT EXECUTE FUNCTION record_claim_changes();
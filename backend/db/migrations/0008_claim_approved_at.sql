@@ -0,0 +1,19 @@
+-- Behaviour change, not part of the schema the app was built on (0001)
+-- approve_claim and the bulk approval only set approved and approved_by, so approved_at stayed NULL
+-- The approved awaiting pickup list calls approved_at.isoformat() on every claim and My Pickups sorts by
+-- approved_at, so the time a claim is approved is now filled in here when it is not given
+-- On a database that already fills it in some other way this changes nothing, as a given approved_at is kept
+
+CREATE OR REPLACE FUNCTION set_claim_approved_at() RETURNS trigger AS $$
+BEGIN
+    IF NEW.approved AND NOT OLD.approved AND NEW.approved_at IS NULL THEN
+        NEW.approved_at := now();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS claim_approved_at ON claim;
+CREATE TRIGGER claim_approved_at
+    BEFORE UPDATE OF approved ON claim
+    FOR EACH ROW EXECUTE FUNCTION set_claim_approved_at();
@@ -0,0 +1,100 @@
+# Listening for Postgres NOTIFY messages on a background thread
+# There is one listener per process (pg_listener below), holding one dedicated connection (not from the pools)
+# Features that need notifications register a handler for their channel before the app starts:
+#   - the listing cache (db/listing_cache.py) on listing_changes
+#   - the event stream (db/events.py) on listing_changes and claim_changes
+# so however many features or connected clients there are, each process only has one LISTEN connection
+# If the connection drops it reconnects, and the connection handlers are told each time,
+# as notifications sent while it was disconnected are lost
+# It uses psycopg2 in both database modes, as it runs on its own thread and not on the event loop
+# Adapted from the psycopg2 documentation on asynchronous notifications (psycopg, 2024)
+
+import logging
+import select
+import threading
+import psycopg2
+from db.config import DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before reconnecting, doubled after each failed attempt up to the maximum
+RECONNECT_DELAY = 1
+RECONNECT_DELAY_MAX = 30
+
+
+class PgListener:
+    def __init__(self):
+        self._handlers = {}  # channel -> [on_notify(channel, payload)]
+        self._connect_handlers = []  # [(on_connect(), on_disconnect())]
+        self._stop = threading.Event()
+        self._thread = None
+
+    def listen(self, channel: str, on_notify):
+        self._handlers.setdefault(channel, []).append(on_notify)
+
+    def on_connection(self, on_connect=None, on_disconnect=None):
+        self._connect_handlers.append((on_connect, on_disconnect))
+
+    def start(self):
+        # Started once, however many features use it
+        if self._thread is not None or not self._handlers:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pg-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _call(self, handler, *args):
+        # A failing handler must not stop the listener for everything else
+        try:
+            handler(*args)
+        except Exception:
+            logger.exception("Postgres listener handler failed")
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**DB_CONFIG)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    for channel in self._handlers:
+                        cur.execute(f"LISTEN {channel}")
+                delay = RECONNECT_DELAY
+                for on_connect, _ in self._connect_handlers:
+                    if on_connect:
+                        self._call(on_connect)
+                self._listen(conn)
+            except psycopg2.Error as e:
+                logger.warning("Postgres listener disconnected: %s", e)
+            finally:
+                if conn is not None:
+                    conn.close()
+                for _, on_disconnect in self._connect_handlers:
+                    if on_disconnect:
+                        self._call(on_disconnect)
+            self._stop.wait(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            # Waking up every second so stop() does not have to wait for a notification
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                for handler in self._handlers.get(notify.channel, []):
+                    self._call(handler, notify.channel, notify.payload)
+
+
+pg_listener = PgListener()
+
+# REFERENCES
+# psycopg. (2024). Asynchronous notifications. Retrieved from psycopg.org: https://www.psycopg.org/docs/advanced.html#asynchronous-notifications
@@ -0,0 +1,78 @@
+# Pickup verification helpers shared by the sync and async endpoints
+# Signed QR codes (utils/pickup_token.py) are checked before a connection is taken from the pool, so a
+# forged, expired or other branch code is turned away straight away even when the database is slow
+#
+# The bulk endpoint (POST /pickup/verify/bulk) completes many scanned codes for one store worker in one
+# transaction with a fixed number of statements, so a scanner can queue codes while the database is slow
+# and confirm them together:
+#   1. every signed code is checked without the database
+#   2. LOCK_PICKUPS_BY_QR locks the pickups for the rest and checks they are for the worker's branch
+#   3. COMPLETE_PICKUPS completes the ones that passed
+# Codes that fail are reported in the results instead of failing the request, with the same messages as
+# POST /pickup/verify
+
+from collections import Counter
+from fastapi import HTTPException
+from models import VerifyPickupRequest, VerifiedPickupResult
+from utils.pickup_token import pickup_token_error
+
+
+# Dependency for POST /pickup/verify, listed before the connection so it runs first
+def check_pickup_code(payload: VerifyPickupRequest):
+    error = pickup_token_error(payload.qr_code, payload.user_branch_id)
+    if error:
+        raise HTTPException(*error)
+
+
+# Validates the bulk request and returns {qr_code: (status, message)} for the signed codes that fail
+# before the database is used
+def verify_request(payload) -> dict:
+    if not payload.qr_codes:
+        raise HTTPException(400, "No QR codes provided")
+
+    # A queued scan could be sent twice, but each code can only complete one pickup
+    repeated = [code for code, n in Counter(payload.qr_codes).items() if n > 1]
+    if repeated:
+        raise HTTPException(400, f"QR code appears more than once in the request: {repeated[0]}")
+
+    rejected = {}
+    for qr_code in payload.qr_codes:
+        error = pickup_token_error(qr_code, payload.user_branch_id)
+        if error:
+            rejected[qr_code] = error
+    return rejected
+
+
+# locked_rows are the (pickup_id, claim_id, qr_code, complete, for_branch, charity_name) rows returned by
+# LOCK_PICKUPS_BY_QR. Returns the pickup_ids that can be completed
+def completable_pickups(locked_rows) -> list:
+    return [str(row[0]) for row in locked_rows if row[4] and not row[3]]
+
+
+# Building one result per code in the order they were sent
+# completed_rows are the pickup_ids returned by COMPLETE_PICKUPS
+def verify_results(payload, rejected, locked_rows, completed_rows) -> list:
+    locked = {row[2]: row for row in locked_rows}
+    completed = {str(row[0]) for row in completed_rows}
+    results = []
+
+    for qr_code in payload.qr_codes:
+        if qr_code in rejected:
+            results.append(VerifiedPickupResult(qr_code=qr_code, success=False, message=rejected[qr_code][1]))
+            continue
+        if qr_code not in locked:
+            results.append(VerifiedPickupResult(qr_code=qr_code, success=False, message="Invalid QR code"))
+            continue
+
+        pickup_id, claim_id, _, complete, for_branch, charity_name = locked[qr_code]
+        if str(pickup_id) in completed:
+            message = f"Pickup verified! Please give {charity_name} their items."
+        elif complete:
+            message = "This pickup has already been completed"
+        else:
+            message = "This pickup is for a different branch"
+        results.append(VerifiedPickupResult(
+            qr_code=qr_code, pickup_id=str(pickup_id), claim_id=str(claim_id),
+            success=str(pickup_id) in completed, message=message, charity_name=charity_name,
+        ))
+    return results
@@ -0,0 +1,200 @@
+# Connection pool for the sync endpoints, replacing psycopg2's ThreadedConnectionPool
+# ThreadedConnectionPool had three problems under load:
+#   - when every connection was out, getconn raised PoolError straight away, so a short spike became 500 errors
+#   - it only kept POOL_MIN idle connections, closing the rest when they were returned,
+#     so busy periods kept opening new connections
+#   - after Postgres restarted, the broken connections were handed out again and the next request failed
+# This pool keeps the same getconn/putconn/closeall methods, and instead:
+#   - waits up to POOL_TIMEOUT seconds for a connection, with at most POOL_MAX_WAITING requests queued,
+#     then raises PoolTimeout, which app.py turns into a 503 with Retry-After
+#   - keeps returned connections open, up to POOL_MAX
+#   - checks a connection that has been idle for more than POOL_CHECK_IDLE seconds with SELECT 1 before
+#     handing it out, and replaces it if it is broken
+#   - opens POOL_MIN connections at startup (warm_up) so the first requests do not wait for them
+#   - on shutdown waits up to POOL_DRAIN_TIMEOUT seconds for connections still in use to come back (drain)
+# The async mode gets the same behaviour from psycopg_pool's own settings (db/async_pool.py)
+
+import logging
+import threading
+import time
+from collections import deque
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from db import queries
+from db.config import STATEMENT_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+# Errors that mean the database is busy rather than the request being wrong, answered with a 503 (see app.py)
+# The psycopg 3 versions are ASYNC_BUSY_ERRORS in db/async_pool.py, so the sync mode never imports psycopg 3
+BUSY_ERRORS = (
+    PoolTimeout,
+    psycopg2.errors.QueryCanceled,  # statement_timeout
+    psycopg2.errors.DeadlockDetected,  # e.g. an optimistic claim that deadlocked on every attempt (db/claims.py)
+    psycopg2.errors.SerializationFailure,
+)
+
+
+# Every pooled connection starts with the read timeout, so most requests never have to set it
+def statement_timeout_options() -> str:
+    return f"-c statement_timeout={STATEMENT_TIMEOUTS['read']}"
+
+
+# Raising the timeout for a write or bulk request, for the current transaction only,
+# so the connection goes back to the pool with the read timeout
+def set_statement_timeout(conn, route_class: str):
+    if route_class != "read":
+        with conn.cursor() as cur:
+            cur.execute(queries.SET_STATEMENT_TIMEOUT, (str(STATEMENT_TIMEOUTS[route_class]),))
+
+
+class ConnectionPool:
+    def __init__(self, minconn, maxconn, timeout=5.0, max_waiting=100, check_idle=2.0, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self.check_idle = check_idle
+        self.connect_kwargs = connect_kwargs
+        self.closed = False
+        self._cond = threading.Condition()
+        # (connection, time it was returned), the most recently returned is handed out first
+        # so the busy connections stay warm and the rest can sit idle
+        self._idle = deque()
+        self._size = 0  # connections open, idle or in use
+        self.waiting = 0
+
+    def _connect(self):
+        return psycopg2.connect(**self.connect_kwargs)
+
+    # Opening POOL_MIN connections at startup
+    # If Postgres is not up yet the app still starts, and connections are opened as requests need them
+    def warm_up(self):
+        for _ in range(self.minconn - self._size):
+            try:
+                conn = self._connect()
+            except psycopg2.OperationalError as e:
+                logger.warning("Could not open pooled connection at startup: %s", e)
+                return
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+
+    # timeout overrides the pool's own wait, in seconds
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            conn, returned_at = self._take(deadline, timeout)
+            if conn is None:
+                # A free place in the pool, opened outside the lock as connecting takes a while
+                try:
+                    return self._connect()
+                except Exception:
+                    self._discard(None)
+                    raise
+            if self._usable(conn, returned_at):
+                return conn
+            # Broken (e.g. Postgres restarted), so it is closed and another is tried
+            self._discard(conn)
+
+    # Returns (idle connection, time it was returned), or (None, None) when a new connection can be opened
+    def _take(self, deadline, timeout):
+        with self._cond:
+            if self.closed:
+                raise PoolError("connection pool is closed")
+            if not self._idle and self._size >= self.maxconn and self.waiting >= self.max_waiting:
+                raise PoolTimeout("Too many requests waiting for a database connection")
+            self.waiting += 1
+            try:
+                while True:
+                    # closed while waiting, e.g. the app is shutting down
+                    if self.closed:
+                        raise PoolError("connection pool is closed")
+                    if self._idle:
+                        return self._idle.pop()
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        return None, None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No database connection free after {timeout}s")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+
+    def _usable(self, conn, returned_at) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute(queries.PING)
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        if conn is not None and not conn.closed:
+            conn.close()
+        with self._cond:
+            self._size -= 1
+            if self.closed:
+                # drain() is waiting for every connection to come back
+                self._cond.notify_all()
+            else:
+                self._cond.notify()
+
+    def putconn(self, conn, close=False):
+        if not close and not conn.closed:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                # Connection to the server lost
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                # Left in a transaction or an error, e.g. by an endpoint that raised
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+        if close or conn.closed or self.closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self.closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            conn.close()
+
+    # Closing the pool on shutdown: idle connections are closed now, and connections still in use are closed
+    # as their requests give them back, waiting up to timeout seconds for them
+    # Returns how many were still in use when it gave up
+    def drain(self, timeout: float) -> int:
+        self.closeall()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._size > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._size
+
+    def in_use(self) -> int:
+        with self._cond:
+            return self._size - len(self._idle)
@@ -0,0 +1,128 @@
+# Prepared statements for the endpoint SQL, used when WASTENOT_PREPARED=1
+# Without them Postgres parses and plans the same SQL text on every call, and for the multi-join reads
+# (PICKUP_ITEMS_WITH_BRANCH, APPROVED_AWAITING_PICKUP, LOCK_CLAIMS_FOR_BRANCH) planning is a
+# noticeable part of the time (PostgreSQL, 2025). A prepared statement is parsed once per connection, and
+# after five runs Postgres switches to a cached generic plan if it is no worse than planning each time
+#
+# The endpoints do not change: the statements below are matched by their SQL text in the pooled connections'
+# cursor class and run by name instead
+#   sync  - PreparedCursor sends PREPARE the first time a connection runs a statement, then EXECUTE name(...)
+#   async - AsyncPreparedCursor (db/async_pool.py) asks psycopg 3 to prepare them (prepare=True), which uses the protocol level
+#           prepare instead of SQL. Without WASTENOT_PREPARED psycopg 3 still prepares any statement run
+#           five times on a connection, so this mostly matters for the sync mode
+# python -m benchmarks.prepared compares planning and run times with and without preparing
+
+import re
+import threading
+from weakref import WeakKeyDictionary
+from psycopg2 import extensions
+from db import queries
+from db.config import PREPARED
+
+# The statements that are prepared, by their name in db/queries.py
+# Left out:
+#   - CLAIMABLE_LISTINGS_PAGE, CACHE_CLAIMABLE_LISTINGS, JSON_CLAIMABLE_LISTINGS_PAGE and LISTING_CHANGES, as their optional
+#     filters (%(x)s IS NULL OR ...) need a custom plan for each set of values, so Postgres plans them every time anyway
+#   - the upload statements, which use a temporary table that only exists for one transaction
+STATEMENT_NAMES = (
+    # listings
+    "GET_PRODUCTS", "INSERT_LISTING", "INSERT_LISTING_LINE_ITEM", "AVAILABLE_LINE_ITEMS",
+    "LOCK_BRANCH_LISTING", "UPDATE_LINE_ITEM_QUANTITIES", "ZERO_LISTING_QUANTITIES",
+    "LOCK_BRANCH_LISTINGS", "ZERO_LISTINGS_QUANTITIES",
+    # claims
+    "INSERT_CLAIM", "LOCK_LINE_ITEMS", "CLAIM_LINE_ITEMS", "CLAIM_IF_AVAILABLE", "LINE_ITEM_QUANTITIES", "PENDING_CLAIMS", "JSON_PENDING_CLAIMS", "CLAIM_ITEMS",
+    "LOCK_CLAIM", "USER_BRANCH_USER", "COUNT_CLAIM_ITEMS_FOR_BRANCH", "APPROVE_CLAIM", "INSERT_PICKUP",
+    "LOCK_CLAIMS_FOR_BRANCH", "APPROVE_CLAIMS",
+    # pickups
+    "CHARITY_CLAIM", "CLAIM_PICKUP", "PICKUP_ITEMS_WITH_STORE", "MY_PICKUPS", "JSON_MY_PICKUPS",
+    "LOCK_PICKUP_BY_QR", "PICKUP_ITEMS_WITH_BRANCH", "CHARITY_NAME", "COMPLETE_PICKUP", "APPROVED_AWAITING_PICKUP",
+    "LOCK_PICKUPS_BY_QR", "COMPLETE_PICKUPS",
+    # delta sync
+    "PENDING_CLAIM_CHANGES", "PICKUP_CHANGES",
+    # conditional GETs
+    "BRANCH_VERSIONS", "PRIMARY_BRANCH_VERSIONS",
+)
+
+# %s, %(name)s or %% in the SQL
+PLACEHOLDER = re.compile(r"%%|%(?:\((\w+)\))?s")
+
+
+class PreparedStatement:
+    def __init__(self, name: str, sql: str):
+        self.name = f"wastenot_{name.lower()}"
+        # The %s placeholders become $1, $2... in the PREPARE, and the same %(name)s is the same $n each time
+        params = []
+
+        def number(match):
+            if match.group(0) == "%%":
+                return "%"
+            key = match.group(1)
+            if key is None:
+                params.append(None)
+                return f"${len(params)}"
+            if key not in params:
+                params.append(key)
+            return f"${params.index(key) + 1}"
+
+        # Postgres works out each parameter's type from where it is used, the same as for the plain SQL
+        self.prepare_sql = f"PREPARE {self.name} AS {PLACEHOLDER.sub(number, sql)}"
+        self.params = params
+        # Set once the parameter types are known, after the first PREPARE
+        self.execute_sql = None
+
+    # The endpoint's parameters are passed on unchanged, in the order of the $n, each cast to the type
+    # Postgres gave it, as a list arrives as ARRAY['...'] (text[]) which EXECUTE will not turn into uuid[] by itself
+    def set_parameter_types(self, types):
+        placeholders = ", ".join(
+            ("%s" if key is None else f"%({key})s") + f"::{param_type}"
+            for key, param_type in zip(self.params, types)
+        )
+        self.execute_sql = f"EXECUTE {self.name} ({placeholders})" if self.params else f"EXECUTE {self.name}"
+
+
+# SQL text -> PreparedStatement, empty when WASTENOT_PREPARED is off so the cursors run the SQL as before
+REGISTRY = {}
+if PREPARED:
+    REGISTRY = {getattr(queries, name): PreparedStatement(name, getattr(queries, name)) for name in STATEMENT_NAMES}
+
+# Statements prepared on each psycopg2 connection, a prepared statement lasts as long as the connection
+# (not the transaction), so a connection replaced by the pool starts again with none
+_prepared = WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def prepared_on(conn) -> set:
+    with _prepared_lock:
+        return _prepared.setdefault(conn, set())
+
+
+# ---------------------------------------------
+# Sync mode (psycopg2)
+
+class PreparedCursor(extensions.cursor):
+    def execute(self, query, vars=None):
+        statement = REGISTRY.get(query)
+        if statement is None:
+            return super().execute(query, vars)
+        prepared = prepared_on(self.connection)
+        if statement.name not in prepared:
+            super().execute(statement.prepare_sql)
+            prepared.add(statement.name)
+            if statement.execute_sql is None:
+                super().execute(queries.PREPARED_PARAMETER_TYPES, (statement.name,))
+                statement.set_parameter_types(self.fetchone()[0])
+        return super().execute(statement.execute_sql, vars)
+
+    # psycopg2's executemany runs each set of parameters in C without calling execute above, so
+    # INSERT_LISTING_LINE_ITEM would never run by name. It sends them one at a time anyway, so looping
+    # here costs no extra round trips
+    # PreparedCursor.execute rather than self.execute, so MetricsCursor (db/metrics.py) times the whole call once
+    def executemany(self, query, vars_list):
+        if query not in REGISTRY:
+            return super().executemany(query, vars_list)
+        for vars in vars_list:
+            PreparedCursor.execute(self, query, vars)
+
+
+# REFERENCES
+# PostgreSQL. (2025). PREPARE. Retrieved from postgresql.org: https://www.postgresql.org/docs/current/sql-prepare.html
@@ -0,0 +1,806 @@
+# SQL used by the endpoints in endpoints/ and async_endpoints/
+# Both database modes import the statements from here so they always send Postgres the same SQL
+# The statements use %s placeholders, which psycopg2 and psycopg 3 both understand
+# Database interaction adapted from (NeuralNine, 2023)
+
+# User Story 1: creating the listings
+GET_PRODUCTS = """
+    SELECT product_id, product_name
+    FROM product
+    WHERE branch_id = %s
+    ORDER BY product_name;
+"""
+
+INSERT_LISTING = """
+    INSERT INTO listing ( user_branch_id)
+    VALUES(%s)
+    RETURNING listing_id;
+"""
+
+INSERT_LISTING_LINE_ITEM = """
+    INSERT INTO listing_line_item (listing_id, product_id, quantity)
+    VALUES (%s, %s, %s)
+"""
+
+# User Story 2: Claiming the items
+# One page of claimable listings (keyset pagination on listing_id)
+# Only listings that still have an item with quantity >= 1 are returned, so empty listings are skipped in SQL
+# Each filter is ignored when its parameter is NULL
+# %(limit)s is one more than the page size so the endpoint can tell if there is a next page
+CLAIMABLE_LISTINGS_PAGE = """
+    SELECT l.listing_id, o.org_name, b.branch_name
+    FROM listing l
+    JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+    JOIN branch b ON b.branch_id = ub.branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE (%(cursor)s::uuid IS NULL OR l.listing_id > %(cursor)s::uuid)
+    AND (%(org_id)s::uuid IS NULL OR ub.org_id = %(org_id)s::uuid)
+    AND (%(branch_id)s::uuid IS NULL OR ub.branch_id = %(branch_id)s::uuid)
+    AND EXISTS (
+        SELECT 1
+        FROM listing_line_item lli
+        WHERE lli.listing_id = l.listing_id
+        AND lli.quantity >= 1
+        AND (%(product_id)s::uuid IS NULL OR lli.product_id = %(product_id)s::uuid)
+    )
+    ORDER BY l.listing_id
+    LIMIT %(limit)s
+"""
+
+# Every claimable listing for the listing cache (db/listing_cache.py), with the branch and organisation
+# they belong to so the cache can group them by branch and filter by organisation
+# %(branch_ids)s limits it to the branches that changed, NULL loads every branch
+CACHE_CLAIMABLE_LISTINGS = """
+    SELECT l.listing_id, o.org_name, b.branch_name, ub.branch_id, ub.org_id
+    FROM listing l
+    JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+    JOIN branch b ON b.branch_id = ub.branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE (%(branch_ids)s::uuid[] IS NULL OR ub.branch_id = ANY(%(branch_ids)s::uuid[]))
+    AND EXISTS (
+        SELECT 1
+        FROM listing_line_item lli
+        WHERE lli.listing_id = l.listing_id
+        AND lli.quantity >= 1
+    )
+    ORDER BY l.listing_id
+"""
+
+# fetching all line items for the listings on this page, returning the available quantity
+AVAILABLE_LINE_ITEMS = """
+    SELECT
+    lli.listing_id, lli.listing_line_item_id, lli.product_id, p.product_name,
+    lli.quantity AS available_qty
+    FROM listing_line_item lli
+    JOIN product p ON p.product_id = lli.product_id
+    WHERE lli.listing_id= ANY(%s::uuid[])
+    AND lli.quantity >=1 --only items with quantity available
+    ORDER BY p.product_name
+"""
+
+# User Story 4: Editing the Items
+# Lock the listing row while we are updating to prevent race conditions (Yamamoto, 2025)
+LOCK_BRANCH_LISTING = """
+    SELECT listing_id
+    FROM listing
+    WHERE listing_id = %s AND user_branch_id = %s
+    FOR UPDATE
+"""
+
+# Only updating items that are in this listing
+# Every item is updated in one statement from matching arrays of listing_ids, listing_line_item_ids and quantities
+# The listing_id of each updated row is returned so the bulk endpoint can count updates per listing
+UPDATE_LINE_ITEM_QUANTITIES = """
+    UPDATE listing_line_item lli
+    SET quantity = e.quantity
+    FROM unnest(%s::uuid[], %s::uuid[], %s::int[]) AS e(listing_id, listing_line_item_id, quantity)
+    WHERE lli.listing_id = e.listing_id
+    AND lli.listing_line_item_id = e.listing_line_item_id
+    RETURNING lli.listing_id
+"""
+
+# Set remaining quantities to zero
+ZERO_LISTING_QUANTITIES = """
+    UPDATE listing_line_item
+    SET quantity = 0
+    WHERE listing_id = %s
+"""
+
+# Bulk listing management
+# Locking every listing in the request that belongs to this branch, in listing_id order so
+# two bulk requests for the same listings cannot deadlock (Yamamoto, 2025)
+LOCK_BRANCH_LISTINGS = """
+    SELECT listing_id
+    FROM listing
+    WHERE listing_id = ANY(%s::uuid[]) AND user_branch_id = %s
+    ORDER BY listing_id
+    FOR UPDATE
+"""
+
+# Cancelling several listings at once, returning the listing_id of each zeroed row
+ZERO_LISTINGS_QUANTITIES = """
+    UPDATE listing_line_item
+    SET quantity = 0
+    WHERE listing_id = ANY(%s::uuid[])
+    RETURNING listing_id
+"""
+
+# Bulk listing upload (see db/uploads.py)
+# Staging tables for one upload, dropped when the transaction ends
+# Every value is kept as text so a bad row is reported by UPLOAD_ERRORS instead of stopping the COPY
+CREATE_LISTING_UPLOAD = """
+    CREATE TEMP TABLE listing_upload (
+        row_no bigint GENERATED BY DEFAULT AS IDENTITY,
+        user_branch_id text,
+        product_id text,
+        quantity text,
+        listing_ref text
+    ) ON COMMIT DROP
+"""
+
+CREATE_LISTING_UPLOAD_JSON = """
+    CREATE TEMP TABLE listing_upload_json (
+        row_no bigint GENERATED BY DEFAULT AS IDENTITY,
+        doc text
+    ) ON COMMIT DROP
+"""
+
+# Reading the NDJSON lines into the same staging table as a CSV, keeping their line numbers
+# Blank lines are skipped, and a line that is not an object gives NULL fields which UPLOAD_ERRORS reports
+NDJSON_TO_UPLOAD = """
+    INSERT INTO listing_upload (row_no, user_branch_id, product_id, quantity, listing_ref)
+    SELECT row_no, doc->>'user_branch_id', doc->>'product_id', doc->>'quantity', doc->>'listing_ref'
+    FROM (
+        SELECT row_no, doc::jsonb AS doc
+        FROM listing_upload_json
+        WHERE btrim(doc) <> ''
+    ) lines
+"""
+
+COUNT_LISTING_UPLOAD = """
+    SELECT count(*) FROM listing_upload
+"""
+
+# Every problem with the upload in one pass, the first %(max_errors)s with the total count
+# Values are only cast once they match the pattern, so a bad value cannot stop the query
+UPLOAD_ERRORS = """
+    WITH checked AS MATERIALIZED (
+        SELECT
+            row_no,
+            CASE WHEN btrim(user_branch_id) ~ %(uuid)s THEN btrim(user_branch_id)::uuid END AS user_branch_id,
+            CASE WHEN btrim(product_id) ~ %(uuid)s THEN btrim(product_id)::uuid END AS product_id,
+            CASE WHEN btrim(quantity) ~ '^[0-9]{1,9}$' THEN btrim(quantity)::int END AS quantity
+        FROM listing_upload
+    ),
+    errors AS (
+        SELECT c.row_no,
+            CASE
+                WHEN c.user_branch_id IS NULL THEN 'user_branch_id is not a valid UUID'
+                WHEN ub.user_branch_id IS NULL THEN 'user_branch_id not found'
+                WHEN c.product_id IS NULL THEN 'product_id is not a valid UUID'
+                WHEN p.product_id IS NULL THEN 'product_id not found for this branch'
+                ELSE 'quantity must be a whole number of at least 1'
+            END AS error
+        FROM checked c
+        LEFT JOIN user_branch ub ON ub.user_branch_id = c.user_branch_id
+        LEFT JOIN product p ON p.product_id = c.product_id AND p.branch_id = ub.branch_id
+        WHERE ub.user_branch_id IS NULL OR p.product_id IS NULL OR c.quantity IS NULL OR c.quantity < 1
+    )
+    SELECT row_no, error, count(*) OVER ()
+    FROM errors
+    ORDER BY row_no
+    LIMIT %(max_errors)s
+"""
+
+# Making every listing and line item in the upload in one statement, once UPLOAD_ERRORS has found nothing
+# The listing IDs are made up front so the line items can be matched to their listing in the same statement
+# Returns one row per listing, in the order the listings first appear in the file
+CREATE_UPLOADED_LISTINGS = """
+    WITH upload AS (
+        SELECT row_no, btrim(user_branch_id)::uuid AS user_branch_id, btrim(product_id)::uuid AS product_id,
+               btrim(quantity)::int AS quantity, COALESCE(btrim(listing_ref), '') AS listing_ref
+        FROM listing_upload
+    ),
+    grouped AS MATERIALIZED (
+        SELECT gen_random_uuid() AS listing_id, user_branch_id, listing_ref, min(row_no) AS first_row
+        FROM upload
+        GROUP BY user_branch_id, listing_ref
+    ),
+    new_listings AS (
+        INSERT INTO listing (listing_id, user_branch_id)
+        SELECT listing_id, user_branch_id FROM grouped
+    ),
+    new_items AS (
+        INSERT INTO listing_line_item (listing_id, product_id, quantity)
+        SELECT g.listing_id, u.product_id, u.quantity
+        FROM upload u
+        JOIN grouped g ON g.user_branch_id = u.user_branch_id AND g.listing_ref = u.listing_ref
+        ORDER BY u.row_no
+        RETURNING listing_id, quantity
+    )
+    SELECT g.listing_id, g.user_branch_id, g.listing_ref, count(*)::int, sum(i.quantity)::int
+    FROM grouped g
+    JOIN new_items i ON i.listing_id = g.listing_id
+    GROUP BY g.listing_id, g.user_branch_id, g.listing_ref, g.first_row
+    ORDER BY g.first_row
+"""
+
+# Making a claim
+INSERT_CLAIM = """
+    INSERT INTO claim (user_branch_id)
+    VALUES (%s)
+    RETURNING claim_id
+"""
+
+# Locking every requested listing line item row in one statement while we check availability (Yamamoto, 2025)
+# Rows are locked in listing_line_item_id order, so two claims for the same items always lock them
+# in the same order and cannot deadlock each other
+LOCK_LINE_ITEMS = """
+    SELECT listing_line_item_id, quantity
+    FROM listing_line_item
+    WHERE listing_line_item_id = ANY(%s::uuid[])
+    ORDER BY listing_line_item_id
+    FOR UPDATE
+"""
+
+# Taking the claimed quantities off every line item and adding the listing claim items in one statement
+# Parameters: claim_id, then matching arrays of listing_line_item_ids and quantities
+CLAIM_LINE_ITEMS = """
+    WITH requested AS (
+        SELECT * FROM unnest(%(item_ids)s::uuid[], %(quantities)s::int[]) AS r(listing_line_item_id, quantity)
+    ),
+    decremented AS (
+        UPDATE listing_line_item lli
+        SET quantity = lli.quantity - requested.quantity
+        FROM requested
+        WHERE lli.listing_line_item_id = requested.listing_line_item_id
+    )
+    INSERT INTO listing_claim_item (claim_id, listing_line_item_id, quantity)
+    SELECT %(claim_id)s, listing_line_item_id, quantity
+    FROM requested
+"""
+
+# Optimistic claims (WASTENOT_CLAIM_ENGINE=optimistic, see db/claims.py)
+# Takes the quantities off only where enough is left, and creates the claim and its items only if every
+# requested item could be taken, all in one statement so the row locks are held for one round trip
+# Returns the new claim_id, or no row if anything was short (the caller then rolls back the items that were taken)
+# An UPDATE locks rows in whatever order its plan visits them, so the rows are first locked in listing_line_item_id
+# order by the locked CTE (materialized, so it is not folded into the UPDATE) and the UPDATE only touches rows it
+# has already locked. Concurrent claims for overlapping items then wait on each other instead of deadlocking
+CLAIM_IF_AVAILABLE = """
+    WITH requested AS (
+        SELECT * FROM unnest(%(item_ids)s::uuid[], %(quantities)s::int[]) AS r(listing_line_item_id, quantity)
+    ),
+    locked AS MATERIALIZED (
+        SELECT listing_line_item_id
+        FROM listing_line_item
+        WHERE listing_line_item_id = ANY(%(item_ids)s::uuid[])
+        ORDER BY listing_line_item_id
+        FOR UPDATE
+    ),
+    decremented AS (
+        UPDATE listing_line_item lli
+        SET quantity = lli.quantity - requested.quantity
+        FROM requested
+        JOIN locked ON locked.listing_line_item_id = requested.listing_line_item_id
+        WHERE lli.listing_line_item_id = requested.listing_line_item_id
+        AND lli.quantity >= requested.quantity
+        RETURNING lli.listing_line_item_id
+    ),
+    new_claim AS (
+        INSERT INTO claim (user_branch_id)
+        SELECT %(user_branch_id)s::uuid
+        WHERE (SELECT count(*) FROM decremented) = cardinality(%(item_ids)s::uuid[])
+        RETURNING claim_id
+    ),
+    claim_items AS (
+        INSERT INTO listing_claim_item (claim_id, listing_line_item_id, quantity)
+        SELECT new_claim.claim_id, requested.listing_line_item_id, requested.quantity
+        FROM new_claim, requested
+    )
+    SELECT claim_id FROM new_claim
+"""
+
+# The quantities left, without locking, to explain why an optimistic claim fell short
+LINE_ITEM_QUANTITIES = """
+    SELECT listing_line_item_id, quantity
+    FROM listing_line_item
+    WHERE listing_line_item_id = ANY(%s::uuid[])
+"""
+
+# User story 5
+# Get all unapproved claims for listings from this branch
+# One index lookup on claim_summary (migration 0005) instead of joining every claim through its items and
+# listings and removing the duplicates with DISTINCT
+PENDING_CLAIMS = """
+    SELECT
+        s.claim_id,
+        ub_charity.user_id,
+        s.created_at,
+        s.status <> 'pending' AS approved,
+        au.user_email,
+        o.org_name
+    FROM claim_summary s
+    -- Getting charity user info via user_branch_id:
+    JOIN user_branch ub_charity ON ub_charity.user_branch_id = s.charity_user_branch_id
+    JOIN app_user au ON au.user_id = ub_charity.user_id
+    JOIN organisation o ON o.org_id = ub_charity.org_id
+    WHERE s.store_branch_id = %s
+    AND s.status = 'pending'
+    ORDER BY s.created_at DESC
+"""
+
+# Getting all items for these claims
+CLAIM_ITEMS = """
+    SELECT
+        lci.claim_id,
+        p.product_name,
+        lci.quantity,
+        lci.listing_line_item_id
+    FROM listing_claim_item lci
+    JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+    JOIN product p ON p.product_id = lli.product_id
+    WHERE lci.claim_id = ANY(%s::uuid[])
+    ORDER BY p.product_name
+"""
+
+# Approving Claims
+# Verify the claim exists
+LOCK_CLAIM = """
+    SELECT c.claim_id, c.approved, ub.user_id
+    FROM claim c
+    JOIN user_branch ub on ub.user_branch_id = c.user_branch_id
+    WHERE c.claim_id = %s
+    FOR UPDATE
+"""
+
+# Getting the store worker's user_branch_id
+USER_BRANCH_USER = """
+    SELECT user_id
+    FROM user_branch
+    WHERE user_branch_id = %s
+"""
+
+# Verify this claim is for items from this store's branch
+COUNT_CLAIM_ITEMS_FOR_BRANCH = """
+    SELECT COUNT(*)
+    FROM listing_claim_item lci
+    JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+    JOIN listing l ON l.listing_id = lli.listing_id
+    WHERE lci.claim_id = %s
+    AND l.user_branch_id = %s
+"""
+
+APPROVE_CLAIM = """
+    UPDATE claim
+    SET approved = TRUE,
+        approved_by = %s
+    WHERE claim_id = %s
+"""
+
+# Creating a pickup record
+INSERT_PICKUP = """
+    INSERT INTO pickup (claim_id, qr_code, complete)
+    VALUES (%s, %s, FALSE)
+"""
+
+# Approving many claims at once (see db/claims.py)
+# Locking every requested claim in claim_id order so two bulk approvals cannot deadlock (Yamamoto, 2025),
+# and checking in the same query whether each one has items from this store's branch
+LOCK_CLAIMS_FOR_BRANCH = """
+    SELECT c.claim_id, c.approved,
+        EXISTS (
+            SELECT 1
+            FROM listing_claim_item lci
+            JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+            JOIN listing l ON l.listing_id = lli.listing_id
+            WHERE lci.claim_id = c.claim_id
+            AND l.user_branch_id = %(user_branch_id)s
+        ) AS for_branch
+    FROM claim c
+    WHERE c.claim_id = ANY(%(claim_ids)s::uuid[])
+    ORDER BY c.claim_id
+    FOR UPDATE OF c
+"""
+
+# Approving the claims and creating their pickup records in one statement,
+# from matching arrays of claim_ids and QR codes
+APPROVE_CLAIMS = """
+    WITH approved AS (
+        UPDATE claim c
+        SET approved = TRUE,
+            approved_by = %(approved_by)s
+        FROM unnest(%(claim_ids)s::uuid[], %(qr_codes)s::text[]) AS a(claim_id, qr_code)
+        WHERE c.claim_id = a.claim_id
+        AND NOT c.approved
+        RETURNING c.claim_id, a.qr_code
+    )
+    INSERT INTO pickup (claim_id, qr_code, complete)
+    SELECT claim_id, qr_code, FALSE
+    FROM approved
+    RETURNING claim_id
+"""
+
+# Get QR code
+# Verifying the claim belongs to this user branch
+CHARITY_CLAIM = """
+    SELECT claim_id, approved
+    FROM claim
+    WHERE claim_id = %s AND user_branch_id = %s
+"""
+
+# Getting pickup details
+CLAIM_PICKUP = """
+    SELECT pickup_id, qr_code, complete, created_at
+    FROM pickup
+    WHERE claim_id = %s
+"""
+
+# Getting claim and store info
+PICKUP_ITEMS_WITH_STORE = """
+    SELECT
+    p.product_name,
+    lci.quantity,
+        o.org_name,
+        b.branch_name,
+        b.branch_location
+    FROM listing_claim_item lci
+    JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+    JOIN product p ON p.product_id = lli.product_id
+    JOIN listing l ON l.listing_id = lli.listing_id
+    JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+    JOIN branch b ON b.branch_id = ub.branch_id
+    JOIN organisation o ON o.org_id = b.org_id
+    WHERE lci.claim_id = %s
+    ORDER BY p.product_name
+"""
+
+# Pickups
+# Approved claims for a charity branch with the store they are from and the claim's total quantity, one
+# index lookup on claim_summary (migration 0005)
+MY_PICKUPS = """
+    SELECT
+        s.claim_id,
+        s.status <> 'pending' AS approved,
+        s.status = 'collected' AS complete,
+        store_o.org_name,
+        store_b.branch_name,
+        store_b.branch_location,
+        s.approved_at,
+        s.total_quantity
+    FROM claim_summary s
+    -- Getting store branch details
+    JOIN branch store_b ON store_b.branch_id = s.store_branch_id
+    JOIN organisation store_o ON store_o.org_id = store_b.org_id
+    WHERE s.charity_branch_id = %s
+    AND s.status <> 'pending'
+    ORDER BY s.approved_at DESC
+"""
+
+# Verifying pickups
+# Find pickup by QR code
+LOCK_PICKUP_BY_QR = """
+    SELECT p.pickup_id, p.claim_id, p.complete, c.user_branch_id
+    FROM pickup p
+    JOIN claim c ON c.claim_id = p.claim_id
+    WHERE p.qr_code = %s
+    FOR UPDATE
+"""
+
+# Get items and verify branch
+PICKUP_ITEMS_WITH_BRANCH = """
+    SELECT
+        lci.listing_claim_item_id,
+        lci.quantity,
+        lli.listing_id,
+        lli.product_id,
+        p.product_name,
+        l.user_branch_id
+    FROM listing_claim_item lci
+    JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+    JOIN listing l ON l.listing_id = lli.listing_id
+    JOIN product p ON p.product_id = lli.product_id
+    WHERE lci.claim_id = %s
+"""
+
+# Getting charity organisation name
+CHARITY_NAME = """
+    SELECT o.org_name, b.branch_name
+    FROM user_branch ub
+    JOIN organisation o ON o.org_id = ub.org_id
+    JOIN branch b ON b.branch_id = ub.branch_id
+    WHERE ub.user_branch_id = %s
+"""
+
+# Mark pickup as complete
+COMPLETE_PICKUP = """
+    UPDATE pickup
+    SET complete = TRUE
+    WHERE pickup_id = %s
+"""
+
+# Verifying many pickups at once (see db/pickups.py)
+# Locking every scanned pickup in pickup_id order (Yamamoto, 2025), checking in the same query whether its
+# claim has items from this store's branch, and getting the charity's name for the results
+LOCK_PICKUPS_BY_QR = """
+    SELECT p.pickup_id, p.claim_id, p.qr_code, p.complete,
+        EXISTS (
+            SELECT 1
+            FROM listing_claim_item lci
+            JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+            JOIN listing l ON l.listing_id = lli.listing_id
+            WHERE lci.claim_id = p.claim_id
+            AND l.user_branch_id = %(user_branch_id)s
+        ) AS for_branch,
+        o.org_name || ' - ' || b.branch_name AS charity_name
+    FROM pickup p
+    JOIN claim c ON c.claim_id = p.claim_id
+    JOIN user_branch ub ON ub.user_branch_id = c.user_branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    JOIN branch b ON b.branch_id = ub.branch_id
+    WHERE p.qr_code = ANY(%(qr_codes)s::text[])
+    ORDER BY p.pickup_id
+    FOR UPDATE OF p
+"""
+
+# Completing several pickups at once, returning the pickup_id of each
+COMPLETE_PICKUPS = """
+    UPDATE pickup
+    SET complete = TRUE
+    WHERE pickup_id = ANY(%s::uuid[])
+    AND NOT complete
+    RETURNING pickup_id
+"""
+
+# Query to get approved claims awaiting pickup grouped by charity
+APPROVED_AWAITING_PICKUP = """
+    SELECT
+        c.claim_id,
+        c.created_at as claim_created_at,
+        c.approved_at,
+        org.org_name as charity_org_name,
+        b.branch_name as charity_branch_name,
+        ub.user_branch_id as charity_user_branch_id,
+        prod.product_name,
+        lci.quantity as quantity_claimed,
+        lli.quantity as quantity_remaining
+    FROM claim c
+    JOIN pickup p ON c.claim_id = p.claim_id
+    JOIN listing_claim_item lci ON c.claim_id = lci.claim_id
+    JOIN listing_line_item lli ON lci.listing_line_item_id = lli.listing_line_item_id
+    JOIN listing l ON lli.listing_id = l.listing_id
+    JOIN product prod ON lli.product_id = prod.product_id
+    -- Getting charity info
+    JOIN user_branch ub ON c.user_branch_id = ub.user_branch_id
+    JOIN branch b ON ub.branch_id = b.branch_id
+    JOIN organisation org ON b.org_id = org.org_id
+    -- Getting store's branch via listing's user_branch
+    JOIN user_branch ub_store ON l.user_branch_id = ub_store.user_branch_id
+    WHERE ub_store.branch_id = %s
+    AND c.approved = TRUE
+    AND p.complete = FALSE
+    -- pickups created today, written as a range so the pickup_awaiting_created_idx index can be used
+    AND p.created_at >= CURRENT_DATE
+    AND p.created_at < CURRENT_DATE + 1
+    ORDER BY org.org_name, c.created_at, prod.product_name
+"""
+
+# ---------------------------------------------
+# JSON aggregation versions of the read endpoints, used when WASTENOT_JSON_AGG=1
+# Postgres builds the whole nested response with json_agg in one statement and returns it as text,
+# so the endpoint sends the bytes on without building a Pydantic model per row
+# The outer queries reuse the statements above so both paths return the same rows in the same order
+
+# Returns (page json, next cursor or NULL)
+# Takes the same parameters as CLAIMABLE_LISTINGS_PAGE plus %(page_size)s
+JSON_CLAIMABLE_LISTINGS_PAGE = f"""
+    WITH candidates AS ({CLAIMABLE_LISTINGS_PAGE}),
+    page AS (
+        SELECT * FROM candidates ORDER BY listing_id LIMIT %(page_size)s
+    )
+    SELECT
+        COALESCE(json_agg(json_build_object(
+            'listing_id', page.listing_id,
+            'org_name', page.org_name,
+            'branch_name', page.branch_name,
+            'items', (
+                SELECT json_agg(json_build_object(
+                    'listing_line_item_id', lli.listing_line_item_id,
+                    'product_id', lli.product_id,
+                    'product_name', p.product_name,
+                    'quantity', lli.quantity
+                ) ORDER BY p.product_name)
+                FROM listing_line_item lli
+                JOIN product p ON p.product_id = lli.product_id
+                WHERE lli.listing_id = page.listing_id
+                AND lli.quantity >= 1
+            )
+        ) ORDER BY page.listing_id), '[]')::text,
+        CASE WHEN (SELECT COUNT(*) FROM candidates) > %(page_size)s
+            THEN (SELECT listing_id FROM page ORDER BY listing_id DESC LIMIT 1)::text
+        END
+    FROM page
+"""
+
+JSON_PENDING_CLAIMS = f"""
+    WITH claims AS ({PENDING_CLAIMS})
+    SELECT COALESCE(json_agg(json_build_object(
+        'claim_id', claims.claim_id,
+        'user_id', claims.user_id,
+        'user_email', claims.user_email,
+        'org_name', claims.org_name,
+        'created_at', claims.created_at,
+        'approved', claims.approved,
+        'items', COALESCE(claim_items.items, '[]'),
+        'total_items', COALESCE(claim_items.total_items, 0)
+    ) ORDER BY claims.created_at DESC), '[]')::text
+    FROM claims
+    LEFT JOIN LATERAL (
+        SELECT
+            json_agg(json_build_object(
+                'product_name', p.product_name,
+                'quantity', lci.quantity,
+                'listing_line_item_id', lci.listing_line_item_id
+            ) ORDER BY p.product_name) AS items,
+            SUM(lci.quantity) AS total_items
+        FROM listing_claim_item lci
+        JOIN listing_line_item lli ON lli.listing_line_item_id = lci.listing_line_item_id
+        JOIN product p ON p.product_id = lli.product_id
+        WHERE lci.claim_id = claims.claim_id
+    ) claim_items ON TRUE
+"""
+
+JSON_MY_PICKUPS = f"""
+    WITH claims AS ({MY_PICKUPS})
+    SELECT COALESCE(json_agg(json_build_object(
+        'claim_id', claims.claim_id,
+        'approved', claims.approved,
+        'complete', claims.complete,
+        'org_name', claims.org_name,
+        'branch_name', claims.branch_name,
+        'branch_location', claims.branch_location,
+        'total_items', claims.total_quantity,
+        'approved_at', claims.approved_at
+    ) ORDER BY claims.approved_at DESC), '[]')::text
+    FROM claims
+"""
+
+# ---------------------------------------------
+# Delta sync (db/changes.py)
+# %(since)s is the client's cursor, a pg_snapshot. A row has changed since it when the transaction that last
+# wrote it (changed_xid, migration 0006) was not visible in that snapshot. Every transaction before the
+# snapshot's xmin was visible, so the changed_xid >= xmin range on the index skips the rows the client has
+
+# The cursor sent back with the changes
+CHANGE_CURSOR = "SELECT pg_current_snapshot()::text"
+
+# The store branch's claims changed since the cursor, with the same columns as PENDING_CLAIMS
+# Claims that are no longer pending are included so the client can remove them
+PENDING_CLAIM_CHANGES = """
+    SELECT
+        s.claim_id,
+        ub_charity.user_id,
+        s.created_at,
+        s.status <> 'pending' AS approved,
+        au.user_email,
+        o.org_name
+    FROM claim_summary s
+    JOIN user_branch ub_charity ON ub_charity.user_branch_id = s.charity_user_branch_id
+    JOIN app_user au ON au.user_id = ub_charity.user_id
+    JOIN organisation o ON o.org_id = ub_charity.org_id
+    WHERE s.store_branch_id = %(branch_id)s
+    AND s.changed_xid >= pg_snapshot_xmin(%(since)s::pg_snapshot)
+    AND NOT pg_visible_in_snapshot(s.changed_xid, %(since)s::pg_snapshot)
+    ORDER BY s.created_at DESC
+"""
+
+# The charity branch's pickups changed since the cursor, with the same columns as MY_PICKUPS
+PICKUP_CHANGES = """
+    SELECT
+        s.claim_id,
+        s.status <> 'pending' AS approved,
+        s.status = 'collected' AS complete,
+        store_o.org_name,
+        store_b.branch_name,
+        store_b.branch_location,
+        s.approved_at,
+        s.total_quantity
+    FROM claim_summary s
+    JOIN branch store_b ON store_b.branch_id = s.store_branch_id
+    JOIN organisation store_o ON store_o.org_id = store_b.org_id
+    WHERE s.charity_branch_id = %(branch_id)s
+    AND s.status <> 'pending'
+    AND s.changed_xid >= pg_snapshot_xmin(%(since)s::pg_snapshot)
+    AND NOT pg_visible_in_snapshot(s.changed_xid, %(since)s::pg_snapshot)
+    ORDER BY s.approved_at DESC
+"""
+
+# Listings with a line item changed since the cursor, with the same filters as CLAIMABLE_LISTINGS_PAGE
+# claimable is false for listings the client should remove (nothing left, or not the product filtered on)
+# %(limit)s is one more than the most changes sent, so the endpoint can tell the cursor is too far behind
+LISTING_CHANGES = """
+    SELECT
+        l.listing_id, o.org_name, b.branch_name,
+        EXISTS (
+            SELECT 1
+            FROM listing_line_item lli
+            WHERE lli.listing_id = l.listing_id
+            AND lli.quantity >= 1
+            AND (%(product_id)s::uuid IS NULL OR lli.product_id = %(product_id)s::uuid)
+        ) AS claimable
+    FROM listing l
+    JOIN user_branch ub ON ub.user_branch_id = l.user_branch_id
+    JOIN branch b ON b.branch_id = ub.branch_id
+    JOIN organisation o ON o.org_id = ub.org_id
+    WHERE l.listing_id IN (
+        SELECT lli.listing_id
+        FROM listing_line_item lli
+        WHERE lli.changed_xid >= pg_snapshot_xmin(%(since)s::pg_snapshot)
+        AND NOT pg_visible_in_snapshot(lli.changed_xid, %(since)s::pg_snapshot)
+    )
+    AND (%(org_id)s::uuid IS NULL OR ub.org_id = %(org_id)s::uuid)
+    AND (%(branch_id)s::uuid IS NULL OR ub.branch_id = %(branch_id)s::uuid)
+    ORDER BY l.listing_id
+    LIMIT %(limit)s
+"""
+
+# ---------------------------------------------
+# Conditional GETs (db/versions.py)
+# The branch's listings and claims versions (migration 0007), the newest transaction that changed each,
+# read from the end of the primary key
+# Always one row, with 0 for a scope that has not changed yet, the database's date for the responses that
+# only show today's pickups, and whether every transaction older than each version has finished, as one
+# still running could commit a change to the branch without raising its version
+BRANCH_VERSIONS = """
+    SELECT
+        CURRENT_DATE,
+        listings::text,
+        claims::text,
+        listings < pg_snapshot_xmin(pg_current_snapshot()) AS listings_settled,
+        claims < pg_snapshot_xmin(pg_current_snapshot()) AS claims_settled
+    FROM (
+        SELECT
+            COALESCE((
+                SELECT MAX(changed_xid) FROM branch_change WHERE branch_id = %(branch_id)s AND scope = 'listings'
+            ), '0'::xid8) AS listings,
+            COALESCE((
+                SELECT MAX(changed_xid) FROM branch_change WHERE branch_id = %(branch_id)s AND scope = 'claims'
+            ), '0'::xid8) AS claims
+        OFFSET 0  -- so each MAX is only worked out once
+    ) v
+"""
+
+# BRANCH_VERSIONS read on the primary before a conditional GET takes its read connection, with the primary's
+# WAL position so a replica read can wait until it has every change the versions count (db/replica.py)
+PRIMARY_BRANCH_VERSIONS = f"""
+    SELECT v.*, pg_current_wal_lsn()::text FROM ({BRANCH_VERSIONS}) v
+"""
+
+# ---------------------------------------------
+# Connection pool and prepared statements (db/pool.py, db/prepared.py)
+# Checking a connection that has been idle is still alive
+PING = "SELECT 1"
+
+# statement_timeout for the rest of the current transaction only, the same as SET LOCAL but with a parameter
+SET_STATEMENT_TIMEOUT = "SELECT set_config('statement_timeout', %s, true)"
+
+# Read replica routing (db/replica.py)
+# The primary's current WAL position, sent to the client after a write
+CURRENT_LSN = "SELECT pg_current_wal_lsn()::text"
+
+# Whether the replica has replayed the client's last write, NULL means it is not a replica so it is up to date
+REPLICA_CAUGHT_UP = """
+    SELECT pg_last_wal_replay_lsn() IS NULL OR pg_last_wal_replay_lsn() >= %s::pg_lsn
+"""
+
+# The parameter types Postgres worked out for a prepared statement (db/prepared.py)
+PREPARED_PARAMETER_TYPES = """
+    SELECT parameter_types::text[]
+    FROM pg_prepared_statements
+    WHERE name = %s
+"""
+
+# REFERENCES
+# NeuralNine. (2023, March 7). PostgreSQL in Python. Retrieved from youtube.com: https://www.youtube.com/watch?v=miEFm1CyjfM&t=33s
+# W3 Schools. (2025, November 16). SQL Server COALESCE() Function. Retrieved from w3schools.com: https://www.w3schools.com/sql/func_sqlserver_coalesce.asp
+# Yamamoto, T. (2025, August 22). Preventing Race Conditions with SELECT FOR UPDATE in Web Applications. Retrieved from leapcell.io: https://leapcell.io/blog/preventing-race-conditions-with-select-for-update-in-web-applications
@@ -0,0 +1,199 @@
+# Read replica routing, used when WASTENOT_REPLICA_HOST is set (see db/config.py)
+# Most of the load on the primary is reads, so the GET endpoints read from a streaming replica instead
+# (PostgreSQL, 2025), and everything else (writes, and the listing cache loads which follow NOTIFY from the
+# primary) stays on the primary
+#
+# A replica runs slightly behind the primary, so a client that has just made a claim could read its
+# pending claims from the replica before the claim has arrived. To stop that (read-your-writes):
+#   - every successful write response carries the primary's WAL position (LSN) in the X-WasteNot-LSN header
+#     (LsnTokenMiddleware)
+#   - the client sends its latest token back with its reads, in the same header or as ?lsn=
+#   - a read with a token only uses the replica once it has replayed up to that position, waiting up to
+#     WASTENOT_REPLICA_WAIT_MS, otherwise it reads from the primary
+# Reads also go to the primary if the replica cannot be reached, so a replica outage only moves the load
+# After that, reads skip the replica for WASTENOT_REPLICA_COOLDOWN seconds (replica_breaker), so they do not
+# each wait for the connect timeout while it is down
+
+import logging
+import re
+import threading
+import time
+from typing import Optional
+import psycopg2
+from fastapi import HTTPException
+from psycopg2.pool import PoolError
+from db import queries
+from db.config import REPLICA_WAIT_MS, REPLICA_COOLDOWN
+from db.versions import checked_position
+from utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+LSN_HEADER = "X-WasteNot-LSN"
+# The text form of a pg_lsn, e.g. 16/B374D848
+LSN_PATTERN = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+# How often a read checks whether the replica has caught up
+POLL_SECONDS = 0.01
+# The token a read without one is checked against, which every replica has replayed
+NO_TOKEN = "0/0"
+# A connection to the replica that has gone away
+LOST_REPLICA_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+REPLICA_READS = Counter(
+    "wastenot_replica_reads_total", "GET requests by the database that served them and why",
+    ("database", "reason"))
+
+
+# Circuit breaker for the replica, shared by both modes
+# Once the replica could not be reached, reads go straight to the primary until the cool down has passed.
+# Then one read tries the replica again while the others keep going to the primary: if it gets through the
+# replica is used again, otherwise it is skipped for another cool down
+class ReplicaBreaker:
+    def __init__(self, cooldown: float):
+        self.cooldown = cooldown
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        with self._lock:
+            if not self.down_until:
+                return True
+            now = time.monotonic()
+            if now < self.down_until:
+                return False
+            # This read tries the replica, the next ones wait for it to mark the replica up or down
+            self.down_until = now + self.cooldown
+            return True
+
+    def mark_down(self):
+        with self._lock:
+            if not self.down_until:
+                logger.warning("Read replica unreachable, reading from the primary for %gs", self.cooldown)
+            self.down_until = time.monotonic() + self.cooldown
+
+    def mark_up(self):
+        with self._lock:
+            self.down_until = 0.0
+
+
+replica_breaker = ReplicaBreaker(REPLICA_COOLDOWN)
+
+
+# The client's last write token, or None if it has not sent one
+def read_token(request) -> Optional[str]:
+    token = request.headers.get(LSN_HEADER) or request.query_params.get("lsn")
+    if token is None:
+        return None
+    if not LSN_PATTERN.match(token):
+        raise HTTPException(400, f"{LSN_HEADER} must be a WAL position such as 0/16B3748")
+    return token
+
+
+# The WAL position as a number, for comparing two of them
+def lsn_value(lsn: str) -> int:
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+# The position a read needs the replica to have replayed: the client's write token or, for a conditional GET
+# whose ETag came from the primary (db/versions.py), where the primary was then, whichever is later
+def read_position(request) -> Optional[str]:
+    token = read_token(request)
+    checked = checked_position(request)
+    if checked is None or (token is not None and lsn_value(token) >= lsn_value(checked)):
+        return token
+    return checked
+
+
+# ---------------------------------------------
+# Sync mode (psycopg2)
+# The async mode's versions are in db/async_pool.py, so the sync mode never imports psycopg 3
+
+# A replica connection that has replayed up to token, or None if the read should go to the primary
+# The connection is checked with REPLICA_CAUGHT_UP even without a token, so the replica is only marked up once
+# a statement has run on it, and a connection the replica dropped is closed and the read goes to the primary
+# instead of failing in the endpoint
+def replica_conn(replica_pool, token):
+    if not replica_breaker.available():
+        REPLICA_READS.inc(database="primary", reason="replica down")
+        return None
+    deadline = time.monotonic() + REPLICA_WAIT_MS / 1000
+    try:
+        conn = replica_pool.getconn(timeout=REPLICA_WAIT_MS / 1000)
+    except PoolError:
+        # Every replica connection is in use, which is not a reason to stop using it
+        REPLICA_READS.inc(database="primary", reason="replica unavailable")
+        return None
+    except psycopg2.OperationalError:
+        replica_breaker.mark_down()
+        REPLICA_READS.inc(database="primary", reason="replica unavailable")
+        return None
+    try:
+        with conn.cursor() as cur:
+            while True:
+                cur.execute(queries.REPLICA_CAUGHT_UP, (token or NO_TOKEN,))
+                caught_up = cur.fetchone()[0]
+                replica_breaker.mark_up()
+                if caught_up:
+                    REPLICA_READS.inc(database="replica", reason="caught up" if token else "no token")
+                    return conn
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(POLL_SECONDS)
+    except LOST_REPLICA_ERRORS:
+        replica_breaker.mark_down()
+        replica_pool.putconn(conn, close=True)
+        REPLICA_READS.inc(database="primary", reason="replica unavailable")
+        return None
+    replica_pool.putconn(conn)
+    REPLICA_READS.inc(database="primary", reason="replica behind")
+    return None
+
+
+# Whether an error from an endpoint's query on a replica connection means the replica went away
+# QueryCanceled (statement_timeout) is an OperationalError too, but the replica is fine
+def lost_replica(e) -> bool:
+    return isinstance(e, LOST_REPLICA_ERRORS) and not isinstance(e, psycopg2.errors.QueryCanceled)
+
+
+# ---------------------------------------------
+# Write tokens
+
+# The write connection dependencies (get_write_conn in db/sync_pool.py, get_async_write_conn in db/async_pool.py)
+# read the primary's WAL position on their own connection once the endpoint has committed, so it includes its
+# changes, and leave it in the request's state
+def keep_write_token(request, lsn: str):
+    request.state.write_lsn = lsn
+
+
+def write_token_failed(e):
+    # Without a token the client's next read may be a little stale, which is better than failing the write
+    logger.warning("Could not read the WAL position for %s: %s", LSN_HEADER, e)
+
+
+# Adds that position to every successful response to a request that can write
+# The dependencies tear down before the response starts (the write endpoints use scope="function" for this)
+class LsnTokenMiddleware:
+    READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in self.READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_token(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                lsn = scope.get("state", {}).get("write_lsn")
+                if lsn is not None:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (LSN_HEADER.lower().encode(), lsn.encode())
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_token)
+
+# REFERENCES
+# PostgreSQL. (2025). Hot Standby. Retrieved from postgresql.org: https://www.postgresql.org/docs/current/hot-standby.html
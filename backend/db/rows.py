@@ -0,0 +1,258 @@
+# Helpers that turn the rows returned by db/queries.py into API responses
+# The grouping here used to live inside each endpoint in main.py
+# It was moved out so the sync and async endpoints build exactly the same responses
+# The listings, pending claims and pickups are built as plain dicts with the fields of their models in
+# models.py, in the same order, so they can go straight to orjson with WASTENOT_FAST_RESPONSES=1
+# (utils/responses.py). Otherwise FastAPI checks them against the endpoint's response_model as before
+
+from typing import List
+from fastapi import Response
+from models import BranchProducts
+
+
+def products_from_rows(rows) -> List[BranchProducts]:
+    # Returning a list of BranchProducts
+    return [
+        BranchProducts(product_id=str(r[0]), product_name=r[1])
+        for r in rows
+    ]
+
+
+# Keyset pagination for /listings and /get_listings
+# The client sends back the X-Next-Cursor header from one page as ?cursor= to get the next page
+LISTING_PAGE_SIZE = 50
+LISTING_PAGE_MAX = 200
+
+
+def listing_page_params(cursor, limit, org_id=None, branch_id=None, product_id=None) -> dict:
+    # UUIDs are sent as strings so both drivers can adapt them, None switches a filter off
+    return {
+        "cursor": str(cursor) if cursor else None,
+        "org_id": str(org_id) if org_id else None,
+        "branch_id": str(branch_id) if branch_id else None,
+        "product_id": str(product_id) if product_id else None,
+        "limit": limit + 1,  # one extra row tells us whether there is another page
+    }
+
+
+# Returns the rows for this page and the cursor for the next page (None on the last page)
+def split_listing_page(listing_rows, limit):
+    if len(listing_rows) > limit:
+        listing_rows = listing_rows[:limit]
+        return listing_rows, str(listing_rows[-1][0])
+    return listing_rows, None
+
+
+# Sends JSON that Postgres already built (the JSON_ queries) straight to the client
+# Returning a Response skips FastAPI's response_model validation, which would only re-check the same data
+def json_response(body: str, next_cursor=None) -> Response:
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=body.encode(), media_type="application/json", headers=headers)
+
+
+# The QR image can be kept by the phone and reused until the pickup changes
+# It is private because the image is the charity's pickup pass, so shared caches should not keep it
+QR_CACHE_CONTROL = "private, max-age=86400"
+
+
+# True if the client already has this version (If-None-Match can be a list of ETags or *)
+def etag_matches(if_none_match, etag: str | None) -> bool:
+    if not if_none_match or etag is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+# 304 with no body when the client's copy is current, otherwise the image (PNG, SVG or matrix JSON)
+def qr_image_response(image, media_type: str, etag: str, not_modified: bool) -> Response:
+    headers = {"ETag": etag, "Cache-Control": QR_CACHE_CONTROL}
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return Response(content=image, media_type=media_type, headers=headers)
+
+
+# listing_rows are (listing_id, org_name, branch_name) from CLAIMABLE_LISTINGS_PAGE
+# item_rows come from AVAILABLE_LINE_ITEMS
+# Returns ListingAvailable dicts
+def listings_from_rows(listing_rows, item_rows) -> List[dict]:
+    # grouping items by listing_id (ListingItemAvailable)
+    items_by_listing = {}
+    for lid, lli_id, pid, pname, qty in item_rows:
+        items_by_listing.setdefault(lid, []).append({
+            "listing_line_item_id": str(lli_id),
+            "product_id": str(pid),
+            "product_name": pname,
+            "quantity": int(qty),  # this maps to available_qty in the SQL
+        })
+    # response
+    listing_list: List[dict] = []
+    for row in listing_rows:
+        lid = row[0]
+        # listings with no items left are not claimable, so they are skipped
+        items = items_by_listing.get(lid, [])
+        if not items:
+            continue
+        listing_list.append({
+            "listing_id": str(lid),
+            "org_name": row[1],
+            "branch_name": row[2],
+            "items": items,
+        })
+    return listing_list
+
+
+# Returns PendingClaimDetail dicts
+def pending_claims_from_rows(claims, items_rows) -> List[dict]:
+    # Group items by claim_id (ClaimItemDetail)
+    items_by_claim = {}
+    for claim_id, product_name, quantity, lli_id in items_rows:
+        items_by_claim.setdefault(claim_id, []).append({
+            "product_name": product_name,
+            "quantity": int(quantity),
+            "listing_line_item_id": str(lli_id),
+        })
+
+    # Building response
+    result = []
+    for claim_id, user_id, created_at, approved, user_email, org_name in claims:
+        items = items_by_claim.get(claim_id, [])
+        total_items = sum(item["quantity"] for item in items)
+
+        result.append({
+            "claim_id": str(claim_id),
+            "user_id": str(user_id),
+            "user_email": user_email,
+            "org_name": org_name,
+            "created_at": created_at.isoformat() if created_at else "",
+            "approved": approved,
+            "items": items,
+            "total_items": total_items,
+        })
+    return result
+
+
+# The QR image itself is served by GET /pickup/qr/{claim_id}/image, the JSON only has its URL
+def qr_image_url(claim_id, user_branch_id) -> str:
+    return f"/pickup/qr/{claim_id}/image?user_branch_id={user_branch_id}"
+
+
+def pickup_qr_from_rows(claim_id, pickup, qr_image_url, items_rows) -> dict:
+    pickup_id, qr_code, complete, created_at = pickup
+
+    items = []
+    store_info = {}
+
+    if items_rows:
+        store_info = {
+            "org_name": items_rows[0][2],
+            "branch_name": items_rows[0][3],
+            "branch_location": items_rows[0][4]
+        }
+        items = [
+            {
+                "product_name": row[0],
+                "quantity": int(row[1])
+            }
+            for row in items_rows
+        ]
+    return {
+        "pickup_id": str(pickup_id),
+        "claim_id": str(claim_id),
+        "qr_code": qr_code,
+        "qr_code_image_url": qr_image_url,
+        "complete": complete,
+        "created_at": created_at.isoformat() if created_at else None,
+        "items": items,
+        "store_info": store_info
+    }
+
+
+# The claim totals come from claim_summary with the claims (MY_PICKUPS)
+# Returns PickupDetail dicts
+def pickups_from_rows(claims) -> List[dict]:
+    # Building response
+    result = []
+    for claim_id, approved, complete, org_name, branch_name, branch_location, approved_at, total_items in claims:
+        result.append({
+            "claim_id": str(claim_id),
+            "approved": approved,
+            "complete": complete,
+            "org_name": org_name,
+            "branch_name": branch_name,
+            "branch_location": branch_location,
+            "total_items": int(total_items),
+            "approved_at": approved_at.isoformat() if approved_at else None,
+        })
+    return result
+
+
+# Format items for the verify pickup response
+def verified_items_from_rows(items_rows) -> List[dict]:
+    return [
+        {
+            "product_name": row[4],
+            "quantity": int(row[1])
+        }
+        for row in items_rows
+    ]
+
+
+# Group approved claims awaiting pickup by charity
+def approved_groups_from_rows(rows) -> List[dict]:
+    charity_groups = {}
+
+    for row in rows:
+        claim_id = row[0]
+        claim_created_at = row[1]
+        approved_at = row[2]
+        charity_org_name = row[3]
+        charity_branch_name = row[4]
+        charity_user_branch_id = row[5]
+        product_name = row[6]
+        quantity_claimed = row[7]
+        quantity_remaining = row[8]
+
+        # Create charity group key
+        charity_key = charity_user_branch_id
+
+        # Initialize charity group if not exists
+        if charity_key not in charity_groups:
+            charity_groups[charity_key] = {
+                "charity_org_name": charity_org_name,
+                "charity_branch_name": charity_branch_name,
+                "charity_user_branch_id": charity_user_branch_id,
+                "claims": {}
+            }
+
+        # Initialize claim if not exists
+        if claim_id not in charity_groups[charity_key]["claims"]:
+            charity_groups[charity_key]["claims"][claim_id] = {
+                "claim_id": claim_id,
+                "claim_created_at": claim_created_at.isoformat(),
+                "approved_at": approved_at.isoformat(),
+                "items": []
+            }
+
+        # Add item to claim
+        charity_groups[charity_key]["claims"][claim_id]["items"].append({
+            "product_name": product_name,
+            "quantity_claimed": quantity_claimed,
+            "quantity_remaining": quantity_remaining
+        })
+
+    # Convert to final response format
+    response = []
+    for charity_key, charity_data in charity_groups.items():
+        claims_list = list(charity_data["claims"].values())
+        total_items = sum(len(claim["items"]) for claim in claims_list)
+
+        response.append({
+            "charity_org_name": charity_data["charity_org_name"],
+            "charity_branch_name": charity_data["charity_branch_name"],
+            "charity_user_branch_id": charity_data["charity_user_branch_id"],
+            "total_claims": len(claims_list),
+            "total_items": total_items,
+            "claims": claims_list
+        })
+
+    return response
@@ -0,0 +1,200 @@
+# psycopg2 connection pools for the sync endpoints (endpoints/), only used when WASTENOT_DB_MODE=sync
+# In async mode the pool in db/async_pool.py is used instead
+# The pools used to be created in main.py when it was imported. They are now created by open_sync_pools
+# when the app starts (lifespan in app.py), so importing the app does no pool set up
+
+import logging
+from contextlib import contextmanager
+from typing import Optional
+import psycopg2
+from fastapi import Header, Query, Request
+from db import queries
+from db.config import (
+    DB_CONFIG, POOL_MIN, POOL_MAX, POOL_TIMEOUT, POOL_MAX_WAITING, POOL_CHECK_IDLE, POOL_DRAIN_TIMEOUT,
+    PREPARED, METRICS, REPLICA_CONFIG,
+)
+from db.pool import ConnectionPool, statement_timeout_options, set_statement_timeout
+from db.replica import (
+    keep_write_token, lost_replica, read_position, replica_breaker, replica_conn, write_token_failed,
+)
+from db.versions import check_not_modified, checked_versions
+
+logger = logging.getLogger(__name__)
+
+connection_pool = None
+replica_pool = None
+
+
+# ---------------------------------------
+# Connection Pool
+# Adapted from (Chowdhury, 2025)
+# Creating a connection pool of 2-20 connections (sizes and timeouts from the environment, see db/config.py)
+# The pool waits briefly for a free connection and checks idle connections before handing them out (db/pool.py)
+# With metrics on, the pool counts connections in use and every statement is timed (db/metrics.py)
+# With prepared statements on, the pool's cursors run the endpoint SQL by name (db/prepared.py)
+# Then opens POOL_MIN connections before the first request is taken
+def open_sync_pools():
+    global connection_pool, replica_pool
+    pool_class = ConnectionPool
+    pool_kwargs = {}
+    if PREPARED:
+        from db.prepared import PreparedCursor
+        pool_kwargs["cursor_factory"] = PreparedCursor
+    if METRICS:
+        from db.metrics import MetricsConnectionPool as pool_class
+    connection_pool = pool_class(
+        POOL_MIN, #min
+        POOL_MAX, #max
+        timeout=POOL_TIMEOUT,
+        max_waiting=POOL_MAX_WAITING,
+        check_idle=POOL_CHECK_IDLE,
+        options=statement_timeout_options(),
+        **pool_kwargs,
+        **DB_CONFIG
+    )
+
+    # Second pool on the read replica, when one is set up (db/replica.py)
+    # Its connections use the same cursor class as the primary's, but the pool metrics only cover the primary
+    if REPLICA_CONFIG:
+        replica_kwargs = dict(pool_kwargs)
+        if METRICS:
+            from db.metrics import MetricsCursor
+            replica_kwargs["cursor_factory"] = MetricsCursor
+        replica_pool = ConnectionPool(
+            POOL_MIN,
+            POOL_MAX,
+            timeout=POOL_TIMEOUT,
+            max_waiting=POOL_MAX_WAITING,
+            check_idle=POOL_CHECK_IDLE,
+            options=statement_timeout_options(),
+            **replica_kwargs,
+            **REPLICA_CONFIG
+        )
+
+    connection_pool.warm_up()
+    if replica_pool is not None:
+        replica_pool.warm_up()
+
+
+# Waits up to POOL_DRAIN_TIMEOUT seconds for any connection still in use before closing the pools
+# Adapted from (Chowdhury, 2025)
+def close_sync_pools():
+    for pool in (connection_pool, replica_pool):
+        if pool is not None:
+            still_in_use = pool.drain(POOL_DRAIN_TIMEOUT)
+            if still_in_use:
+                logger.warning("Closed the pool with %d connections still in use", still_in_use)
+
+
+# Getting a connection from the pool and giving it back afterwards
+# route_class picks the statement_timeout: "read" (the connection default), "write" or "bulk"
+# Also used directly by endpoints that only need a connection some of the time
+# (e.g. /listings when it is served from the listing cache)
+@contextmanager
+def pooled_conn(route_class="read"):
+    conn = connection_pool.getconn()
+    try:
+        set_statement_timeout(conn, route_class)
+        yield conn
+    finally:
+        # Return connection pool
+        connection_pool.putconn(conn)
+
+
+# A connection for a GET endpoint: from the read replica when there is one and it has caught up with the
+# client's last write, otherwise from the primary
+@contextmanager
+def read_conn(request: Request):
+    conn = None
+    if replica_pool is not None:
+        conn = replica_conn(replica_pool, read_position(request))
+    if conn is None:
+        with pooled_conn() as conn:
+            yield conn
+        return
+    try:
+        yield conn
+    except Exception as e:
+        if lost_replica(e):
+            # The replica went away during the endpoint's queries, which is too late to move the read
+            replica_breaker.mark_down()
+            replica_pool.putconn(conn, close=True)
+        else:
+            replica_pool.putconn(conn)
+        raise
+    replica_pool.putconn(conn)
+
+
+# With a read replica, the primary's WAL position for LsnTokenMiddleware (db/replica.py), read on the write's own
+# connection once the endpoint has committed, in autocommit so no transaction is opened
+def read_write_token(request: Request, conn):
+    if not REPLICA_CONFIG:
+        return
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(queries.CURRENT_LSN)
+            keep_write_token(request, cur.fetchone()[0])
+    except psycopg2.Error as e:
+        write_token_failed(e)
+    finally:
+        if not conn.closed:
+            conn.autocommit = False
+
+
+# The branch's versions (db/versions.py), read on a primary connection in autocommit so no transaction is opened
+def branch_versions(branch_id):
+    with pooled_conn() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute(queries.PRIMARY_BRANCH_VERSIONS, {"branch_id": str(branch_id)})
+                return cur.fetchone()
+        finally:
+            conn.autocommit = False
+
+
+# The versions for the endpoint's ETag: the ones branch_unchanged already read on the primary, otherwise read on
+# the endpoint's own connection
+def etag_versions(request: Request, cur, branch_id):
+    versions = checked_versions(request)
+    if versions is None:
+        cur.execute(queries.BRANCH_VERSIONS, {"branch_id": str(branch_id)})
+        versions = cur.fetchone()
+    return versions
+
+
+# Answers 304 before the endpoint takes its read connection, when the client's ETag is still current
+# Used as a route dependency, which FastAPI runs before the endpoint's own ones, e.g. get_conn
+# Does nothing without If-None-Match, as the endpoint reads the versions itself for the ETag it sends
+def branch_unchanged(scopes, today=False):
+    def check(request: Request, branch_id: str = Query(...), if_none_match: Optional[str] = Header(None)):
+        if if_none_match:
+            check_not_modified(request, if_none_match, branch_versions(branch_id), scopes, today)
+    return check
+
+
+# Updated get_conn function for the pool, used by the GET endpoints
+def get_conn(request: Request):
+    with read_conn(request) as conn:
+        yield conn
+
+
+# For endpoints that change data, which may wait on row locks held by other requests
+# The write endpoints commit themselves (with conn:) and use these with Depends(..., scope="function"), so the
+# write token is read before the response is sent. Nothing after the yield runs if the endpoint raised
+def get_write_conn(request: Request):
+    with pooled_conn("write") as conn:
+        yield conn
+        read_write_token(request, conn)
+
+
+# For the bulk listing endpoint, which can change many listings in one request
+def get_bulk_conn(request: Request):
+    with pooled_conn("bulk") as conn:
+        yield conn
+        read_write_token(request, conn)
+
+
+# REFERENCES
+# Chowdhury, P. (2025, July 23). Python PostgreSQL Connection Pooling Using Psycopg2. Retrieved from geeksforgeeks.org: https://www.geeksforgeeks.org/python/python-postgresql-connection-pooling-using-psycopg2/
@@ -0,0 +1,167 @@
+# Listing upload helpers shared by the sync and async endpoints (POST /listings/upload)
+# Stores send their end of day surplus export as one file instead of one POST /listing per listing:
+#   csv    - a header row naming the columns, then one row per line item
+#   ndjson - one JSON object per line with the same fields
+# Fields: user_branch_id, product_id, quantity and an optional listing_ref
+# Rows with the same user_branch_id and listing_ref become one listing (no listing_ref = one listing per user branch)
+#
+# The file is streamed into a temporary staging table with COPY (PostgreSQL, 2025), stopping early if it has more
+# than MAX_UPLOAD_ROWS rows, then:
+#   1. UPLOAD_ERRORS checks every row in one query (UUIDs, quantities, and that each product belongs to the user's branch)
+#   2. CREATE_UPLOADED_LISTINGS makes every listing and line item in one statement and returns a summary per listing
+# all in one transaction, so an upload with any bad row creates nothing and the errors are sent back by row number
+
+import codecs
+import csv
+from fastapi import HTTPException
+from models import UploadedListing, ListingUploadOutput
+
+UPLOAD_FORMATS = ("csv", "ndjson")
+UPLOAD_COLUMNS = ("user_branch_id", "product_id", "quantity", "listing_ref")
+REQUIRED_COLUMNS = {"user_branch_id", "product_id", "quantity"}
+
+# Limits so one upload cannot hold a connection for too long
+MAX_UPLOAD_ROWS = 50000
+# Only the first errors are sent back, with the total count
+MAX_UPLOAD_ERRORS = 50
+# Uploads bigger than this are spooled to disk instead of memory
+UPLOAD_SPOOL_SIZE = 8 * 1024 * 1024
+# Bytes sent to COPY at a time by the async endpoint
+COPY_CHUNK_SIZE = 64 * 1024
+
+UUID_PATTERN = "^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$"
+
+# Each NDJSON line is copied into one text column, using a delimiter and quote that valid JSON never contains
+# unescaped, and Postgres then reads the JSON (NDJSON_TO_UPLOAD)
+COPY_NDJSON = "COPY listing_upload_json (doc) FROM STDIN WITH (FORMAT csv, DELIMITER E'\\x1f', QUOTE E'\\x1e')"
+
+
+# ?format= wins, otherwise the Content-Type decides, and anything else is read as CSV
+def upload_format(fmt, content_type) -> str:
+    if fmt:
+        if fmt not in UPLOAD_FORMATS:
+            raise HTTPException(400, f"format must be one of: {', '.join(UPLOAD_FORMATS)}")
+        return fmt
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return "ndjson"
+    return "csv"
+
+
+# Exports saved from Excel start with a byte order mark, which Postgres would read as part of the first value
+def strip_bom(data: bytes) -> bytes:
+    return data[len(codecs.BOM_UTF8):] if data.startswith(codecs.BOM_UTF8) else data
+
+
+# Checking the CSV header row and returning the columns in file order for the COPY column list
+def csv_columns(header: bytes) -> list:
+    if not header.strip():
+        raise HTTPException(400, "No rows in upload")
+    try:
+        columns = next(csv.reader([header.decode("utf-8").strip()]), [])
+    except UnicodeDecodeError:
+        raise HTTPException(400, "The upload must be UTF-8")
+    columns = [column.strip().lower() for column in columns]
+
+    unknown = [column for column in columns if column not in UPLOAD_COLUMNS]
+    if unknown:
+        raise HTTPException(400, f"Unknown column: {unknown[0]} (columns are {', '.join(UPLOAD_COLUMNS)})")
+    missing = REQUIRED_COLUMNS - set(columns)
+    if missing:
+        raise HTTPException(400, f"Missing column: {sorted(missing)[0]}")
+    if len(set(columns)) != len(columns):
+        raise HTTPException(400, "A column appears more than once in the header")
+    return columns
+
+
+# The COPY for the format, the column names have been checked against UPLOAD_COLUMNS so they are safe to add
+def copy_sql(fmt: str, columns) -> str:
+    if fmt == "ndjson":
+        return COPY_NDJSON
+    return f"COPY listing_upload ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)"
+
+
+# Reading the request body into body, a spooled file, counting the rows as they arrive so the database
+# connection is only taken once the whole upload is in (and known to be under the row limit)
+# Returns the CSV columns, with body rewound for COPY
+async def spool_upload(stream, fmt, body):
+    rows_in = UploadRowCounter(fmt)
+    async for chunk in stream:
+        rows_in.add(chunk)
+        body.write(strip_bom(chunk) if body.tell() == 0 else chunk)
+    body.seek(0)
+    columns = csv_columns(body.readline()) if fmt == "csv" else None
+    body.seek(0)
+    return columns
+
+
+# A COPY or JSON error (e.g. a row with too many fields) as a 400, with the line Postgres stopped at
+def copy_error(diag):
+    detail = diag.message_primary or "The upload could not be read"
+    if diag.context:
+        detail += f" ({diag.context.strip()})"
+    raise HTTPException(400, detail)
+
+
+# Counts the rows of an upload as it is streamed in, so one over MAX_UPLOAD_ROWS is stopped once it passes the
+# limit rather than after all of it has been copied into the staging table
+# A row ends at a line break, except inside a quoted CSV value, and JSON never has an unescaped one in a value
+# A last row without a line break after it is not counted, check_row_count has the exact count after COPY
+class UploadRowCounter:
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        # The CSV header row is not a row
+        self.limit = MAX_UPLOAD_ROWS + (1 if fmt == "csv" else 0)
+        self.lines = 0
+        self.in_quotes = False
+
+    def add(self, chunk: bytes):
+        if self.fmt == "ndjson" or (not self.in_quotes and b'"' not in chunk):
+            self.lines += chunk.count(b"\n")
+        else:
+            parts = chunk.split(b"\n")
+            for part in parts[:-1]:
+                self.in_quotes ^= part.count(b'"') % 2 == 1
+                if not self.in_quotes:
+                    self.lines += 1
+            self.in_quotes ^= parts[-1].count(b'"') % 2 == 1
+        if self.lines > self.limit:
+            raise HTTPException(400, f"Uploads are limited to {MAX_UPLOAD_ROWS} rows")
+
+
+def check_row_count(count: int):
+    if count == 0:
+        raise HTTPException(400, "No rows in upload")
+    if count > MAX_UPLOAD_ROWS:
+        raise HTTPException(400, f"Uploads are limited to {MAX_UPLOAD_ROWS} rows, this one has {count}")
+
+
+# error_rows are (row, error, total errors) from UPLOAD_ERRORS
+def check_upload_errors(error_rows):
+    if error_rows:
+        raise HTTPException(400, {
+            "message": f"{error_rows[0][2]} rows have errors, nothing was created",
+            "errors": [{"row": row, "error": error} for row, error, _ in error_rows],
+        })
+
+
+def upload_error_params() -> dict:
+    return {"uuid": UUID_PATTERN, "max_errors": MAX_UPLOAD_ERRORS}
+
+
+# listing_rows are (listing_id, user_branch_id, listing_ref, line_items, total_quantity) from CREATE_UPLOADED_LISTINGS
+def upload_output(listing_rows) -> ListingUploadOutput:
+    listings = [
+        UploadedListing(
+            listing_id=str(listing_id),
+            user_branch_id=str(user_branch_id),
+            listing_ref=listing_ref or None,
+            line_items=line_items,
+            total_quantity=total_quantity,
+        )
+        for listing_id, user_branch_id, listing_ref, line_items, total_quantity in listing_rows
+    ]
+    return ListingUploadOutput(listings=listings, line_items=sum(listing.line_items for listing in listings))
+
+# REFERENCES
+# PostgreSQL. (2025). COPY. Retrieved from postgresql.org: https://www.postgresql.org/docs/current/sql-copy.html
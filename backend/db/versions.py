@@ -0,0 +1,80 @@
+# Conditional GETs for the branch-scoped read endpoints
+# Most refreshes of the Approvals, My Pickups and My Listings screens find nothing has changed, but they
+# still ran every query and sent the same JSON again. Each branch now has a version for its listings and
+# one for its claims: the newest transaction that changed them (migration 0007), recorded by triggers on
+# every write to them, including the bulk endpoints
+#
+# A GET reads the versions it depends on first (BRANCH_VERSIONS, two index lookups) and makes an ETag
+# from them and the request's URL. If the client sends that ETag back in If-None-Match nothing has changed,
+# so it gets a 304 with no body and the endpoint's queries are never run
+# When the request has If-None-Match, the versions are first read on a primary connection outside a
+# transaction (branch_unchanged in db/sync_pool.py and db/async_pool.py), before the endpoint takes its read
+# connection, so a 304 never waits for a replica to catch up or opens a transaction. The primary is never
+# behind the client's own writes, so it can always answer the 304
+# If the ETag has changed the endpoint sends the new one from those same versions (etag_versions), and a
+# replica is only used once it has replayed up to where the primary was when they were read, so the data is
+# never older than its ETag. Without If-None-Match the versions are read on the endpoint's own connection
+#
+# Transaction ids are handed out when a transaction starts, so an older transaction that is still running
+# could commit a change without raising the branch's version. Until every transaction older than the
+# version has finished the response is sent without an ETag, which only happens for a moment after a write
+
+import hashlib
+from fastapi import HTTPException, Response
+from utils.responses import representation
+from db.rows import etag_matches
+
+LISTINGS = "listings"
+CLAIMS = "claims"
+
+# The app checks with the API each time, but can keep the response to use after a 304
+CACHE_CONTROL = "private, no-cache"
+
+
+# versions is the (date, listings, claims, listings_settled, claims_settled) row from BRANCH_VERSIONS
+# The URL is included so each page and filter has its own ETag, and the encoding so a MessagePack body
+# never matches a JSON one (utils/responses.py)
+# None when a version the response depends on could still change without going up (see above)
+def branch_etag(request, versions, scopes, today: bool = False) -> str | None:
+    changed = {LISTINGS: versions[1], CLAIMS: versions[2]}
+    settled = {LISTINGS: versions[3], CLAIMS: versions[4]}
+    if not all(settled[scope] for scope in scopes):
+        return None
+    parts = [request.url.path, request.url.query, representation(request)] + [f"{scope}={changed[scope]}" for scope in scopes]
+    if today:
+        # for responses that only include today's pickups, which change at midnight without a write
+        parts.append(versions[0].isoformat())
+    return '"' + hashlib.sha256("|".join(parts).encode()).hexdigest()[:32] + '"'
+
+
+def etag_headers(etag: str | None) -> dict:
+    if etag is None:
+        return {"Cache-Control": CACHE_CONTROL}
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+# For the JSON_ queries, which return a Response instead of a model
+def with_etag(response: Response, etag: str | None) -> Response:
+    response.headers.update(etag_headers(etag))
+    return response
+
+
+# For branch_unchanged and /get_listings, before the read connection is taken: raising the 304 (with no body)
+# means the endpoint's queries are never run
+# versions is the row from PRIMARY_BRANCH_VERSIONS, kept for the endpoint when the ETag has changed
+def check_not_modified(request, if_none_match, versions, scopes, today: bool = False):
+    etag = branch_etag(request, versions, scopes, today)
+    if etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers=etag_headers(etag))
+    request.state.branch_versions = versions
+
+
+# The versions check_not_modified read on the primary for this request, or None
+def checked_versions(request):
+    return getattr(request.state, "branch_versions", None)
+
+
+# The primary's WAL position when those versions were read, or None
+def checked_position(request):
+    versions = checked_versions(request)
+    return None if versions is None else versions[5]
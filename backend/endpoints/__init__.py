@@ -0,0 +1,8 @@
+# this file is for the initialisation of the endpoints folder
+# the endpoints folder holds the sync endpoints (WASTENOT_DB_MODE=sync), which used to all be in main.py,
+# with one router per part of the app. app.py adds them in ROUTERS order
+# async_endpoints/ has the same routers for the async mode
+
+from endpoints import listings, claims, approvals, pickups
+
+ROUTERS = [listings.router, claims.router, approvals.router, pickups.router]
@@ -0,0 +1,177 @@
+# Approval endpoints for the sync database mode: a store's pending claims, their changes, and approving them
+# one at a time or in bulk
+# This is adapted from (Tech With Tim, 2024)
+# The SQL lives in db/queries.py and the response building in db/rows.py, shared with async_endpoints/approvals.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional
+from utils.pickup_token import new_pickup_code
+from utils.responses import read_response
+from db.config import JSON_AGG_READS
+from db.sync_pool import branch_unchanged, etag_versions, get_conn, get_write_conn
+from db import queries, rows
+from db.claims import approval_request, approvable_claims, approve_claims_params, approval_results
+from db.versions import CLAIMS, branch_etag, etag_headers, with_etag
+from db.changes import change_cursor, pending_claim_changes
+from models import (
+    PendingClaimDetail, ApproveClaimRequest, ApproveClaimResponse, ApproveClaimsRequest,
+    ApproveClaimsResponse, PendingClaimChanges,
+)
+
+router = APIRouter()
+
+
+# User story 5
+# Claims pending approval
+@router.get("/claims/pending", response_model=List[PendingClaimDetail],
+            dependencies=[Depends(branch_unchanged([CLAIMS]))])
+def get_pending_claims(
+        request: Request,
+        response: Response,
+        branch_id: str = Query(..., description="Branch ID to get pending claims for"),
+        conn=Depends(get_conn)
+):
+    # Getting all unapproved claims for a specific branch.
+    # Used by store workers to see which claims need approval.
+    with conn, conn.cursor() as cur:
+        # The ETag for the response, a client whose copy is current already got a 304 from branch_unchanged,
+        # which left the versions it read for this
+        etag = branch_etag(request, etag_versions(request, cur, branch_id), [CLAIMS])
+        response.headers.update(etag_headers(etag))
+
+        if JSON_AGG_READS:
+            # Postgres groups the items under each claim and returns the JSON
+            cur.execute(queries.JSON_PENDING_CLAIMS, (branch_id,))
+            return with_etag(rows.json_response(cur.fetchone()[0]), etag)
+
+        # Get all unapproved claims for listings from this branch
+        cur.execute(queries.PENDING_CLAIMS, (branch_id,))
+
+        claims = cur.fetchall()
+
+        if not claims:
+            return []
+
+        claim_ids = [row[0] for row in claims]
+
+        # Getting all items for these claims
+        cur.execute(queries.CLAIM_ITEMS, (claim_ids,))
+
+        items_rows = cur.fetchall()
+
+    # Group items by claim_id and build the response
+    return read_response(request, response, rows.pending_claims_from_rows(claims, items_rows))
+
+# Pending claims changed since the client's cursor, so the Approvals tab does not reload every claim
+# Without a cursor every pending claim is returned, the same as /claims/pending
+@router.get("/claims/pending/changes", response_model=PendingClaimChanges)
+def get_pending_claim_changes(
+        branch_id: str = Query(..., description="Branch ID to get pending claims for"),
+        cursor: Optional[str] = Query(None, description="cursor from the previous response"),
+        conn=Depends(get_conn)
+):
+    since = change_cursor(cursor)
+    with conn, conn.cursor() as cur:
+        # Taken before the read, so a change committed in between is sent again instead of missed
+        cur.execute(queries.CHANGE_CURSOR)
+        next_cursor = cur.fetchone()[0]
+
+        if since is None:
+            cur.execute(queries.PENDING_CLAIMS, (branch_id,))
+        else:
+            cur.execute(queries.PENDING_CLAIM_CHANGES, {"branch_id": branch_id, "since": since})
+        claims = cur.fetchall()
+
+        # Items are only needed for the claims still pending, the rest are removed by the client
+        items_rows = []
+        claim_ids = [row[0] for row in claims if not row[3]]
+        if claim_ids:
+            cur.execute(queries.CLAIM_ITEMS, (claim_ids,))
+            items_rows = cur.fetchall()
+
+    return pending_claim_changes(claims, items_rows, next_cursor)
+
+# Approving Claims
+@router.post("/claims/approve", response_model=ApproveClaimResponse)
+def approve_claim(payload: ApproveClaimRequest, conn=Depends(get_write_conn, scope="function")):
+    # Approving a claim, automatically generating a QR code for pickup
+    with conn:
+        with conn.cursor() as cur:
+            # Verify the claim exists
+            cur.execute(queries.LOCK_CLAIM, (payload.claim_id,))
+
+            claim_row = cur.fetchone()
+
+            if not claim_row:
+                raise HTTPException(404, "Claim not found")
+
+            claim_id, already_approved, charity_user_id = claim_row
+
+            if already_approved:
+                raise HTTPException(400, "Claim has already been approved")
+
+            # Getting the store worker's user_branch_id
+            cur.execute(queries.USER_BRANCH_USER, (payload.user_branch_id,))
+
+            store_user_row = cur.fetchone()
+            if not store_user_row:
+                raise HTTPException(404, "Store worker branch not found")
+
+            store_user_id = store_user_row[0]
+
+            # Verify this claim is for items from this store's branch
+            cur.execute(queries.COUNT_CLAIM_ITEMS_FOR_BRANCH, (payload.claim_id, payload.user_branch_id))
+
+            count = cur.fetchone()[0]
+
+            if count == 0:
+                raise HTTPException(403, "This claim is not for items from your branch")
+
+            # Approving the claim
+            cur.execute(queries.APPROVE_CLAIM, (store_user_id, payload.claim_id))
+            # Generating QR code for pickup
+            qr_code = new_pickup_code(payload.claim_id, payload.user_branch_id)
+
+            # Creating a pickup record
+            cur.execute(queries.INSERT_PICKUP, (payload.claim_id, qr_code))
+
+            return ApproveClaimResponse(
+                claim_id=str(payload.claim_id),
+                approved=True,
+                message="Claim approved successfully"
+            )
+
+# Approving many claims at once in one transaction (see db/claims.py)
+# e.g. a busy store clearing 30+ pending claims just before pickup time
+@router.post("/claims/approve/bulk", response_model=ApproveClaimsResponse)
+def approve_claims(payload: ApproveClaimsRequest, conn=Depends(get_write_conn, scope="function")):
+    claim_ids = approval_request(payload)
+
+    locked_rows, approved_rows = [], []
+    with conn:
+        with conn.cursor() as cur:
+            # Getting the store worker's user_id
+            cur.execute(queries.USER_BRANCH_USER, (payload.user_branch_id,))
+            store_user_row = cur.fetchone()
+            if not store_user_row:
+                raise HTTPException(404, "Store worker branch not found")
+
+            # Locking every claim and checking which ones are for this branch (Yamamoto, 2025)
+            valid_ids = [claim_id for claim_id in claim_ids if claim_id]
+            if valid_ids:
+                cur.execute(queries.LOCK_CLAIMS_FOR_BRANCH,
+                            {"claim_ids": valid_ids, "user_branch_id": payload.user_branch_id})
+                locked_rows = cur.fetchall()
+
+            # Approving them and creating their pickups in one statement
+            to_approve = approvable_claims(locked_rows)
+            if to_approve:
+                cur.execute(queries.APPROVE_CLAIMS, approve_claims_params(store_user_row[0], payload.user_branch_id, to_approve))
+                approved_rows = cur.fetchall()
+
+    results = approval_results(payload, claim_ids, locked_rows, approved_rows)
+    return ApproveClaimsResponse(results=results, approved_amt=len(approved_rows))
+
+# REFERENCES
+# Tim, T. W. (2024, November 19). How to Create a FastAPI & React Project-Python Backend + React Frontend. Retrieved from youtube.com: https://www.youtube.com/watch?v=aSdVU9-SxH4
+# Yamamoto, T. (2025, August 22). Preventing Race Conditions with SELECT FOR UPDATE in Web Applications. Retrieved from leapcell.io: https://leapcell.io/blog/preventing-race-conditions-with-select-for-update-in-web-applications
@@ -0,0 +1,79 @@
+# Claim endpoint for the sync database mode: a charity claiming items from listings
+# This is adapted from (Tech With Tim, 2024)
+# The claim helpers live in db/claims.py, shared with async_endpoints/claims.py
+
+import time
+from fastapi import APIRouter, Depends, HTTPException
+from db.config import CLAIM_ENGINE
+from db.sync_pool import get_write_conn
+from db.pool import set_statement_timeout
+from db import queries
+from db.claims import (
+    merge_claim_items, check_availability, claim_line_item_params, claim_if_available_params, Shortfall,
+    RETRY_ERRORS, CLAIM_ATTEMPTS, retry_delay,
+)
+from models import Claim, ClaimOutput
+
+router = APIRouter()
+
+
+# Making a claim, preventing over-claims
+@router.post("/claims", response_model=ClaimOutput)
+def create_claim(payload: Claim, conn=Depends(get_write_conn, scope="function")):
+    if not payload.items:
+        raise HTTPException(400, "No items provided")
+
+    # Checking the quantities and merging repeated items before opening a transaction
+    requested = merge_claim_items(payload.items)
+
+    if CLAIM_ENGINE == "optimistic":
+        return ClaimOutput(claim_id=str(claim_optimistically(conn, payload.user_branch_id, requested)))
+
+    with conn:
+        with conn.cursor() as cur:
+            # Locking all the requested listing line item rows to avoid race conditions while we check availability (Yamamoto, 2025)
+            # Preventing two claim requests for the same items at the same time
+            cur.execute(queries.LOCK_LINE_ITEMS, (list(requested),))
+
+            # Confirming every row exists and has enough left
+            check_availability(requested, cur.fetchall())
+
+            # Creating the claim, generating a unique id
+            cur.execute(queries.INSERT_CLAIM, (payload.user_branch_id,))
+            claim_id = cur.fetchone()[0]
+
+            # Updating the remaining quantities and adding the listing claim items in one statement
+            cur.execute(queries.CLAIM_LINE_ITEMS, claim_line_item_params(claim_id, requested))
+    return ClaimOutput(claim_id=str(claim_id))
+
+# Optimistic version of the claim above (see db/claims.py)
+# Each attempt is its own transaction, rolled back if anything was short or it deadlocked
+def claim_optimistically(conn, user_branch_id, requested):
+    for attempt in range(CLAIM_ATTEMPTS):
+        if attempt:
+            # The write statement_timeout only lasted for the first transaction
+            set_statement_timeout(conn, "write")
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(queries.CLAIM_IF_AVAILABLE, claim_if_available_params(user_branch_id, requested))
+                    row = cur.fetchone()
+                    if row is None:
+                        raise Shortfall()
+                    return row[0]
+        except Shortfall:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(queries.LINE_ITEM_QUANTITIES, (list(requested),))
+                    # Raises the same 404 or 400 as the locking claim
+                    check_availability(requested, cur.fetchall())
+            # Enough again by now (e.g. a listing was edited), so the claim is tried again
+        except RETRY_ERRORS:
+            if attempt == CLAIM_ATTEMPTS - 1:
+                raise
+            time.sleep(retry_delay(attempt))
+    raise HTTPException(409, "The items changed while claiming, please try again")
+
+# REFERENCES
+# Tim, T. W. (2024, November 19). How to Create a FastAPI & React Project-Python Backend + React Frontend. Retrieved from youtube.com: https://www.youtube.com/watch?v=aSdVU9-SxH4
+# Yamamoto, T. (2025, August 22). Preventing Race Conditions with SELECT FOR UPDATE in Web Applications. Retrieved from leapcell.io: https://leapcell.io/blog/preventing-race-conditions-with-select-for-update-in-web-applications
@@ -0,0 +1,324 @@
+# Listing endpoints for the sync database mode: products, making and editing listings, the claimable
+# listings pages and their changes, bulk changes and uploads
+# This is adapted from (Tech With Tim, 2024)
+# The SQL lives in db/queries.py and the response building in db/rows.py, shared with async_endpoints/listings.py
+
+from tempfile import SpooledTemporaryFile
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
+from uuid import UUID
+import psycopg2
+from utils.responses import read_response
+from db.config import JSON_AGG_READS, LISTING_CACHE
+from db.sync_pool import (
+    branch_versions, etag_versions, pooled_conn, read_conn, read_write_token, get_conn, get_write_conn, get_bulk_conn,
+)
+from db import queries, rows
+from db.versions import LISTINGS, branch_etag, check_not_modified, etag_headers, with_etag
+from db.changes import change_cursor, listing_changes_params, check_listing_changes, listing_changes
+from db.listings import check_quantities, edit_arrays, bulk_request, bulk_listing_ids, bulk_results
+from db.uploads import (
+    upload_format, spool_upload, copy_sql, copy_error, check_row_count, check_upload_errors,
+    upload_error_params, upload_output, UPLOAD_SPOOL_SIZE,
+)
+from db.listing_cache import listing_cache
+from models import (
+    BranchProducts, Listing, ListingOutput, ListingAvailable, UpdateListingInput, UpdateListingOutput,
+    CancelListing, CancelListingOutput, BulkListingInput, BulkListingOutput, ListingUploadOutput,
+    ListingChanges,
+)
+
+router = APIRouter()
+
+
+@router.get("/get_products", response_model=List[BranchProducts])  # get endpoint that will return all the products for the branch
+def get_products(
+        branch_id: str = Query(..., description="Branch ID to get products for"),
+        conn=Depends(get_conn),
+):
+        # Database interaction (NeuralNine, 2023)
+        with conn, conn.cursor() as cur:
+            cur.execute(queries.GET_PRODUCTS, (branch_id,))
+            product_rows = cur.fetchall()
+        # Returning a list of BranchProducts
+        return rows.products_from_rows(product_rows)
+
+@router.post("/listing", response_model=ListingOutput)
+def make_listing(payload: Listing, conn=Depends(get_write_conn, scope="function")):
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="No items provided")
+
+    with conn:
+        with conn.cursor() as cur:
+            # creating the listing
+            cur.execute(queries.INSERT_LISTING, (payload.user_branch_id,))
+            listing_id = cur.fetchone()[0]
+
+            cur.executemany(
+                queries.INSERT_LISTING_LINE_ITEM,
+                [(listing_id, it.product_id, it.quantity) for it in payload.items],
+            )
+
+    return ListingOutput(listing_id=str(listing_id))
+
+
+# Reloading the branches the listing cache has been told have changed (see db/listing_cache.py)
+# Uses its own pooled connection so a request served from memory never takes one
+def refresh_listing_cache():
+    plan = listing_cache.refresh_plan()
+    if plan is None:
+        return
+    with pooled_conn() as conn:
+        with conn, conn.cursor() as cur:
+            cur.execute(queries.CACHE_CLAIMABLE_LISTINGS, {"branch_ids": plan[1]})
+            listing_rows = cur.fetchall()
+            cur.execute(queries.AVAILABLE_LINE_ITEMS, ([row[0] for row in listing_rows],))
+            item_rows = cur.fetchall()
+    listing_cache.load(plan, listing_rows, item_rows)
+
+
+# A page of listings from the cache, with the X-Next-Cursor header set the same way as the SQL version
+def cached_listing_page(request, response, cursor, limit, org_id=None, branch_id=None, product_id=None):
+    refresh_listing_cache()
+    listings, next_cursor = listing_cache.page(cursor, limit, org_id, branch_id, product_id)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return read_response(request, response, listings)
+
+
+@router.get("/listings", response_model=List[ListingAvailable])
+def list_claimable_listings(
+        request: Request,
+        response: Response,
+        cursor: Optional[UUID] = Query(None, description="listing_id of the last listing on the previous page"),
+        limit: int = Query(rows.LISTING_PAGE_SIZE, ge=1, le=rows.LISTING_PAGE_MAX, description="Listings per page"),
+        org_id: Optional[UUID] = Query(None, description="Only listings from this organisation"),
+        branch_id: Optional[UUID] = Query(None, description="Only listings from this branch"),
+        product_id: Optional[UUID] = Query(None, description="Only listings with this product available"),
+):
+    # Served from memory when the listing cache is on and its listener is connected
+    if LISTING_CACHE and listing_cache.ready():
+        return cached_listing_page(request, response, cursor, limit, org_id, branch_id, product_id)
+
+    params = rows.listing_page_params(cursor, limit, org_id, branch_id, product_id)
+    with read_conn(request) as conn:
+        with conn, conn.cursor() as cur:
+            if JSON_AGG_READS:
+                # Postgres builds the whole page as JSON in one statement
+                cur.execute(queries.JSON_CLAIMABLE_LISTINGS_PAGE, {**params, "page_size": limit})
+                body, json_cursor = cur.fetchone()
+                return rows.json_response(body, json_cursor)
+
+            #  Fetch one page of listings that still have items available
+            cur.execute(queries.CLAIMABLE_LISTINGS_PAGE, params)
+            listings, next_cursor = rows.split_listing_page(cur.fetchall(), limit)
+            if not listings:
+                return []
+
+            listing_ids = [row[0] for row in listings]
+
+            # fetching the line items for this page only, returning the available quantity
+            cur.execute(queries.AVAILABLE_LINE_ITEMS, (listing_ids,))
+            item_rows = cur.fetchall()
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # grouping items by listing_id
+    return read_response(request, response, rows.listings_from_rows(listings, item_rows))
+
+# Listings per branch, paginated the same way as /listings
+# Answers 304 when the branch's listings have not changed since the client's copy (db/versions.py),
+# except when served from the listing cache, which does not need the database
+@router.get("/get_listings",
+         response_model=List[ListingAvailable])  # get endpoint that will return all the listings for the branch
+def get_listings_by_branch(
+        request: Request,
+        response: Response,
+        branch_id: UUID = Query(..., description="Branch ID to get listings for"),
+        cursor: Optional[UUID] = Query(None, description="listing_id of the last listing on the previous page"),
+        limit: int = Query(rows.LISTING_PAGE_SIZE, ge=1, le=rows.LISTING_PAGE_MAX, description="Listings per page"),
+        product_id: Optional[UUID] = Query(None, description="Only listings with this product available"),
+        if_none_match: Optional[str] = Header(None),
+):
+    if LISTING_CACHE and listing_cache.ready():
+        return cached_listing_page(request, response, cursor, limit, branch_id=branch_id, product_id=product_id)
+
+    # Answering 304 from the primary before taking a read connection (db/versions.py)
+    if if_none_match:
+        check_not_modified(request, if_none_match, branch_versions(branch_id), [LISTINGS])
+
+    params = rows.listing_page_params(cursor, limit, branch_id=branch_id, product_id=product_id)
+    with read_conn(request) as conn:
+        with conn, conn.cursor() as cur:
+            etag = branch_etag(request, etag_versions(request, cur, branch_id), [LISTINGS])
+            response.headers.update(etag_headers(etag))
+
+            if JSON_AGG_READS:
+                cur.execute(queries.JSON_CLAIMABLE_LISTINGS_PAGE, {**params, "page_size": limit})
+                body, json_cursor = cur.fetchone()
+                return with_etag(rows.json_response(body, json_cursor), etag)
+
+            cur.execute(queries.CLAIMABLE_LISTINGS_PAGE, params)
+            listing_rows, next_cursor = rows.split_listing_page(cur.fetchall(), limit)
+            if not listing_rows:
+                return[]
+
+            listing_ids = [row[0] for row in listing_rows]
+
+            # Fetching the line items
+            cur.execute(queries.AVAILABLE_LINE_ITEMS, (listing_ids,))
+            item_rows = cur.fetchall()
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Grouping items by listing_id
+    return read_response(request, response, rows.listings_from_rows(listing_rows, item_rows))
+
+
+# Listings changed since the client's cursor (db/changes.py)
+# Without a cursor only the cursor is returned, to keep before loading the pages with /listings
+# Always read from the database, even when the listing cache is on
+@router.get("/listings/changes", response_model=ListingChanges)
+def get_listing_changes(
+        cursor: Optional[str] = Query(None, description="cursor from the previous response"),
+        org_id: Optional[UUID] = Query(None, description="Only listings from this organisation"),
+        branch_id: Optional[UUID] = Query(None, description="Only listings from this branch"),
+        product_id: Optional[UUID] = Query(None, description="Only listings with this product available"),
+        conn=Depends(get_conn),
+):
+    since = change_cursor(cursor)
+    with conn, conn.cursor() as cur:
+        # Taken before the read, so a change committed in between is sent again instead of missed
+        cur.execute(queries.CHANGE_CURSOR)
+        next_cursor = cur.fetchone()[0]
+        if since is None:
+            return ListingChanges(listings=[], removed=[], cursor=next_cursor)
+
+        cur.execute(queries.LISTING_CHANGES, listing_changes_params(since, org_id, branch_id, product_id))
+        listing_rows = cur.fetchall()
+        check_listing_changes(listing_rows)
+
+        # the current items of the listings that are still claimable
+        item_rows = []
+        listing_ids = [row[0] for row in listing_rows if row[3]]
+        if listing_ids:
+            cur.execute(queries.AVAILABLE_LINE_ITEMS, (listing_ids,))
+            item_rows = cur.fetchall()
+
+    return listing_changes(listing_rows, item_rows, next_cursor)
+
+# Editing Listings
+@router.patch("/listing/items", response_model=UpdateListingOutput)
+def update_listing_items(payload: UpdateListingInput, conn=Depends(get_write_conn, scope="function")):
+    with conn:
+        with conn.cursor() as cur:
+            # Lock the listing row while we are updating to prevent race conditions (Yamamoto, 2025)
+            cur.execute(queries.LOCK_BRANCH_LISTING, (payload.listing_id, payload.user_branch_id))
+            row = cur.fetchone()
+            if row is None:
+                raise HTTPException(404, "Listing not found for this branch")
+
+            # Validating Inputs
+            check_quantities(payload.items)
+
+            updated = 0
+            if payload.items:
+                # Only updating items that are in this listing, all in one statement
+                cur.execute(queries.UPDATE_LINE_ITEM_QUANTITIES, edit_arrays([(payload.listing_id, payload.items)]))
+                updated = cur.rowcount
+    return UpdateListingOutput(updated_amt=updated)
+
+# Canceling a Listing
+@router.post("/listing/cancel", response_model= CancelListingOutput)
+def cancel_listing(payload: CancelListing, conn=Depends(get_write_conn, scope="function")):
+    with conn:
+        with conn.cursor() as cur:
+            # Locking listing row:
+            cur.execute(queries.LOCK_BRANCH_LISTING, (payload.listing_id, payload.user_branch_id))
+            row = cur.fetchone()
+            if row is None:
+                raise HTTPException(404, "Listing not found for this branch")
+
+            # Set remaining quantities to zero
+            cur.execute(queries.ZERO_LISTING_QUANTITIES, (payload.listing_id,))
+            zeroed = cur.rowcount
+    return CancelListingOutput(listing_id=str(payload.listing_id), zeroed_amt=zeroed)
+
+# Editing and cancelling many listings for a branch in one transaction
+# e.g. a store cancelling all of its listings at close of day with one request
+@router.post("/listing/bulk", response_model=BulkListingOutput)
+def bulk_manage_listings(payload: BulkListingInput, conn=Depends(get_bulk_conn, scope="function")):
+    edits, cancels = bulk_request(payload)
+    listing_ids = bulk_listing_ids(edits, cancels)
+
+    owned, updated_rows, zeroed_rows = set(), [], []
+    if listing_ids:
+        with conn:
+            with conn.cursor() as cur:
+                # Locking all of this branch's listings in the request (Yamamoto, 2025)
+                cur.execute(queries.LOCK_BRANCH_LISTINGS, (listing_ids, payload.user_branch_id))
+                owned = {str(row[0]) for row in cur.fetchall()}
+
+                # Applying every item edit in one statement
+                owned_edits = [(lid, items) for lid, items in edits if lid in owned and items]
+                if owned_edits:
+                    cur.execute(queries.UPDATE_LINE_ITEM_QUANTITIES, edit_arrays(owned_edits))
+                    updated_rows = cur.fetchall()
+
+                # Setting the remaining quantities of every cancelled listing to zero in one statement
+                owned_cancels = [lid for lid in cancels if lid in owned]
+                if owned_cancels:
+                    cur.execute(queries.ZERO_LISTINGS_QUANTITIES, (owned_cancels,))
+                    zeroed_rows = cur.fetchall()
+
+    return BulkListingOutput(results=bulk_results(payload, edits, cancels, owned, updated_rows, zeroed_rows))
+
+# Bulk listing upload from a store's end of day export (CSV or NDJSON), see db/uploads.py
+# The request body is the file itself, e.g.
+#   curl --data-binary @surplus.csv -H "Content-Type: text/csv" http://localhost:8001/listings/upload
+# The body is read into a spooled file (only written to disk if it is large),
+# then COPY runs on a threadpool thread like the other sync endpoints
+@router.post("/listings/upload", response_model=ListingUploadOutput)
+async def upload_listings(
+        request: Request,
+        fmt: Optional[str] = Query(None, alias="format", description="csv or ndjson, otherwise taken from the Content-Type"),
+):
+    fmt = upload_format(fmt, request.headers.get("content-type"))
+    with SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE) as body:
+        columns = await spool_upload(request.stream(), fmt, body)
+        return await run_in_threadpool(load_listing_upload, request, body, fmt, columns)
+
+
+def load_listing_upload(request, body, fmt, columns):
+    with pooled_conn("bulk") as conn:
+        with conn, conn.cursor() as cur:
+            # Streaming the file into the staging table
+            cur.execute(queries.CREATE_LISTING_UPLOAD)
+            try:
+                if fmt == "ndjson":
+                    cur.execute(queries.CREATE_LISTING_UPLOAD_JSON)
+                    cur.copy_expert(copy_sql(fmt, columns), body)
+                    cur.execute(queries.NDJSON_TO_UPLOAD)
+                else:
+                    cur.copy_expert(copy_sql(fmt, columns), body)
+            except psycopg2.DataError as e:
+                copy_error(e.diag)
+
+            cur.execute(queries.COUNT_LISTING_UPLOAD)
+            check_row_count(cur.fetchone()[0])
+
+            # Checking every row at once, nothing is created if any row is wrong
+            cur.execute(queries.UPLOAD_ERRORS, upload_error_params())
+            check_upload_errors(cur.fetchall())
+
+            cur.execute(queries.CREATE_UPLOADED_LISTINGS)
+            listing_rows = cur.fetchall()
+        read_write_token(request, conn)
+
+    return upload_output(listing_rows)
+
+# REFERENCES
+# NeuralNine. (2023, March 7). PostgreSQL in Python. Retrieved from youtube.com: https://www.youtube.com/watch?v=miEFm1CyjfM&t=33s
+# Tim, T. W. (2024, November 19). How to Create a FastAPI & React Project-Python Backend + React Frontend. Retrieved from youtube.com: https://www.youtube.com/watch?v=aSdVU9-SxH4
+# Yamamoto, T. (2025, August 22). Preventing Race Conditions with SELECT FOR UPDATE in Web Applications. Retrieved from leapcell.io: https://leapcell.io/blog/preventing-race-conditions-with-select-for-update-in-web-applications
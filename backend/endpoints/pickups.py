@@ -0,0 +1,252 @@
+# Pickup endpoints for the sync database mode: pickup QR codes, a charity's pickups and their changes,
+# verifying pickups and a store's approved claims awaiting pickup
+# This is adapted from (Tech With Tim, 2024)
+# The QR image is drawn by utils/qr_render.py, which only loads qrcode (and PIL) the first time a code is drawn
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from typing import List, Optional
+from utils.qr_render import FORMATS, qr_etag, render_qr_sync
+from utils.responses import read_response
+from db.config import JSON_AGG_READS
+from db.sync_pool import branch_unchanged, etag_versions, get_conn, get_write_conn
+from db import queries, rows
+from db.pickups import check_pickup_code, verify_request, completable_pickups, verify_results
+from db.versions import LISTINGS, CLAIMS, branch_etag, etag_headers, with_etag
+from db.changes import change_cursor
+from models import (
+    PickupDetail, VerifyPickupRequest, VerifyPickupResponse, VerifyPickupsRequest, VerifyPickupsResponse,
+    PickupChanges,
+)
+
+router = APIRouter()
+
+
+# Get QR code
+@router.get("/pickup/qr/{claim_id}")
+def get_pickup_qr(
+        claim_id: str,
+        user_branch_id:str = Query(..., description="User branch ID of charity that made the claim"),
+        conn=Depends(get_conn)
+):
+    # getting the QR code for the specific claim
+    with conn, conn.cursor() as cur:
+        # Verifying the claim belongs to this user branch
+        cur.execute(queries.CHARITY_CLAIM, (claim_id, user_branch_id))
+
+        claim = cur.fetchone()
+        if not claim:
+            raise HTTPException(404, "Claim not found")
+        # claim not approved
+        if not claim[1]:
+            raise HTTPException(400, "Claim not approved yet")
+
+        # Getting pickup details
+        cur.execute(queries.CLAIM_PICKUP, (claim_id,))
+        pickup = cur.fetchone()
+        if not pickup:
+            raise HTTPException(404, "QR code not generated yet")
+
+        # Getting claim and store info
+        cur.execute(queries.PICKUP_ITEMS_WITH_STORE, (claim_id,))
+
+        items_rows = cur.fetchall()
+
+    # The image is not drawn here, the app loads it from the image endpoint below
+    return rows.pickup_qr_from_rows(claim_id, pickup, rows.qr_image_url(claim_id, user_branch_id), items_rows)
+
+# Get QR code image
+# ?format= can be png (default), svg or matrix, see utils/qr_render.py
+# The image is only drawn the first time a token is asked for, in a worker process, and then cached
+# The ETag is sent back by the app as If-None-Match, so refreshing the QR screen gets a 304 with no body
+@router.get("/pickup/qr/{claim_id}/image")
+def get_pickup_qr_image(
+        claim_id: str,
+        user_branch_id: str = Query(..., description="User branch ID of charity that made the claim"),
+        fmt: str = Query("png", alias="format", description="png, svg or matrix"),
+        if_none_match: Optional[str] = Header(None),
+        conn=Depends(get_conn)
+):
+    if fmt not in FORMATS:
+        raise HTTPException(400, f"format must be one of: {', '.join(FORMATS)}")
+
+    with conn, conn.cursor() as cur:
+        # Verifying the claim belongs to this user branch
+        cur.execute(queries.CHARITY_CLAIM, (claim_id, user_branch_id))
+        claim = cur.fetchone()
+        if not claim:
+            raise HTTPException(404, "Claim not found")
+        if not claim[1]:
+            raise HTTPException(400, "Claim not approved yet")
+
+        cur.execute(queries.CLAIM_PICKUP, (claim_id,))
+        pickup = cur.fetchone()
+        if not pickup:
+            raise HTTPException(404, "QR code not generated yet")
+
+    qr_code = pickup[1]
+    etag = qr_etag(qr_code, fmt)
+    if rows.etag_matches(if_none_match, etag):
+        return rows.qr_image_response(None, FORMATS[fmt], etag, not_modified=True)
+    return rows.qr_image_response(render_qr_sync(qr_code, fmt), FORMATS[fmt], etag, not_modified=False)
+
+# Getting all approved claims for a charity user, showing pickups ready for collection.
+@router.get("/pickups/my-pickups", response_model=List[PickupDetail],
+            dependencies=[Depends(branch_unchanged([CLAIMS]))])
+def get_my_pickups(
+        request: Request,
+        response: Response,
+        branch_id: str = Query(..., description="Branch ID of charity to get pickups for"),
+        conn=Depends(get_conn)
+):
+    with conn, conn.cursor() as cur:
+        # The ETag for the response, a client whose copy is current already got a 304 from branch_unchanged,
+        # which left the versions it read for this
+        etag = branch_etag(request, etag_versions(request, cur, branch_id), [CLAIMS])
+        response.headers.update(etag_headers(etag))
+
+        if JSON_AGG_READS:
+            # Postgres returns the JSON
+            cur.execute(queries.JSON_MY_PICKUPS, (branch_id,))
+            return with_etag(rows.json_response(cur.fetchone()[0]), etag)
+
+        # The claims come with their totals
+        cur.execute(queries.MY_PICKUPS, (branch_id,))
+
+        claims = cur.fetchall()
+
+    # Building response
+    return read_response(request, response, rows.pickups_from_rows(claims))
+
+
+# Pickups changed since the client's cursor, e.g. newly approved or collected claims
+# Without a cursor every pickup is returned, the same as /pickups/my-pickups
+@router.get("/pickups/my-pickups/changes", response_model=PickupChanges)
+def get_my_pickup_changes(
+        branch_id: str = Query(..., description="Branch ID of charity to get pickups for"),
+        cursor: Optional[str] = Query(None, description="cursor from the previous response"),
+        conn=Depends(get_conn)
+):
+    since = change_cursor(cursor)
+    with conn, conn.cursor() as cur:
+        # Taken before the read, so a change committed in between is sent again instead of missed
+        cur.execute(queries.CHANGE_CURSOR)
+        next_cursor = cur.fetchone()[0]
+
+        if since is None:
+            cur.execute(queries.MY_PICKUPS, (branch_id,))
+        else:
+            cur.execute(queries.PICKUP_CHANGES, {"branch_id": branch_id, "since": since})
+        claims = cur.fetchall()
+
+    return PickupChanges(pickups=rows.pickups_from_rows(claims), cursor=next_cursor)
+
+# Verify a pickup by scanning QR code done by the store worker when a charity volunteer shows QR code
+@router.post("/pickup/verify", response_model=VerifyPickupResponse, dependencies=[Depends(check_pickup_code)])
+def verify_pickup(payload: VerifyPickupRequest, conn=Depends(get_write_conn, scope="function")):
+    with conn:
+        with conn.cursor() as cur:
+            # Find pickup by QR code
+            cur.execute(queries.LOCK_PICKUP_BY_QR, (payload.qr_code,))
+
+            pickup_row = cur.fetchone()
+
+            if not pickup_row:
+                raise HTTPException(404, "Invalid QR code")
+
+            pickup_id, claim_id, complete, charity_user_branch_id = pickup_row
+
+            if complete:
+                raise HTTPException(400, "This pickup has already been completed")
+
+            # Get items and verify branch
+            cur.execute(queries.PICKUP_ITEMS_WITH_BRANCH, (claim_id,))
+
+            items_rows = cur.fetchall()
+
+            if not items_rows:
+                raise HTTPException(404, "No items found for this claim")
+
+            # Verifying store worker's branch matches
+            listing_user_branch_id = items_rows[0][5] # gets the 5th position from the select statement (l.user_branch_id)
+
+            if str(listing_user_branch_id) != payload.user_branch_id:
+                raise HTTPException(
+                    403,
+                    "This pickup is for a different branch"
+                )
+
+            # Getting charity organisation name
+            cur.execute(queries.CHARITY_NAME, (charity_user_branch_id,))
+
+            charity_row = cur.fetchone()
+            charity_name = f"{charity_row[0]} - {charity_row[1]}" if charity_row else "Unknown"
+
+            # Mark pickup as complete
+            cur.execute(queries.COMPLETE_PICKUP, (pickup_id,))
+
+            return VerifyPickupResponse(
+                pickup_id=str(pickup_id),
+                claim_id=str(claim_id),
+                success=True,
+                message=f"Pickup verified! Please give {charity_name} their items.",
+                charity_name=charity_name,
+                items=rows.verified_items_from_rows(items_rows)
+            )
+
+# Completing many scanned pickups in one transaction (see db/pickups.py)
+# The scanner sends the codes it queued while the database was slow, and signed codes that fail their
+# check are reported without being looked up
+@router.post("/pickup/verify/bulk", response_model=VerifyPickupsResponse)
+def verify_pickups(payload: VerifyPickupsRequest, conn=Depends(get_write_conn, scope="function")):
+    rejected = verify_request(payload)
+    qr_codes = [qr_code for qr_code in payload.qr_codes if qr_code not in rejected]
+
+    locked_rows, completed_rows = [], []
+    if qr_codes:
+        with conn:
+            with conn.cursor() as cur:
+                # Locking every scanned pickup and checking which ones are for this branch (Yamamoto, 2025)
+                cur.execute(queries.LOCK_PICKUPS_BY_QR, {"qr_codes": qr_codes, "user_branch_id": payload.user_branch_id})
+                locked_rows = cur.fetchall()
+
+                # Marking them all complete in one statement
+                to_complete = completable_pickups(locked_rows)
+                if to_complete:
+                    cur.execute(queries.COMPLETE_PICKUPS, (to_complete,))
+                    completed_rows = cur.fetchall()
+
+    results = verify_results(payload, rejected, locked_rows, completed_rows)
+    return VerifyPickupsResponse(results=results, completed_amt=len(completed_rows))
+
+# Getting all approved claims awaiting pickup for a store's branch.
+# Only includes listings created today, showing quantity claimed vs quantity listed with remaining quantities.
+# This endpoint gets approved claims awaiting pickup for a store's branch
+# Grouped by charity, only today's listings, showing claimed/listed/remaining quantities
+
+# The remaining quantities come from the branch's listings, so both of its versions are in the ETag,
+# along with the date as only today's pickups are shown
+@router.get("/claims/approved-awaiting-pickup",
+            dependencies=[Depends(branch_unchanged([LISTINGS, CLAIMS], today=True))])
+def get_approved_awaiting_pickup(
+        request: Request,
+        response: Response,
+        branch_id: str = Query(..., description="Branch ID to get approved claims for"),
+        conn=Depends(get_conn)):
+    with conn, conn.cursor() as cur:
+        etag = branch_etag(request, etag_versions(request, cur, branch_id), [LISTINGS, CLAIMS], today=True)
+        response.headers.update(etag_headers(etag))
+
+        # Query to get approved claims awaiting pickup grouped by charity
+        cur.execute(queries.APPROVED_AWAITING_PICKUP, (branch_id,))
+
+        approved_rows = cur.fetchall()
+
+    if not approved_rows:
+        return []
+
+    # Group results by charity
+    return read_response(request, response, rows.approved_groups_from_rows(approved_rows))
+
+# REFERENCES
+# Tim, T. W. (2024, November 19). How to Create a FastAPI & React Project-Python Backend + React Frontend. Retrieved from youtube.com: https://www.youtube.com/watch?v=aSdVU9-SxH4
+# Yamamoto, T. (2025, August 22). Preventing Race Conditions with SELECT FOR UPDATE in Web Applications. Retrieved from leapcell.io: https://leapcell.io/blog/preventing-race-conditions-with-select-for-update-in-web-applications
@@ -0,0 +1,73 @@
+# Server-sent events stream, served when WASTENOT_EVENTS=1
+# The Pending Claims screen and the Browse tab used to poll (pull to refresh and reloads on focus),
+# which runs the pending claims and listings queries for every phone even when nothing has changed.
+# Instead the app keeps GET /events open and only refetches, or patches its list, when told something changed:
+#   event: claim    {"event": "created" | "approved" | "collected", "claim_id", "branch_id"}
+#   event: listing  {"branch_id", "listings": [{"listing_id", "items": [...]}]}  an empty items list means it is gone
+#   event: resync   the stream may have missed changes, so the app should refetch
+# The events come from db/events.py, so however many phones are connected the process only has one
+# Postgres LISTEN connection and one availability query per change
+# Server-sent events are plain HTTP, so they work through the same uvicorn install and proxies as the other
+# endpoints, and the app only needs to read one direction (MDN, 2025)
+
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from db.events import event_hub
+
+router = APIRouter()
+
+TOPICS = {"claims", "listings"}
+
+# A comment line is sent this often when there are no events, so proxies and the phone's network
+# do not close a quiet connection
+HEARTBEAT_SECONDS = 15
+# How long the client should wait before reconnecting if the stream drops
+RETRY_MS = 5000
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def event_lines(sub):
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield sse(event["type"], event)
+    finally:
+        # Runs when the client disconnects and the response is cancelled
+        event_hub.unsubscribe(sub)
+
+
+@router.get("/events")
+async def events(
+        branch_id: Optional[str] = Query(None, description="Branch to receive claim events for, needed for claims"),
+        topics: str = Query("claims,listings", description="Comma separated: claims, listings"),
+):
+    wanted = {topic.strip() for topic in topics.split(",") if topic.strip()}
+    if not wanted or not wanted <= TOPICS:
+        raise HTTPException(status_code=400, detail=f"topics must be from {sorted(TOPICS)}")
+    if "claims" in wanted and not branch_id:
+        raise HTTPException(status_code=400, detail="branch_id is needed for claim events")
+
+    sub = event_hub.subscribe(branch_id.lower() if branch_id else None, wanted)
+    return StreamingResponse(
+        event_lines(sub),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stops nginx holding back the stream until a buffer fills
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+# REFERENCES
+# MDN. (2025). Using server-sent events. Retrieved from developer.mozilla.org: https://developer.mozilla.org/en-US/docs/Web/API/Server-sent_events/Using_server-sent_events
@@ -0,0 +1,240 @@
+# Pydantic data models for the WasteNot API
+# These models are shared by the sync endpoints in endpoints/ and the async endpoints in async_endpoints/
+# This code is adapted for my models from (Tech With Tim, 2024)
+
+from pydantic import BaseModel
+from typing import List, Optional
+
+# User Story 1: creating the listings
+class BranchProducts(BaseModel):
+    product_id: str  # UUID as string
+    product_name: str
+
+
+# Listing Item input
+class ListingLineItem(BaseModel):
+    product_id: str
+    quantity: int
+
+
+# Combining the line items into one list
+class Listing(BaseModel):
+    user_branch_id: str
+    items: List[ListingLineItem]
+
+
+# Listing Output
+# Creating the listing generates the UUID for the listing entity
+class ListingOutput(BaseModel):
+    listing_id: str
+
+
+# User Story 2: Claiming the items
+#
+class ListingItemAvailable(BaseModel):
+    listing_line_item_id: str
+    product_id: str
+    product_name: str
+    quantity: int # This now represents quantity available, not quantity inputted!
+
+
+class ListingAvailable(BaseModel):
+    listing_id: str
+    org_name: Optional[str] = None
+    branch_name: Optional[str] = None
+    items: List[ListingItemAvailable]
+
+
+class ClaimItem(BaseModel):
+    listing_line_item_id: str
+    quantity: int
+
+
+class Claim(BaseModel):
+    user_branch_id: str  # charity user making the claim
+    items: List[ClaimItem]
+
+
+class ClaimOutput(BaseModel):
+    claim_id: str
+
+
+# User Story 4: Editing the Items
+class UpdateLineItem(BaseModel):
+    listing_line_item_id: str
+    quantity: int  # new remaining quantity for this line item
+
+
+class UpdateListingInput(BaseModel):
+    user_branch_id: str
+    listing_id: str
+    items: List[UpdateLineItem]
+
+
+class UpdateListingOutput(BaseModel):
+    updated_amt: int
+
+
+class CancelListing(BaseModel):
+    user_branch_id: str
+    listing_id: str
+
+
+class CancelListingOutput(BaseModel):
+    listing_id: str
+    zeroed_amt: int
+
+
+# Bulk listing management: editing and cancelling many listings for a branch in one request
+class BulkListingEdit(BaseModel):
+    listing_id: str
+    items: List[UpdateLineItem]
+
+
+class BulkListingInput(BaseModel):
+    user_branch_id: str
+    edits: List[BulkListingEdit] = []
+    cancel: List[str] = []  # listing_ids to cancel
+
+
+# Result for one listing in the bulk request
+class BulkListingResult(BaseModel):
+    listing_id: str
+    action: str  # "edit" or "cancel"
+    success: bool
+    updated_amt: int = 0  # line items updated, or zeroed for a cancel
+    message: Optional[str] = None
+
+
+class BulkListingOutput(BaseModel):
+    results: List[BulkListingResult]
+
+
+# Bulk listing upload (POST /listings/upload): one summary per listing created from the file
+class UploadedListing(BaseModel):
+    listing_id: str
+    user_branch_id: str
+    listing_ref: Optional[str] = None
+    line_items: int
+    total_quantity: int
+
+
+class ListingUploadOutput(BaseModel):
+    listings: List[UploadedListing]
+    line_items: int  # line items created across every listing
+
+
+# User Story 5
+# Claim Approval Models
+class ClaimItemDetail(BaseModel):
+    # Details of a single item in a claim
+    product_name: str
+    quantity: int
+    listing_line_item_id: str
+
+class PendingClaimDetail(BaseModel):
+    # Details of a claim waiting for approval
+    claim_id: str
+    user_id: str
+    user_email: Optional[str] = None
+    org_name: Optional[str] = None
+    created_at: str
+    approved: bool
+    items: List[ClaimItemDetail]
+    total_items: int
+
+
+# Request to approve a claim
+class ApproveClaimRequest(BaseModel):
+    claim_id: str
+    user_branch_id: str
+
+
+# Response after approving a claim
+class ApproveClaimResponse(BaseModel):
+    claim_id: str
+    approved: bool
+    message: str
+
+
+# Approving many claims for one store worker at once (POST /claims/approve/bulk)
+class ApproveClaimsRequest(BaseModel):
+    claim_ids: List[str]
+    user_branch_id: str
+
+
+# One result per claim in the order they were sent, approved is False with the reason in message
+class ApproveClaimsResponse(BaseModel):
+    results: List[ApproveClaimResponse]
+    approved_amt: int
+
+# Pickups
+# Details of a user's approved claim for pickup
+class PickupDetail(BaseModel):
+    claim_id: str
+    approved: bool
+    complete: bool
+    org_name: str
+    branch_name: str
+    branch_location: str
+    total_items: int
+    approved_at: Optional[str] = None
+
+
+# Request to verify a pickup using a QR code
+class VerifyPickupRequest(BaseModel):
+    qr_code: str
+    user_branch_id: str  # Store worker's branch
+
+# Response after verifying the pickup
+class VerifyPickupResponse(BaseModel):
+    pickup_id: str
+    claim_id: str
+    success: bool
+    message: str
+    charity_name: Optional[str] = None
+    items: List[dict]
+
+
+# Completing many scanned pickups at once (POST /pickup/verify/bulk), e.g. codes a scanner queued
+# while the database was slow
+class VerifyPickupsRequest(BaseModel):
+    qr_codes: List[str]
+    user_branch_id: str  # Store worker's branch
+
+
+# One result per code in the order they were sent, success is False with the reason in message
+class VerifiedPickupResult(BaseModel):
+    qr_code: str
+    pickup_id: Optional[str] = None
+    claim_id: Optional[str] = None
+    success: bool
+    message: str
+    charity_name: Optional[str] = None
+
+
+class VerifyPickupsResponse(BaseModel):
+    results: List[VerifiedPickupResult]
+    completed_amt: int
+
+
+# Delta sync: what changed since the client's cursor, and the cursor to send next time
+# Without a cursor the claim and pickup versions return everything, like /claims/pending and /pickups/my-pickups
+class PendingClaimChanges(BaseModel):
+    claims: List[PendingClaimDetail]  # new or changed pending claims
+    removed: List[str]  # claim_ids that are no longer pending
+    cursor: str
+
+
+class PickupChanges(BaseModel):
+    pickups: List[PickupDetail]  # new or changed pickups
+    cursor: str
+
+
+class ListingChanges(BaseModel):
+    listings: List[ListingAvailable]  # changed listings with all their available items
+    removed: List[str]  # listing_ids that are no longer claimable
+    cursor: str
+
+# REFERENCES
+# Tim, T. W. (2024, November 19). How to Create a FastAPI & React Project-Python Backend + React Frontend. Retrieved from youtube.com: https://www.youtube.com/watch?v=aSdVU9-SxH4
@@ -0,0 +1,131 @@
+# Production launcher for the API: several uvicorn worker processes sharing one Postgres connection budget
+# Run from the backend folder:
+#   python serve.py --workers 4 --db-connections 80
+# python main.py runs a single process for development. Each process has its own pool of up to POOL_MAX
+# connections, so adding processes to handle more requests used to multiply the connections too, until
+# Postgres turned them away at max_connections
+#
+# Here WASTENOT_DB_CONNECTIONS (or --db-connections) is the most connections the whole server may have open
+# on the primary. It is split evenly between the workers: each worker's own Postgres listener and event
+# stream connections are taken off its share first (db/notify.py, db/events.py), and the rest is its pool
+# size, handed to the workers as WASTENOT_POOL_MAX. The read replica pool, if there is one, is the same size
+# per worker, on the replica's own max_connections
+#
+# Before starting the workers the launcher:
+#   - imports the app once, so a bad setting stops it here instead of in every worker
+#   - checks the budget fits in the primary's max_connections (less the superuser reserved ones), and warns
+#     when other clients already have too many of them open
+# Each worker then opens POOL_MIN connections before it takes requests (lifespan in app.py)
+#
+# On SIGTERM or Ctrl+C uvicorn stops taking new connections and gives the requests in progress up to
+# --graceful-timeout seconds to finish, closing any event streams still open after that. Each worker then
+# stops its listener and waits up to WASTENOT_POOL_DRAIN_TIMEOUT seconds for its connections to come back
+# before closing its pool (Uvicorn, 2025)
+
+import argparse
+import importlib
+import os
+import sys
+import psycopg2
+import uvicorn
+
+# The primary's connection limit, and how many connections other clients already have open (not counting ours)
+MAX_CONNECTIONS = """
+    SELECT current_setting('max_connections')::int, current_setting('superuser_reserved_connections')::int
+"""
+OTHER_CONNECTIONS = """
+    SELECT count(*) - 1 FROM pg_stat_activity WHERE backend_type = 'client backend'
+"""
+
+
+# Connections each worker opens outside its pool, by the setting that needs them
+def extra_connections(listing_cache: bool, events: bool) -> int:
+    extra = 0
+    if listing_cache or events:
+        extra += 1  # the Postgres listener (db/notify.py)
+    if events:
+        extra += 1  # reading availability for listing events (db/events.py)
+    return extra
+
+
+# The pool size for each worker, so every worker together stays within the budget
+def worker_pool_size(budget: int, workers: int, extra: int) -> int:
+    pool_max = budget // workers - extra
+    if pool_max < 1:
+        sys.exit(
+            f"{budget} connections is not enough for {workers} workers, "
+            f"each needs at least {extra + 1}"
+        )
+    return pool_max
+
+
+# Warns or stops if the budget does not fit in the database's max_connections (PostgreSQL, 2025)
+# If Postgres cannot be reached the server still starts, as the workers keep trying to connect
+def check_max_connections(db_config, budget: int):
+    try:
+        conn = psycopg2.connect(connect_timeout=5, **db_config)
+    except psycopg2.OperationalError as e:
+        print(f"Could not check max_connections: {e}")
+        return
+    try:
+        with conn.cursor() as cur:
+            cur.execute(MAX_CONNECTIONS)
+            max_connections, reserved = cur.fetchone()
+            cur.execute(OTHER_CONNECTIONS)
+            in_use = cur.fetchone()[0]
+    finally:
+        conn.close()
+    available = max_connections - reserved
+    if budget > available:
+        sys.exit(
+            f"--db-connections {budget} is more than the database allows "
+            f"(max_connections {max_connections} less {reserved} reserved)"
+        )
+    if budget > available - in_use:
+        print(f"Warning: {in_use} connections are already open, so only {available - in_use} of {budget} are free")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the WasteNot API with several workers")
+    parser.add_argument("--host", default=os.getenv("WASTENOT_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WASTENOT_PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WASTENOT_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--db-connections", type=int, default=int(os.getenv("WASTENOT_DB_CONNECTIONS", "80")),
+                        help="Most connections every worker together may open on the primary")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("WASTENOT_GRACEFUL_TIMEOUT", "20")),
+                        help="Seconds requests in progress get to finish on shutdown")
+    args = parser.parse_args()
+    if args.workers < 1:
+        sys.exit("--workers must be at least 1")
+
+    # Read before the pool sizes are set, so they are the settings from the environment
+    from db.config import DB_CONFIG, POOL_MIN, LISTING_CACHE, EVENTS
+
+    pool_max = worker_pool_size(args.db_connections, args.workers, extra_connections(LISTING_CACHE, EVENTS))
+    # Passed to the workers through the environment, which they read in db/config.py
+    os.environ["WASTENOT_POOL_MAX"] = str(pool_max)
+    os.environ["WASTENOT_POOL_MIN"] = str(min(POOL_MIN, pool_max))
+
+    check_max_connections(DB_CONFIG, args.db_connections)
+
+    # Importing the app once here, so settings that stop it starting are found before any worker starts
+    # It opens no connections until its lifespan starts
+    importlib.import_module("main")
+
+    print(f"{args.workers} workers, each with a pool of {os.environ['WASTENOT_POOL_MIN']}-{pool_max} connections")
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        lifespan="on",
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
+
+# REFERENCES
+# PostgreSQL. (2025). Connections and Authentication. Retrieved from postgresql.org: https://www.postgresql.org/docs/current/runtime-config-connection.html
+# Uvicorn. (2025). Settings. Retrieved from uvicorn.org: https://www.uvicorn.org/settings/
@@ -0,0 +1,82 @@
+# Fixtures for the endpoint tests (tests/test_*_endpoints.py), which call the app through the TestClient
+# in both database modes
+# They need a Postgres server to connect to with the settings in db/config.py, and are skipped without one
+# A new database is created for the test session, migrated with db/migrate.py and dropped at the end, so the
+# database the settings name is left as it was. Each test gets a store and a charity of its own (world)
+
+from uuid import uuid4
+import psycopg2
+import pytest
+from fastapi.testclient import TestClient
+from db.config import DB_CONFIG, REPLICA_CONFIG
+from db.migrate import migrate
+from tests.helpers import new_world
+
+DB_MODES = ["sync", "async"]
+
+
+def admin_connection():
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    return conn
+
+
+# The pools read DB_CONFIG when they are made, so it is pointed at the test database before the app
+# (and db/async_pool.py, which makes its pool on import) is loaded by the client fixture
+@pytest.fixture(scope="session")
+def test_database():
+    try:
+        admin = admin_connection()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"No database to connect to: {e}")
+    dbname = DB_CONFIG["dbname"]
+    test_dbname = f"wastenot_test_{uuid4().hex[:12]}"
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {test_dbname}")
+
+    DB_CONFIG["dbname"] = test_dbname
+    # A replica copies the new database from the primary
+    if REPLICA_CONFIG:
+        REPLICA_CONFIG["dbname"] = test_dbname
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+        yield test_dbname
+    finally:
+        DB_CONFIG["dbname"] = dbname
+        if REPLICA_CONFIG:
+            REPLICA_CONFIG["dbname"] = dbname
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE {test_dbname} WITH (FORCE)")
+        admin.close()
+
+
+# One app per database mode for the whole session, as the async pool cannot be opened again once closed
+@pytest.fixture(scope="session", params=DB_MODES)
+def client(request, test_database):
+    import app
+    mode = app.DB_MODE
+    app.DB_MODE = request.param
+    try:
+        with TestClient(app.create_app()) as test_client:
+            yield test_client
+    finally:
+        app.DB_MODE = mode
+
+
+# A psycopg2 connection to the test database, for setting up rows and checking what the endpoints wrote
+@pytest.fixture
+def db(test_database):
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    yield conn
+    conn.close()
+
+
+# A store and a charity of the test's own (tests/helpers.py)
+@pytest.fixture
+def world(db):
+    return new_world(db)
@@ -0,0 +1,50 @@
+# Helpers shared by the endpoint tests, which get their client and world from tests/conftest.py
+
+from types import SimpleNamespace
+from uuid import uuid4
+
+
+def ok(response, status=200):
+    assert response.status_code == status, (response.status_code, response.text)
+    return response
+
+
+# A listing of the store's products, e.g. {bread: 5}, and its line item IDs by product
+def create_listing(client, world, quantities) -> tuple:
+    items = [{"product_id": product_id, "quantity": quantity} for product_id, quantity in quantities.items()]
+    listing_id = ok(client.post("/listing", json={"user_branch_id": world.store_user_branch, "items": items})).json()["listing_id"]
+    listings = ok(client.get("/get_listings", params={"branch_id": world.store_branch})).json()
+    line_items = {item["product_id"]: item["listing_line_item_id"]
+                  for listing in listings if listing["listing_id"] == listing_id for item in listing["items"]}
+    return listing_id, line_items
+
+
+def create_claim(client, world, line_item_id, quantity=1) -> str:
+    body = {"user_branch_id": world.charity_user_branch,
+            "items": [{"listing_line_item_id": line_item_id, "quantity": quantity}]}
+    return ok(client.post("/claims", json=body)).json()["claim_id"]
+
+
+# A store organisation with a branch, a user and two products, and a charity with a branch and a user,
+# all with new IDs so each test only sees its own rows
+def new_world(db) -> SimpleNamespace:
+    w = SimpleNamespace(
+        store_org=str(uuid4()), store_branch=str(uuid4()), store_user=str(uuid4()), store_user_branch=str(uuid4()),
+        charity_org=str(uuid4()), charity_branch=str(uuid4()), charity_user=str(uuid4()),
+        charity_user_branch=str(uuid4()), bread=str(uuid4()), milk=str(uuid4()),
+    )
+    with db.cursor() as cur:
+        cur.execute("INSERT INTO organisation (org_id, org_name) VALUES (%s, 'Store'), (%s, 'Charity')",
+                    (w.store_org, w.charity_org))
+        cur.execute("INSERT INTO branch (branch_id, org_id, branch_name, branch_location) "
+                    "VALUES (%s, %s, 'Store Branch', 'Cork'), (%s, %s, 'Charity Branch', 'Cork')",
+                    (w.store_branch, w.store_org, w.charity_branch, w.charity_org))
+        cur.execute("INSERT INTO app_user (user_id, user_email) VALUES (%s, %s), (%s, %s)",
+                    (w.store_user, f"{w.store_user}@example.com", w.charity_user, f"{w.charity_user}@example.com"))
+        cur.execute("INSERT INTO user_branch (user_branch_id, user_id, branch_id, org_id) VALUES (%s, %s, %s, %s), (%s, %s, %s, %s)",
+                    (w.store_user_branch, w.store_user, w.store_branch, w.store_org,
+                     w.charity_user_branch, w.charity_user, w.charity_branch, w.charity_org))
+        cur.execute("INSERT INTO product (product_id, branch_id, product_name) VALUES (%s, %s, 'Bread'), (%s, %s, 'Milk')",
+                    (w.bread, w.store_branch, w.milk, w.store_branch))
+    return w
+
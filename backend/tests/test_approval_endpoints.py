@@ -0,0 +1,54 @@
+# Endpoint tests for POST /claims/approve/bulk, in both database modes
+# Needs a database, see tests/conftest.py
+
+from uuid import uuid4
+from tests.helpers import create_claim, create_listing, ok
+
+
+def approve_bulk(client, world, claim_ids, status=200):
+    body = {"user_branch_id": world.store_user_branch, "claim_ids": claim_ids}
+    return ok(client.post("/claims/approve/bulk", json=body), status).json()
+
+
+def test_bulk_approval(client, world, db):
+    _, line_items = create_listing(client, world, {world.bread: 10})
+    claim_ids = [create_claim(client, world, line_items[world.bread]) for _ in range(4)]
+    ok(client.post("/claims/approve", json={"claim_id": claim_ids[0], "user_branch_id": world.store_user_branch}))
+    missing = str(uuid4())
+
+    approved = approve_bulk(client, world, claim_ids + [missing, "not-a-claim"])
+    assert approved["approved_amt"] == 3
+    # A result for every claim, in the order they were sent
+    assert [result["claim_id"] for result in approved["results"]] == claim_ids + [missing, "not-a-claim"]
+    assert approved["results"][0] == {"claim_id": claim_ids[0], "approved": False,
+                                      "message": "Claim has already been approved"}
+    assert all(result["approved"] for result in approved["results"][1:4])
+    assert [result["message"] for result in approved["results"][4:]] == ["Claim not found", "Claim not found"]
+
+    with db.cursor() as cur:
+        cur.execute("SELECT count(*), count(DISTINCT qr_code) FROM pickup WHERE claim_id = ANY(%s::uuid[])", (claim_ids,))
+        assert cur.fetchone() == (4, 4)
+        cur.execute("SELECT count(*) FROM claim WHERE claim_id = ANY(%s::uuid[]) AND approved AND approved_by = %s",
+                    (claim_ids, world.store_user))
+        assert cur.fetchone()[0] == 4
+
+    # Approving them again changes nothing
+    assert approve_bulk(client, world, claim_ids)["approved_amt"] == 0
+
+
+def test_claims_from_another_branch_are_not_approved(client, world, db):
+    _, line_items = create_listing(client, world, {world.bread: 10})
+    claim_id = create_claim(client, world, line_items[world.bread])
+    body = {"user_branch_id": world.charity_user_branch, "claim_ids": [claim_id]}
+    result = ok(client.post("/claims/approve/bulk", json=body)).json()["results"][0]
+    assert result["message"] == "This claim is not for items from your branch"
+    assert ok(client.get("/claims/pending", params={"branch_id": world.store_branch})).json()[0]["claim_id"] == claim_id
+
+
+def test_bad_bulk_requests(client, world):
+    _, line_items = create_listing(client, world, {world.bread: 10})
+    claim_id = create_claim(client, world, line_items[world.bread])
+    approve_bulk(client, world, [], 400)
+    approve_bulk(client, world, [claim_id, claim_id.upper()], 400)
+    body = {"user_branch_id": str(uuid4()), "claim_ids": [claim_id]}
+    ok(client.post("/claims/approve/bulk", json=body), 404)
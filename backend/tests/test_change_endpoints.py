@@ -0,0 +1,97 @@
+# Endpoint tests for the delta sync endpoints (db/changes.py), in both database modes
+# Needs a database, see tests/conftest.py
+
+import psycopg2
+from db import changes
+from db.config import DB_CONFIG
+from tests.helpers import create_claim, create_listing, ok
+
+
+def get_changes(client, path, status=200, **params):
+    return ok(client.get(path, params=params), status).json()
+
+
+def test_listing_changes(client, world):
+    start = get_changes(client, "/listings/changes", branch_id=world.store_branch)
+    assert start["listings"] == [] and start["removed"] == [] and start["cursor"]
+
+    listing_id, line_items = create_listing(client, world, {world.bread: 3})
+    changed = get_changes(client, "/listings/changes", branch_id=world.store_branch, cursor=start["cursor"])
+    assert [listing["listing_id"] for listing in changed["listings"]] == [listing_id]
+    assert get_changes(client, "/listings/changes", branch_id=world.store_branch, cursor=changed["cursor"])["listings"] == []
+
+    # Claiming everything that was left removes the listing
+    create_claim(client, world, line_items[world.bread], 3)
+    claimed = get_changes(client, "/listings/changes", branch_id=world.store_branch, cursor=changed["cursor"])
+    assert claimed["listings"] == [] and claimed["removed"] == [listing_id]
+
+
+def test_listing_without_the_product_is_removed(client, world):
+    start = get_changes(client, "/listings/changes", branch_id=world.store_branch)
+    listing_id, line_items = create_listing(client, world, {world.bread: 3, world.milk: 1})
+    create_claim(client, world, line_items[world.milk])
+    changed = get_changes(client, "/listings/changes", branch_id=world.store_branch, product_id=world.milk,
+                          cursor=start["cursor"])
+    assert changed["listings"] == [] and changed["removed"] == [listing_id]
+
+
+# A write that had not committed when the cursor was taken is sent once it has
+def test_write_in_progress_is_sent_after_it_commits(client, world):
+    _, line_items = create_listing(client, world, {world.bread: 3})
+    before = get_changes(client, "/listings/changes", branch_id=world.store_branch)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE listing_line_item SET quantity = 4 WHERE listing_line_item_id = %s",
+                        (line_items[world.bread],))
+        during = get_changes(client, "/listings/changes", branch_id=world.store_branch, cursor=before["cursor"])
+        assert during["listings"] == []
+        conn.commit()
+    finally:
+        conn.close()
+
+    after = get_changes(client, "/listings/changes", branch_id=world.store_branch, cursor=during["cursor"])
+    assert [listing["items"][0]["quantity"] for listing in after["listings"]] == [4]
+
+
+def test_pending_claim_and_pickup_changes(client, world):
+    _, line_items = create_listing(client, world, {world.bread: 5})
+    pending = get_changes(client, "/claims/pending/changes", branch_id=world.store_branch)
+    pickups = get_changes(client, "/pickups/my-pickups/changes", branch_id=world.charity_branch)
+    assert pending["claims"] == [] and pickups["pickups"] == []
+
+    claim_id = create_claim(client, world, line_items[world.bread], 3)
+    new_claim = get_changes(client, "/claims/pending/changes", branch_id=world.store_branch, cursor=pending["cursor"])
+    assert [(claim["claim_id"], claim["total_items"]) for claim in new_claim["claims"]] == [(claim_id, 3)]
+
+    ok(client.post("/claims/approve", json={"claim_id": claim_id, "user_branch_id": world.store_user_branch}))
+    approved = get_changes(client, "/claims/pending/changes", branch_id=world.store_branch, cursor=new_claim["cursor"])
+    assert approved["claims"] == [] and approved["removed"] == [claim_id]
+    approved_pickups = get_changes(client, "/pickups/my-pickups/changes", branch_id=world.charity_branch,
+                                   cursor=pickups["cursor"])
+    assert [(pickup["claim_id"], pickup["complete"]) for pickup in approved_pickups["pickups"]] == [(claim_id, False)]
+
+    code = ok(client.get(f"/pickup/qr/{claim_id}", params={"user_branch_id": world.charity_user_branch})).json()["qr_code"]
+    ok(client.post("/pickup/verify", json={"qr_code": code, "user_branch_id": world.store_user_branch}))
+    collected = get_changes(client, "/pickups/my-pickups/changes", branch_id=world.charity_branch,
+                            cursor=approved_pickups["cursor"])
+    assert [(pickup["claim_id"], pickup["complete"]) for pickup in collected["pickups"]] == [(claim_id, True)]
+
+    # Without a cursor everything is sent, the same as the full endpoint
+    everything = get_changes(client, "/pickups/my-pickups/changes", branch_id=world.charity_branch)
+    assert everything["pickups"] == ok(client.get("/pickups/my-pickups", params={"branch_id": world.charity_branch})).json()
+
+
+def test_bad_cursors(client, world):
+    for cursor in ["junk", "1:2", "1:2:3,", "1;2:3:", "9" * 30 + ":1:"]:
+        get_changes(client, "/listings/changes", 400, cursor=cursor)
+    get_changes(client, "/claims/pending/changes", 400, branch_id=world.store_branch, cursor="junk")
+
+
+def test_cursor_too_far_behind(client, world, monkeypatch):
+    start = get_changes(client, "/listings/changes", branch_id=world.store_branch)
+    create_listing(client, world, {world.bread: 1})
+    create_listing(client, world, {world.milk: 1})
+    monkeypatch.setattr(changes, "LISTING_CHANGES_MAX", 1)
+    get_changes(client, "/listings/changes", 410, branch_id=world.store_branch, cursor=start["cursor"])
@@ -0,0 +1,63 @@
+# Endpoint tests for POST /claims with both claim engines (WASTENOT_CLAIM_ENGINE, see db/claims.py),
+# in both database modes, including claims racing for the same items
+# Needs a database, see tests/conftest.py. The request checks are unit tested in tests/test_claims.py
+
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+import pytest
+from tests.helpers import create_listing, ok
+
+RACING_CLAIMS = 40
+STOCK = 20
+
+
+@pytest.fixture(params=["locking", "optimistic"])
+def engine(request, monkeypatch):
+    monkeypatch.setattr("endpoints.claims.CLAIM_ENGINE", request.param)
+    monkeypatch.setattr("async_endpoints.claims.CLAIM_ENGINE", request.param)
+    return request.param
+
+
+def claim(client, world, quantities):
+    items = [{"listing_line_item_id": line_item_id, "quantity": quantity} for line_item_id, quantity in quantities.items()]
+    return client.post("/claims", json={"user_branch_id": world.charity_user_branch, "items": items})
+
+
+def available(client, world):
+    listings = ok(client.get("/get_listings", params={"branch_id": world.store_branch})).json()
+    return {item["product_id"]: item["quantity"] for listing in listings for item in listing["items"]}
+
+
+def test_claim_takes_every_item(client, world, engine):
+    _, line_items = create_listing(client, world, {world.bread: 5, world.milk: 2})
+    ok(claim(client, world, {line_items[world.bread]: 3, line_items[world.milk]: 2}))
+    assert available(client, world) == {world.bread: 2}
+
+
+def test_short_item_takes_nothing(client, world, engine):
+    _, line_items = create_listing(client, world, {world.bread: 5, world.milk: 2})
+    response = ok(claim(client, world, {line_items[world.bread]: 1, line_items[world.milk]: 3}), 400)
+    assert line_items[world.milk] in response.json()["detail"]
+    assert available(client, world) == {world.bread: 5, world.milk: 2}
+
+
+def test_missing_item(client, world, engine):
+    _, line_items = create_listing(client, world, {world.bread: 5})
+    ok(claim(client, world, {line_items[world.bread]: 1, str(uuid4()): 1}), 404)
+    assert available(client, world) == {world.bread: 5}
+
+
+# Half the claims ask for bread then milk and half for milk then bread, so claims that locked their rows
+# in the order they were sent would deadlock. Every claim either gets both or gets a 400 for a shortfall
+def test_racing_claims_never_over_claim(client, world, engine):
+    _, line_items = create_listing(client, world, {world.bread: STOCK, world.milk: STOCK})
+    orders = [[world.bread, world.milk], [world.milk, world.bread]]
+
+    def racing_claim(i):
+        return claim(client, world, {line_items[product_id]: 1 for product_id in orders[i % 2]}).status_code
+
+    with ThreadPoolExecutor(8) as pool:
+        statuses = list(pool.map(racing_claim, range(RACING_CLAIMS)))
+    assert sorted(set(statuses)) == [200, 400]
+    assert statuses.count(200) == STOCK
+    assert available(client, world) == {}
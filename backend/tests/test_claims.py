@@ -0,0 +1,31 @@
+# Unit tests for the claim request checks in db/claims.py, no database needed
+
+import pytest
+from fastapi import HTTPException
+from db.claims import merge_claim_items
+from models import ClaimItem
+
+BREAD = "00000000-0000-0000-0000-0000000000e1"
+MILK = "00000000-0000-0000-0000-0000000000e2"
+
+
+def test_same_item_twice_is_merged_in_order():
+    items = [
+        ClaimItem(listing_line_item_id=MILK, quantity=1),
+        ClaimItem(listing_line_item_id=BREAD, quantity=2),
+        # the same ID in capitals and without dashes
+        ClaimItem(listing_line_item_id=MILK.upper().replace("-", ""), quantity=3),
+    ]
+    assert list(merge_claim_items(items).items()) == [(MILK, 4), (BREAD, 2)]
+
+
+def test_negative_quantity():
+    with pytest.raises(HTTPException) as e:
+        merge_claim_items([ClaimItem(listing_line_item_id=BREAD, quantity=-1)])
+    assert e.value.status_code == 400
+
+
+def test_id_that_is_not_a_uuid():
+    with pytest.raises(HTTPException) as e:
+        merge_claim_items([ClaimItem(listing_line_item_id="bread", quantity=1)])
+    assert e.value.status_code == 404
@@ -0,0 +1,49 @@
+# Endpoint tests for the main flow, run in both database modes (endpoints/ and async_endpoints/)
+# Needs a database, see tests/conftest.py
+
+from tests.helpers import create_claim, create_listing, ok
+
+
+def test_root_reports_the_mode(request, client):
+    assert ok(client.get("/")).json()["db_mode"] == request.node.callspec.params["client"]
+
+
+def test_listing_claim_approve_and_pickup(client, world):
+    _, line_items = create_listing(client, world, {world.bread: 5, world.milk: 2})
+    claim_id = create_claim(client, world, line_items[world.bread], 3)
+
+    # The claimed quantity is taken off what is available
+    listings = ok(client.get("/get_listings", params={"branch_id": world.store_branch})).json()
+    assert {item["product_id"]: item["quantity"] for item in listings[0]["items"]} == {world.bread: 2, world.milk: 2}
+
+    pending = ok(client.get("/claims/pending", params={"branch_id": world.store_branch})).json()
+    assert [(claim["claim_id"], claim["total_items"]) for claim in pending] == [(claim_id, 3)]
+
+    approved = ok(client.post("/claims/approve", json={"claim_id": claim_id, "user_branch_id": world.store_user_branch}))
+    assert approved.json()["approved"]
+    assert ok(client.get("/claims/pending", params={"branch_id": world.store_branch})).json() == []
+
+    qr_code = ok(client.get(f"/pickup/qr/{claim_id}", params={"user_branch_id": world.charity_user_branch})).json()["qr_code"]
+    verified = ok(client.post("/pickup/verify", json={"qr_code": qr_code, "user_branch_id": world.store_user_branch})).json()
+    assert verified["success"] and verified["claim_id"] == claim_id
+
+    pickups = ok(client.get("/pickups/my-pickups", params={"branch_id": world.charity_branch})).json()
+    assert [(pickup["claim_id"], pickup["complete"]) for pickup in pickups] == [(claim_id, True)]
+
+
+def test_claim_more_than_is_left(client, world):
+    _, line_items = create_listing(client, world, {world.bread: 1})
+    body = {"user_branch_id": world.charity_user_branch,
+            "items": [{"listing_line_item_id": line_items[world.bread], "quantity": 2}]}
+    ok(client.post("/claims", json=body), 400)
+    # Nothing was taken off
+    listings = ok(client.get("/get_listings", params={"branch_id": world.store_branch})).json()
+    assert listings[0]["items"][0]["quantity"] == 1
+
+
+def test_listing_for_another_branch_cannot_be_cancelled(client, world):
+    listing_id, _ = create_listing(client, world, {world.bread: 1})
+    body = {"user_branch_id": world.charity_user_branch, "listing_id": listing_id}
+    ok(client.post("/listing/cancel", json=body), 404)
+    listings = ok(client.get("/get_listings", params={"branch_id": world.store_branch})).json()
+    assert [listing["listing_id"] for listing in listings] == [listing_id]
@@ -0,0 +1,90 @@
+# Endpoint tests for the ETags and 304s on the branch read endpoints (db/versions.py), in both database modes
+# Needs a database, see tests/conftest.py
+
+import psycopg2
+from db.config import DB_CONFIG
+from tests.helpers import create_claim, create_listing, new_world, ok
+
+
+def routes(world):
+    return {
+        "pending": ("/claims/pending", {"branch_id": world.store_branch}),
+        "awaiting": ("/claims/approved-awaiting-pickup", {"branch_id": world.store_branch}),
+        "pickups": ("/pickups/my-pickups", {"branch_id": world.charity_branch}),
+        "listings": ("/get_listings", {"branch_id": world.store_branch}),
+    }
+
+
+# Each route's ETag, checking that sending it back gets an empty 304 with the same ETag
+def etags(client, world) -> dict:
+    found = {}
+    for name, (path, params) in routes(world).items():
+        response = ok(client.get(path, params=params))
+        assert response.headers["cache-control"] == "private, no-cache"
+        found[name] = response.headers["etag"]
+        not_modified = ok(client.get(path, params=params, headers={"If-None-Match": found[name]}), 304)
+        assert not_modified.content == b"" and not_modified.headers["etag"] == found[name]
+    return found
+
+
+def changed(before, after) -> set:
+    return {name for name in before if before[name] != after[name]}
+
+
+def test_writes_change_the_etags_that_depend_on_them(client, world):
+    start = etags(client, world)
+    assert len(set(start.values())) == len(start)
+
+    _, line_items = create_listing(client, world, {world.bread: 5})
+    listed = etags(client, world)
+    assert changed(start, listed) == {"listings", "awaiting"}
+
+    claim_id = create_claim(client, world, line_items[world.bread], 2)
+    claimed = etags(client, world)
+    assert changed(listed, claimed) == {"listings", "awaiting", "pending", "pickups"}
+
+    ok(client.post("/claims/approve", json={"claim_id": claim_id, "user_branch_id": world.store_user_branch}))
+    approved = etags(client, world)
+    assert changed(claimed, approved) == {"awaiting", "pending", "pickups"}
+
+
+def test_old_etag_gets_the_new_body(client, world):
+    path, params = routes(world)["pending"]
+    old_etag = ok(client.get(path, params=params)).headers["etag"]
+    _, line_items = create_listing(client, world, {world.bread: 5})
+    claim_id = create_claim(client, world, line_items[world.bread])
+
+    response = ok(client.get(path, params=params, headers={"If-None-Match": old_etag}))
+    assert [claim["claim_id"] for claim in response.json()] == [claim_id]
+    assert response.headers["etag"] == etags(client, world)["pending"]
+
+
+def test_query_parameters_are_part_of_the_etag(client, world):
+    path, params = routes(world)["listings"]
+    assert (ok(client.get(path, params=params)).headers["etag"]
+            != ok(client.get(path, params={**params, "limit": 5})).headers["etag"])
+
+
+def test_other_branches_keep_their_etags(client, world, db):
+    start = etags(client, world)
+    other_world = new_world(db)
+    _, line_items = create_listing(client, other_world, {other_world.bread: 5})
+    create_claim(client, other_world, line_items[other_world.bread])
+    assert changed(start, etags(client, world)) == set()
+
+
+# Until every transaction older than the branch's newest change has finished, one of them could still commit
+# a change to the branch, so no ETag is sent
+def test_no_etag_while_an_older_transaction_is_open(client, world):
+    path, params = routes(world)["listings"]
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            # Gives the open transaction its ID, older than the listing's
+            cur.execute("SELECT pg_current_xact_id()")
+        create_listing(client, world, {world.bread: 5})
+        assert "etag" not in ok(client.get(path, params=params)).headers
+    finally:
+        conn.rollback()
+        conn.close()
+    assert "etag" in ok(client.get(path, params=params)).headers
@@ -0,0 +1,43 @@
+# Unit tests for the event hub (db/events.py), no database needed
+# The availability reads are replaced, so the hub never connects
+
+import asyncio
+import json
+import psycopg2
+from db.events import RESYNC, EventHub
+
+BRANCH = "00000000-0000-0000-0000-0000000000a1"
+LISTING = "00000000-0000-0000-0000-000000000001"
+CHANGE = json.dumps({"branch_id": BRANCH, "listing_ids": [LISTING]})
+
+
+# Subscribes to listings, sends the change as the listener thread would and returns the event the client gets
+def listing_event(hub, payload=CHANGE):
+    async def receive():
+        sub = hub.subscribe(None, ["listings"])
+        await asyncio.to_thread(hub.on_listing_change, "listing_changes", payload)
+        return await asyncio.wait_for(sub.queue.get(), 1)
+
+    return asyncio.run(receive())
+
+
+def test_listing_event_carries_the_availability(monkeypatch):
+    hub = EventHub()
+    monkeypatch.setattr(hub, "_fetch", lambda sql, params: [(LISTING, "lli", "product", "Bread", 2)])
+    event = listing_event(hub)
+    assert event["type"] == "listing" and event["branch_id"] == BRANCH
+    assert event["listings"] == [{"listing_id": LISTING, "items": [
+        {"listing_line_item_id": "lli", "product_id": "product", "product_name": "Bread", "quantity": 2}]}]
+
+
+def test_failed_availability_read_sends_resync(monkeypatch):
+    def fail(sql, params):
+        raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    hub = EventHub()
+    monkeypatch.setattr(hub, "_fetch", fail)
+    assert listing_event(hub) == {**RESYNC, "branch_id": BRANCH}
+
+
+def test_too_many_listings_sends_resync():
+    assert listing_event(EventHub(), json.dumps({"branch_id": BRANCH})) == {**RESYNC, "branch_id": BRANCH}
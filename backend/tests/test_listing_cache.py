@@ -0,0 +1,103 @@
+# Unit tests for the listing cache (db/listing_cache.py), no database needed
+# The rows passed to load() are shaped like CACHE_CLAIMABLE_LISTINGS and AVAILABLE_LINE_ITEMS
+
+from db.listing_cache import ListingCache
+
+BRANCH_A = "00000000-0000-0000-0000-0000000000a1"
+BRANCH_B = "00000000-0000-0000-0000-0000000000a2"
+ORG_A = "00000000-0000-0000-0000-0000000000b1"
+ORG_B = "00000000-0000-0000-0000-0000000000b2"
+BREAD = "00000000-0000-0000-0000-0000000000c1"
+MILK = "00000000-0000-0000-0000-0000000000c2"
+
+# listing_id -> (branch_id, org_id, product_id), listing IDs in sort order
+LISTINGS = {
+    "00000000-0000-0000-0000-000000000001": (BRANCH_A, ORG_A, BREAD),
+    "00000000-0000-0000-0000-000000000002": (BRANCH_B, ORG_B, MILK),
+    "00000000-0000-0000-0000-000000000003": (BRANCH_A, ORG_A, MILK),
+}
+
+
+def cache_rows(listing_ids):
+    listing_rows = [(lid, "Org", "Branch", LISTINGS[lid][0], LISTINGS[lid][1]) for lid in listing_ids]
+    item_rows = [(lid, f"{lid[:-1]}9", LISTINGS[lid][2], "Product", 2) for lid in listing_ids]
+    return listing_rows, item_rows
+
+
+def loaded_cache():
+    cache = ListingCache()
+    cache.load(cache.refresh_plan(), *cache_rows(LISTINGS))
+    return cache
+
+
+def page_ids(page):
+    return [listing["listing_id"] for listing in page]
+
+
+def test_first_plan_loads_every_branch():
+    cache = ListingCache()
+    assert cache.refresh_plan() == (0, None)
+    cache.load(cache.refresh_plan(), *cache_rows(LISTINGS))
+    assert cache.refresh_plan() is None
+
+
+def test_pages_follow_listing_id_order():
+    cache = loaded_cache()
+    page, cursor = cache.page(None, 2)
+    assert page_ids(page) == list(LISTINGS)[:2]
+    assert cursor == list(LISTINGS)[1]
+
+    page, cursor = cache.page(cursor, 2)
+    assert page_ids(page) == list(LISTINGS)[2:]
+    assert cursor is None
+
+
+def test_page_filters():
+    cache = loaded_cache()
+    assert page_ids(cache.page(None, 10, branch_id=BRANCH_A)[0]) == [
+        "00000000-0000-0000-0000-000000000001", "00000000-0000-0000-0000-000000000003",
+    ]
+    assert page_ids(cache.page(None, 10, org_id=ORG_B)[0]) == ["00000000-0000-0000-0000-000000000002"]
+    assert page_ids(cache.page(None, 10, branch_id=BRANCH_A, product_id=MILK)[0]) == [
+        "00000000-0000-0000-0000-000000000003",
+    ]
+
+
+def test_reloading_a_branch_replaces_its_listings():
+    cache = loaded_cache()
+    cache.invalidate(BRANCH_A)
+    plan = cache.refresh_plan()
+    assert plan[1] == [BRANCH_A]
+
+    # Every listing of the branch was claimed, so the reload returns none for it
+    cache.load(plan, [], [])
+    assert cache.refresh_plan() is None
+    assert page_ids(cache.page(None, 10)[0]) == ["00000000-0000-0000-0000-000000000002"]
+
+
+def test_change_during_a_load_stays_out_of_date():
+    cache = loaded_cache()
+    cache.invalidate(BRANCH_A)
+    plan = cache.refresh_plan()
+    # A write to the branch after the plan was made, which the load may not have seen
+    cache.invalidate(BRANCH_A)
+    cache.load(plan, *cache_rows(LISTINGS))
+    assert cache.refresh_plan()[1] == [BRANCH_A]
+
+
+def test_invalidate_all_during_a_full_load():
+    cache = ListingCache()
+    plan = cache.refresh_plan()
+    cache.invalidate_all()
+    cache.load(plan, *cache_rows(LISTINGS))
+    assert cache.refresh_plan()[1] is None
+
+
+def test_unreadable_notify_reloads_everything():
+    cache = loaded_cache()
+    cache.on_notify("listing_changes", "not json")
+    assert cache.refresh_plan()[1] is None
+
+    cache = loaded_cache()
+    cache.on_notify("listing_changes", f'{{"branch_id": "{BRANCH_B}"}}')
+    assert cache.refresh_plan()[1] == [BRANCH_B]
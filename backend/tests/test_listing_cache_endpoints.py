@@ -0,0 +1,78 @@
+# Endpoint tests for the listing cache (db/listing_cache.py): the NOTIFY from migration 0003 reaching a
+# listener, and cached pages matching the ones read from the database, in both database modes
+# Needs a database, see tests/conftest.py. The unit tests are in tests/test_listing_cache.py
+
+import threading
+import time
+import pytest
+from db.listing_cache import LISTING_CHANNEL, ListingCache, listing_cache
+from db.notify import PgListener
+from tests.helpers import create_claim, create_listing, ok
+
+WAIT_SECONDS = 5
+
+
+def wait_for(check):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while not check():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def listened_cache(test_database):
+    cache = ListingCache()
+    connected = threading.Event()
+    listener = PgListener()
+    listener.listen(LISTING_CHANNEL, cache.on_notify)
+    listener.on_connection(on_connect=connected.set)
+    listener.start()
+    try:
+        assert connected.wait(WAIT_SECONDS)
+        # Everything loaded, so only the branches written to after this are out of date
+        cache.load(cache.refresh_plan(), [], [])
+        yield cache
+    finally:
+        listener.stop()
+
+
+def test_listing_write_marks_its_branch_out_of_date(client, world, listened_cache):
+    assert listened_cache.refresh_plan() is None
+    _, line_items = create_listing(client, world, {world.bread: 2})
+    wait_for(lambda: listened_cache.refresh_plan() is not None)
+    assert listened_cache.refresh_plan()[1] == [world.store_branch]
+
+    # A claim changes the available quantities, so it notifies too
+    listened_cache.load(listened_cache.refresh_plan(), [], [])
+    create_claim(client, world, line_items[world.bread])
+    wait_for(lambda: listened_cache.refresh_plan() is not None)
+    assert listened_cache.refresh_plan()[1] == [world.store_branch]
+
+
+def listing_pages(client, params):
+    response = ok(client.get("/listings", params=params))
+    return response.json(), response.headers.get("X-Next-Cursor")
+
+
+def test_cached_pages_match_the_database(client, world, monkeypatch):
+    create_listing(client, world, {world.bread: 2})
+    create_listing(client, world, {world.milk: 3})
+    create_listing(client, world, {world.bread: 1, world.milk: 1})
+
+    queries = [
+        {"branch_id": world.store_branch},
+        {"branch_id": world.store_branch, "limit": 2},
+        {"org_id": world.store_org, "product_id": world.milk},
+    ]
+    from_database = [listing_pages(client, params) for params in queries]
+    with monkeypatch.context() as patch:
+        patch.setattr("endpoints.listings.LISTING_CACHE", True)
+        patch.setattr("async_endpoints.listings.LISTING_CACHE", True)
+        # Not attached to a listener here, so it is loaded in full by the first read
+        listing_cache.set_ready(True)
+        try:
+            from_cache = [listing_pages(client, params) for params in queries]
+            assert listing_cache.refresh_plan() is None
+        finally:
+            listing_cache.set_ready(False)
+    assert from_cache == from_database
@@ -0,0 +1,80 @@
+# Endpoint tests for verifying pickups with signed and random QR codes (utils/pickup_token.py),
+# one at a time and in bulk, in both database modes
+# Needs a database, see tests/conftest.py. The signing itself is unit tested in tests/test_pickup_token.py
+
+import time
+import pytest
+from utils import pickup_token
+from utils.pickup_token import sign_pickup_token
+from tests.helpers import create_claim, create_listing, ok
+
+
+@pytest.fixture(params=["signed", "random"])
+def codes(request, monkeypatch):
+    monkeypatch.setattr(pickup_token, "QR_SECRET", "test-secret" if request.param == "signed" else "")
+    return request.param
+
+
+# Claims approved by the store, with their QR codes
+def approved_claims(client, world, count) -> list:
+    _, line_items = create_listing(client, world, {world.bread: count})
+    claim_ids = [create_claim(client, world, line_items[world.bread]) for _ in range(count)]
+    ok(client.post("/claims/approve/bulk", json={"user_branch_id": world.store_user_branch, "claim_ids": claim_ids}))
+    return [(claim_id, qr_code(client, world, claim_id)) for claim_id in claim_ids]
+
+
+def qr_code(client, world, claim_id):
+    params = {"user_branch_id": world.charity_user_branch}
+    return ok(client.get(f"/pickup/qr/{claim_id}", params=params)).json()["qr_code"]
+
+
+def verify(client, world, code):
+    return client.post("/pickup/verify", json={"qr_code": code, "user_branch_id": world.store_user_branch})
+
+
+def test_codes_are_signed_when_there_is_a_secret(client, world, codes):
+    [(claim_id, code)] = approved_claims(client, world, 1)
+    assert code.startswith("WN1.") == (codes == "signed")
+    verified = ok(verify(client, world, code)).json()
+    assert verified["success"] and verified["claim_id"] == claim_id and verified["items"]
+    assert ok(verify(client, world, code), 400).json()["detail"] == "This pickup has already been completed"
+
+
+def test_rejected_codes(client, world, codes):
+    [(claim_id, code)] = approved_claims(client, world, 1)
+    if codes == "signed":
+        forged = f"{code[:-3]}{'AAA' if not code.endswith('AAA') else 'BBB'}"
+        expired = sign_pickup_token(claim_id, world.store_user_branch, int(time.time()) - 10)
+        ok(verify(client, world, forged), 404)
+        ok(verify(client, world, expired), 400)
+    # A code for another store is turned away, whether or not it is signed
+    other_store = {"qr_code": code, "user_branch_id": world.charity_user_branch}
+    ok(client.post("/pickup/verify", json=other_store), 403)
+    assert ok(verify(client, world, code)).json()["success"]
+
+
+def test_bulk_verify(client, world, db, codes):
+    claims = approved_claims(client, world, 4)
+    ok(verify(client, world, claims[0][1]))
+    bad = "WN1.junk"
+    sent = [code for _, code in claims] + [bad]
+
+    verified = ok(client.post("/pickup/verify/bulk", json={"user_branch_id": world.store_user_branch, "qr_codes": sent})).json()
+    assert verified["completed_amt"] == 3
+    results = verified["results"]
+    assert [result["qr_code"] for result in results] == sent
+    assert results[0]["message"] == "This pickup has already been completed" and not results[0]["success"]
+    assert all(result["success"] and result["charity_name"] == "Charity - Charity Branch" for result in results[1:4])
+    assert results[4]["message"] == "Invalid QR code" and not results[4]["success"]
+
+    with db.cursor() as cur:
+        cur.execute("SELECT count(*) FROM pickup WHERE complete AND claim_id = ANY(%s::uuid[])",
+                    ([claim_id for claim_id, _ in claims],))
+        assert cur.fetchone()[0] == 4
+
+
+def test_bad_bulk_verify_requests(client, world, codes):
+    [(_, code)] = approved_claims(client, world, 1)
+    for qr_codes in ([], [code, code]):
+        body = {"user_branch_id": world.store_user_branch, "qr_codes": qr_codes}
+        ok(client.post("/pickup/verify/bulk", json=body), 400)
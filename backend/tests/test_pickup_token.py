@@ -0,0 +1,84 @@
+# Unit tests for the signed pickup QR codes (utils/pickup_token.py), no database needed
+
+import time
+import pytest
+from utils import pickup_token
+from utils.pickup_token import InvalidPickupToken, new_pickup_code, pickup_token_error, read_pickup_token, sign_pickup_token
+
+CLAIM = "00000000-0000-0000-0000-0000000000c1"
+STORE_BRANCH = "00000000-0000-0000-0000-0000000000d1"
+OTHER_BRANCH = "00000000-0000-0000-0000-0000000000d2"
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(pickup_token, "QR_SECRET", "test-secret")
+
+
+def test_signed_code_reads_back():
+    expires_at = int(time.time()) + 60
+    token = read_pickup_token(sign_pickup_token(CLAIM, STORE_BRANCH, expires_at))
+    assert (token.claim_id, token.user_branch_id, token.expires_at) == (CLAIM, STORE_BRANCH, expires_at)
+
+
+def test_expired_code():
+    qr_code = sign_pickup_token(CLAIM, STORE_BRANCH, int(time.time()) - 1)
+    with pytest.raises(InvalidPickupToken) as e:
+        read_pickup_token(qr_code)
+    assert e.value.status == 400
+
+
+def test_new_code_expires_after_qr_token_hours(monkeypatch):
+    monkeypatch.setattr(pickup_token, "QR_TOKEN_HOURS", 2)
+    token = read_pickup_token(new_pickup_code(CLAIM, STORE_BRANCH))
+    assert abs(token.expires_at - (time.time() + 2 * 3600)) < 5
+
+
+# Codes with one character changed, or cut short
+def change_at(text, i):
+    return text[:i] + ("A" if text[i] != "A" else "B") + text[i + 1:]
+
+
+def change_payload(qr_code):
+    signed_part, _, signature = qr_code.rpartition(".")
+    return f"{change_at(signed_part, len(pickup_token.VERSION) + 2)}.{signature}"
+
+
+def change_signature(qr_code):
+    signed_part, _, signature = qr_code.rpartition(".")
+    return f"{signed_part}.{change_at(signature, 2)}"
+
+
+def drop_signature(qr_code):
+    return qr_code.rpartition(".")[0]
+
+
+@pytest.mark.parametrize("change", [change_payload, change_signature, drop_signature])
+def test_changed_code_is_rejected(change):
+    qr_code = sign_pickup_token(CLAIM, STORE_BRANCH)
+    with pytest.raises(InvalidPickupToken) as e:
+        read_pickup_token(change(qr_code))
+    assert e.value.status == 404
+
+
+def test_code_signed_with_another_secret(monkeypatch):
+    qr_code = sign_pickup_token(CLAIM, STORE_BRANCH)
+    monkeypatch.setattr(pickup_token, "QR_SECRET", "another-secret")
+    with pytest.raises(InvalidPickupToken):
+        read_pickup_token(qr_code)
+
+
+def test_branch_check():
+    qr_code = sign_pickup_token(CLAIM, STORE_BRANCH)
+    assert pickup_token_error(qr_code, STORE_BRANCH.upper()) is None
+    assert pickup_token_error(qr_code, OTHER_BRANCH)[0] == 403
+
+
+def test_random_codes_are_left_to_the_database(monkeypatch):
+    assert pickup_token_error("WNrandomcode", STORE_BRANCH) is None
+
+    monkeypatch.setattr(pickup_token, "QR_SECRET", "")
+    qr_code = new_pickup_code(CLAIM, STORE_BRANCH)
+    assert qr_code.startswith("WN") and "." not in qr_code
+    with pytest.raises(InvalidPickupToken):
+        read_pickup_token(qr_code)
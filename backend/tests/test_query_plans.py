@@ -0,0 +1,155 @@
+# Checks that every endpoint query in db/queries.py is answered from an index on realistic data
+# Run from the backend folder against a migrated local database (python -m db.migrate first):
+#   python -m pytest tests/test_query_plans.py
+# Skipped when there is no database to connect to
+# The default benchmark world (benchmarks/seed.py) and a few rows with known IDs are added inside a transaction
+# and rolled back at the end, so nothing is left behind, including any Bench world already there
+# The planner settings are left as they are, so the plans are the ones the endpoints get. Reading a small table
+# whole (organisations, branches, users) is cheaper than an index and is fine, so only a scan that reads a
+# table of more than BIG_TABLE_ROWS rows whole is a failure
+
+from uuid import uuid4
+import psycopg2
+import pytest
+from benchmarks import seed
+from db.config import DB_CONFIG
+from db import queries
+
+# New IDs each run so the seeded rows cannot clash with rows already in the database
+ORG = str(uuid4())
+CHARITY_ORG = str(uuid4())
+BRANCH = str(uuid4())
+CHARITY_BRANCH = str(uuid4())
+USER = str(uuid4())
+CHARITY_USER = str(uuid4())
+USER_BRANCH = str(uuid4())
+CHARITY_USER_BRANCH = str(uuid4())
+PRODUCT = str(uuid4())
+LISTING = str(uuid4())
+LINE_ITEM = str(uuid4())
+CLAIM = str(uuid4())
+PICKUP = str(uuid4())
+QR_CODE = str(uuid4())
+# A change cursor from a while ago (pg_snapshot xmin:xmax:xip)
+SINCE = "1000:1000:"
+
+SEED = f"""
+    INSERT INTO organisation (org_id, org_name) VALUES ('{ORG}', 'Store'), ('{CHARITY_ORG}', 'Charity');
+    INSERT INTO branch (branch_id, org_id, branch_name, branch_location)
+    VALUES ('{BRANCH}', '{ORG}', 'Store Branch', 'Cork'), ('{CHARITY_BRANCH}', '{CHARITY_ORG}', 'Charity Branch', 'Cork');
+    INSERT INTO app_user (user_id, user_email) VALUES ('{USER}', 'store@example.com'), ('{CHARITY_USER}', 'charity@example.com');
+    INSERT INTO user_branch (user_branch_id, user_id, branch_id, org_id)
+    VALUES ('{USER_BRANCH}', '{USER}', '{BRANCH}', '{ORG}'), ('{CHARITY_USER_BRANCH}', '{CHARITY_USER}', '{CHARITY_BRANCH}', '{CHARITY_ORG}');
+    INSERT INTO product (product_id, branch_id, product_name) VALUES ('{PRODUCT}', '{BRANCH}', 'Bread');
+    INSERT INTO listing (listing_id, user_branch_id) VALUES ('{LISTING}', '{USER_BRANCH}');
+    INSERT INTO listing_line_item (listing_line_item_id, listing_id, product_id, quantity) VALUES ('{LINE_ITEM}', '{LISTING}', '{PRODUCT}', 5);
+    INSERT INTO claim (claim_id, user_branch_id) VALUES ('{CLAIM}', '{CHARITY_USER_BRANCH}');
+    INSERT INTO listing_claim_item (claim_id, listing_line_item_id, quantity) VALUES ('{CLAIM}', '{LINE_ITEM}', 1);
+    INSERT INTO pickup (pickup_id, claim_id, qr_code) VALUES ('{PICKUP}', '{CLAIM}', '{QR_CODE}');
+"""
+
+LISTING_PAGE = {"cursor": None, "org_id": None, "branch_id": BRANCH, "product_id": PRODUCT, "limit": 51}
+LISTING_PAGE_CURSOR = {"cursor": LISTING, "org_id": ORG, "branch_id": None, "product_id": None, "limit": 51}
+
+# (query name in db/queries.py, parameters) for every read and write the endpoints make
+# INSERTs without a SELECT are left out as they do not scan anything
+CHECKS = [
+    ("GET_PRODUCTS", (BRANCH,)),
+    ("CLAIMABLE_LISTINGS_PAGE", LISTING_PAGE),
+    ("CLAIMABLE_LISTINGS_PAGE", LISTING_PAGE_CURSOR),
+    ("CACHE_CLAIMABLE_LISTINGS", {"branch_ids": [BRANCH]}),
+    ("AVAILABLE_LINE_ITEMS", ([LISTING],)),
+    ("LOCK_BRANCH_LISTING", (LISTING, USER_BRANCH)),
+    ("UPDATE_LINE_ITEM_QUANTITIES", ([LISTING], [LINE_ITEM], [3])),
+    ("ZERO_LISTING_QUANTITIES", (LISTING,)),
+    ("LOCK_BRANCH_LISTINGS", ([LISTING], USER_BRANCH)),
+    ("ZERO_LISTINGS_QUANTITIES", ([LISTING],)),
+    ("LOCK_LINE_ITEMS", ([LINE_ITEM],)),
+    ("CLAIM_LINE_ITEMS", {"claim_id": CLAIM, "item_ids": [LINE_ITEM], "quantities": [1]}),
+    ("CLAIM_IF_AVAILABLE", {"user_branch_id": CHARITY_USER_BRANCH, "item_ids": [LINE_ITEM], "quantities": [1]}),
+    ("LINE_ITEM_QUANTITIES", ([LINE_ITEM],)),
+    ("PENDING_CLAIMS", (BRANCH,)),
+    ("CLAIM_ITEMS", ([CLAIM],)),
+    ("LOCK_CLAIM", (CLAIM,)),
+    ("USER_BRANCH_USER", (USER_BRANCH,)),
+    ("COUNT_CLAIM_ITEMS_FOR_BRANCH", (CLAIM, USER_BRANCH)),
+    ("APPROVE_CLAIM", (USER, CLAIM)),
+    ("LOCK_CLAIMS_FOR_BRANCH", {"claim_ids": [CLAIM], "user_branch_id": USER_BRANCH}),
+    ("APPROVE_CLAIMS", {"approved_by": USER, "claim_ids": [CLAIM], "qr_codes": [QR_CODE]}),
+    ("CHARITY_CLAIM", (CLAIM, CHARITY_USER_BRANCH)),
+    ("CLAIM_PICKUP", (CLAIM,)),
+    ("PICKUP_ITEMS_WITH_STORE", (CLAIM,)),
+    ("MY_PICKUPS", (CHARITY_BRANCH,)),
+    ("LOCK_PICKUP_BY_QR", (QR_CODE,)),
+    ("PICKUP_ITEMS_WITH_BRANCH", (CLAIM,)),
+    ("CHARITY_NAME", (CHARITY_USER_BRANCH,)),
+    ("COMPLETE_PICKUP", (PICKUP,)),
+    ("LOCK_PICKUPS_BY_QR", {"qr_codes": [QR_CODE], "user_branch_id": USER_BRANCH}),
+    ("COMPLETE_PICKUPS", ([PICKUP],)),
+    ("APPROVED_AWAITING_PICKUP", (BRANCH,)),
+    ("JSON_CLAIMABLE_LISTINGS_PAGE", {**LISTING_PAGE, "page_size": 50}),
+    ("JSON_PENDING_CLAIMS", (BRANCH,)),
+    ("JSON_MY_PICKUPS", (CHARITY_BRANCH,)),
+    ("PENDING_CLAIM_CHANGES", {"branch_id": BRANCH, "since": SINCE}),
+    ("PICKUP_CHANGES", {"branch_id": CHARITY_BRANCH, "since": SINCE}),
+    ("LISTING_CHANGES", {"since": SINCE, "org_id": None, "branch_id": BRANCH, "product_id": None, "limit": 501}),
+    ("BRANCH_VERSIONS", {"branch_id": BRANCH}),
+    ("PRIMARY_BRANCH_VERSIONS", {"branch_id": BRANCH}),
+]
+
+
+# The benchmark world's smallest endpoint tables (products, listings) are a few thousand rows,
+# its lookup tables (organisations, branches, users) around a hundred
+BIG_TABLE_ROWS = 1000
+
+# An index scan with a Filter but no Index Cond reads the whole index and applies the filter to every row
+# (a whole index read with no Filter, e.g. to build a hash join, is fine)
+INDEX_SCANS = ("Index Scan", "Index Only Scan")
+
+
+# Returns a description of every scan in the plan tree that filters a whole big table or index
+# table_rows is the planner's row estimate for each table (pg_class.reltuples)
+def full_scans(node, table_rows) -> list:
+    found = []
+    if table_rows.get(node.get("Relation Name"), 0) > BIG_TABLE_ROWS:
+        if node["Node Type"] == "Seq Scan":
+            found.append(f"Seq Scan on {node['Relation Name']}")
+        elif node["Node Type"] in INDEX_SCANS and "Filter" in node and "Index Cond" not in node:
+            found.append(f"{node['Node Type']} using {node['Index Name']} with no Index Cond")
+    for child in node.get("Plans", []):
+        found.extend(full_scans(child, table_rows))
+    return found
+
+
+# A cursor in a transaction holding the benchmark world and the seeded rows, rolled back afterwards
+@pytest.fixture(scope="module")
+def cur():
+    try:
+        conn = psycopg2.connect(connect_timeout=3, **DB_CONFIG)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"no database to connect to: {e}")
+    try:
+        with conn.cursor() as cur:
+            # Removing any Bench world first so the tables are the size the seed script makes them
+            cur.execute(seed.RESET)
+            cur.execute(seed.WORLD, seed.world_params(seed.parse_args([])))
+            cur.execute(SEED)
+            # The planner needs up to date statistics for the new table sizes
+            cur.execute("ANALYZE")
+            yield cur
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@pytest.fixture(scope="module")
+def table_rows(cur):
+    cur.execute("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace")
+    return dict(cur.fetchall())
+
+
+@pytest.mark.parametrize("name, params", CHECKS, ids=[name for name, _ in CHECKS])
+def test_query_uses_indexes(cur, table_rows, name, params):
+    cur.execute("EXPLAIN (FORMAT JSON) " + getattr(queries, name), params)
+    plan = cur.fetchone()[0][0]["Plan"]
+    assert full_scans(plan, table_rows) == []
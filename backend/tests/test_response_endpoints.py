@@ -0,0 +1,61 @@
+# Endpoint tests for the fast responses (utils/responses.py), in both database modes
+# Needs a database, see tests/conftest.py. The encoding is unit tested in tests/test_responses.py
+
+import pytest
+from utils import responses
+from tests.helpers import create_claim, create_listing, ok
+
+MSGPACK = "application/msgpack"
+
+
+@pytest.fixture
+def claimed_world(client, world):
+    _, line_items = create_listing(client, world, {world.bread: 5, world.milk: 2})
+    create_listing(client, world, {world.milk: 1})
+    claim_id = create_claim(client, world, line_items[world.bread], 2)
+    ok(client.post("/claims/approve", json={"claim_id": claim_id, "user_branch_id": world.store_user_branch}))
+    create_claim(client, world, line_items[world.milk])
+    return world
+
+
+def read_routes(world):
+    return [
+        ("/get_listings", {"branch_id": world.store_branch}),
+        ("/listings", {"branch_id": world.store_branch, "limit": 1}),
+        ("/claims/pending", {"branch_id": world.store_branch}),
+        ("/pickups/my-pickups", {"branch_id": world.charity_branch}),
+        ("/claims/approved-awaiting-pickup", {"branch_id": world.store_branch}),
+    ]
+
+
+def test_fast_responses_send_the_same_json(client, claimed_world, monkeypatch):
+    def bodies():
+        found = []
+        for path, params in read_routes(claimed_world):
+            response = ok(client.get(path, params=params))
+            found.append((response.json(), response.headers.get("X-Next-Cursor"), response.headers.get("ETag")))
+        return found
+
+    checked = bodies()
+    monkeypatch.setattr(responses, "FAST_RESPONSES", True)
+    assert bodies() == checked
+
+
+def test_msgpack_for_clients_that_ask(client, claimed_world, monkeypatch):
+    msgpack = pytest.importorskip("msgpack")
+    monkeypatch.setattr(responses, "FAST_RESPONSES", True)
+    for path, params in read_routes(claimed_world):
+        as_json = ok(client.get(path, params=params))
+        packed = ok(client.get(path, params=params, headers={"Accept": MSGPACK}))
+        assert packed.headers["content-type"] == MSGPACK
+        assert msgpack.unpackb(packed.content) == as_json.json()
+        # The two bodies are different representations, so a cached one is never sent for the other
+        if "ETag" in as_json.headers:
+            assert packed.headers["ETag"] != as_json.headers["ETag"]
+
+
+def test_msgpack_needs_fast_responses(client, claimed_world, monkeypatch):
+    monkeypatch.setattr(responses, "FAST_RESPONSES", False)
+    path, params = read_routes(claimed_world)[0]
+    response = ok(client.get(path, params=params, headers={"Accept": MSGPACK}))
+    assert response.headers["content-type"] == "application/json"
@@ -0,0 +1,70 @@
+# Unit tests for the fast response encoding (utils/responses.py), no database needed
+
+import os
+import subprocess
+import sys
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+import pytest
+from starlette.requests import Request
+from utils import responses
+from utils.responses import encode_default, representation
+
+CLAIM = "00000000-0000-0000-0000-0000000000c1"
+
+
+def request_with(accept=None):
+    headers = [(b"accept", accept.encode())] if accept else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_encode_default_matches_jsonable_encoder():
+    assert encode_default(UUID(CLAIM)) == CLAIM
+    assert encode_default(date(2026, 1, 2)) == "2026-01-02"
+    assert encode_default(datetime(2026, 1, 2, 3, 4, tzinfo=timezone.utc)) == "2026-01-02T03:04:00+00:00"
+    # SUM() comes back as a Decimal, whole numbers are sent as ints
+    assert encode_default(Decimal("3")) == 3 and isinstance(encode_default(Decimal("3")), int)
+    assert encode_default(Decimal("2.5")) == 2.5
+
+
+def test_encode_default_with_orjson():
+    orjson = pytest.importorskip("orjson")
+    assert orjson.loads(orjson.dumps({"total": Decimal("4")}, default=encode_default)) == {"total": 4}
+
+
+def test_encode_default_unknown_type():
+    with pytest.raises(TypeError):
+        encode_default(object())
+
+
+def test_representation(monkeypatch):
+    monkeypatch.setattr(responses, "FAST_RESPONSES", True)
+    assert representation(request_with()) == "json"
+    assert representation(request_with("application/json")) == "json"
+    if responses.load_msgpack() is not None:
+        assert representation(request_with("application/msgpack")) == "msgpack"
+
+    # Without msgpack, or without fast responses, everyone gets JSON
+    monkeypatch.setattr(responses, "load_msgpack", lambda: None)
+    assert representation(request_with("application/msgpack")) == "json"
+
+
+def test_representation_without_fast_responses(monkeypatch):
+    monkeypatch.setattr(responses, "FAST_RESPONSES", False)
+    assert representation(request_with("application/msgpack")) == "json"
+
+
+# With fast responses and compression off, starting the app loads none of the optional encoders or the QR pool
+# orjson is left out, as FastAPI itself imports it when it is installed
+def test_optional_modules_are_not_imported_at_start_up():
+    code = (
+        "import sys, app; app.create_app(); "
+        "print(sorted(set(sys.argv[1:]) & set(sys.modules)))"
+    )
+    env_off = {"WASTENOT_FAST_RESPONSES": "0", "WASTENOT_COMPRESS_MIN_BYTES": "0"}
+    result = subprocess.run(
+        [sys.executable, "-c", code, "msgpack", "brotli", "concurrent.futures.process"],
+        capture_output=True, text=True, check=True, env={**os.environ, **env_off},
+    )
+    assert result.stdout.strip() == "[]"
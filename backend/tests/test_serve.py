@@ -0,0 +1,41 @@
+# Tests for splitting the connection budget between the workers (serve.py)
+# Only the max_connections checks need a database (tests/conftest.py)
+
+import pytest
+from db.config import DB_CONFIG
+from serve import check_max_connections, extra_connections, worker_pool_size
+
+
+def test_budget_is_split_between_workers():
+    assert worker_pool_size(80, 4, 0) == 20
+    # what is left over from an uneven split is not used
+    assert worker_pool_size(81, 4, 0) == 20
+
+
+def test_listener_and_event_connections_come_off_each_share():
+    extra = extra_connections(listing_cache=True, events=True)
+    assert extra == 2
+    assert worker_pool_size(80, 4, extra) == 18
+    assert worker_pool_size(80, 4, extra_connections(listing_cache=True, events=False)) == 19
+
+
+def test_budget_too_small_stops_the_launcher():
+    assert worker_pool_size(8, 4, 1) == 1
+    with pytest.raises(SystemExit):
+        worker_pool_size(7, 4, 1)
+
+
+def test_budget_within_max_connections(test_database, capsys):
+    check_max_connections(DB_CONFIG, 1)
+    assert capsys.readouterr().out == ""
+
+
+def test_budget_over_max_connections_stops_the_launcher(test_database):
+    with pytest.raises(SystemExit) as e:
+        check_max_connections(DB_CONFIG, 100000)
+    assert "max_connections" in str(e.value)
+
+
+def test_unreachable_database_is_not_checked(capsys):
+    check_max_connections({**DB_CONFIG, "host": "127.0.0.1", "port": 1}, 100000)
+    assert "Could not check max_connections" in capsys.readouterr().out
@@ -0,0 +1,128 @@
+# Tests for POST /listings/upload (db/uploads.py): loading CSV and NDJSON stock exports, rejecting bad rows,
+# and the row limit, in both database modes
+# The endpoint tests need a database, see tests/conftest.py. The UploadRowCounter tests do not
+
+import asyncio
+import json
+from tempfile import SpooledTemporaryFile
+import pytest
+from fastapi import HTTPException
+from db import uploads
+from db.uploads import UploadRowCounter, spool_upload
+from tests.helpers import ok
+
+ROW_LIMIT = 5
+HEADER = "user_branch_id,product_id,quantity,listing_ref\n"
+
+
+@pytest.fixture(autouse=True)
+def row_limit(monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_ROWS", ROW_LIMIT)
+
+
+def upload(client, body, content_type="text/csv"):
+    return client.post("/listings/upload", content=body.encode(), headers={"Content-Type": content_type})
+
+
+def csv_rows(world, count, listing_ref="am"):
+    return "".join(f"{world.store_user_branch},{world.bread},1,{listing_ref}\n" for _ in range(count))
+
+
+def branch_listings(client, world):
+    return ok(client.get("/get_listings", params={"branch_id": world.store_branch})).json()
+
+
+def test_counter_counts_quoted_newlines_as_one_row():
+    counter = UploadRowCounter("csv")
+    counter.add(b'a,b\n1,"x\ny"\n2,"')
+    counter.add(b'p\nq""r"\n')
+    assert counter.lines == 3
+
+
+def test_counter_stops_past_the_limit():
+    counter = UploadRowCounter("ndjson")
+    with pytest.raises(HTTPException) as e:
+        counter.add(b"{}\n" * (ROW_LIMIT + 1))
+    assert e.value.status_code == 400
+
+
+def chunks(*parts):
+    async def stream():
+        for part in parts:
+            yield part
+    return stream()
+
+
+def test_spooling_strips_the_bom_and_reads_the_columns():
+    with SpooledTemporaryFile() as body:
+        columns = asyncio.run(spool_upload(chunks(b"\xef\xbb\xbfquantity,product_id,user_branch_id\n", b"1,b,a\n"), "csv", body))
+        assert columns == ["quantity", "product_id", "user_branch_id"]
+        assert body.read() == b"quantity,product_id,user_branch_id\n1,b,a\n"
+
+
+# A stream over the limit is stopped before the rest of it is read
+def test_spooling_stops_past_the_limit():
+    read = []
+
+    async def stream():
+        for part in [b"user_branch_id,product_id,quantity\n", b"a,b,1\n" * ROW_LIMIT, b"a,b,1\n", b"a,b,1\n"]:
+            read.append(part)
+            yield part
+
+    with SpooledTemporaryFile() as body:
+        with pytest.raises(HTTPException):
+            asyncio.run(spool_upload(stream(), "csv", body))
+    assert len(read) == 3
+
+
+def test_csv_upload(client, world):
+    body = (f"﻿product_id,quantity,user_branch_id,listing_ref\n"
+            f"{world.bread},5,{world.store_user_branch},am\n"
+            f"{world.milk}, 3 ,{world.store_user_branch},am\n"
+            f"{world.bread},2,{world.store_user_branch.upper()},pm\n")
+    uploaded = ok(upload(client, body)).json()
+    assert uploaded["line_items"] == 3
+    assert [(listing["listing_ref"], listing["total_quantity"]) for listing in uploaded["listings"]] == [("am", 8), ("pm", 2)]
+    assert {listing["listing_id"] for listing in branch_listings(client, world)} == {
+        listing["listing_id"] for listing in uploaded["listings"]}
+
+
+def test_ndjson_upload(client, world):
+    body = "".join(json.dumps({"user_branch_id": world.store_user_branch, "product_id": product_id, "quantity": quantity}) + "\n"
+                   for product_id, quantity in ((world.bread, 1), (world.milk, "2")))
+    uploaded = ok(upload(client, body, "application/x-ndjson")).json()
+    assert [listing["total_quantity"] for listing in uploaded["listings"]] == [3]
+
+
+def test_bad_rows_are_listed_and_nothing_is_loaded(client, world):
+    body = (HEADER
+            + f"{world.store_user_branch},{world.bread},1,\n"
+            + f"{world.store_user_branch},not-a-product,1,\n"
+            + f"{world.store_user_branch},{world.bread},0,\n")
+    response = ok(upload(client, body), 400)
+    assert [error["row"] for error in response.json()["detail"]["errors"]] == [2, 3]
+    assert branch_listings(client, world) == []
+
+
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_one_row_over_the_limit(client, world, trailing_newline):
+    body = HEADER + csv_rows(world, ROW_LIMIT + 1)
+    if not trailing_newline:
+        body = body[:-1]
+    response = ok(upload(client, body), 400)
+    assert "limited" in response.text
+    assert branch_listings(client, world) == []
+
+
+def test_far_over_the_limit(client, world):
+    ok(upload(client, HEADER + csv_rows(world, 4 * ROW_LIMIT)), 400)
+    nd_row = json.dumps({"user_branch_id": world.store_user_branch, "product_id": world.bread, "quantity": 1}) + "\n"
+    ok(upload(client, nd_row * (ROW_LIMIT + 1), "application/x-ndjson"), 400)
+    assert branch_listings(client, world) == []
+
+
+def test_rows_up_to_the_limit(client, world):
+    # A quoted newline is part of its row, so this is still ROW_LIMIT rows
+    body = HEADER + csv_rows(world, ROW_LIMIT - 1) + f'{world.store_user_branch},{world.bread},1,"am\nlate"\n'
+    uploaded = ok(upload(client, body)).json()
+    assert uploaded["line_items"] == ROW_LIMIT
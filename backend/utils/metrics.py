@@ -0,0 +1,204 @@
+# Metrics in the Prometheus text format, served at GET /metrics when WASTENOT_METRICS=1
+# Written by hand instead of adding prometheus_client, as only counters, gauges and histograms are needed
+# (Prometheus, 2024)
+#
+# What is measured:
+#   - every request, by route: total time, the part spent waiting on Postgres, and the rest (Python work and
+#     JSON serialisation), via MetricsMiddleware below
+#   - every SQL statement, by its name in db/queries.py: time and rows (db/metrics.py)
+#   - the connection pool: connections in use, requests waiting, time waiting for a connection and requests turned away (db/metrics.py)
+# The numbers are for this process only, so with several workers each one is scraped separately
+
+import threading
+import time
+from contextvars import ContextVar
+
+# Default Prometheus buckets, with smaller ones added for SQL statements that take well under a millisecond
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Every metric registers itself here so render() can write them all out
+REGISTRY = []
+
+
+def format_labels(labelnames, values) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> value
+        REGISTRY.append(self)
+
+    def key(self, labels) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{format_labels(self.labelnames, key)} {value}" for key, value in values
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    # read is called at scrape time instead of keeping the value up to date, it returns {label values: value}
+    def __init__(self, name: str, help_text: str, labelnames=(), read=None):
+        super().__init__(name, help_text, labelnames)
+        self.read = read
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self.key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> list:
+        if self.read is None:
+            return super().render()
+        return self.header() + [
+            f"{self.name}{format_labels(self.labelnames, key)} {value}" for key, value in self.read().items()
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # one count per bucket, then the sum and the total count
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        lines = self.header()
+        for key, counts in values:
+            for bound, count in zip(self.buckets, counts):
+                labels = format_labels(self.labelnames + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = format_labels(self.labelnames + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {counts[-1]}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {counts[-2]}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+
+def render() -> bytes:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return ("\n".join(lines) + "\n").encode()
+
+
+# ---------------------------------------------
+# Requests
+
+REQUEST_SECONDS = Histogram(
+    "wastenot_request_seconds", "Time to send the whole response", ("method", "route", "status"))
+REQUEST_DB_SECONDS = Histogram(
+    "wastenot_request_db_seconds", "Time each request spent waiting on Postgres", ("method", "route"))
+REQUEST_PYTHON_SECONDS = Histogram(
+    "wastenot_request_python_seconds", "Time each request spent outside Postgres (Python work and serialisation)",
+    ("method", "route"))
+REQUESTS_IN_PROGRESS = Gauge(
+    "wastenot_requests_in_progress", "Requests being handled right now")
+
+# Postgres time for the current request, added to by the cursors in db/metrics.py
+# Sync endpoints run in a copy of the request's context on a threadpool thread, so the list is shared
+# with the middleware rather than replaced
+request_db_time = ContextVar("request_db_time", default=None)
+
+
+def add_db_time(seconds: float):
+    timing = request_db_time.get()
+    if timing is not None:
+        timing[0] += seconds
+
+
+# Routes that stay open (the event stream) or would measure themselves are left out
+SKIPPED_PATHS = {"/metrics", "/events"}
+
+
+# Plain ASGI middleware rather than @app.middleware("http"), so the time includes sending the whole body
+# (a StreamingResponse keeps sending after the endpoint returns)
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in SKIPPED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        timing = [0.0]
+        token = request_db_time.set(timing)
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_PROGRESS.dec()
+            request_db_time.reset(token)
+            # The route template (e.g. /pickup/qr/{claim_id}) so each claim does not get its own series
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_SECONDS.observe(elapsed, method=method, route=route, status=status[0])
+            REQUEST_DB_SECONDS.observe(timing[0], method=method, route=route)
+            REQUEST_PYTHON_SECONDS.observe(max(elapsed - timing[0], 0.0), method=method, route=route)
+
+# REFERENCES
+# Prometheus. (2024). Exposition formats. Retrieved from prometheus.io: https://prometheus.io/docs/instrumenting/exposition_formats/
@@ -0,0 +1,107 @@
+# Signed pickup QR codes, used when WASTENOT_QR_SECRET is set (see db/config.py)
+# The original codes from generate_secure_token are random, so the only way to check one is to look it up
+# in the pickup table. A signed code carries what the store needs to know and an HMAC over it (Krawczyk et al., 1997):
+#   WN1.<payload>.<signature>
+#   payload   - claim_id (16 bytes), the store's user_branch_id (16 bytes) and the expiry (4 byte Unix time),
+#               base64url without padding
+#   signature - the first 16 bytes of HMAC-SHA256(WASTENOT_QR_SECRET, "WN1." + payload), base64url
+# so the backend can reject a forged, expired or other branch code before touching the database, and the
+# scanner can read the branch and expiry itself to reject codes straight away (WasteNotDev/services/pickupToken.ts)
+# The code is still stored in pickup.qr_code, so a pickup can only be completed once
+
+import base64
+import hashlib
+import hmac
+import struct
+import time
+from uuid import UUID
+from db.config import QR_SECRET, QR_TOKEN_HOURS
+from utils.qr_code import generate_secure_token
+
+VERSION = "WN1."
+PAYLOAD = struct.Struct(">16s16sI")
+SIGNATURE_BYTES = 16
+
+
+# status is the HTTP status the verify endpoints answer with
+class InvalidPickupToken(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class PickupToken:
+    def __init__(self, claim_id: str, user_branch_id: str, expires_at: int):
+        self.claim_id = claim_id
+        self.user_branch_id = user_branch_id  # the store branch that approved the claim
+        self.expires_at = expires_at
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(signed_part: str) -> bytes:
+    return hmac.new(QR_SECRET.encode(), signed_part.encode(), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+# Old random codes start with WN too, but never contain a dot
+def is_signed(qr_code: str) -> bool:
+    return qr_code.startswith(VERSION)
+
+
+def sign_pickup_token(claim_id, user_branch_id, expires_at=None) -> str:
+    if expires_at is None:
+        expires_at = int(time.time() + QR_TOKEN_HOURS * 3600)
+    payload = PAYLOAD.pack(UUID(str(claim_id)).bytes, UUID(str(user_branch_id)).bytes, expires_at)
+    signed_part = VERSION + _b64encode(payload)
+    return f"{signed_part}.{_b64encode(_signature(signed_part))}"
+
+
+# Checking the signature, then the expiry, without a database lookup
+# Raises InvalidPickupToken with the status and message for the store worker
+def read_pickup_token(qr_code: str) -> PickupToken:
+    if not QR_SECRET or not is_signed(qr_code):
+        raise InvalidPickupToken(404, "Invalid QR code")
+    signed_part, _, signature = qr_code.rpartition(".")
+    try:
+        claim_id, user_branch_id, expires_at = PAYLOAD.unpack(_b64decode(signed_part[len(VERSION):]))
+        valid = hmac.compare_digest(_b64decode(signature), _signature(signed_part))
+    except (ValueError, struct.error):
+        raise InvalidPickupToken(404, "Invalid QR code")
+    if not valid:
+        raise InvalidPickupToken(404, "Invalid QR code")
+    if expires_at < time.time():
+        raise InvalidPickupToken(400, "This QR code has expired")
+    return PickupToken(str(UUID(bytes=claim_id)), str(UUID(bytes=user_branch_id)), expires_at)
+
+
+# Checking a scanned code is for the scanning store worker's branch
+# Returns (status code, message) for a code that should be turned away, or None if it is fine
+# Codes that are not signed are left to the database lookup, as pickups approved before
+# WASTENOT_QR_SECRET was set still have random codes
+def pickup_token_error(qr_code: str, user_branch_id: str):
+    if not (QR_SECRET and is_signed(qr_code)):
+        return None
+    try:
+        token = read_pickup_token(qr_code)
+    except InvalidPickupToken as e:
+        return e.status, e.message
+    if token.user_branch_id != user_branch_id.strip().lower():
+        return 403, "This pickup is for a different branch"
+    return None
+
+
+# The code for a newly approved claim
+def new_pickup_code(claim_id, user_branch_id) -> str:
+    if QR_SECRET:
+        return sign_pickup_token(claim_id, user_branch_id)
+    return generate_secure_token()
+
+# REFERENCES
+# Krawczyk, H., Bellare, M., & Canetti, R. (1997). HMAC: Keyed-Hashing for Message Authentication (RFC 2104). Retrieved from rfc-editor.org: https://www.rfc-editor.org/rfc/rfc2104
@@ -0,0 +1,189 @@
+# QR rendering for the pickup QR image endpoint
+# A QR code can be sent in three formats (?format= on GET /pickup/qr/{claim_id}/image):
+#   png    - the original PIL image, box_size 10 with a 4 module border (adapted from ProgrammingKnowledge, 2025)
+#   svg    - a small SVG drawn straight from the module matrix, one path segment per run of dark modules
+#   matrix - the raw modules as JSON, so the app can draw the code itself at any size
+# Rendering is CPU work that holds the GIL, so it runs in a process pool and other requests keep going
+# Results are cached in this process by (token, format), as a pickup's token never changes after approval
+# qrcode (and PIL for the PNGs) is only imported when the first code is drawn, as it took about 35 ms of a
+# worker's start up and most workers never draw one (benchmarks/cold_start.py), and the process pool
+# module is imported with the pool for the same reason
+
+import asyncio
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "matrix": "application/json",
+}
+
+BORDER = 4
+BOX_SIZE = 10
+
+# WASTENOT_QR_WORKERS=0 renders in the calling thread instead of the process pool
+QR_WORKERS = int(os.getenv("WASTENOT_QR_WORKERS", "2"))
+QR_CACHE_SIZE = 1024
+
+
+# Building the module matrix, without the border (the formats below add it back)
+def qr_matrix(data: str):
+    import qrcode
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        border=0,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def render_png(data: str) -> bytes:
+    import qrcode
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=BOX_SIZE,
+        border=BORDER,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    buffer = io.BytesIO()
+    # The image is already 1 bit per pixel, optimize makes the PNG compression try harder
+    img.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+# Each run of dark modules in a row becomes one rectangle in a single path,
+# which is much smaller than qrcode's SvgPathImage (one rectangle per module)
+def render_svg(data: str) -> bytes:
+    matrix = qr_matrix(data)
+    size = len(matrix) + BORDER * 2
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if row[x]:
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                path.append(f"M{start + BORDER},{y + BORDER}h{x - start}v1h-{x - start}z")
+            else:
+                x += 1
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path d="{"".join(path)}" fill="#000"/>'
+        "</svg>"
+    )
+    return svg.encode()
+
+
+# rows are strings of 0s and 1s (1 = dark), which is far smaller than a JSON list of booleans
+def render_matrix(data: str) -> bytes:
+    matrix = qr_matrix(data)
+    body = {
+        "size": len(matrix),
+        "border": BORDER,
+        "rows": ["".join("1" if module else "0" for module in row) for row in matrix],
+    }
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+RENDERERS = {
+    "png": render_png,
+    "svg": render_svg,
+    "matrix": render_matrix,
+}
+
+
+# Runs in a worker process, so it has to be a top level function
+def render_qr(data: str, fmt: str) -> bytes:
+    return RENDERERS[fmt](data)
+
+
+# The ETag only depends on the token and the format, so it is the same on every server and after restarts
+# The token is hashed so it is not sent in the header
+def qr_etag(data: str, fmt: str = "png") -> str:
+    return '"' + hashlib.sha256(f"{fmt}:{data}".encode()).hexdigest()[:32] + '"'
+
+
+# ---------------------------------------------
+# Process pool and cache
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Least recently used entries are dropped once the cache is full
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# The pool is only started when the first QR code is drawn, so the app starts as fast as before
+def get_pool():
+    global _pool
+    if QR_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            _pool = ProcessPoolExecutor(max_workers=QR_WORKERS)
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def cached(data: str, fmt: str):
+    with _cache_lock:
+        key = (data, fmt)
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    return None
+
+
+def store(data: str, fmt: str, image: bytes) -> bytes:
+    with _cache_lock:
+        _cache[(data, fmt)] = image
+        _cache.move_to_end((data, fmt))
+        if len(_cache) > QR_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return image
+
+
+# For the sync endpoints, which already run in FastAPI's threadpool
+# The thread waits for the worker process, and while it waits other threads can run
+def render_qr_sync(data: str, fmt: str = "png") -> bytes:
+    image = cached(data, fmt)
+    if image is not None:
+        return image
+    pool = get_pool()
+    if pool is None:
+        return store(data, fmt, render_qr(data, fmt))
+    return store(data, fmt, pool.submit(render_qr, data, fmt).result())
+
+
+# For the async endpoints, the event loop waits for the worker process without blocking
+async def render_qr_async(data: str, fmt: str = "png") -> bytes:
+    image = cached(data, fmt)
+    if image is not None:
+        return image
+    loop = asyncio.get_running_loop()
+    # With no process pool, None runs it in the loop's default thread pool
+    image = await loop.run_in_executor(get_pool(), render_qr, data, fmt)
+    return store(data, fmt, image)
@@ -0,0 +1,148 @@
+# Faster responses for the big read endpoints
+# On a big branch most of a /listings, /get_listings, /claims/pending, /pickups/my-pickups or
+# /claims/approved-awaiting-pickup request was spent in Python after the queries had finished: FastAPI checked
+# the response against its response_model again and then encoded it with the standard json module
+#
+# With WASTENOT_FAST_RESPONSES=1 those endpoints send the dicts built by db/rows.py straight to orjson
+# (orjson, 2025), which is several times faster than json, and skip the response_model check, as the dicts
+# are built from the database with the right types already
+# Clients that send Accept: application/msgpack get MessagePack instead (MessagePack, 2025), which is smaller
+# and quicker for the app to read, when the msgpack package is installed
+#
+# WASTENOT_COMPRESS_MIN_BYTES compresses every response at least that big, using Starlette's GZipMiddleware
+# (Starlette, 2025) with brotli added for clients that accept it, when the brotli package is installed
+#
+# orjson, msgpack and brotli are only imported when the first response needs them, so a worker with
+# WASTENOT_FAST_RESPONSES and WASTENOT_COMPRESS_MIN_BYTES off starts without loading them
+
+import functools
+import importlib
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+from fastapi import Response
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+from db.config import FAST_RESPONSES
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# The lowest levels, as bigger levels took twice as long or more on a 277 KB page of listings for a few
+# percent smaller bodies (95 KB at gzip level 1, 82 KB at level 6)
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 4
+
+
+# msgpack and brotli are optional, without them every client gets JSON and gzip
+# The import is tried once, None means the package is not installed
+@functools.cache
+def optional_module(name: str):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def load_msgpack():
+    return optional_module("msgpack")
+
+
+def load_brotli():
+    return optional_module("brotli")
+
+
+# For values neither encoder knows, e.g. the UUIDs and timestamps in /claims/approved-awaiting-pickup
+# Matches what FastAPI's jsonable_encoder sends for them
+def encode_default(value):
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+# True if the client asked for MessagePack and we can send it
+def wants_msgpack(request) -> bool:
+    accept = request.headers.get("accept", "")
+    if not any(media_type in accept for media_type in MSGPACK_TYPES):
+        return False
+    return load_msgpack() is not None
+
+
+# Which encoding a request gets, so db/versions.py can give the JSON and MessagePack bodies different ETags
+def representation(request) -> str:
+    return "msgpack" if FAST_RESPONSES and wants_msgpack(request) else "json"
+
+
+# The body as orjson or MessagePack
+# Headers the endpoint already set on its Response parameter (X-Next-Cursor, ETag) are copied over,
+# as FastAPI only adds them to responses it builds itself
+def fast_response(request, response, content) -> Response:
+    if wants_msgpack(request):
+        body = load_msgpack().packb(content, default=encode_default)
+        media_type = "application/msgpack"
+    else:
+        import orjson
+        body = orjson.dumps(content, default=encode_default)
+        media_type = "application/json"
+    headers = {
+        name: value for name, value in response.headers.items()
+        if name not in ("content-length", "content-type")
+    }
+    fast = Response(content=body, media_type=media_type, headers=headers)
+    # the same URL can get either encoding
+    fast.headers.add_vary_header("Accept")
+    return fast
+
+
+# Returned by the read endpoints: content is sent as it is when WASTENOT_FAST_RESPONSES is off, so FastAPI
+# checks it against the response_model and encodes it the usual way
+def read_response(request, response, content):
+    if not FAST_RESPONSES:
+        return content
+    return fast_response(request, response, content)
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, **kwargs):
+        super().__init__(app, minimum_size, **kwargs)
+        self.compressor = load_brotli().Compressor(quality=BROTLI_QUALITY)
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if more_body:
+            return self.compressor.process(body) + self.compressor.flush()
+        return self.compressor.process(body) + self.compressor.finish()
+
+
+# GZipMiddleware with brotli for clients that list br in Accept-Encoding
+# Streams such as GET /events (text/event-stream) and responses under minimum_size are left as they are
+class CompressionMiddleware(GZipMiddleware):
+    def __init__(self, app, minimum_size: int):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=GZIP_LEVEL)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        if "br" in accept_encoding and load_brotli() is not None:
+            responder = BrotliResponder(
+                self.app, self.minimum_size, exclude_content_types=self.exclude_content_types,
+            )
+        elif "gzip" in accept_encoding:
+            responder = GZipResponder(
+                self.app, self.minimum_size, compresslevel=self.compresslevel,
+                thread_minimum_size=self.thread_minimum_size, exclude_content_types=self.exclude_content_types,
+            )
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size, exclude_content_types=self.exclude_content_types)
+        await responder(scope, receive, send)
+
+# REFERENCES
+# MessagePack. (2025). MessagePack: It's like JSON. but fast and small. Retrieved from msgpack.org: https://msgpack.org/
+# orjson. (2025). orjson: Fast, correct Python JSON library. Retrieved from github.com: https://github.com/ijl/orjson
+# Starlette. (2025). Middleware - GZipMiddleware. Retrieved from starlette.io: https://www.starlette.io/middleware/#gzipmiddleware